@@ -41,12 +41,13 @@ export const commandExecutor = {
             // Sanitize report for upload
             const sanitizedReport = sanitizeForUpload(report, command.params);
 
-            // Try to upload
+            // Try to upload; the outbox retries with the same idempotency key
+            const idempotencyKey = crypto.randomUUID();
             try {
-                await apiClient.uploadReport(config, command.id, sanitizedReport);
+                await apiClient.uploadReport(config, command.id, sanitizedReport, idempotencyKey);
             } catch (error) {
                 // Save to outbox for retry
-                await outboxStore.add(command.id, sanitizedReport);
+                await outboxStore.add(command.id, sanitizedReport, idempotencyKey);
                 throw error;
             }
 
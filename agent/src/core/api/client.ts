@@ -175,14 +175,24 @@ export const apiClient = {
         }
     },
 
-    async uploadReport(config: Config, commandId: string | undefined, report: unknown): Promise<void> {
+    async uploadReport(
+        config: Config,
+        commandId: string | undefined,
+        report: unknown,
+        idempotencyKey?: string,
+    ): Promise<void> {
         const baseUrl = normalizeServerUrl(config.serverUrl);
+        const headers: Record<string, string> = {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${config.deviceToken}`,
+        };
+        // Same key on every retry: the server returns the original report instead of storing a copy.
+        if (idempotencyKey) {
+            headers['Idempotency-Key'] = idempotencyKey;
+        }
         const response = await fetchWithRetry(`${baseUrl}/v1/agent/reports`, {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${config.deviceToken}`,
-            },
+            headers,
             body: JSON.stringify({
                 command_id: commandId,
                 report,
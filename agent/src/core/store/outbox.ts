@@ -6,6 +6,7 @@ import { apiClient } from '../api/client.js';
 interface OutboxItem {
     id: string;
     commandId?: string;
+    idempotencyKey?: string;
     report: unknown;
     createdAt: string;
     retryCount: number;
@@ -14,7 +15,7 @@ interface OutboxItem {
 const OUTBOX_DIR = path.join(configStore.getConfigDir(), 'outbox');
 
 export const outboxStore = {
-    async add(commandId: string | undefined, report: unknown): Promise<void> {
+    async add(commandId: string | undefined, report: unknown, idempotencyKey?: string): Promise<void> {
         await fs.mkdir(OUTBOX_DIR, { recursive: true, mode: 0o700 });
         try {
             await fs.chmod(OUTBOX_DIR, 0o700);
@@ -25,6 +26,7 @@ export const outboxStore = {
         const item: OutboxItem = {
             id: crypto.randomUUID(),
             commandId,
+            idempotencyKey,
             report,
             createdAt: new Date().toISOString(),
             retryCount: 0,
@@ -51,7 +53,7 @@ export const outboxStore = {
                 const item: OutboxItem = JSON.parse(data);
 
                 try {
-                    await apiClient.uploadReport(config, item.commandId, item.report);
+                    await apiClient.uploadReport(config, item.commandId, item.report, item.idempotencyKey);
                     await fs.unlink(filePath);
                     console.log(`📤 Flushed outbox item: ${item.id}`);
                 } catch (error) {
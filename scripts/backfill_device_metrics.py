@@ -0,0 +1,85 @@
+"""Fill device_metrics from the summary columns of reports uploaded before migration 0007.
+
+Walks reports in primary-key order, one short transaction per batch, and inserts the
+health_score / disk_free_percent / startup_apps_count points of each batch. Points that
+already exist (reports uploaded after 0007, or an earlier run) are skipped, so the
+script can be stopped and re-run, or resumed from the last printed id with --after:
+
+    cd server && DATABASE_URL=... python ../scripts/backfill_device_metrics.py --batch-size 5000
+
+Fields that only exist in raw report bodies start at upload and are not backfilled.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import asyncpg
+
+BACKFILL_BATCH = """
+    WITH batch AS (
+        SELECT id, device_id, created_at, health_score, disk_free_percent, startup_apps_count
+        FROM reports
+        WHERE id > $1
+        ORDER BY id
+        LIMIT $2
+    ), inserted AS (
+        INSERT INTO device_metrics (device_id, metric, ts, value)
+        SELECT b.device_id, m.metric, b.created_at, m.value
+        FROM batch b
+        CROSS JOIN LATERAL (
+            VALUES ('health_score', b.health_score::float8),
+                   ('disk_free_percent', b.disk_free_percent::float8),
+                   ('startup_apps_count', b.startup_apps_count::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+    SELECT (SELECT max(id) FROM batch) AS last_id,
+           (SELECT count(*) FROM batch) AS reports,
+           (SELECT count(*) FROM inserted) AS points
+"""
+
+
+async def backfill(args: argparse.Namespace) -> int:
+    conn = await asyncpg.connect(args.database_url)
+    after = args.after
+    reports = 0
+    points = 0
+    started = time.perf_counter()
+    try:
+        while True:
+            async with conn.transaction():
+                row = await conn.fetchrow(BACKFILL_BATCH, after, args.batch_size)
+            if not row["reports"]:
+                break
+            after = row["last_id"]
+            reports += row["reports"]
+            points += row["points"]
+            elapsed = time.perf_counter() - started
+            print(f"{reports:,} reports, {points:,} points inserted in {elapsed:,.1f}s (last id {after})", flush=True)
+            if args.pause_seconds:
+                await asyncio.sleep(args.pause_seconds)
+    finally:
+        await conn.close()
+    print(f"done: {reports:,} reports scanned, {points:,} points inserted")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL", ""))
+    parser.add_argument("--batch-size", type=int, default=5000, help="reports per transaction")
+    parser.add_argument("--pause-seconds", type=float, default=0.0, help="sleep between batches to limit load")
+    parser.add_argument("--after", default="", help="resume after this report id")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+    return asyncio.run(backfill(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
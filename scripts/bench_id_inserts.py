@@ -0,0 +1,162 @@
+"""Compare insert throughput of random vs time-ordered primary keys on a growing table.
+
+Loads --rows rows into two otherwise identical tables shaped like ``commands`` (TEXT
+primary key, device_id, created_at, a small payload): one keyed with the previous
+scheme (16 random hex chars from uuid4), one with the current generate_id
+(48-bit millisecond timestamp + 80 random bits). Every --report-every rows it prints
+insert throughput, primary-key index size and WAL written for that stretch; random
+keys dirty a different leaf page per row once the index outgrows shared_buffers,
+which shows up as falling rows/s and full-page-image WAL.
+
+    DATABASE_URL=... python scripts/bench_id_inserts.py --rows 5000000
+
+Ids are generated before the timed section so only the database cost is measured.
+The tables are dropped afterwards unless --keep is given.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "server"))
+
+import asyncpg  # noqa: E402
+
+from app.core.security import generate_id  # noqa: E402
+
+
+def legacy_id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:16]}"
+
+
+SCHEMES: Dict[str, Callable[[str], str]] = {
+    "random": legacy_id,
+    "time_ordered": generate_id,
+}
+
+
+def build_rows(make_id: Callable[[str], str], count: int, devices: int, seed: int) -> List[Tuple]:
+    rng = random.Random(seed)
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        (
+            make_id("cmd"),
+            f"dev_{rng.randrange(devices):06d}",
+            started + timedelta(milliseconds=index),
+            "RUN_FULL",
+            "succeeded",
+        )
+        for index in range(count)
+    ]
+
+
+async def _wal_lsn(conn) -> int:
+    return int(await conn.fetchval("SELECT pg_current_wal_lsn() - '0/0'::pg_lsn"))
+
+
+async def run_scheme(conn, scheme: str, args: argparse.Namespace) -> List[Dict[str, float]]:
+    table = f"bench_ids_{scheme}"
+    await conn.execute(f"DROP TABLE IF EXISTS {table}")
+    await conn.execute(
+        f"""
+        CREATE TABLE {table} (
+            id TEXT PRIMARY KEY,
+            device_id TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL,
+            type TEXT NOT NULL,
+            status TEXT NOT NULL
+        )
+        """
+    )
+    insert = f"INSERT INTO {table} (id, device_id, created_at, type, status) VALUES ($1, $2, $3, $4, $5)"
+    checkpoints: List[Dict[str, float]] = []
+    loaded = 0
+    while loaded < args.rows:
+        stretch = min(args.report_every, args.rows - loaded)
+        rows = build_rows(SCHEMES[scheme], stretch, args.devices, args.seed + loaded)
+        wal_before = await _wal_lsn(conn)
+        started = time.perf_counter()
+        for offset in range(0, stretch, args.batch_size):
+            async with conn.transaction():
+                if args.method == "copy":
+                    await conn.copy_records_to_table(
+                        table,
+                        records=rows[offset:offset + args.batch_size],
+                        columns=("id", "device_id", "created_at", "type", "status"),
+                    )
+                else:
+                    await conn.executemany(insert, rows[offset:offset + args.batch_size])
+        elapsed = time.perf_counter() - started
+        loaded += stretch
+        checkpoint = {
+            "rows": loaded,
+            "rows_per_second": stretch / elapsed,
+            "pkey_mb": await conn.fetchval(f"SELECT pg_relation_size('{table}_pkey')") / 1024 / 1024,
+            "wal_mb": (await _wal_lsn(conn) - wal_before) / 1024 / 1024,
+        }
+        checkpoints.append(checkpoint)
+        print(
+            f"{scheme:13} {loaded:>10,} rows  {checkpoint['rows_per_second']:>9,.0f} rows/s  "
+            f"pkey {checkpoint['pkey_mb']:8.1f} MB  WAL {checkpoint['wal_mb']:8.1f} MB",
+            flush=True,
+        )
+    try:
+        stats = await conn.fetchrow(
+            f"SELECT avg_leaf_density, leaf_fragmentation FROM pgstatindex('{table}_pkey')"
+        )
+        print(
+            f"{scheme:13} leaf density {stats['avg_leaf_density']:.1f}%  "
+            f"leaf fragmentation {stats['leaf_fragmentation']:.1f}%"
+        )
+    except asyncpg.PostgresError:
+        pass  # pgstattuple not installed
+    if not args.keep:
+        await conn.execute(f"DROP TABLE {table}")
+    return checkpoints
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL", ""))
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--report-every", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=1_000, help="rows per transaction")
+    parser.add_argument("--devices", type=int, default=12_000)
+    parser.add_argument("--method", choices=("insert", "copy"), default="insert",
+                        help="insert mirrors the API (one row per statement); copy is bulk load")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="keep the bench_ids_* tables")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    conn = await asyncpg.connect(args.database_url)
+    try:
+        try:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS pgstattuple")
+        except asyncpg.PostgresError:
+            pass
+        results = {scheme: await run_scheme(conn, scheme, args) for scheme in SCHEMES}
+    finally:
+        await conn.close()
+
+    tail = max(1, len(results["random"]) // 5)
+    for scheme, checkpoints in results.items():
+        last = checkpoints[-tail:]
+        print(
+            f"{scheme:13} last {tail} checkpoint(s): "
+            f"{sum(c['rows_per_second'] for c in last) / len(last):,.0f} rows/s, "
+            f"{sum(c['wal_mb'] for c in last) / len(last):.1f} MB WAL per {args.report_every:,} rows"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
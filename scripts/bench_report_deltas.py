@@ -0,0 +1,119 @@
+"""Measure how much report storage delta encoding saves on a synthetic fleet.
+
+Each device starts from an analyzer-shaped report (the generate_fleet_data shape) and
+then drifts the way repeated scans of one PC do: a few folders grow or shrink, a
+subfolder occasionally appears or disappears, privacy counters and scores move, the
+timestamp changes. Every report is encoded twice, as a full body and through
+app.services.report_delta with the configured snapshot interval, and both are
+compressed the way the blob store would. It also times rebuilding the deepest delta
+of each chain without the cache. No database is needed.
+
+    python scripts/bench_report_deltas.py --devices 500 --reports-per-device 60 --interval 20
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "server"))
+
+from app.core import json_codec  # noqa: E402
+from app.services.blob_store import compress  # noqa: E402
+from app.services.report_delta import apply_patch, diff  # noqa: E402
+from generate_fleet_data import _raw_report  # noqa: E402
+
+DELTA_RATIO = 0.75  # mirrors report_delta._MAX_DELTA_RATIO
+
+
+def next_scan(rng: random.Random, report: Dict[str, Any], at: datetime) -> Dict[str, Any]:
+    report = json_codec.loads(json_codec.dumps_bytes(report))
+    storage = report["storage"]
+    folders = storage["folders"]
+    for folder in folders:
+        if rng.random() < 0.3:
+            folder["bytes"] = max(0, int(folder["bytes"] * rng.uniform(0.97, 1.05)))
+            folder["fileCount"] = max(0, folder["fileCount"] + rng.randint(-20, 40))
+    if rng.random() < 0.05:
+        folders.insert(rng.randint(0, len(folders)), {
+            "name": f"Documents/new{rng.randint(0, 999)}", "bytes": rng.randint(1_000, 5_000_000_000),
+            "fileCount": rng.randint(1, 500),
+        })
+    elif rng.random() < 0.05 and len(folders) > 4:
+        folders.pop(rng.randrange(4, len(folders)))
+    free_percent = round(max(2.0, storage["freePercent"] - rng.uniform(0, 0.5)), 1)
+    storage["freePercent"] = report["diskFreePercent"] = free_percent
+    storage["freeBytes"] = int(storage["totalBytes"] * free_percent / 100)
+    report["healthScore"] = max(5, min(100, report["healthScore"] + rng.choice([-1, 0, 0, 1])))
+    report["slowdown"]["heavyProcessCount"] = rng.randint(0, 12)
+    report["privacy"]["browserCacheSizeBytes"] = rng.randint(0, 5_000_000_000)
+    report["privacy"]["tempFilesBytes"] = rng.randint(0, 10_000_000_000)
+    report["privacy"]["downloadsFolderBytes"] = folders[0]["bytes"]
+    report["createdAt"] = at.isoformat()
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--reports-per-device", type=int, default=60)
+    parser.add_argument("--interval", type=int, default=20, help="REPORT_DELTA_SNAPSHOT_INTERVAL")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    totals = {"full": 0, "full_compressed": 0, "stored": 0, "stored_compressed": 0, "snapshots": 0}
+    rebuild_seconds = 0.0
+    rebuilds = 0
+    started_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for index in range(args.devices):
+        rng = random.Random(f"{args.seed}:delta:{index}")
+        report = _raw_report(rng, rng.choice(["RUN_FULL", "RUN_DEEP"]), rng.randint(40, 95),
+                             round(rng.uniform(20, 80), 1), rng.randint(3, 20), started_at)
+        previous = None
+        chain = []
+        for n in range(args.reports_per_device):
+            if n:
+                report = next_scan(rng, report, started_at + timedelta(days=n))
+            body = json_codec.dumps_bytes(report)
+            stored = body
+            if previous is not None and len(chain) + 1 < args.interval:
+                delta = json_codec.dumps_bytes(diff(json_codec.loads(previous), report))
+                if len(delta) <= len(body) * DELTA_RATIO:
+                    stored = delta
+            if stored is body:
+                totals["snapshots"] += 1
+                chain = [body]
+            else:
+                chain.append(stored)
+            totals["full"] += len(body)
+            totals["full_compressed"] += len(compress(body))
+            totals["stored"] += len(stored)
+            totals["stored_compressed"] += len(compress(stored))
+            previous = body
+
+        if len(chain) > 1:
+            clock = time.perf_counter()
+            document = json_codec.loads(chain[0])
+            for patch in chain[1:]:
+                document = apply_patch(document, json_codec.loads(patch))
+            json_codec.dumps_bytes(document)
+            rebuild_seconds += time.perf_counter() - clock
+            rebuilds += 1
+
+    count = args.devices * args.reports_per_device
+    mb = 1024 * 1024
+    print(f"reports: {count:,} ({totals['snapshots']:,} snapshots, interval {args.interval})")
+    print(f"full bodies:    {totals['full'] / mb:9.1f} MB raw  {totals['full_compressed'] / mb:9.1f} MB compressed")
+    print(f"delta encoded:  {totals['stored'] / mb:9.1f} MB raw  {totals['stored_compressed'] / mb:9.1f} MB compressed")
+    print(f"saved:          {1 - totals['stored'] / totals['full']:9.1%} raw   "
+          f"{1 - totals['stored_compressed'] / totals['full_compressed']:9.1%} compressed")
+    if rebuilds:
+        print(f"uncached rebuild of the deepest delta: {rebuild_seconds / rebuilds * 1000:.2f} ms avg")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
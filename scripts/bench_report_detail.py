@@ -0,0 +1,137 @@
+"""Benchmark GET /v1/reports/{id} on a large report, in process.
+
+Compares the raw_report_json passthrough in the current router against the previous
+pipeline (stdlib json.loads of the jsonb text, Dict[str, Any] model validation and
+re-serialization), both served through ASGI with the database mocked out, so only the
+serialization cost is measured.
+
+    cd server && python ../scripts/bench_report_detail.py --size-mb 2 --requests 50
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "server"))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from app.api.v1.deps import get_current_user  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import ReportDetailResponse  # noqa: E402
+
+
+def build_report_text(size_bytes: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    folders = []
+    report = {"healthScore": 71, "diskFreePercent": 18.4, "startupAppsCount": 14, "oneLiner": "점검 필요",
+              "storage": {"folders": folders}}
+    while len(json.dumps(report, ensure_ascii=False)) < size_bytes:
+        folders.extend(
+            {
+                "name": f"Users/me/Documents/project-{rng.randint(0, 10**6)}/node_modules",
+                "bytes": rng.randint(10_000, 4_000_000_000),
+                "fileCount": rng.randint(1, 90_000),
+                "lastModified": "2026-01-01T00:00:00Z",
+            }
+            for _ in range(500)
+        )
+    return json.dumps(report, ensure_ascii=False)
+
+
+def row(raw_text: str) -> dict:
+    return {
+        "id": "rpt_bench",
+        "device_id": "dev_bench",
+        "command_id": None,
+        "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc),
+        "health_score": 71,
+        "disk_free_percent": 18.4,
+        "startup_apps_count": 14,
+        "one_liner": "점검 필요",
+        "raw_report_json": raw_text,
+        "raw_report_json_text": raw_text,
+        "raw_report_ref": None,
+        "raw_report_base_id": None,
+    }
+
+
+def legacy_app(raw_text: str) -> FastAPI:
+    legacy = FastAPI()
+
+    @legacy.get("/v1/reports/{report_id}", response_model=ReportDetailResponse)
+    async def get_report(report_id: str):
+        report = row(raw_text)
+        raw_data = json.loads(report["raw_report_json"])
+        return ReportDetailResponse(
+            id=report["id"],
+            device_id=report["device_id"],
+            command_id=report["command_id"],
+            created_at=report["created_at"],
+            health_score=report["health_score"],
+            disk_free_percent=report["disk_free_percent"],
+            startup_apps_count=report["startup_apps_count"],
+            one_liner=report["one_liner"],
+            raw_report_json=raw_data,
+        )
+
+    return legacy
+
+
+async def measure(asgi_app, requests: int) -> list:
+    timings = []
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/v1/reports/rpt_bench")  # warm-up
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get("/v1/reports/rpt_bench")
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.text
+    return timings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=2.0)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    raw_text = build_report_text(int(args.size_mb * 1024 * 1024))
+    conn = MagicMock()
+    conn.fetchrow = AsyncMock(return_value=row(raw_text))
+
+    @asynccontextmanager
+    async def fake_read_connection(*_args, **_kwargs):
+        yield conn
+
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_bench", "email": "bench@example.com"}
+    try:
+        with patch("app.api.v1.routers.reports.get_read_connection", side_effect=fake_read_connection), \
+                patch.object(settings, "rate_limit_requests", args.requests + 10):
+            current = await measure(app, args.requests)
+    finally:
+        app.dependency_overrides = {}
+    previous = await measure(legacy_app(raw_text), args.requests)
+
+    print(f"report size: {len(raw_text.encode('utf-8')) / 1024 / 1024:.2f} MB, {args.requests} requests")
+    for name, timings in (("previous (decode + re-encode)", previous), ("passthrough", current)):
+        timings.sort()
+        print(
+            f"{name:30} median {statistics.median(timings):7.2f} ms   "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
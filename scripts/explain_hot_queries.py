@@ -0,0 +1,169 @@
+"""Fail when a hot registered query plans a sequential scan.
+
+Creates a scratch schema, applies the migrations, seeds a synthetic dataset whose ids
+match the EXPLAIN_* sample parameters in app.core.queries, then runs
+EXPLAIN (FORMAT JSON) for every query registered with hot=True. Sequential scans are
+disabled for the session, so a Seq Scan in the plan means no usable index exists.
+
+    cd server && DATABASE_URL=... python ../scripts/explain_hot_queries.py --devices 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "server"))
+
+import asyncpg  # noqa: E402
+
+import app.main  # noqa: E402,F401  (imports every router so their queries register)
+from app.core.config import settings  # noqa: E402
+from app.core.migrations import apply_migrations  # noqa: E402
+from app.core.queries import hot_queries  # noqa: E402
+
+SEED_SQL = """
+INSERT INTO users (id, email, password_hash)
+SELECT 'usr_explain_' || u, 'explain-' || u || '@example.com', 'x'
+FROM generate_series(0, {users} - 1) AS u;
+
+INSERT INTO devices (id, user_id, name, platform, arch, agent_version, last_seen_at)
+SELECT 'dev_explain_' || d, 'usr_explain_' || (d % {users}), 'PC-' || d, 'windows', 'x64', '1.0.0',
+       NOW() - make_interval(secs => d)
+FROM generate_series(0, {devices} - 1) AS d;
+
+INSERT INTO device_tokens (id, device_id, token_hash, expires_at)
+SELECT 'dtk_explain_' || d, 'dev_explain_' || d, lpad(d::text, 64, '0'), NOW() + INTERVAL '1 year'
+FROM generate_series(0, {devices} - 1) AS d;
+
+INSERT INTO enroll_tokens (id, user_id, token_hash, expires_at)
+SELECT 'etk_explain_' || u, 'usr_explain_' || u, lpad(u::text, 64, '0'), NOW() + INTERVAL '1 hour'
+FROM generate_series(0, {users} - 1) AS u;
+
+INSERT INTO commands (id, device_id, user_id, type, status, progress, created_at, started_at, finished_at)
+SELECT 'cmd_explain_' || c,
+       'dev_explain_' || (c % {devices}),
+       'usr_explain_' || ((c % {devices}) % {users}),
+       (ARRAY['RUN_FULL', 'RUN_DEEP', 'RUN_STORAGE_ONLY', 'RUN_PRIVACY_ONLY', 'PING', 'PING'])[c % 6 + 1],
+       (ARRAY['succeeded', 'succeeded', 'failed', 'queued'])[c % 4 + 1],
+       100,
+       NOW() - make_interval(mins => c),
+       NOW() - make_interval(mins => c),
+       NOW() - make_interval(mins => c) + make_interval(secs => (c % 5) + 1)
+FROM generate_series(0, {devices} * {commands_per_device} - 1) AS c;
+
+INSERT INTO reports (id, device_id, created_at, health_score, disk_free_percent, startup_apps_count, one_liner)
+SELECT 'rpt_explain_' || r, 'dev_explain_' || (r % {devices}), NOW() - make_interval(hours => r),
+       50 + r % 50, (r % 90)::real, r % 20, 'ok'
+FROM generate_series(0, {devices} * {reports_per_device} - 1) AS r;
+
+INSERT INTO device_metrics (device_id, metric, ts, value)
+SELECT 'dev_explain_' || (r % {devices}), m.metric, NOW() - make_interval(hours => r), (r % 90)::float8
+FROM generate_series(0, {devices} * {reports_per_device} - 1) AS r
+CROSS JOIN unnest(ARRAY['health_score', 'disk_free_percent', 'startup_apps_count']) AS m(metric);
+
+INSERT INTO fleet_state (user_id, metric, count, total)
+SELECT 'usr_explain_' || u, m.metric, {devices} / {users}, 0
+FROM generate_series(0, {users} - 1) AS u
+CROSS JOIN unnest(ARRAY['devices', 'health_score', 'high_risk_devices', 'disk_free_bin.3']) AS m(metric);
+
+INSERT INTO fleet_rollups (user_id, granularity, bucket_start, metric, count, total)
+SELECT 'usr_explain_' || u, 'day', date_trunc('day', NOW()) - make_interval(days => d), m.metric, 10, 700
+FROM generate_series(0, {users} - 1) AS u
+CROSS JOIN generate_series(2, 365) AS d
+CROSS JOIN unnest(ARRAY['reports', 'health_score', 'commands.RUN_FULL.succeeded']) AS m(metric);
+
+INSERT INTO report_shares (id, report_id, user_id, share_token_hash, expires_at)
+SELECT 'shr_explain_' || r, 'rpt_explain_' || r, 'usr_explain_' || ((r % {devices}) % {users}),
+       lpad(r::text, 64, '0'), NOW() + INTERVAL '7 days'
+FROM generate_series(0, {devices} * {reports_per_device} - 1) AS r;
+
+INSERT INTO ai_insights (id, device_id, user_id, report_id, source, summary, risk_level,
+                         prompt_version, model_version, generated_at)
+SELECT 'ain_explain_' || r, 'dev_explain_' || (r % {devices}), 'usr_explain_' || ((r % {devices}) % {users}),
+       'rpt_explain_' || r, 'llm', 'summary', 'low', 'v1', 'openai:gpt-4o-mini',
+       NOW() - make_interval(hours => r)
+FROM generate_series(0, {devices} * {reports_per_device} - 1) AS r;
+"""
+
+
+def _plan_nodes(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+async def _seed(conn, *, users: int, devices: int, commands_per_device: int, reports_per_device: int) -> None:
+    # Sizes are ints from argparse, so formatting them into the SQL is safe.
+    await conn.execute(
+        SEED_SQL.format(
+            users=int(users),
+            devices=int(devices),
+            commands_per_device=int(commands_per_device),
+            reports_per_device=int(reports_per_device),
+        )
+    )
+    await conn.execute("ANALYZE")
+
+
+async def _explain_all(conn) -> List[Dict[str, Any]]:
+    results = []
+    await conn.execute("SET enable_seqscan = off")
+    for query in sorted(hot_queries(), key=lambda q: q.name):
+        raw = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query.sql}", *query.explain_args)
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+        nodes = list(_plan_nodes(plan))
+        results.append(
+            {
+                "query": query.name,
+                "seq_scans": sorted({n.get("Relation Name", "?") for n in nodes if n["Node Type"] == "Seq Scan"}),
+                "indexes": sorted({n["Index Name"] for n in nodes if "Index Name" in n}),
+                "total_cost": plan.get("Total Cost"),
+            }
+        )
+    return results
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL", settings.database_url))
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--commands-per-device", type=int, default=50)
+    parser.add_argument("--reports-per-device", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema for inspection")
+    args = parser.parse_args()
+
+    schema = f"explain_audit_{os.getpid()}"
+    conn = await asyncpg.connect(args.database_url)
+    try:
+        await conn.execute(f"CREATE SCHEMA {schema}")
+        await conn.execute(f"SET search_path TO {schema}")
+        await apply_migrations(conn)
+        await _seed(
+            conn,
+            users=max(1, args.devices // 5),
+            devices=args.devices,
+            commands_per_device=args.commands_per_device,
+            reports_per_device=args.reports_per_device,
+        )
+        results = await _explain_all(conn)
+    finally:
+        if not args.keep:
+            await conn.execute("RESET search_path")
+            await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        await conn.close()
+
+    failures = [result for result in results if result["seq_scans"]]
+    for result in results:
+        status = "FAIL" if result["seq_scans"] else "ok"
+        detail = f"seq scan on {', '.join(result['seq_scans'])}" if result["seq_scans"] else ", ".join(result["indexes"])
+        print(f"{status:4} {result['query']:40} {detail}")
+    print(f"\n{len(results) - len(failures)}/{len(results)} hot queries use indexes only.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
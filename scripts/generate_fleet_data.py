@@ -0,0 +1,360 @@
+"""Bulk-load a deterministic synthetic fleet for benchmarks.
+
+Generates users (one of them owning --large-user-devices devices), device tokens,
+months of commands and reports with analyzer-shaped raw_report_json and their
+device_metrics, ai_insights and report shares, and loads them with COPY (asyncpg
+copy_records_to_table), then rebuilds the fleet rollups of the loaded users. Every row
+is derived from (--seed, device index) alone, so the same arguments and --now always
+produce the same data no matter how the work is split across --jobs processes.
+
+    cd server && DATABASE_URL=... python ../scripts/migrate_db.py
+    DATABASE_URL=... python scripts/generate_fleet_data.py --devices 12000 --reports-per-device 84 --jobs 8
+
+Synthetic rows use ids prefixed with "syn<seed>_"; --replace deletes an earlier load
+of the same seed first. All synthetic users share the password given by --password.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "server"))
+
+import asyncpg  # noqa: E402
+
+from app.core.security import hash_password  # noqa: E402
+from app.services.device_metrics import extract_metrics  # noqa: E402
+from app.services.fleet_rollups import rebuild_fleet_rollups  # noqa: E402
+
+TABLE_COLUMNS = {
+    "users": ("id", "email", "password_hash", "created_at"),
+    "devices": (
+        "id", "user_id", "name", "platform", "arch", "fingerprint_hash",
+        "agent_version", "created_at", "last_seen_at", "revoked_at",
+    ),
+    "device_tokens": ("id", "device_id", "token_hash", "created_at", "expires_at", "last_used_at"),
+    "reports": (
+        "id", "device_id", "command_id", "created_at", "health_score",
+        "disk_free_percent", "startup_apps_count", "one_liner", "raw_report_json",
+    ),
+    "commands": (
+        "id", "device_id", "user_id", "type", "params_json", "status", "progress",
+        "message", "created_at", "started_at", "finished_at", "report_id",
+    ),
+    "ai_insights": (
+        "id", "device_id", "user_id", "report_id", "source", "summary", "risk_level",
+        "reasons_json", "actions_json", "prompt_version", "model_version", "generated_at",
+    ),
+    "report_shares": ("id", "report_id", "user_id", "share_token_hash", "expires_at", "created_at", "revoked_at"),
+    "device_metrics": ("device_id", "metric", "ts", "value"),
+}
+# Parents first, so every flushed batch satisfies its foreign keys.
+CHILD_TABLES = ("reports", "commands", "ai_insights", "report_shares", "device_metrics")
+
+FOLDER_NAMES = ["Downloads", "Documents", "Desktop", "Pictures", "Videos", "Music", "AppData", "Temp"]
+REPORT_COMMANDS = ["RUN_FULL", "RUN_FULL", "RUN_STORAGE_ONLY", "RUN_PRIVACY_ONLY", "RUN_DEEP"]
+AGENT_VERSIONS = ["1.2.0", "1.3.0", "1.3.1", "1.4.0"]
+MODEL_VERSIONS = ["openai:gpt-4o-mini:v1", "glm45:glm-4.5:v1", "openai:gpt-4o-mini:v2"]
+INSIGHT_SOURCES = ["llm", "llm", "llm", "rule_based", "fallback"]
+ONE_LINERS = {
+    "high": "디스크 여유 공간이 부족하고 시작 프로그램이 많습니다.",
+    "medium": "저장 공간과 시작 프로그램을 점검하세요.",
+    "low": "전반적으로 양호합니다.",
+}
+
+
+def _prefix(seed: int) -> str:
+    return f"syn{seed}_"
+
+
+def _sha256(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def device_owner(index: int, args: argparse.Namespace) -> int:
+    """The first --large-user-devices devices belong to user 0; the rest round-robin."""
+    if index < args.large_user_devices or args.users == 1:
+        return 0
+    return 1 + (index - args.large_user_devices) % (args.users - 1)
+
+
+def _risk(health: int, free_percent: float) -> str:
+    if health < 50 or free_percent < 10:
+        return "high"
+    if health < 75 or free_percent < 20:
+        return "medium"
+    return "low"
+
+
+def _raw_report(rng: random.Random, command_type: str, health: int, free_percent: float,
+                startup_apps: int, created_at: datetime) -> Dict[str, Any]:
+    folder_count = len(FOLDER_NAMES) + (40 if command_type == "RUN_DEEP" else rng.randint(0, 12))
+    folders = [
+        {
+            "name": FOLDER_NAMES[i % len(FOLDER_NAMES)] + ("" if i < len(FOLDER_NAMES) else f"/sub{i}"),
+            "bytes": rng.randint(10_000_000, 40_000_000_000),
+            "fileCount": rng.randint(10, 50_000),
+        }
+        for i in range(folder_count)
+    ]
+    total = rng.choice([256, 512, 1024, 2048]) * 1_000_000_000
+    free = int(total * free_percent / 100)
+    risk = _risk(health, free_percent)
+    return {
+        "healthScore": health,
+        "diskFreePercent": free_percent,
+        "startupAppsCount": startup_apps,
+        "oneLiner": ONE_LINERS[risk],
+        "storage": {"folders": folders, "totalBytes": total, "freeBytes": free, "freePercent": free_percent},
+        "slowdown": {
+            "startupAppsCount": startup_apps,
+            "heavyProcessCount": rng.randint(0, 12),
+            "reasons": ["시작 프로그램이 많습니다."] * (startup_apps // 15),
+        },
+        "privacy": {
+            "browserCacheSizeBytes": rng.randint(0, 5_000_000_000),
+            "downloadsFolderBytes": folders[0]["bytes"],
+            "tempFilesBytes": rng.randint(0, 10_000_000_000),
+        },
+        "recommendations": ["다운로드 폴더를 정리하세요.", "불필요한 시작 프로그램을 끄세요."][: 1 + (risk != "low")],
+        "transparency": {
+            "collected": ["Folder sizes", "Disk usage statistics", "Startup apps count"],
+            "notCollected": ["File contents", "File names (default)", "Browser history"],
+        },
+        "createdAt": created_at.isoformat(),
+    }
+
+
+def generate_device(index: int, args: argparse.Namespace, now: datetime) -> Dict[str, List[Tuple]]:
+    """All rows owned by one device, derived only from (seed, index)."""
+    rng = random.Random(f"{args.seed}:device:{index}")
+    prefix = _prefix(args.seed)
+    device_id = f"{prefix}dev_{index}"
+    user_id = f"{prefix}usr_{device_owner(index, args)}"
+    history_start = now - timedelta(days=args.days)
+    created_at = history_start - timedelta(days=rng.randint(0, 30))
+    rows: Dict[str, List[Tuple]] = {table: [] for table in TABLE_COLUMNS}
+
+    # Disk fills up steadily with occasional cleanups; health follows free space and
+    # startup apps, so trend queries see realistic slopes rather than noise.
+    free_percent = rng.uniform(20, 80)
+    startup_apps = rng.randint(3, 20)
+    count = args.reports_per_device
+    step = timedelta(days=args.days) / max(count, 1)
+    last_report_at = None
+    for n in range(count):
+        at = history_start + step * n + timedelta(seconds=rng.randint(0, max(int(step.total_seconds()) - 60, 0)))
+        free_percent = max(2.0, free_percent - rng.uniform(0, 1.5))
+        if rng.random() < 0.05:
+            free_percent = min(90.0, free_percent + rng.uniform(10, 40))
+        startup_apps = max(0, min(45, startup_apps + rng.choice([-1, 0, 0, 0, 1])))
+        health = max(5, min(100, int(40 + free_percent * 0.6 - startup_apps * 0.8 + rng.uniform(-5, 5))))
+        free_rounded = round(free_percent, 1)
+        command_type = rng.choice(REPORT_COMMANDS)
+        command_id = f"{prefix}cmd_{index}_{n}"
+        report_id = f"{prefix}rpt_{index}_{n}"
+        raw = _raw_report(rng, command_type, health, free_rounded, startup_apps, at)
+
+        rows["reports"].append(
+            (report_id, device_id, command_id, at, health, free_rounded, startup_apps, raw["oneLiner"], json.dumps(raw))
+        )
+        rows["device_metrics"].extend(
+            (device_id, metric, at, value) for metric, value in extract_metrics(raw).items()
+        )
+        started = at - timedelta(seconds=rng.randint(5, 120))
+        rows["commands"].append(
+            (command_id, device_id, user_id, command_type, "{}", "succeeded", 100, "Completed",
+             started - timedelta(seconds=rng.randint(1, 30)), started, at, report_id)
+        )
+        if rng.random() < args.ping_ratio:
+            ping_at = at + timedelta(minutes=rng.randint(1, 60))
+            failed = rng.random() < 0.1
+            rows["commands"].append(
+                (f"{command_id}_ping", device_id, user_id, "PING", "{}", "failed" if failed else "succeeded",
+                 100, "Timed out" if failed else "pong", ping_at,
+                 ping_at + timedelta(milliseconds=rng.randint(50, 2000)),
+                 ping_at + timedelta(milliseconds=rng.randint(2000, 4000)), None)
+            )
+        if n == count - 1 or rng.random() < args.insight_ratio:
+            risk = _risk(health, free_rounded)
+            reasons = [f"디스크 여유 공간 {free_rounded}%"] + (["시작 프로그램 과다"] if startup_apps > 15 else [])
+            actions = [{"command_type": "RUN_STORAGE_ONLY", "label": "스토리지 점검", "reason": reasons[0]}]
+            rows["ai_insights"].append(
+                (f"{prefix}ain_{index}_{n}", device_id, user_id, report_id, rng.choice(INSIGHT_SOURCES),
+                 ONE_LINERS[risk], risk, json.dumps(reasons, ensure_ascii=False), json.dumps(actions, ensure_ascii=False),
+                 "v1", rng.choice(MODEL_VERSIONS), at + timedelta(seconds=rng.randint(1, 300)))
+            )
+        if rng.random() < args.share_ratio:
+            rows["report_shares"].append(
+                (f"{prefix}shr_{index}_{n}", report_id, user_id, _sha256(f"{prefix}share:{index}:{n}"),
+                 at + timedelta(days=7), at, None)
+            )
+        last_report_at = at
+
+    if rng.random() < args.queued_ratio:
+        queued_at = now - timedelta(minutes=rng.randint(0, 30))
+        rows["commands"].append(
+            (f"{prefix}cmd_{index}_queued", device_id, user_id, rng.choice(REPORT_COMMANDS), "{}", "queued",
+             0, "", queued_at, None, None, None)
+        )
+
+    offline = rng.random() < args.offline_ratio
+    last_seen = (now - timedelta(days=rng.randint(2, 30))) if offline else (now - timedelta(seconds=rng.randint(0, 90)))
+    if last_report_at is not None and last_seen < last_report_at:
+        last_seen = last_report_at
+    revoked = now - timedelta(days=1) if rng.random() < args.revoked_ratio else None
+    rows["devices"].append(
+        (device_id, user_id, f"PC-{index:06d}", "windows", rng.choice(["x64", "x64", "arm64"]),
+         _sha256(f"{prefix}fingerprint:{index}"), rng.choice(AGENT_VERSIONS), created_at, last_seen, revoked)
+    )
+    rows["device_tokens"].append(
+        (f"{prefix}dtk_{index}", device_id, _sha256(f"{prefix}device-token:{index}"), created_at,
+         now + timedelta(days=30), last_seen)
+    )
+    return rows
+
+
+async def _copy(conn, table: str, records: List[Tuple]) -> None:
+    if records:
+        await conn.copy_records_to_table(table, records=records, columns=TABLE_COLUMNS[table])
+
+
+async def _load_devices(args: argparse.Namespace, now: datetime, start: int, stop: int) -> Dict[str, int]:
+    """Copy devices [start, stop): parent rows for the whole range first, then children in batches."""
+    conn = await asyncpg.connect(args.database_url)
+    counts = {table: 0 for table in TABLE_COLUMNS}
+    try:
+        await conn.execute("SET synchronous_commit = off")
+        buffer: Dict[str, List[Tuple]] = {table: [] for table in CHILD_TABLES}
+        pending_parents: Dict[str, List[Tuple]] = {"devices": [], "device_tokens": []}
+
+        async def flush() -> None:
+            async with conn.transaction():
+                for table in ("devices", "device_tokens"):
+                    await _copy(conn, table, pending_parents[table])
+                    counts[table] += len(pending_parents[table])
+                    pending_parents[table] = []
+                for table in CHILD_TABLES:
+                    await _copy(conn, table, buffer[table])
+                    counts[table] += len(buffer[table])
+                    buffer[table] = []
+
+        for index in range(start, stop):
+            rows = generate_device(index, args, now)
+            for table in pending_parents:
+                pending_parents[table].extend(rows[table])
+            for table in CHILD_TABLES:
+                buffer[table].extend(rows[table])
+            if len(buffer["reports"]) >= args.batch_size:
+                await flush()
+        await flush()
+    finally:
+        await conn.close()
+    return counts
+
+
+def _load_devices_worker(payload: Tuple[argparse.Namespace, datetime, int, int]) -> Dict[str, int]:
+    args, now, start, stop = payload
+    return asyncio.run(_load_devices(args, now, start, stop))
+
+
+async def _prepare(args: argparse.Namespace, now: datetime) -> int:
+    prefix = _prefix(args.seed)
+    conn = await asyncpg.connect(args.database_url)
+    try:
+        existing = await conn.fetchval("SELECT COUNT(*) FROM users WHERE id LIKE $1", f"{prefix}usr_%")
+        if existing and not args.replace:
+            raise SystemExit(f"seed {args.seed} is already loaded ({existing} users); pass --replace to reload")
+        if existing:
+            # ON DELETE CASCADE removes devices, commands, reports, metrics, insights and shares.
+            await conn.execute("DELETE FROM users WHERE id LIKE $1", f"{prefix}usr_%")
+        password_hash = hash_password(args.password)
+        users = [
+            (f"{prefix}usr_{i}", f"synthetic-{args.seed}-{i}@example.com", password_hash,
+             now - timedelta(days=args.days + 30))
+            for i in range(args.users)
+        ]
+        await _copy(conn, "users", users)
+        return len(users)
+    finally:
+        await conn.close()
+
+
+async def _finish(args: argparse.Namespace, now: datetime) -> None:
+    conn = await asyncpg.connect(args.database_url)
+    try:
+        # COPY bypasses ingest, so the fleet rollups are rebuilt from the loaded history.
+        user_ids = [f"{_prefix(args.seed)}usr_{i}" for i in range(args.users)]
+        await rebuild_fleet_rollups(conn, user_ids, now)
+        await conn.execute("ANALYZE")
+    finally:
+        await conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL", ""))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--devices", type=int, default=12_000)
+    parser.add_argument("--large-user-devices", type=int, default=10_000, help="devices owned by the first user")
+    parser.add_argument("--days", type=int, default=120, help="history length")
+    parser.add_argument("--reports-per-device", type=int, default=84)
+    parser.add_argument("--ping-ratio", type=float, default=0.3, help="extra PING commands per report")
+    parser.add_argument("--insight-ratio", type=float, default=0.25, help="reports with a cached AI insight")
+    parser.add_argument("--share-ratio", type=float, default=0.02)
+    parser.add_argument("--queued-ratio", type=float, default=0.05, help="devices with a pending command")
+    parser.add_argument("--offline-ratio", type=float, default=0.2)
+    parser.add_argument("--revoked-ratio", type=float, default=0.01)
+    parser.add_argument("--now", default="", help="ISO timestamp anchoring the history (default: today 00:00 UTC)")
+    parser.add_argument("--password", default="synthetic-password")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="loader processes")
+    parser.add_argument("--batch-size", type=int, default=20_000, help="reports per COPY transaction")
+    parser.add_argument("--replace", action="store_true", help="delete an earlier load of this seed first")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+    args.users = max(1, args.users)
+    args.large_user_devices = min(args.large_user_devices, args.devices)
+
+    if args.now:
+        now = datetime.fromisoformat(args.now)
+        now = now if now.tzinfo else now.replace(tzinfo=timezone.utc)
+    else:
+        now = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    started = time.perf_counter()
+    user_count = asyncio.run(_prepare(args, now))
+    jobs = max(1, min(args.jobs, args.devices))
+    bounds = [args.devices * j // jobs for j in range(jobs + 1)]
+    payloads = [(args, now, bounds[j], bounds[j + 1]) for j in range(jobs)]
+    if jobs == 1:
+        results = [_load_devices_worker(payloads[0])]
+    else:
+        with multiprocessing.Pool(jobs) as pool:
+            results = pool.map(_load_devices_worker, payloads)
+    asyncio.run(_finish(args, now))
+    elapsed = time.perf_counter() - started
+
+    totals = {"users": user_count}
+    for table in TABLE_COLUMNS:
+        if table != "users":
+            totals[table] = sum(result[table] for result in results)
+    for table, count in totals.items():
+        print(f"{table:15} {count:>12,}")
+    print(f"\nLoaded seed {args.seed} anchored at {now.isoformat()} in {elapsed:.1f}s "
+          f"({totals['reports'] / max(elapsed, 0.001):,.0f} reports/s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Minimal OpenAI-compatible chat completions stub for load tests.
+
+Answers every POST with a fixed summary after a configurable delay, so dashboard
+AI endpoints exercise the full provider path without network calls or cost.
+Supports both regular and ``"stream": true`` (SSE) requests.
+"""
+
+import asyncio
+import json
+from typing import Optional
+
+SUMMARY = {
+    "summary": "디스크 여유 공간이 줄어들고 있어 정리가 필요합니다.",
+    "risk_level": "medium",
+    "reasons": ["디스크 여유 공간 감소", "시작 프로그램 증가"],
+    "recommended_actions": [
+        {"title": "저장 공간 점검", "command_type": "RUN_STORAGE_ONLY", "reason": "여유 공간 확보"},
+    ],
+}
+
+
+def _completion_body(payload: dict) -> bytes:
+    user_messages = [m.get("content", "") for m in payload.get("messages", []) if m.get("role") == "user"]
+    content: dict = SUMMARY
+    if user_messages and '"devices"' in user_messages[-1]:
+        # Batch prompt: answer one result per device in the request.
+        try:
+            devices = json.loads(user_messages[-1]).get("devices", [])
+        except (TypeError, ValueError, AttributeError):
+            devices = []
+        content = {"results": [{"device_id": device.get("device_id"), **SUMMARY} for device in devices]}
+    return json.dumps(
+        {"choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps(content, ensure_ascii=False)}}]},
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def _stream_chunks() -> list:
+    text = json.dumps(SUMMARY, ensure_ascii=False)
+    pieces = [text[i:i + 24] for i in range(0, len(text), 24)]
+    chunks = [f"data: {json.dumps({'choices': [{'delta': {'content': p}}]}, ensure_ascii=False)}\n\n" for p in pieces]
+    chunks.append("data: [DONE]\n\n")
+    return [chunk.encode("utf-8") for chunk in chunks]
+
+
+class StubLLM:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 300):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1/chat/completions"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0") or 0))
+                self.requests += 1
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError:
+                    payload = {}
+                await asyncio.sleep(self.latency_ms / 1000)
+                if payload.get("stream"):
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                        b"Transfer-Encoding: chunked\r\n\r\n"
+                    )
+                    for chunk in _stream_chunks():
+                        writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    writer.write(b"0\r\n\r\n")
+                else:
+                    response = _completion_body(payload)
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                        + f"Content-Length: {len(response)}\r\n\r\n".encode()
+                        + response
+                    )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _main() -> None:
+    stub = StubLLM(port=8099)
+    await stub.start()
+    print(f"stub LLM listening on {stub.base_url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
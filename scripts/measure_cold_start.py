@@ -0,0 +1,99 @@
+"""Measure API cold-start time and DB connections opened per cold invocation.
+
+Each sample runs in a fresh interpreter: import the Vercel entrypoint (api/index.py),
+run the lifespan startup, serve one request, and count asyncpg connections opened.
+
+    cd server && python ../scripts/measure_cold_start.py --samples 5 --path /health
+    cd server && VERCEL=1 python ../scripts/measure_cold_start.py --samples 5
+
+Without a reachable database, pass --path / in serverless mode to measure the
+import + startup cost alone.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parents[1] / "server"
+
+_CHILD = r"""
+import asyncio, json, sys, time
+started = time.perf_counter()
+import asyncpg.connection
+
+opened = 0
+_connect = asyncpg.connection.connect
+
+async def counting_connect(*args, **kwargs):
+    global opened
+    opened += 1
+    return await _connect(*args, **kwargs)
+
+asyncpg.connection.connect = counting_connect
+
+from api.index import app
+imported = time.perf_counter()
+
+import httpx
+
+async def run():
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://cold") as client:
+            response = await client.get(sys.argv[1])
+        served = time.perf_counter()
+    return ready, served, response.status_code
+
+ready, served, status_code = asyncio.run(run())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (served - ready) * 1000,
+    "total_ms": (served - started) * 1000,
+    "connections_opened": opened,
+    "status": status_code,
+}))
+"""
+
+
+def _sample(path: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _CHILD, path],
+        cwd=SERVER_DIR,
+        env={**os.environ, "PYTHONPATH": str(SERVER_DIR)},
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"cold start sample failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--path", default="/health")
+    args = parser.parse_args()
+
+    samples = [_sample(args.path) for _ in range(args.samples)]
+    summary = {
+        "serverless": bool(os.environ.get("VERCEL") or os.environ.get("SERVERLESS_MODE")),
+        "samples": len(samples),
+        "path": args.path,
+    }
+    for key in ("import_ms", "startup_ms", "first_request_ms", "total_ms"):
+        values = [sample[key] for sample in samples]
+        summary[key] = {"median": round(statistics.median(values), 1), "max": round(max(values), 1)}
+    summary["connections_opened"] = max(sample["connections_opened"] for sample in samples)
+    summary["statuses"] = sorted({sample["status"] for sample in samples})
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
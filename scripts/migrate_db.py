@@ -0,0 +1,32 @@
+"""Apply pending schema migrations once, outside of application startup.
+
+Serverless deployments skip DDL on cold start (see RUN_MIGRATIONS_ON_STARTUP), so run
+this as a release step against the target database:
+
+    cd server && DATABASE_URL=... python ../scripts/migrate_db.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "server"))
+
+from app.core.database import POOL_BACKGROUND, close_pool, get_connection  # noqa: E402
+from app.core.migrations import apply_migrations, current_version  # noqa: E402
+
+
+async def main() -> None:
+    try:
+        async with get_connection(pool=POOL_BACKGROUND) as conn:
+            applied = await apply_migrations(conn)
+            version = await current_version(conn)
+    finally:
+        await close_pool()
+    for migration_version in applied:
+        print(f"Applied migration {migration_version:04d}")
+    print(f"Database schema is at version {version:04d}.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""Move inline reports.raw_report_json bodies into the configured blob store, in batches.
+
+Each batch claims rows that still have an inline body (FOR UPDATE SKIP LOCKED, so
+several copies can run side by side), writes every body to the blob store, then sets
+raw_report_ref and clears raw_report_json in the same transaction. Blobs are
+content-addressed, so a batch interrupted after the upload is simply redone. Run it
+after migration 0005 with the same REPORT_BLOB_* settings as the API:
+
+    cd server && DATABASE_URL=... REPORT_BLOB_BACKEND=local python ../scripts/migrate_report_blobs.py
+
+Freed TOAST space is reusable right away; VACUUM FULL (or pg_repack) returns it to the OS.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "server"))
+
+import asyncpg  # noqa: E402
+
+from app.services.blob_store import backend_name, put_report_body  # noqa: E402
+
+CLAIM_BATCH = """
+    SELECT id, raw_report_json::text AS body
+    FROM reports
+    WHERE raw_report_json IS NOT NULL AND raw_report_ref IS NULL
+    ORDER BY id
+    LIMIT $1
+    FOR UPDATE SKIP LOCKED
+"""
+MOVE_TO_BLOB = """
+    UPDATE reports AS r
+    SET raw_report_ref = m.ref, raw_report_json = NULL
+    FROM unnest($1::text[], $2::text[]) AS m(id, ref)
+    WHERE r.id = m.id
+"""
+
+
+async def migrate(args: argparse.Namespace) -> int:
+    conn = await asyncpg.connect(args.database_url)
+    moved = 0
+    moved_bytes = 0
+    started = time.perf_counter()
+    try:
+        while args.limit <= 0 or moved < args.limit:
+            async with conn.transaction():
+                rows = await conn.fetch(CLAIM_BATCH, args.batch_size)
+                if not rows:
+                    break
+                ids, refs = [], []
+                for row in rows:
+                    body = row["body"].encode("utf-8")
+                    ids.append(row["id"])
+                    refs.append(await put_report_body(body))
+                    moved_bytes += len(body)
+                await conn.execute(MOVE_TO_BLOB, ids, refs)
+            moved += len(rows)
+            elapsed = time.perf_counter() - started
+            print(f"moved {moved:,} reports ({moved_bytes / 1024 / 1024:,.1f} MB raw) in {elapsed:,.1f}s", flush=True)
+            if args.pause_seconds:
+                await asyncio.sleep(args.pause_seconds)
+    finally:
+        await conn.close()
+    remaining_note = "" if args.limit <= 0 else f" (stopped at --limit {args.limit})"
+    print(f"done: {moved:,} reports moved{remaining_note}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL", ""))
+    parser.add_argument("--batch-size", type=int, default=200, help="reports per transaction")
+    parser.add_argument("--pause-seconds", type=float, default=0.0, help="sleep between batches to limit load")
+    parser.add_argument("--limit", type=int, default=0, help="stop after about this many reports (0 = all)")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+    if backend_name() == "inline":
+        parser.error("REPORT_BLOB_BACKEND is inline; set local or s3 to move bodies out of Postgres")
+    return asyncio.run(migrate(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
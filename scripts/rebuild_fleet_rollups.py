@@ -0,0 +1,61 @@
+"""Recompute the fleet rollup tables (fleet_device_latest, fleet_state, fleet_rollups) from history.
+
+The API keeps the rollups up to date on ingest; run this once after migration 0008 to
+load existing history, after a bulk load that bypassed the API, or to reconcile drift
+(e.g. a flush that kept failing until the worker stopped). Tenants are
+rebuilt a few at a time, each batch in one transaction:
+
+    cd server && DATABASE_URL=... python ../scripts/rebuild_fleet_rollups.py
+    cd server && DATABASE_URL=... python ../scripts/rebuild_fleet_rollups.py --user usr_123
+
+Reports uploaded while a tenant is being rebuilt may be counted twice in their hourly
+bucket, so prefer a quiet period for whole-database runs.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "server"))
+
+import asyncpg  # noqa: E402
+
+from app.services.fleet_rollups import rebuild_fleet_rollups  # noqa: E402
+
+
+async def rebuild(args: argparse.Namespace) -> int:
+    conn = await asyncpg.connect(args.database_url)
+    started = time.perf_counter()
+    try:
+        if args.user:
+            user_ids = list(args.user)
+        else:
+            user_ids = [row["id"] for row in await conn.fetch("SELECT id FROM users ORDER BY id")]
+        devices = 0
+        for start in range(0, len(user_ids), args.batch_size):
+            batch = user_ids[start:start + args.batch_size]
+            devices += await rebuild_fleet_rollups(conn, batch)
+            print(f"rebuilt {start + len(batch):,}/{len(user_ids):,} tenants "
+                  f"({devices:,} devices) in {time.perf_counter() - started:,.1f}s", flush=True)
+    finally:
+        await conn.close()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL", ""))
+    parser.add_argument("--user", action="append", help="tenant (user id) to rebuild; repeatable, default all")
+    parser.add_argument("--batch-size", type=int, default=20, help="tenants per transaction")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+    args.batch_size = max(1, args.batch_size)
+    return asyncio.run(rebuild(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
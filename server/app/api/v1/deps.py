@@ -1,15 +1,60 @@
 from datetime import datetime, timezone
+import secrets
 from fastapi import Depends, HTTPException, Request, status
 from typing import Optional
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from urllib.parse import urlparse
 
 from app.core.config import settings
-from app.core.database import get_connection
+from app.core.database import POOL_AGENT, get_connection, mark_user_write
+from app.core.queries import (
+    EXPLAIN_TOKEN_HASH,
+    EXPLAIN_USER_ID,
+    register_query,
+)
 from app.core.security import decode_jwt_token, hash_token
+from app.services.presence import record_heartbeat
 
 http_bearer = HTTPBearer(auto_error=False)
 
+USER_BY_ID = register_query(
+    "auth.user_by_id",
+    "SELECT id, email FROM users WHERE id = $1",
+    hot=True,
+    explain_args=(EXPLAIN_USER_ID,),
+)
+DEVICE_TOKEN_LOOKUP = register_query(
+    "agent.device_token_lookup",
+    """
+    SELECT dt.id, dt.device_id, d.user_id, d.name, d.revoked_at, d.last_seen_at
+    FROM device_tokens dt
+    JOIN devices d ON dt.device_id = d.id
+    WHERE dt.token_hash = $1
+      AND dt.revoked_at IS NULL
+      AND (dt.expires_at IS NULL OR dt.expires_at > NOW())
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_TOKEN_HASH,),
+)
+DEVICE_TOKEN_TOUCH = register_query(
+    "agent.device_token_touch",
+    "UPDATE device_tokens SET last_used_at = $2 WHERE id = $1",
+)
+DEVICE_LAST_SEEN_TOUCH = register_query(
+    "agent.device_last_seen_touch",
+    "UPDATE devices SET last_seen_at = $2 WHERE id = $1",
+)
+ENROLL_TOKEN_LOOKUP = register_query(
+    "agent.enroll_token_lookup",
+    """
+    SELECT id, user_id, expires_at, used_at
+    FROM enroll_tokens
+    WHERE token_hash = $1
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_TOKEN_HASH,),
+)
+
 
 def _origin_from_url(value: Optional[str]) -> str:
     if not value:
@@ -99,16 +144,16 @@ async def get_current_user(
     
     # Verify user exists
     async with get_connection() as conn:
-        user = await conn.fetchrow(
-            "SELECT id, email FROM users WHERE id = $1",
-            user_id,
-        )
+        user = await USER_BY_ID.fetchrow(conn, user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found",
             )
-    
+
+    if _is_state_changing_request(request):
+        # Subsequent reads by this user skip the replica until the write is visible there.
+        mark_user_write(user["id"])
     return {"id": user["id"], "email": user["email"]}
 
 
@@ -139,15 +184,8 @@ async def verify_device_token(
     
     token_hash = hash_token(credentials.credentials)
     
-    async with get_connection() as conn:
-        result = await conn.fetchrow("""
-            SELECT dt.id, dt.device_id, d.user_id, d.name, d.revoked_at
-            FROM device_tokens dt
-            JOIN devices d ON dt.device_id = d.id
-            WHERE dt.token_hash = $1
-              AND dt.revoked_at IS NULL
-              AND (dt.expires_at IS NULL OR dt.expires_at > NOW())
-        """, token_hash)
+    async with get_connection(pool=POOL_AGENT) as conn:
+        result = await DEVICE_TOKEN_LOOKUP.fetchrow(conn, token_hash)
         
         if not result:
             raise HTTPException(
@@ -161,16 +199,22 @@ async def verify_device_token(
                 detail="Device has been revoked",
             )
         
+        # The same timestamp is written and tracked so the presence engine can tell
+        # which worker holds the latest heartbeat.
+        seen_at = datetime.now(timezone.utc)
+
         # Update last_used_at
-        await conn.execute(
-            "UPDATE device_tokens SET last_used_at = NOW() WHERE id = $1",
-            result["id"],
-        )
+        await DEVICE_TOKEN_TOUCH.execute(conn, result["id"], seen_at)
         
         # Update device last_seen_at
-        await conn.execute(
-            "UPDATE devices SET last_seen_at = NOW() WHERE id = $1",
-            result["device_id"],
+        await DEVICE_LAST_SEEN_TOUCH.execute(conn, result["device_id"], seen_at)
+
+        await record_heartbeat(
+            conn,
+            device_id=result["device_id"],
+            user_id=result["user_id"],
+            previous_seen_at=result["last_seen_at"],
+            seen_at=seen_at,
         )
     
     return {
@@ -193,12 +237,8 @@ async def verify_enroll_token(
     
     token_hash = hash_token(credentials.credentials)
     
-    async with get_connection() as conn:
-        result = await conn.fetchrow("""
-            SELECT id, user_id, expires_at, used_at
-            FROM enroll_tokens
-            WHERE token_hash = $1
-        """, token_hash)
+    async with get_connection(pool=POOL_AGENT) as conn:
+        result = await ENROLL_TOKEN_LOOKUP.fetchrow(conn, token_hash)
         
         if not result:
             raise HTTPException(
@@ -222,3 +262,20 @@ async def verify_enroll_token(
         "token_id": result["id"],
         "user_id": result["user_id"],
     }
+
+
+def require_ops_token(request: Request) -> None:
+    """Gate operator endpoints (/metrics, profiling) behind OPS_API_TOKEN.
+
+    Without a configured token they are only served outside production/staging.
+    """
+    if settings.ops_api_token:
+        supplied = request.headers.get("authorization", "")
+        if not secrets.compare_digest(supplied.encode(), f"Bearer {settings.ops_api_token}".encode()):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid ops token",
+            )
+        return
+    if settings.environment.lower() in {"production", "staging"}:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
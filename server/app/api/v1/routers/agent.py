@@ -1,11 +1,18 @@
+import hashlib
 from datetime import datetime, timedelta, timezone
-import json
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 
 from app.api.v1.deps import verify_enroll_token, verify_device_token
+from app.core import json_codec
 from app.core.config import settings
-from app.core.database import get_connection
+from app.core.database import POOL_AGENT, get_connection, mark_user_write
+from app.core.queries import (
+    EXPLAIN_DEVICE_ID,
+    EXPLAIN_NOW,
+    register_query,
+)
 from app.core.security import generate_id, generate_token, hash_token
 from app.models import (
     AgentCommandPayload,
@@ -15,23 +22,83 @@ from app.models import (
     AgentReportUpload,
     AgentStatusUpdate,
 )
-from app.services.request_rate_limit import enforce_request_rate_limit
+from app.services.blob_store import put_report_body
+from app.services.command_progress import CommandNotFound, CommandTransitionRejected, command_progress
+from app.services.device_metrics import record_report_metrics
+from app.services.event_bus import dispatch_local, publish_event
+from app.services.fleet_rollups import fleet_rollups
+from app.services.report_delta import encode_report_body, remember_report_body
 
 router = APIRouter()
 
+CLAIM_NEXT_COMMAND = register_query(
+    "agent.claim_next_command",
+    """
+    WITH next_command AS (
+        SELECT id
+        FROM commands
+        WHERE device_id = $1
+          AND status = 'queued'
+          AND (expires_at IS NULL OR expires_at > $2)
+        ORDER BY created_at ASC
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    UPDATE commands c
+    SET status = 'running',
+        started_at = $2,
+        progress = 0,
+        message = 'Starting...'
+    FROM next_command
+    WHERE c.id = next_command.id
+    RETURNING c.id, c.type, c.params_json, c.created_at
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID, EXPLAIN_NOW,),
+)
+INSERT_REPORT = register_query(
+    "agent.insert_report",
+    """
+    INSERT INTO reports (id, device_id, command_id, created_at,
+                       health_score, disk_free_percent, startup_apps_count,
+                       one_liner, raw_report_json, raw_report_ref,
+                       raw_report_base_id, raw_report_delta_depth, idempotency_key)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9::text::jsonb, $10, $11, $12, $13)
+    ON CONFLICT (device_id, idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+    RETURNING id
+    """,
+)
+REPORT_BY_IDEMPOTENCY_KEY = register_query(
+    "agent.report_by_idempotency_key",
+    "SELECT id FROM reports WHERE device_id = $1 AND idempotency_key = $2",
+)
+COMPLETE_COMMAND_WITH_REPORT = register_query(
+    "agent.complete_command_with_report",
+    """
+    UPDATE commands c
+    SET status = 'succeeded', progress = 100,
+        message = 'Report uploaded', report_id = $2,
+        finished_at = COALESCE(CASE WHEN previous.report_id = $2 THEN previous.finished_at END, $1)
+    FROM (
+        SELECT id, status, report_id, finished_at
+        FROM commands WHERE id = $3 AND device_id = $4 FOR UPDATE
+    ) previous
+    WHERE c.id = previous.id
+    RETURNING c.type, previous.status AS previous_status, previous.report_id AS previous_report_id
+    """,
+)
+
 
 @router.post("/enroll", response_model=AgentEnrollResponse)
 async def agent_enroll(
     request: AgentEnrollRequest,
-    http_request: Request,
     token_info: dict = Depends(verify_enroll_token),
 ):
     """Enroll a new device using an enrollment token."""
-    await enforce_request_rate_limit(request=http_request, scope="agent:enroll")
     now = datetime.now(timezone.utc)
     expires_at = now + timedelta(days=settings.device_token_expires_days)
 
-    async with get_connection() as conn:
+    async with get_connection(pool=POOL_AGENT) as conn:
         async with conn.transaction():
             locked_token = await conn.fetchrow(
                 """
@@ -129,51 +196,31 @@ async def agent_enroll(
 
 @router.get("/commands/next", response_model=AgentNextCommandResponse)
 async def get_next_command(
-    http_request: Request,
     device: dict = Depends(verify_device_token),
 ):
     """Get the next queued command for this device."""
-    await enforce_request_rate_limit(
-        request=http_request,
-        scope=f"agent:next:device:{device['device_id']}",
-    )
     now = datetime.now(timezone.utc)
 
-    async with get_connection() as conn:
-        command = await conn.fetchrow(
-            """
-            WITH next_command AS (
-                SELECT id
-                FROM commands
-                WHERE device_id = $1
-                  AND status = 'queued'
-                  AND (expires_at IS NULL OR expires_at > $2)
-                ORDER BY created_at ASC
-                FOR UPDATE SKIP LOCKED
-                LIMIT 1
-            )
-            UPDATE commands c
-            SET status = 'running',
-                started_at = $2,
-                progress = 0,
-                message = 'Starting...'
-            FROM next_command
-            WHERE c.id = next_command.id
-            RETURNING c.id, c.type, c.params_json, c.created_at
-            """,
-            device["device_id"],
-            now,
-        )
+    async with get_connection(pool=POOL_AGENT) as conn:
+        command = await CLAIM_NEXT_COMMAND.fetchrow(conn, device["device_id"], now)
 
         if not command:
             return AgentNextCommandResponse(command=None)
 
+        await publish_event(
+            conn,
+            user_id=device["user_id"],
+            event_type="command.updated",
+            data={
+                "command_id": command["id"],
+                "device_id": device["device_id"],
+                "status": "running",
+                "progress": 0,
+                "message": "Starting...",
+            },
+        )
+
     params = command["params_json"]
-    if isinstance(params, str):
-        try:
-            params = json.loads(params)
-        except json.JSONDecodeError:
-            params = {}
 
     return AgentNextCommandResponse(
         command=AgentCommandPayload(
@@ -189,58 +236,57 @@ async def get_next_command(
 async def update_command_status(
     command_id: str,
     request: AgentStatusUpdate,
-    http_request: Request,
     device: dict = Depends(verify_device_token),
 ):
-    """Update command status."""
-    await enforce_request_rate_limit(
-        request=http_request,
-        scope=f"agent:status:device:{device['device_id']}",
-    )
-    now = datetime.now(timezone.utc)
-    
-    async with get_connection() as conn:
-        # Verify command belongs to this device
-        command = await conn.fetchrow(
-            "SELECT id, status FROM commands WHERE id = $1 AND device_id = $2",
-            command_id, device["device_id"],
-        )
-        
-        if not command:
+    """Update command status.
+
+    Progress ticks arriving faster than COMMAND_PROGRESS_COALESCE_SECONDS are merged in
+    memory; terminal statuses are written immediately and never regress.
+    """
+    async with get_connection(pool=POOL_AGENT) as conn:
+        try:
+            await command_progress.update(
+                conn,
+                command_id=command_id,
+                device=device,
+                status=request.status,
+                progress=request.progress,
+                message=request.message,
+            )
+        except CommandNotFound:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Command not found",
             )
-        
-        # Update status
-        finished_at = now if request.status in ("succeeded", "failed") else None
-        await conn.execute("""
-            UPDATE commands
-            SET status = $1, progress = $2, message = $3, finished_at = $4
-            WHERE id = $5
-        """, request.status, request.progress, request.message, finished_at, command_id)
-    
+        except CommandTransitionRejected as exc:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Command is already {exc.current_status}",
+            )
+
     return {"message": "Status updated"}
 
 
 @router.post("/reports")
 async def upload_report(
     request: AgentReportUpload,
-    http_request: Request,
     device: dict = Depends(verify_device_token),
+    idempotency_key: Optional[str] = Header(default=None, min_length=1, max_length=200),
 ):
-    """Upload a report."""
-    await enforce_request_rate_limit(
-        request=http_request,
-        scope=f"agent:report:device:{device['device_id']}",
-    )
+    """Upload a report.
+
+    Retries are deduplicated per device by the ``Idempotency-Key`` header, or by a hash
+    of the command id and report body for agents that do not send one: a replay returns
+    the original report_id without storing or announcing anything again.
+    """
     report_id = generate_id("rpt")
     now = datetime.now(timezone.utc)
     
     # Extract summary fields from report
     report_data = request.report
-    report_size = len(json.dumps(report_data, ensure_ascii=False).encode("utf-8"))
-    if report_size > settings.max_report_size_bytes:
+    # Encoded once: the same bytes are size-checked and stored (cast to jsonb in SQL).
+    report_json = json_codec.dumps_bytes(report_data)
+    if len(report_json) > settings.max_report_size_bytes:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"Report payload too large. Max {settings.max_report_size_bytes} bytes.",
@@ -249,39 +295,113 @@ async def upload_report(
     disk_free_percent = report_data.get("diskFreePercent")
     startup_apps_count = report_data.get("startupAppsCount")
     one_liner = report_data.get("oneLiner")
+    if not idempotency_key:
+        digest = hashlib.sha256((request.command_id or "").encode("utf-8") + b"\0" + report_json)
+        idempotency_key = f"sha256:{digest.hexdigest()}"
     
-    async with get_connection() as conn:
-        # Insert report
-        await conn.execute("""
-            INSERT INTO reports (id, device_id, command_id, created_at, 
-                               health_score, disk_free_percent, startup_apps_count, 
-                               one_liner, raw_report_json)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-        """, report_id, device["device_id"], request.command_id, now,
-             health_score, disk_free_percent, startup_apps_count, one_liner,
-             json.dumps(report_data))
-        
-        # Update command if linked
-        if request.command_id:
-            await conn.execute("""
-                UPDATE commands
-                SET status = 'succeeded', progress = 100, 
-                    message = 'Report uploaded', finished_at = $1, report_id = $2
-                WHERE id = $3 AND device_id = $4
-            """, now, report_id, request.command_id, device["device_id"])
-    
+    stored_body, base_report_id, delta_depth = report_json, None, 0
+    if settings.report_delta_snapshot_interval > 0:
+        async with get_connection(pool=POOL_AGENT) as conn:
+            stored_body, base_report_id, delta_depth = await encode_report_body(
+                conn, device["device_id"], report_data, report_json,
+            )
+
+    # Body goes to the blob store before the row exists; blobs are content-addressed,
+    # so a replayed upload rewrites nothing new.
+    raw_report_ref = await put_report_body(stored_body)
+    inline_json = stored_body.decode("utf-8") if raw_report_ref is None else None
+
+    deferred: List[Dict[str, Any]] = []
+    async with get_connection(pool=POOL_AGENT) as conn:
+        # Report row, metrics and command completion commit together; events published
+        # inside go out on commit, so a failed upload announces nothing.
+        async with conn.transaction():
+            inserted = await INSERT_REPORT.fetchval(
+                conn,
+                report_id, device["device_id"], request.command_id, now,
+                health_score, disk_free_percent, startup_apps_count, one_liner,
+                inline_json, raw_report_ref, base_report_id, delta_depth, idempotency_key,
+            )
+            if inserted is None:
+                original_id = await REPORT_BY_IDEMPOTENCY_KEY.fetchval(conn, device["device_id"], idempotency_key)
+                # Re-running the completion is a no-op when the original already linked
+                # the command, and repairs it when the retry is the first to name it.
+                completed = await _complete_command(conn, device, request.command_id, original_id, now, deferred)
+            else:
+                await record_report_metrics(conn, device["device_id"], now, report_data)
+                completed = await _complete_command(conn, device, request.command_id, report_id, now, deferred)
+
+        # Local delivery, rollups and the body cache wait until the rows are committed.
+        dispatch_local(deferred)
+        if completed is not None and completed["previous_status"] != "succeeded":
+            await fleet_rollups.record_command(
+                conn,
+                user_id=device["user_id"],
+                command_type=completed["type"],
+                status="succeeded",
+                finished_at=now,
+                previous_status=completed["previous_status"],
+            )
+        if inserted is None:
+            if completed is not None:
+                mark_user_write(device["user_id"])
+            return {"report_id": original_id, "message": "Report already uploaded"}
+
+        remember_report_body(report_id, report_json)
+        await fleet_rollups.record_report(
+            conn,
+            device_id=device["device_id"],
+            user_id=device["user_id"],
+            reported_at=now,
+            health_score=health_score,
+            disk_free_percent=disk_free_percent,
+            startup_apps_count=startup_apps_count,
+        )
+
+    mark_user_write(device["user_id"])
     return {"report_id": report_id, "message": "Report uploaded successfully"}
 
 
+async def _complete_command(
+    conn,
+    device: dict,
+    command_id: Optional[str],
+    report_id: str,
+    now: datetime,
+    deferred: List[Dict[str, Any]],
+):
+    """Mark the linked command succeeded with ``report_id``; announce it on first completion.
+
+    Runs inside the upload transaction: events for local delivery go to ``deferred``.
+    """
+    if not command_id:
+        return None
+    completed = await COMPLETE_COMMAND_WITH_REPORT.fetchrow(conn, now, report_id, command_id, device["device_id"])
+    if completed is None or (completed["previous_status"] == "succeeded" and completed["previous_report_id"] == report_id):
+        return completed
+    local = await publish_event(
+        conn,
+        user_id=device["user_id"],
+        event_type="command.updated",
+        data={
+            "command_id": command_id,
+            "device_id": device["device_id"],
+            "status": "succeeded",
+            "progress": 100,
+            "message": "Report uploaded",
+            "finished_at": now,
+            "report_id": report_id,
+        },
+    )
+    if local is not None:
+        deferred.append(local)
+    return completed
+
+
 @router.post("/heartbeat")
 async def heartbeat(
-    http_request: Request,
     device: dict = Depends(verify_device_token),
 ):
     """Update device last_seen_at timestamp."""
-    await enforce_request_rate_limit(
-        request=http_request,
-        scope=f"agent:heartbeat:device:{device['device_id']}",
-    )
     # Last seen is already updated in verify_device_token
     return {"status": "ok", "device_id": device["device_id"]}
@@ -1,24 +1,47 @@
 from datetime import datetime, timezone, timedelta
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
 
 from app.api.v1.deps import get_current_user
 from app.core.config import settings
-from app.core.database import get_connection
+from app.core.database import POOL_BACKGROUND, get_connection, get_read_connection
+from app.core.queries import EXPLAIN_USER_ID, register_query
 from app.models import (
     AiMetricsResponse,
+    AiPregenerateResponse,
     AiQueryItem,
     AiQueryRequest,
     AiQueryResponse,
     AiVersionInfoResponse,
     AiVersionUsageItem,
 )
-from app.services.ai_runtime import get_model_version_tag, resolve_ai_provider
+from app.services.ai_copilot import build_device_ai_summary
+from app.services.ai_insights import AI_INSIGHT_UPSERT_SQL, build_ai_insight_row
+from app.services.ai_runtime import (
+    generate_device_ai_summaries_batch,
+    get_model_version_tag,
+    resolve_ai_provider,
+)
 from app.services.ai_guardrails import get_ai_metrics_snapshot
+from app.services.presence import is_device_online, online_threshold
 
 router = APIRouter()
 
+VERSION_USAGE = register_query(
+    "ai.version_usage",
+    """
+    SELECT prompt_version, model_version, COUNT(*)::int AS count
+    FROM ai_insights
+    WHERE user_id = $1
+      AND generated_at > NOW() - INTERVAL '30 days'
+    GROUP BY prompt_version, model_version
+    ORDER BY count DESC
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_USER_ID,),
+)
+
 
 def _intent_from_query(query: str) -> str:
     text = query.lower()
@@ -46,18 +69,8 @@ async def get_ai_versions(
     _ = current_user
     usages: List[AiVersionUsageItem] = []
 
-    async with get_connection() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT prompt_version, model_version, COUNT(*)::int AS count
-            FROM ai_insights
-            WHERE user_id = $1
-              AND generated_at > NOW() - INTERVAL '30 days'
-            GROUP BY prompt_version, model_version
-            ORDER BY count DESC
-            """,
-            current_user["id"],
-        )
+    async with get_read_connection(current_user["id"]) as conn:
+        rows = await VERSION_USAGE.fetch(conn, current_user["id"])
         for row in rows:
             model_version = str(row["model_version"] or "")
             # Legacy rows written before provider/model tagging are noise on the UI.
@@ -78,6 +91,136 @@ async def get_ai_versions(
     )
 
 
+@router.post("/insights/pregenerate", response_model=AiPregenerateResponse)
+async def pregenerate_ai_insights(
+    request: Request,
+    provider: str = Query(default="glm45", pattern="^(openai|glm45|glm4\\.5|glm-4\\.5|glm)$"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Pre-generate cached insights for every device of the current user.
+
+    Devices are packed into batches of ``settings.ai_batch_size`` so one provider call covers
+    several devices, and all resulting rows are written with a single ``executemany``. At most
+    ``settings.ai_pregenerate_max_batches`` batches run per request; the rest is reported as
+    ``remaining`` for the next call. Only LLM output is cached.
+    """
+    provider_name = resolve_ai_provider(provider)
+    cache_model_version = get_model_version_tag(provider_name)
+    cache_prompt_version = settings.ai_prompt_version
+    now = datetime.now(timezone.utc)
+
+    async with get_connection(pool=POOL_BACKGROUND) as conn:
+        rows = await conn.fetch(
+            """
+            SELECT d.id AS device_id, d.last_seen_at,
+                   r.id, r.health_score, r.disk_free_percent, r.startup_apps_count, r.one_liner, r.created_at
+            FROM devices d
+            JOIN LATERAL (
+                SELECT id, health_score, disk_free_percent, startup_apps_count, one_liner, created_at
+                FROM reports
+                WHERE device_id = d.id
+                ORDER BY created_at DESC
+                LIMIT 1
+            ) r ON TRUE
+            WHERE d.user_id = $1
+              AND d.revoked_at IS NULL
+            """,
+            current_user["id"],
+        )
+        fresh_rows = []
+        if rows:
+            fresh_rows = await conn.fetch(
+                """
+                SELECT report_id
+                FROM ai_insights
+                WHERE report_id = ANY($1::text[])
+                  AND prompt_version = $2
+                  AND model_version = $3
+                  AND generated_at > $4
+                """,
+                [row["id"] for row in rows],
+                cache_prompt_version,
+                cache_model_version,
+                now - timedelta(seconds=settings.ai_cache_ttl_seconds),
+            )
+    fresh_report_ids = {row["report_id"] for row in fresh_rows}
+
+    pending = []
+    for row in rows:
+        if not settings.enable_ai_copilot or row["id"] in fresh_report_ids:
+            continue
+        last_seen = row["last_seen_at"]
+        is_online = is_device_online(last_seen, now)
+        latest_report = {
+            "id": row["id"],
+            "health_score": row["health_score"],
+            "disk_free_percent": row["disk_free_percent"],
+            "startup_apps_count": row["startup_apps_count"],
+            "one_liner": row["one_liner"],
+            "created_at": row["created_at"],
+        }
+        pending.append(
+            {
+                "device_id": row["device_id"],
+                "is_online": is_online,
+                "latest_report": latest_report,
+                "rule_based": build_device_ai_summary(is_online=is_online, latest_report=latest_report),
+            }
+        )
+
+    batch_size = max(1, settings.ai_batch_size)
+    max_batches = max(1, settings.ai_pregenerate_max_batches)
+    trace_id = getattr(request.state, "trace_id", "unknown")
+    insight_rows = []
+    llm_calls = 0
+    processed = 0
+    for start in range(0, len(pending), batch_size):
+        if start // batch_size >= max_batches:
+            break
+        chunk = pending[start : start + batch_size]
+        summaries, calls = await generate_device_ai_summaries_batch(
+            items=chunk,
+            rate_limit_key=f"user:{current_user['id']}:batch:provider:{provider_name}",
+            trace_id=trace_id,
+            provider=provider_name,
+            metrics_key=f"user:{current_user['id']}",
+        )
+        llm_calls += calls
+        processed += len(chunk)
+        for item in chunk:
+            summary = summaries[item["device_id"]]
+            # Rule-based fallbacks (rate limited, provider error) are not cached, so the
+            # next run retries those devices instead of skipping them for the cache TTL.
+            if summary.source != "llm":
+                continue
+            insight_rows.append(
+                build_ai_insight_row(
+                    device_id=item["device_id"],
+                    user_id=current_user["id"],
+                    report_id=item["latest_report"]["id"],
+                    summary=summary,
+                    prompt_version=cache_prompt_version,
+                    model_version=cache_model_version,
+                )
+            )
+        if any(summaries[item["device_id"]].source in {"rate_limited", "rule_based"} for item in chunk):
+            break  # rate limited or no API key: later batches would fall back too
+
+    if insight_rows:
+        async with get_connection(pool=POOL_BACKGROUND) as conn:
+            await conn.executemany(AI_INSIGHT_UPSERT_SQL, insight_rows)
+
+    return AiPregenerateResponse(
+        provider=provider_name,
+        total_devices=len(rows),
+        generated=len(insight_rows),
+        skipped=len(rows) - len(pending),
+        failed=processed - len(insight_rows),
+        remaining=len(pending) - processed,
+        llm_calls=llm_calls,
+    )
+
+
 @router.post("/query", response_model=AiQueryResponse)
 async def query_ai_insights(
     request: AiQueryRequest,
@@ -88,32 +231,33 @@ async def query_ai_insights(
     items: List[AiQueryItem] = []
     answer = "조건에 맞는 디바이스를 찾지 못했습니다."
 
-    async with get_connection() as conn:
+    async with get_read_connection(current_user["id"]) as conn:
         if intent == "offline_devices":
+            now = datetime.now(timezone.utc)
             rows = await conn.fetch(
                 """
                 SELECT id, name, last_seen_at
                 FROM devices
                 WHERE user_id = $1
+                  AND (last_seen_at IS NULL OR last_seen_at <= $3)
                 ORDER BY last_seen_at ASC NULLS FIRST
                 LIMIT $2
                 """,
                 current_user["id"],
                 request.limit,
+                now - online_threshold(),
             )
-            now = datetime.now(timezone.utc)
+            threshold_seconds = settings.device_online_threshold_seconds
+            window = f"{threshold_seconds // 60}분" if threshold_seconds % 60 == 0 else f"{threshold_seconds}초"
             for row in rows:
-                last_seen = row["last_seen_at"]
-                is_offline = not last_seen or (now - last_seen) > timedelta(minutes=2)
-                if is_offline:
-                    items.append(
-                        AiQueryItem(
-                            device_id=row["id"],
-                            device_name=row["name"],
-                            score=70,
-                            reason="최근 2분 내 heartbeat가 확인되지 않았습니다.",
-                        )
+                items.append(
+                    AiQueryItem(
+                        device_id=row["id"],
+                        device_name=row["name"],
+                        score=70,
+                        reason=f"최근 {window} 내 heartbeat가 확인되지 않았습니다.",
                     )
+                )
         elif intent == "low_disk":
             rows = await conn.fetch(
                 """
@@ -176,7 +320,7 @@ async def query_ai_insights(
                 if row["startup_apps_count"] is not None and row["startup_apps_count"] >= 40:
                     risk += 10
                     reasons.append("시작프로그램 과다")
-                is_offline = not row["last_seen_at"] or (now - row["last_seen_at"]) > timedelta(minutes=2)
+                is_offline = not is_device_online(row["last_seen_at"], now)
                 if is_offline:
                     risk += 10
                     reasons.append("오프라인 상태")
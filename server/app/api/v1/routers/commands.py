@@ -1,16 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from datetime import datetime, timedelta, timezone
-import json
+from typing import Optional
 
 from app.api.v1.deps import get_current_user
+from app.core import json_codec
+from app.core.config import settings
 from app.core.database import get_connection
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.queries import EXPLAIN_COMMAND_ID, EXPLAIN_DEVICE_ID, EXPLAIN_NOW, EXPLAIN_USER_ID, register_query
 from app.core.security import generate_id
 from app.models import (
     CommandCreate,
     CommandResponse,
     CommandListResponse,
 )
-from app.services.request_rate_limit import enforce_request_rate_limit
+from app.services.event_bus import SubscriptionLimitExceeded, subscribe, unsubscribe
+from app.services.presence import is_device_online
+from app.services.request_rate_limit import record_rate_limit_rejection
 
 router = APIRouter()
 
@@ -24,19 +32,53 @@ ALLOWED_COMMAND_TYPES = {
     "PING",
 }
 
+TERMINAL_COMMAND_STATUSES = {"succeeded", "failed"}
+
+DEVICE_OWNED_BY_USER = register_query(
+    "commands.device_owned_by_user",
+    "SELECT id FROM devices WHERE id = $1 AND user_id = $2",
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID, EXPLAIN_USER_ID,),
+)
+LIST_DEVICE_COMMANDS = register_query(
+    "commands.list_for_device",
+    """
+    SELECT id, type, status, progress, message, created_at, started_at, finished_at, report_id
+    FROM commands
+    WHERE device_id = $1
+    ORDER BY created_at DESC, id DESC
+    LIMIT $2 OFFSET $3
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID, 21, 0,),
+)
+LIST_DEVICE_COMMANDS_AFTER = register_query(
+    "commands.list_for_device_after",
+    """
+    SELECT id, type, status, progress, message, created_at, started_at, finished_at, report_id
+    FROM commands
+    WHERE device_id = $1 AND (created_at, id) < ($2::timestamptz, $3::text)
+    ORDER BY created_at DESC, id DESC
+    LIMIT $4
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID, EXPLAIN_NOW, EXPLAIN_COMMAND_ID, 21,),
+)
+COUNT_DEVICE_COMMANDS = register_query(
+    "commands.count_for_device",
+    "SELECT COUNT(*) FROM commands WHERE device_id = $1",
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID,),
+)
+
 
 @router.post("/devices/{device_id}/commands", response_model=CommandResponse)
 async def create_command(
     device_id: str,
     request: CommandCreate,
-    http_request: Request,
     current_user: dict = Depends(get_current_user),
 ):
     """Create a new command for a device."""
-    await enforce_request_rate_limit(
-        request=http_request,
-        scope=f"commands:create:user:{current_user['id']}",
-    )
     # Validate command type
     if request.type not in ALLOWED_COMMAND_TYPES:
         raise HTTPException(
@@ -67,7 +109,7 @@ async def create_command(
         # Prevent commands from being queued indefinitely on offline devices
         now = datetime.now(timezone.utc)
         last_seen = device["last_seen_at"]
-        is_online = bool(last_seen and (now - last_seen) < timedelta(minutes=2))
+        is_online = is_device_online(last_seen, now)
         if not is_online:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
@@ -81,7 +123,7 @@ async def create_command(
         await conn.execute("""
             INSERT INTO commands (id, device_id, user_id, type, params_json, status, expires_at, created_at)
             VALUES ($1, $2, $3, $4, $5, 'queued', $6, $7)
-        """, command_id, device_id, current_user["id"], request.type, json.dumps(request.params), expires_at, now)
+        """, command_id, device_id, current_user["id"], request.type, request.params, expires_at, now)
     
     return CommandResponse(
         id=command_id,
@@ -99,22 +141,29 @@ async def create_command(
 @router.get("/devices/{device_id}/commands", response_model=CommandListResponse)
 async def list_commands(
     device_id: str,
-    http_request: Request,
     limit: int = Query(default=20, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, max_length=200),
     current_user: dict = Depends(get_current_user),
 ):
-    """List commands for a device."""
-    await enforce_request_rate_limit(
-        request=http_request,
-        scope=f"commands:list:user:{current_user['id']}",
-    )
+    """List commands for a device, newest first.
+
+    Pass ``next_cursor`` from the previous page as ``cursor`` to page by keyset;
+    ``offset`` is kept for existing clients and ignored when a cursor is given.
+    """
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor",
+            )
+
     async with get_connection() as conn:
         # Verify ownership
-        device = await conn.fetchrow(
-            "SELECT id FROM devices WHERE id = $1 AND user_id = $2",
-            device_id, current_user["id"],
-        )
+        device = await DEVICE_OWNED_BY_USER.fetchrow(conn, device_id, current_user["id"])
         
         if not device:
             raise HTTPException(
@@ -122,20 +171,18 @@ async def list_commands(
                 detail="Device not found",
             )
         
-        # Get commands
-        commands = await conn.fetch("""
-            SELECT id, type, status, progress, message, created_at, started_at, finished_at, report_id
-            FROM commands
-            WHERE device_id = $1
-            ORDER BY created_at DESC
-            LIMIT $2 OFFSET $3
-        """, device_id, limit, offset)
+        # One extra row tells whether another page exists.
+        if after is not None:
+            commands = await LIST_DEVICE_COMMANDS_AFTER.fetch(conn, device_id, after[0], after[1], limit + 1)
+        else:
+            commands = await LIST_DEVICE_COMMANDS.fetch(conn, device_id, limit + 1, offset)
+        next_cursor = None
+        if len(commands) > limit:
+            commands = commands[:limit]
+            next_cursor = encode_cursor(commands[-1]["created_at"], commands[-1]["id"])
         
         # Get total count
-        total = await conn.fetchval(
-            "SELECT COUNT(*) FROM commands WHERE device_id = $1",
-            device_id,
-        )
+        total = await COUNT_DEVICE_COMMANDS.fetchval(conn, device_id)
     
     return CommandListResponse(
         commands=[
@@ -153,20 +200,16 @@ async def list_commands(
             for cmd in commands
         ],
         total=total,
+        next_cursor=next_cursor,
     )
 
 
 @router.get("/commands/{command_id}", response_model=CommandResponse)
 async def get_command(
     command_id: str,
-    http_request: Request,
     current_user: dict = Depends(get_current_user),
 ):
     """Get command details."""
-    await enforce_request_rate_limit(
-        request=http_request,
-        scope=f"commands:get:user:{current_user['id']}",
-    )
     async with get_connection() as conn:
         command = await conn.fetchrow("""
             SELECT c.id, c.type, c.status, c.progress, c.message, 
@@ -193,3 +236,80 @@ async def get_command(
         finished_at=command["finished_at"],
         report_id=command["report_id"],
     )
+
+
+@router.get("/commands/{command_id}/events")
+async def stream_command_events(
+    command_id: str,
+    http_request: Request,
+    current_user: dict = Depends(get_current_user),
+):
+    """Push command status/progress changes over Server-Sent Events.
+
+    Sends a ``snapshot`` of the current state, then a ``command`` event for every update
+    written by the agent, and closes after the command reaches a terminal status.
+    """
+    try:
+        subscription = await subscribe(current_user["id"], event_types={"command.updated"})
+    except SubscriptionLimitExceeded:
+        record_rate_limit_rejection("events")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many open event streams.",
+        )
+
+    try:
+        async with get_connection() as conn:
+            command = await conn.fetchrow("""
+                SELECT c.id, c.type, c.status, c.progress, c.message,
+                       c.created_at, c.started_at, c.finished_at, c.report_id
+                FROM commands c
+                JOIN devices d ON c.device_id = d.id
+                WHERE c.id = $1 AND d.user_id = $2
+            """, command_id, current_user["id"])
+    except Exception:
+        unsubscribe(subscription)
+        raise
+
+    if not command:
+        unsubscribe(subscription)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Command not found",
+        )
+
+    snapshot = CommandResponse(**dict(command))
+
+    def _format(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json_codec.dumps(data)}\n\n"
+
+    async def event_stream():
+        try:
+            yield _format("snapshot", snapshot.model_dump(mode="json"))
+            if snapshot.status in TERMINAL_COMMAND_STATUSES:
+                yield _format("done", {})
+                return
+            while True:
+                event = await subscription.get(timeout=settings.event_stream_keepalive_seconds)
+                if await http_request.is_disconnected():
+                    return
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                data = event.get("data") or {}
+                if data.get("command_id") != command_id:
+                    continue
+                yield _format("command", data)
+                if data.get("status") in TERMINAL_COMMAND_STATUSES:
+                    yield _format("done", {})
+                    return
+        finally:
+            unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also release the slot when the client disconnects before the stream starts.
+        background=BackgroundTask(unsubscribe, subscription),
+    )
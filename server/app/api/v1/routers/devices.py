@@ -1,13 +1,15 @@
-import json
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
-from datetime import datetime, timezone, timedelta
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
 
 from app.api.v1.deps import get_current_user
+from app.core import json_codec
 from app.core.config import settings
-from app.core.database import get_connection
-from app.core.security import generate_id
+from app.core.database import get_connection, get_read_connection
+from app.core.queries import EXPLAIN_DEVICE_ID, EXPLAIN_USER_ID, register_query
 from app.models import (
     DeviceAiRecommendedAction,
     DeviceResponse,
@@ -18,63 +20,119 @@ from app.models import (
     DeviceAiSummaryResponse,
     DeviceRiskItem,
     DeviceRiskTopResponse,
+    DeviceMetricSeries,
+    DeviceMetricsResponse,
     DeviceTrendResponse,
     DeviceTrendSignal,
 )
 from app.services.ai_copilot import build_device_ai_summary
+from app.services.ai_insights import AI_INSIGHT_UPSERT_SQL, build_ai_insight_row
+from app.services.device_metrics import (
+    MAX_METRIC_NAME_LENGTH,
+    bucket_seconds,
+    fetch_metric_buckets,
+    fetch_recent_samples,
+)
+from app.services.device_risk import compute_risk
+from app.services.event_bus import SubscriptionLimitExceeded, subscribe, unsubscribe
+from app.services.fleet_rollups import fleet_rollups
+from app.services.presence import PRESENCE_EVENT, is_device_online
+from app.services.request_rate_limit import record_rate_limit_rejection
 from app.services.ai_runtime import (
     apply_audience_view,
     generate_device_ai_summary,
     get_model_version_tag,
     resolve_ai_provider,
+    stream_device_ai_summary,
 )
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+DEFAULT_CHART_METRICS = ("health_score", "disk_free_percent", "startup_apps_count")
+MAX_CHART_METRICS = 10
+
+LIST_USER_DEVICES = register_query(
+    "devices.list_for_user",
+    """
+    SELECT id, name, platform, arch, agent_version, created_at, last_seen_at, revoked_at
+    FROM devices
+    WHERE user_id = $1
+    ORDER BY last_seen_at DESC NULLS LAST, created_at DESC
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_USER_ID,),
+)
+DEVICE_FOR_USER = register_query(
+    "devices.get_for_user",
+    """
+    SELECT id, name, platform, arch, agent_version, created_at, last_seen_at, revoked_at
+    FROM devices
+    WHERE id = $1 AND user_id = $2
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID, EXPLAIN_USER_ID,),
+)
+RECENT_DEVICE_COMMANDS = register_query(
+    "devices.recent_commands",
+    """
+    SELECT id, type, status, progress, message, created_at, started_at, finished_at, report_id
+    FROM commands
+    WHERE device_id = $1
+    ORDER BY created_at DESC
+    LIMIT 10
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID,),
+)
+ACTION_HISTORY = register_query(
+    "devices.action_history",
+    """
+    SELECT type,
+           SUM(CASE WHEN status = 'succeeded' THEN 1 ELSE 0 END) AS success_count,
+           COUNT(*) AS total_count
+    FROM commands
+    WHERE device_id = $1
+      AND type IN ('RUN_FULL', 'RUN_STORAGE_ONLY', 'PING')
+      AND created_at > NOW() - INTERVAL '30 days'
+    GROUP BY type
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID,),
+)
+PING_LATENCY_SAMPLES = register_query(
+    "devices.ping_latency_samples",
+    """
+    SELECT EXTRACT(EPOCH FROM (finished_at - started_at)) * 1000 AS latency_ms
+    FROM commands
+    WHERE device_id = $1
+      AND type = 'PING'
+      AND status = 'succeeded'
+      AND started_at IS NOT NULL
+      AND finished_at IS NOT NULL
+      AND finished_at > NOW() - INTERVAL '7 days'
+    ORDER BY finished_at DESC
+    LIMIT 8
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID,),
+)
+LATEST_DEVICE_REPORT = register_query(
+    "devices.latest_report_summary",
+    """
+    SELECT id, health_score, disk_free_percent, startup_apps_count, one_liner, created_at
+    FROM reports
+    WHERE device_id = $1
+    ORDER BY created_at DESC
+    LIMIT 1
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID,),
+)
+
 
-def _compute_risk(row: dict, *, is_online: bool) -> tuple[int, str, List[str]]:
-    score = 0
-    reasons: List[str] = []
-    health_score = row.get("health_score")
-    disk_free_percent = row.get("disk_free_percent")
-    startup_apps_count = row.get("startup_apps_count")
-
-    if health_score is not None:
-        if health_score < 60:
-            score += 45
-            reasons.append(f"건강 점수 낮음({health_score})")
-        elif health_score < 80:
-            score += 20
-            reasons.append(f"건강 점수 주의({health_score})")
-    else:
-        score += 20
-        reasons.append("리포트 없음")
-
-    if disk_free_percent is not None:
-        if disk_free_percent < 15:
-            score += 35
-            reasons.append(f"디스크 위험({disk_free_percent:.1f}%)")
-        elif disk_free_percent < 25:
-            score += 15
-            reasons.append(f"디스크 부족({disk_free_percent:.1f}%)")
-
-    if startup_apps_count is not None and startup_apps_count >= 40:
-        score += 10
-        reasons.append(f"시작프로그램 과다({startup_apps_count})")
-
-    if not is_online:
-        score += 10
-        reasons.append("오프라인 상태")
-
-    score = min(score, 100)
-    if score >= 60:
-        level = "high"
-    elif score >= 30:
-        level = "medium"
-    else:
-        level = "low"
-    return score, level, reasons[:3]
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json_codec.dumps(data)}\n\n"
 
 
 async def _rank_actions_by_history(
@@ -86,19 +144,7 @@ async def _rank_actions_by_history(
     if not actions:
         return actions
 
-    rows = await conn.fetch(
-        """
-        SELECT type,
-               SUM(CASE WHEN status = 'succeeded' THEN 1 ELSE 0 END) AS success_count,
-               COUNT(*) AS total_count
-        FROM commands
-        WHERE device_id = $1
-          AND type IN ('RUN_FULL', 'RUN_STORAGE_ONLY', 'PING')
-          AND created_at > NOW() - INTERVAL '30 days'
-        GROUP BY type
-        """,
-        device_id,
-    )
+    rows = await ACTION_HISTORY.fetch(conn, device_id)
     stats = {
         row["type"]: (
             (row["success_count"] / row["total_count"]) if row["total_count"] else 0.5
@@ -138,24 +184,23 @@ def _build_ping_latency_signal(ping_latencies: List[float]) -> Optional[DeviceTr
 
 
 async def _fetch_ping_latency_samples(conn, device_id: str) -> List[float]:
-    rows = await conn.fetch(
-        """
-        SELECT EXTRACT(EPOCH FROM (finished_at - started_at)) * 1000 AS latency_ms
-        FROM commands
-        WHERE device_id = $1
-          AND type = 'PING'
-          AND status = 'succeeded'
-          AND started_at IS NOT NULL
-          AND finished_at IS NOT NULL
-          AND finished_at > NOW() - INTERVAL '7 days'
-        ORDER BY finished_at DESC
-        LIMIT 8
-        """,
-        device_id,
-    )
+    rows = await PING_LATENCY_SAMPLES.fetch(conn, device_id)
     return [float(row["latency_ms"]) for row in rows if row["latency_ms"] is not None]
 
 
+def _trend_rows(samples: Dict[str, List[float]]) -> List[dict]:
+    """Per-metric samples (newest first) in the row shape _build_trend_signals reads."""
+    depth = max((len(values) for values in samples.values()), default=0)
+    return [
+        {metric: values[index] if index < len(values) else None for metric, values in samples.items()}
+        for index in range(depth)
+    ]
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
 def _build_trend_signals(
     device_id: str,
     reports: List[dict],
@@ -254,19 +299,14 @@ async def list_devices(
     current_user: dict = Depends(get_current_user),
 ):
     """List all devices for the current user."""
-    async with get_connection() as conn:
-        rows = await conn.fetch("""
-            SELECT id, name, platform, arch, agent_version, created_at, last_seen_at, revoked_at
-            FROM devices
-            WHERE user_id = $1
-            ORDER BY last_seen_at DESC NULLS LAST, created_at DESC
-        """, current_user["id"])
+    async with get_read_connection(current_user["id"]) as conn:
+        rows = await LIST_USER_DEVICES.fetch(conn, current_user["id"])
     
     now = datetime.now(timezone.utc)
     devices = []
     for row in rows:
         last_seen = row["last_seen_at"]
-        is_online = last_seen and (now - last_seen) < timedelta(minutes=2)
+        is_online = is_device_online(last_seen, now)
         
         devices.append(DeviceResponse(
             id=row["id"],
@@ -288,7 +328,7 @@ async def get_risk_top_devices(
     limit: int = Query(default=5, ge=1, le=20),
     current_user: dict = Depends(get_current_user),
 ):
-    async with get_connection() as conn:
+    async with get_read_connection(current_user["id"]) as conn:
         rows = await conn.fetch(
             """
             SELECT d.id, d.name, d.platform, d.last_seen_at,
@@ -312,8 +352,8 @@ async def get_risk_top_devices(
     items: List[DeviceRiskItem] = []
     for row in rows:
         last_seen = row["last_seen_at"]
-        is_online = bool(last_seen and (now - last_seen) < timedelta(minutes=2))
-        risk_score, risk_level, reasons = _compute_risk(dict(row), is_online=is_online)
+        is_online = is_device_online(last_seen, now)
+        risk_score, risk_level, reasons = compute_risk(dict(row), is_online=is_online)
         items.append(
             DeviceRiskItem(
                 device_id=row["id"],
@@ -333,19 +373,52 @@ async def get_risk_top_devices(
     return DeviceRiskTopResponse(items=limited, total=len(limited))
 
 
+@router.get("/events")
+async def stream_device_events(
+    http_request: Request,
+    current_user: dict = Depends(get_current_user),
+):
+    """Push online/offline transitions of the current user's devices over Server-Sent Events."""
+    try:
+        subscription = await subscribe(current_user["id"], event_types={PRESENCE_EVENT})
+    except SubscriptionLimitExceeded:
+        record_rate_limit_rejection("events")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many open event streams.",
+        )
+
+    async def event_stream():
+        try:
+            yield _sse_event("ready", {"online_threshold_seconds": settings.device_online_threshold_seconds})
+            while True:
+                event = await subscription.get(timeout=settings.event_stream_keepalive_seconds)
+                if await http_request.is_disconnected():
+                    return
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse_event("presence", event.get("data") or {})
+        finally:
+            unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(unsubscribe, subscription),
+    )
+
+
 @router.get("/{device_id}", response_model=DeviceDetailResponse)
 async def get_device(
     device_id: str,
     current_user: dict = Depends(get_current_user),
 ):
     """Get device details with recent commands and latest report."""
-    async with get_connection() as conn:
+    async with get_read_connection(current_user["id"]) as conn:
         # Get device
-        device = await conn.fetchrow("""
-            SELECT id, name, platform, arch, agent_version, created_at, last_seen_at, revoked_at
-            FROM devices
-            WHERE id = $1 AND user_id = $2
-        """, device_id, current_user["id"])
+        device = await DEVICE_FOR_USER.fetchrow(conn, device_id, current_user["id"])
         
         if not device:
             raise HTTPException(
@@ -354,26 +427,14 @@ async def get_device(
             )
         
         # Get recent commands
-        commands = await conn.fetch("""
-            SELECT id, type, status, progress, message, created_at, started_at, finished_at, report_id
-            FROM commands
-            WHERE device_id = $1
-            ORDER BY created_at DESC
-            LIMIT 10
-        """, device_id)
+        commands = await RECENT_DEVICE_COMMANDS.fetch(conn, device_id)
         
         # Get latest report
-        report = await conn.fetchrow("""
-            SELECT id, health_score, disk_free_percent, startup_apps_count, one_liner, created_at
-            FROM reports
-            WHERE device_id = $1
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, device_id)
+        report = await LATEST_DEVICE_REPORT.fetchrow(conn, device_id)
     
     now = datetime.now(timezone.utc)
     last_seen = device["last_seen_at"]
-    is_online = last_seen and (now - last_seen) < timedelta(minutes=2)
+    is_online = is_device_online(last_seen, now)
     
     return DeviceDetailResponse(
         id=device["id"],
@@ -410,19 +471,34 @@ async def get_device(
     )
 
 
-@router.get("/{device_id}/ai-summary", response_model=DeviceAiSummaryResponse)
-async def get_device_ai_summary(
+def _cached_insight_to_summary(cached) -> DeviceAiSummaryResponse:
+    reasons_raw = cached["reasons_json"] or []
+    actions_raw = cached["actions_json"] or []
+    actions = [
+        DeviceAiRecommendedAction(**action)
+        for action in list(actions_raw)
+    ]
+    return DeviceAiSummaryResponse(
+        enabled=True,
+        source=cached["source"],
+        summary=cached["summary"],
+        risk_level=cached["risk_level"],
+        reasons=list(reasons_raw),
+        recommended_actions=actions,
+        based_on_report_id=cached["report_id"],
+        generated_at=cached["generated_at"],
+    )
+
+
+async def _load_ai_summary_context(
+    *,
     device_id: str,
-    request: Request,
-    audience: str = Query(default="operator", pattern="^(operator|manager)$"),
-    provider: str = Query(default="glm45", pattern="^(openai|glm45|glm4\\.5|glm-4\\.5|glm)$"),
-    current_user: dict = Depends(get_current_user),
+    user_id: str,
+    audience: str,
+    cache_prompt_version: str,
+    cache_model_version: str,
 ):
-    """Get AI copilot summary for a device based on latest report."""
-    provider_name = resolve_ai_provider(provider)
-    cache_model_version = get_model_version_tag(provider_name)
-    cache_prompt_version = settings.ai_prompt_version
-
+    """Return (device, latest report, fresh cached summary or None) for an AI summary request."""
     async with get_connection() as conn:
         device = await conn.fetchrow(
             """
@@ -431,7 +507,7 @@ async def get_device_ai_summary(
             WHERE id = $1 AND user_id = $2
             """,
             device_id,
-            current_user["id"],
+            user_id,
         )
         if not device:
             raise HTTPException(
@@ -451,7 +527,6 @@ async def get_device_ai_summary(
         )
 
         # Return cached insight if available for latest report
-        cached = None
         if settings.enable_ai_copilot and report and audience == "operator":
             cached = await conn.fetchrow(
                 """
@@ -474,44 +549,99 @@ async def get_device_ai_summary(
                 now = datetime.now(timezone.utc)
                 age_seconds = (now - cached["generated_at"]).total_seconds()
                 if age_seconds <= settings.ai_cache_ttl_seconds:
-                    reasons_raw = cached["reasons_json"] or []
-                    actions_raw = cached["actions_json"] or []
-                    if isinstance(reasons_raw, str):
-                        try:
-                            reasons_raw = json.loads(reasons_raw)
-                        except Exception:
-                            reasons_raw = []
-                    if isinstance(actions_raw, str):
-                        try:
-                            actions_raw = json.loads(actions_raw)
-                        except Exception:
-                            actions_raw = []
-                    actions = [
-                        DeviceAiRecommendedAction(**action)
-                        for action in list(actions_raw)
-                    ]
-                    cached_response = DeviceAiSummaryResponse(
-                        enabled=True,
-                        source=cached["source"],
-                        summary=cached["summary"],
-                        risk_level=cached["risk_level"],
-                        reasons=list(reasons_raw),
-                        recommended_actions=actions,
-                        based_on_report_id=cached["report_id"],
-                        generated_at=cached["generated_at"],
-                    )
-                    return apply_audience_view(
-                        cached_response,
-                        audience=audience,
-                        is_online=bool(
-                            device["last_seen_at"]
-                            and (datetime.now(timezone.utc) - device["last_seen_at"]) < timedelta(minutes=2)
-                        ),
-                    )
+                    return device, report, _cached_insight_to_summary(cached)
+
+    return device, report, None
+
+
+async def _finalize_ai_summary(
+    *,
+    device_id: str,
+    user_id: str,
+    report,
+    summary: DeviceAiSummaryResponse,
+    audience: str,
+    cache_prompt_version: str,
+    cache_model_version: str,
+) -> DeviceAiSummaryResponse:
+    """Merge trend signals and command history into a generated summary, then cache it."""
+    if report:
+        async with get_connection() as conn:
+            samples = await fetch_recent_samples(conn, device_id)
+            ping_latencies = await _fetch_ping_latency_samples(conn, device_id)
+        trend = _build_trend_signals(
+            device_id,
+            _trend_rows(samples),
+            ping_latencies=ping_latencies,
+        )
+        degraded_notes = [signal.note for signal in trend.signals if signal.status == "degraded"]
+        if degraded_notes:
+            merged_reasons = (summary.reasons + degraded_notes)[:4]
+            summary = summary.model_copy(update={"reasons": merged_reasons})
+
+    async with get_connection() as conn:
+        ranked = await _rank_actions_by_history(
+            conn=conn,
+            device_id=device_id,
+            actions=summary.recommended_actions,
+        )
+        summary = summary.model_copy(update={"recommended_actions": ranked})
+
+    if settings.enable_ai_copilot and report and audience == "operator":
+        async with get_connection() as conn:
+            await conn.execute(
+                AI_INSIGHT_UPSERT_SQL,
+                *build_ai_insight_row(
+                    device_id=device_id,
+                    user_id=user_id,
+                    report_id=report["id"],
+                    summary=summary,
+                    prompt_version=cache_prompt_version,
+                    model_version=cache_model_version,
+                ),
+            )
+    return summary
+
+
+def _ai_summary_failure(report) -> DeviceAiSummaryResponse:
+    return DeviceAiSummaryResponse(
+        enabled=settings.enable_ai_copilot,
+        source="fallback",
+        summary="AI 요약 생성에 실패했습니다. 기본 점검 액션을 사용하세요.",
+        risk_level="unknown",
+        reasons=["AI 요약 생성 중 일시적 오류가 발생했습니다."],
+        recommended_actions=[],
+        based_on_report_id=report["id"] if report else None,
+        generated_at=datetime.now(timezone.utc),
+    )
+
+
+@router.get("/{device_id}/ai-summary", response_model=DeviceAiSummaryResponse)
+async def get_device_ai_summary(
+    device_id: str,
+    request: Request,
+    audience: str = Query(default="operator", pattern="^(operator|manager)$"),
+    provider: str = Query(default="glm45", pattern="^(openai|glm45|glm4\\.5|glm-4\\.5|glm)$"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Get AI copilot summary for a device based on latest report."""
+    provider_name = resolve_ai_provider(provider)
+    cache_model_version = get_model_version_tag(provider_name)
+    cache_prompt_version = settings.ai_prompt_version
+
+    device, report, cached = await _load_ai_summary_context(
+        device_id=device_id,
+        user_id=current_user["id"],
+        audience=audience,
+        cache_prompt_version=cache_prompt_version,
+        cache_model_version=cache_model_version,
+    )
 
     now = datetime.now(timezone.utc)
     last_seen = device["last_seen_at"]
-    is_online = bool(last_seen and (now - last_seen) < timedelta(minutes=2))
+    is_online = is_device_online(last_seen, now)
+    if cached:
+        return apply_audience_view(cached, audience=audience, is_online=is_online)
 
     try:
         rule_based = build_device_ai_summary(
@@ -528,84 +658,101 @@ async def get_device_ai_summary(
             provider=provider_name,
             metrics_key=f"user:{current_user['id']}",
         )
-        if report:
-            async with get_connection() as conn:
-                trend_rows = await conn.fetch(
-                    """
-                    SELECT created_at, disk_free_percent, startup_apps_count
-                    FROM reports
-                    WHERE device_id = $1
-                      AND created_at > NOW() - INTERVAL '7 days'
-                    ORDER BY created_at DESC
-                    LIMIT 8
-                    """,
-                    device_id,
-                )
-                ping_latencies = await _fetch_ping_latency_samples(conn, device_id)
-            trend = _build_trend_signals(
-                device_id,
-                [dict(row) for row in trend_rows],
-                ping_latencies=ping_latencies,
-            )
-            degraded_notes = [signal.note for signal in trend.signals if signal.status == "degraded"]
-            if degraded_notes:
-                merged_reasons = (summary.reasons + degraded_notes)[:4]
-                summary = summary.model_copy(update={"reasons": merged_reasons})
+        return await _finalize_ai_summary(
+            device_id=device_id,
+            user_id=current_user["id"],
+            report=report,
+            summary=summary,
+            audience=audience,
+            cache_prompt_version=cache_prompt_version,
+            cache_model_version=cache_model_version,
+        )
+    except Exception:
+        logger.exception("AI summary fallback triggered")
+        return _ai_summary_failure(report)
 
-        async with get_connection() as conn:
-            ranked = await _rank_actions_by_history(
-                conn=conn,
+
+@router.get("/{device_id}/ai-summary/stream")
+async def stream_device_ai_summary_events(
+    device_id: str,
+    request: Request,
+    audience: str = Query(default="operator", pattern="^(operator|manager)$"),
+    provider: str = Query(default="glm45", pattern="^(openai|glm45|glm4\\.5|glm-4\\.5|glm)$"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Server-Sent Events variant of the AI summary.
+
+    Emits ``rule_based`` right after the DB lookups, then ``delta`` events carrying the
+    provider's incremental output, and finally ``result`` with the validated summary
+    (also persisted to the cache) followed by ``done``.
+    """
+    provider_name = resolve_ai_provider(provider)
+    cache_model_version = get_model_version_tag(provider_name)
+    cache_prompt_version = settings.ai_prompt_version
+
+    device, report, cached = await _load_ai_summary_context(
+        device_id=device_id,
+        user_id=current_user["id"],
+        audience=audience,
+        cache_prompt_version=cache_prompt_version,
+        cache_model_version=cache_model_version,
+    )
+    now = datetime.now(timezone.utc)
+    last_seen = device["last_seen_at"]
+    is_online = is_device_online(last_seen, now)
+    latest_report = dict(report) if report else None
+    trace_id = getattr(request.state, "trace_id", "unknown")
+
+    async def event_stream():
+        if cached:
+            view = apply_audience_view(cached, audience=audience, is_online=is_online)
+            yield _sse_event("result", view.model_dump(mode="json"))
+            yield _sse_event("done", {})
+            return
+
+        try:
+            rule_based = build_device_ai_summary(is_online=is_online, latest_report=latest_report)
+            yield _sse_event(
+                "rule_based",
+                apply_audience_view(rule_based, audience=audience, is_online=is_online).model_dump(mode="json"),
+            )
+            summary = None
+            async for kind, payload in stream_device_ai_summary(
+                is_online=is_online,
+                latest_report=latest_report,
+                rule_based=rule_based,
+                rate_limit_key=f"user:{current_user['id']}:device:{device_id}:provider:{provider_name}",
+                trace_id=trace_id,
+                audience=audience,
+                provider=provider_name,
+                metrics_key=f"user:{current_user['id']}",
+            ):
+                if kind == "delta":
+                    yield _sse_event("delta", {"text": payload})
+                else:
+                    summary = payload
+            if summary is None:
+                raise RuntimeError("AI stream ended without a result")
+            summary = await _finalize_ai_summary(
                 device_id=device_id,
-                actions=summary.recommended_actions,
+                user_id=current_user["id"],
+                report=report,
+                summary=summary,
+                audience=audience,
+                cache_prompt_version=cache_prompt_version,
+                cache_model_version=cache_model_version,
             )
-            summary = summary.model_copy(update={"recommended_actions": ranked})
-
-        if settings.enable_ai_copilot and report and audience == "operator":
-            async with get_connection() as conn:
-                await conn.execute(
-                    """
-                    INSERT INTO ai_insights (
-                        id, device_id, user_id, report_id,
-                        source, summary, risk_level, reasons_json, actions_json, prompt_version, model_version, generated_at
-                    )
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8::jsonb, $9::jsonb, $10, $11, $12)
-                    ON CONFLICT (device_id, report_id)
-                    DO UPDATE SET
-                        source = EXCLUDED.source,
-                        summary = EXCLUDED.summary,
-                        risk_level = EXCLUDED.risk_level,
-                        reasons_json = EXCLUDED.reasons_json,
-                        actions_json = EXCLUDED.actions_json,
-                        prompt_version = EXCLUDED.prompt_version,
-                        model_version = EXCLUDED.model_version,
-                        generated_at = EXCLUDED.generated_at
-                    """,
-                    generate_id("ais"),
-                    device_id,
-                    current_user["id"],
-                    report["id"],
-                    summary.source,
-                    summary.summary,
-                    summary.risk_level,
-                    json.dumps(summary.reasons, ensure_ascii=False),
-                    json.dumps([action.model_dump() for action in summary.recommended_actions], ensure_ascii=False),
-                    cache_prompt_version,
-                    cache_model_version,
-                    summary.generated_at,
-                )
-        return summary
-    except Exception:
-        logger.exception("AI summary fallback triggered")
-        return DeviceAiSummaryResponse(
-            enabled=settings.enable_ai_copilot,
-            source="fallback",
-            summary="AI 요약 생성에 실패했습니다. 기본 점검 액션을 사용하세요.",
-            risk_level="unknown",
-            reasons=["AI 요약 생성 중 일시적 오류가 발생했습니다."],
-            recommended_actions=[],
-            based_on_report_id=report["id"] if report else None,
-            generated_at=datetime.now(timezone.utc),
-        )
+        except Exception:
+            logger.exception("AI summary stream fallback triggered")
+            summary = _ai_summary_failure(report)
+        yield _sse_event("result", summary.model_dump(mode="json"))
+        yield _sse_event("done", {})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{device_id}/ai-trends", response_model=DeviceTrendResponse)
@@ -613,7 +760,7 @@ async def get_device_ai_trends(
     device_id: str,
     current_user: dict = Depends(get_current_user),
 ):
-    async with get_connection() as conn:
+    async with get_read_connection(current_user["id"]) as conn:
         device = await conn.fetchrow(
             "SELECT id FROM devices WHERE id = $1 AND user_id = $2",
             device_id,
@@ -625,25 +772,63 @@ async def get_device_ai_trends(
                 detail="Device not found",
             )
 
-        rows = await conn.fetch(
-            """
-            SELECT created_at, disk_free_percent, startup_apps_count
-            FROM reports
-            WHERE device_id = $1
-              AND created_at > NOW() - INTERVAL '7 days'
-            ORDER BY created_at DESC
-            LIMIT 8
-            """,
-            device_id,
-        )
+        samples = await fetch_recent_samples(conn, device_id)
         ping_latencies = await _fetch_ping_latency_samples(conn, device_id)
     return _build_trend_signals(
         device_id,
-        [dict(row) for row in rows],
+        _trend_rows(samples),
         ping_latencies=ping_latencies,
     )
 
 
+@router.get("/{device_id}/metrics", response_model=DeviceMetricsResponse)
+async def get_device_metrics(
+    device_id: str,
+    metric: List[str] = Query(default=list(DEFAULT_CHART_METRICS)),
+    start: Optional[datetime] = Query(default=None, alias="from"),
+    end: Optional[datetime] = Query(default=None, alias="to"),
+    points: int = Query(default=200, ge=10, le=2000),
+    current_user: dict = Depends(get_current_user),
+):
+    """Metric history for charts, downsampled server-side.
+
+    The range (default: the last 7 days) is split into at most ``points`` equal buckets,
+    normally the chart width in pixels, and each bucket returns min/max/avg/count.
+    A one-year chart therefore returns as many points as a 7-day one.
+    """
+    metrics = list(dict.fromkeys(metric))
+    if not metrics or len(metrics) > MAX_CHART_METRICS or any(len(name) > MAX_METRIC_NAME_LENGTH for name in metrics):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Request 1 to {MAX_CHART_METRICS} metrics",
+        )
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must be earlier than 'to'",
+        )
+    width = bucket_seconds(start, end, points)
+
+    async with get_read_connection(current_user["id"]) as conn:
+        device = await DEVICE_FOR_USER.fetchrow(conn, device_id, current_user["id"])
+        if not device:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Device not found",
+            )
+        series = await fetch_metric_buckets(conn, device_id, metrics, start, end, width)
+
+    return DeviceMetricsResponse(
+        device_id=device_id,
+        start=start,
+        end=end,
+        bucket_seconds=width,
+        series=[DeviceMetricSeries(metric=name, points=series[name]) for name in metrics],
+    )
+
+
 @router.post("/{device_id}/revoke")
 async def revoke_device(
     device_id: str,
@@ -714,7 +899,10 @@ async def delete_device(
         # 3. Commands
         await conn.execute("DELETE FROM commands WHERE device_id = $1", device_id)
         
-        # 4. The Device
+        # 4. Fleet rollup state (counters follow the device's latest report)
+        await fleet_rollups.forget_device(conn, device_id)
+
+        # 5. The Device
         await conn.execute("DELETE FROM devices WHERE id = $1", device_id)
     
     return {"message": "Device deleted permanently"}
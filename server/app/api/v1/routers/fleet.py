@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Query
+
+from app.api.v1.deps import get_current_user
+from app.core.database import get_read_connection
+from app.models import FleetCommandStats, FleetDiskFreeBucket, FleetOverviewResponse
+from app.services.fleet_rollups import DISK_FREE_BINS, day_start, fetch_fleet_state, fetch_fleet_totals
+
+router = APIRouter()
+
+
+def _average(entry: Optional[Tuple[int, float]]) -> Optional[float]:
+    if not entry or entry[0] <= 0:
+        return None
+    return round(entry[1] / entry[0], 1)
+
+
+def _command_stats(totals: Dict[str, Tuple[int, float]]) -> List[FleetCommandStats]:
+    outcomes: Dict[str, Dict[str, int]] = {}
+    for metric, (count, _) in totals.items():
+        if not metric.startswith("commands."):
+            continue
+        command_type, _, outcome = metric[len("commands."):].rpartition(".")
+        if command_type and outcome in ("succeeded", "failed"):
+            outcomes.setdefault(command_type, {"succeeded": 0, "failed": 0})[outcome] = max(count, 0)
+
+    stats = []
+    for command_type, counts in sorted(outcomes.items()):
+        finished = counts["succeeded"] + counts["failed"]
+        stats.append(
+            FleetCommandStats(
+                type=command_type,
+                succeeded=counts["succeeded"],
+                failed=counts["failed"],
+                success_rate=round(counts["succeeded"] / finished, 4) if finished else None,
+            )
+        )
+    return stats
+
+
+@router.get("/overview", response_model=FleetOverviewResponse)
+async def get_fleet_overview(
+    days: int = Query(default=7, ge=1, le=90),
+    current_user: dict = Depends(get_current_user),
+):
+    """Fleet summary tiles from the rollup tables; the cost does not depend on the device count."""
+    since = day_start(datetime.now(timezone.utc)) - timedelta(days=days - 1)
+    async with get_read_connection(current_user["id"]) as conn:
+        state = await fetch_fleet_state(conn, current_user["id"])
+        totals = await fetch_fleet_totals(conn, current_user["id"], since)
+
+    bin_width = 100 // DISK_FREE_BINS
+    return FleetOverviewResponse(
+        days=days,
+        since=since,
+        devices_reporting=state.get("devices", (0, 0.0))[0],
+        avg_health_score=_average(state.get("health_score")),
+        high_risk_devices=state.get("high_risk_devices", (0, 0.0))[0],
+        disk_free_distribution=[
+            FleetDiskFreeBucket(
+                min_percent=index * bin_width,
+                max_percent=(index + 1) * bin_width,
+                devices=state.get(f"disk_free_bin.{index}", (0, 0.0))[0],
+            )
+            for index in range(DISK_FREE_BINS)
+        ],
+        reports=totals.get("reports", (0, 0.0))[0],
+        report_avg_health_score=_average(totals.get("health_score")),
+        report_avg_disk_free_percent=_average(totals.get("disk_free_percent")),
+        commands=_command_stats(totals),
+    )
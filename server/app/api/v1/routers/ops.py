@@ -0,0 +1,37 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from app.api.v1.deps import require_ops_token
+from app.services.profiling import loop_watchdog, stack_sampler
+
+router = APIRouter(dependencies=[Depends(require_ops_token)])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def get_profile(
+    route: Optional[str] = Query(default=None, description='Route key such as "GET /v1/devices/risk-top"'),
+):
+    """Folded stacks of profiled requests, ready for flamegraph.pl or speedscope.
+
+    Profiles are per worker; repeat against each worker (or run with one) when needed.
+    """
+    return PlainTextResponse(stack_sampler.dump_folded(route))
+
+
+@router.get("/profile/summary")
+async def get_profile_summary():
+    return {
+        "samples_by_route": stack_sampler.summary(),
+        "event_loop": {
+            "blocked_total": loop_watchdog.blocked_total,
+            "max_lag_ms": round(loop_watchdog.max_lag_seconds * 1000, 1),
+        },
+    }
+
+
+@router.delete("/profile")
+async def reset_profile():
+    stack_sampler.reset()
+    return {"message": "Profile reset"}
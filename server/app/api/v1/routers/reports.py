@@ -3,11 +3,11 @@ import base64
 from datetime import datetime, timedelta, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi import Request
+from fastapi import Response
 
 from app.api.v1.deps import get_current_user
-from app.core.config import settings
-from app.core.database import get_connection
+from app.core.database import get_connection, get_read_connection
+from app.core.queries import EXPLAIN_TOKEN_HASH, register_query
 from app.core.security import generate_id, generate_token, hash_token
 from app.models import (
     ReportDetailResponse,
@@ -17,11 +17,38 @@ from app.models import (
     ReportShareResponse,
     SharedReportResponse,
 )
-from app.services.request_rate_limit import enforce_request_rate_limit
+from app.services.report_delta import load_report_body
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+REPORT_DETAIL = register_query(
+    "reports.detail",
+    """
+    SELECT r.id, r.device_id, r.command_id, r.created_at,
+           r.health_score, r.disk_free_percent, r.startup_apps_count,
+           r.one_liner, r.raw_report_json::text AS raw_report_json_text, r.raw_report_ref,
+           r.raw_report_base_id
+    FROM reports r
+    JOIN devices d ON r.device_id = d.id
+    WHERE r.id = $1 AND d.user_id = $2
+    """,
+)
+
+SHARED_REPORT_LOOKUP = register_query(
+    "reports.shared_report_lookup",
+    """
+    SELECT r.id AS report_id, r.created_at, r.one_liner, r.health_score, r.disk_free_percent, r.startup_apps_count,
+           d.name AS device_name, s.expires_at, s.revoked_at
+    FROM report_shares s
+    JOIN reports r ON r.id = s.report_id
+    JOIN devices d ON d.id = r.device_id
+    WHERE s.share_token_hash = $1 OR s.share_token = $2
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_TOKEN_HASH, "explain-share-token"),
+)
+
 
 def _sanitize_pdf_text(value: str) -> str:
     escaped = value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
@@ -73,75 +100,59 @@ def _build_simple_pdf(lines: list[str]) -> bytes:
 @router.get("/{report_id}", response_model=ReportDetailResponse)
 async def get_report(
     report_id: str,
-    request: Request,
     current_user: dict = Depends(get_current_user),
 ):
-    """Get report details."""
-    import json
-    await enforce_request_rate_limit(
-        request=request,
-        scope=f"report:detail:user:{current_user['id']}",
-    )
+    """Get report details.
+
+    ``raw_report_json`` is read as text (from the blob store, or jsonb text for inline
+    rows) and spliced into the response body as is, so multi-megabyte reports are never
+    decoded into Python objects and re-encoded. Delta-encoded rows are rebuilt from
+    their base reports first.
+    """
 
+    raw_body = None
     try:
-        async with get_connection() as conn:
-            report = await conn.fetchrow("""
-                SELECT r.id, r.device_id, r.command_id, r.created_at,
-                       r.health_score, r.disk_free_percent, r.startup_apps_count,
-                       r.one_liner, r.raw_report_json
-                FROM reports r
-                JOIN devices d ON r.device_id = d.id
-                WHERE r.id = $1 AND d.user_id = $2
-            """, report_id, current_user["id"])
-            
-            if not report:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Report not found",
-                )
-                
-            raw_data = report["raw_report_json"]
-            # Handle case where asyncpg returns JSONB as string
-            if isinstance(raw_data, str):
+        async with get_read_connection(current_user["id"]) as conn:
+            report = await REPORT_DETAIL.fetchrow(conn, report_id, current_user["id"])
+            if report:
                 try:
-                    raw_data = json.loads(raw_data)
+                    raw_body = await load_report_body(conn, report)
                 except Exception:
-                    pass # Keep as is or handle error, Pydantic will validate
-            
-            return ReportDetailResponse(
-                id=report["id"],
-                device_id=report["device_id"],
-                command_id=report["command_id"],
-                created_at=report["created_at"],
-                health_score=report["health_score"],
-                disk_free_percent=report["disk_free_percent"],
-                startup_apps_count=report["startup_apps_count"],
-                one_liner=report["one_liner"],
-                raw_report_json=raw_data,
-            )
-            
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise e
+                    logger.exception("Raw report body unavailable: report=%s", report["id"])
+    except Exception:
         logger.exception("Error fetching report")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error",
         )
 
+    if not report:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report not found",
+        )
+
+    summary = ReportDetailResponse(
+        id=report["id"],
+        device_id=report["device_id"],
+        command_id=report["command_id"],
+        created_at=report["created_at"],
+        health_score=report["health_score"],
+        disk_free_percent=report["disk_free_percent"],
+        startup_apps_count=report["startup_apps_count"],
+        one_liner=report["one_liner"],
+    ).model_dump_json(exclude={"raw_report_json"})
+    body = summary[:-1].encode("utf-8") + b',"raw_report_json":' + (raw_body or b"null") + b"}"
+    return Response(content=body, media_type="application/json")
+
 
 @router.get("/{report_id}/export", response_model=ReportExportResponse)
 async def export_report(
     report_id: str,
-    request: Request,
     format: str = Query(default="markdown", pattern="^(markdown|text|pdf)$"),
     current_user: dict = Depends(get_current_user),
 ):
-    await enforce_request_rate_limit(
-        request=request,
-        scope=f"report:export:user:{current_user['id']}",
-    )
-    async with get_connection() as conn:
+    async with get_read_connection(current_user["id"]) as conn:
         report = await conn.fetchrow(
             """
             SELECT r.id, r.created_at, r.health_score, r.disk_free_percent, r.startup_apps_count, r.one_liner,
@@ -211,12 +222,10 @@ async def export_report(
 
 @router.post("/{report_id}/share", response_model=ReportShareResponse)
 async def create_report_share(
-    request: Request,
     report_id: str,
     expires_in_hours: int = Query(default=72, ge=1, le=720),
     current_user: dict = Depends(get_current_user),
 ):
-    await enforce_request_rate_limit(request=request, scope=f"report:share:create:user:{current_user['id']}")
     async with get_connection() as conn:
         report = await conn.fetchrow(
             """
@@ -259,14 +268,9 @@ async def create_report_share(
 @router.get("/{report_id}/shares", response_model=ReportShareListResponse)
 async def list_report_shares(
     report_id: str,
-    request: Request,
     current_user: dict = Depends(get_current_user),
 ):
-    await enforce_request_rate_limit(
-        request=request,
-        scope=f"report:share:list:user:{current_user['id']}",
-    )
-    async with get_connection() as conn:
+    async with get_read_connection(current_user["id"]) as conn:
         report = await conn.fetchrow(
             """
             SELECT r.id
@@ -309,13 +313,8 @@ async def list_report_shares(
 @router.post("/share/{share_ref}/revoke")
 async def revoke_report_share(
     share_ref: str,
-    request: Request,
     current_user: dict = Depends(get_current_user),
 ):
-    await enforce_request_rate_limit(
-        request=request,
-        scope=f"report:share:revoke:user:{current_user['id']}",
-    )
     now = datetime.now(timezone.utc)
     share_hash = hash_token(share_ref)
     async with get_connection() as conn:
@@ -338,27 +337,10 @@ async def revoke_report_share(
 
 
 @router.get("/share/{share_token}", response_model=SharedReportResponse)
-async def get_shared_report(share_token: str, request: Request):
-    await enforce_request_rate_limit(
-        request=request,
-        scope="report:share:public",
-        limit=settings.share_public_rate_limit_requests,
-        window_seconds=settings.share_public_rate_limit_window_seconds,
-    )
-    async with get_connection() as conn:
+async def get_shared_report(share_token: str):
+    async with get_read_connection() as conn:
         share_hash = hash_token(share_token)
-        row = await conn.fetchrow(
-            """
-            SELECT r.id AS report_id, r.created_at, r.one_liner, r.health_score, r.disk_free_percent, r.startup_apps_count,
-                   d.name AS device_name, s.expires_at, s.revoked_at
-            FROM report_shares s
-            JOIN reports r ON r.id = s.report_id
-            JOIN devices d ON d.id = r.device_id
-            WHERE s.share_token_hash = $1 OR s.share_token = $2
-            """,
-            share_hash,
-            share_token,
-        )
+        row = await SHARED_REPORT_LOOKUP.fetchrow(conn, share_hash, share_token)
     if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Share not found")
     if row["revoked_at"] is not None or row["expires_at"] < datetime.now(timezone.utc):
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends
 from datetime import datetime, timedelta, timezone
 
 from app.api.v1.deps import get_current_user
@@ -11,19 +11,16 @@ from app.models import (
     EnrollTokenStatusRequest,
     EnrollTokenStatusResponse,
 )
-from app.services.request_rate_limit import enforce_request_rate_limit
 
 router = APIRouter()
 
 
 @router.post("/enroll", response_model=EnrollTokenResponse)
 async def create_enroll_token(
-    http_request: Request,
     request: EnrollTokenCreate,
     current_user: dict = Depends(get_current_user),
 ):
     """Generate a new enrollment token for device registration."""
-    await enforce_request_rate_limit(request=http_request, scope=f"token:enroll:user:{current_user['id']}")
     token = generate_token("enroll")
     token_hash = hash_token(token)
     token_id = generate_id("et")
@@ -43,14 +40,9 @@ async def create_enroll_token(
 
 @router.post("/enroll/status", response_model=EnrollTokenStatusResponse)
 async def get_enroll_token_status(
-    http_request: Request,
     request: EnrollTokenStatusRequest,
     current_user: dict = Depends(get_current_user),
 ):
-    await enforce_request_rate_limit(
-        request=http_request,
-        scope=f"token:enroll:status:user:{current_user['id']}",
-    )
     token_hash = hash_token(request.token)
     async with get_connection() as conn:
         row = await conn.fetchrow(
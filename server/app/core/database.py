@@ -1,237 +1,275 @@
-import asyncpg
+import asyncio
+import time
+from bisect import bisect_left
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Optional
-from app.core.config import settings
+from typing import Any, AsyncGenerator, Dict, Optional
+
+import asyncpg
+
+from app.core.config import is_serverless, settings
+from app.core import json_codec
+from app.core.migrations import migrate
+from app.core.request_context import record_db_query
+
+# Named pools keep agent check-ins, dashboard reads and background jobs from starving
+# each other; each one is sized independently through Settings.
+POOL_AGENT = "agent"
+POOL_DASHBOARD = "dashboard"
+POOL_BACKGROUND = "background"
+# Optional read replica (settings.database_replica_url) used by get_read_connection.
+POOL_REPLICA = "replica"
+POOL_NAMES = (POOL_AGENT, POOL_DASHBOARD, POOL_BACKGROUND, POOL_REPLICA)
+
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM (NOW() - pg_last_xact_replay_timestamp())), 0)
+    END::float8
+"""
+
+# Upper bounds (seconds) of the acquire-wait histogram buckets; the last bucket is +Inf.
+ACQUIRE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_pools: Dict[str, asyncpg.Pool] = {}
+_pool_lock = asyncio.Lock()
+_acquire_stats: Dict[str, Dict[str, Any]] = {}
+_replica_state: Dict[str, Any] = {"lag_seconds": None, "checked_at": 0.0, "fallbacks": 0}
+_recent_writes: Dict[str, float] = {}
+
+
+class DatabaseUnavailableError(Exception):
+    """Raised when no pooled connection could be acquired in time."""
+
+    def __init__(self, pool_name: str):
+        super().__init__(f"Database pool '{pool_name}' exhausted")
+        self.pool_name = pool_name
+
+
+def _physical_pool_name(name: str) -> str:
+    # Serverless instances serve one request at a time; the named primary pools share
+    # a single tiny pool so a cold instance opens at most one primary connection.
+    if name != POOL_REPLICA and is_serverless():
+        return POOL_DASHBOARD
+    return name
 
-# Connection pool (singleton)
-_pool: Optional[asyncpg.Pool] = None
 
+def _pool_size(name: str) -> tuple:
+    if is_serverless():
+        return (0, settings.db_serverless_pool_max_size)
+    return (
+        getattr(settings, f"db_pool_{name}_min_size"),
+        getattr(settings, f"db_pool_{name}_max_size"),
+    )
 
-async def get_pool() -> asyncpg.Pool:
-    global _pool
-    if _pool is None:
-        _pool = await asyncpg.create_pool(
-            settings.database_url,
-            min_size=5,
-            max_size=20,
-            command_timeout=60,
+
+def _stats_for(name: str) -> Dict[str, Any]:
+    stats = _acquire_stats.get(name)
+    if stats is None:
+        stats = {
+            "acquired": 0,
+            "timeouts": 0,
+            "waiting": 0,
+            "wait_seconds_total": 0.0,
+            "wait_buckets": [0] * (len(ACQUIRE_WAIT_BUCKETS) + 1),
+        }
+        _acquire_stats[name] = stats
+    return stats
+
+
+def _log_query_time(record) -> None:
+    record_db_query(record.elapsed)
+
+
+async def _init_connection(connection: asyncpg.Connection) -> None:
+    # JSON/JSONB columns arrive as Python objects and are written from Python objects,
+    # decoded once here instead of with json.loads in every router.
+    for type_name in ("json", "jsonb"):
+        await connection.set_type_codec(
+            type_name,
+            schema="pg_catalog",
+            encoder=json_codec.dumps,
+            decoder=json_codec.loads,
         )
-    return _pool
+    # asyncpg schedules sync loggers with call_soon, which copies the request's context,
+    # so the elapsed time lands in that request's RequestDbStats.
+    if settings.enable_metrics:
+        connection.add_query_logger(_log_query_time)
+
+
+async def get_pool(name: str = POOL_DASHBOARD) -> asyncpg.Pool:
+    if name not in POOL_NAMES:
+        raise ValueError(f"Unknown database pool: {name}")
+    if name == POOL_REPLICA and not settings.database_replica_url:
+        raise ValueError("No read replica configured")
+    name = _physical_pool_name(name)
+    pool = _pools.get(name)
+    if pool is not None:
+        return pool
+    async with _pool_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            min_size, max_size = _pool_size(name)
+            dsn = settings.database_replica_url if name == POOL_REPLICA else settings.database_url
+            pool = await asyncpg.create_pool(
+                dsn,
+                min_size=min_size,
+                max_size=max_size,
+                command_timeout=settings.db_command_timeout_seconds,
+                statement_cache_size=settings.db_statement_cache_size,
+                init=_init_connection,
+            )
+            _pools[name] = pool
+    return pool
+
+
+async def open_pools() -> None:
+    for name in POOL_NAMES:
+        if name == POOL_REPLICA and not settings.database_replica_url:
+            continue
+        await get_pool(name)
 
 
 async def close_pool():
-    global _pool
-    if _pool is not None:
-        await _pool.close()
-        _pool = None
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        await pool.close()
+
+
+async def _acquire(name: str, db_pool: asyncpg.Pool) -> asyncpg.Connection:
+    stats = _stats_for(name)
+    stats["waiting"] += 1
+    started = time.perf_counter()
+    try:
+        connection = await db_pool.acquire(timeout=settings.db_pool_acquire_timeout_seconds)
+    except asyncio.TimeoutError as exc:
+        stats["timeouts"] += 1
+        raise DatabaseUnavailableError(name) from exc
+    finally:
+        stats["waiting"] -= 1
+        waited = time.perf_counter() - started
+        stats["wait_seconds_total"] += waited
+        stats["wait_buckets"][bisect_left(ACQUIRE_WAIT_BUCKETS, waited)] += 1
+    stats["acquired"] += 1
+    return connection
+
+
+@asynccontextmanager
+async def get_connection(pool: str = POOL_DASHBOARD) -> AsyncGenerator[asyncpg.Connection, None]:
+    """Acquire a connection from the named pool, failing fast when it is saturated."""
+    db_pool = await get_pool(pool)
+    connection = await _acquire(pool, db_pool)
+    try:
+        yield connection
+    finally:
+        await db_pool.release(connection)
+
+
+def mark_user_write(user_id: str) -> None:
+    """Pin the user's reads to the primary for the read-your-writes window."""
+    now = time.monotonic()
+    _recent_writes[user_id] = now
+    if len(_recent_writes) > 10000:
+        cutoff = now - settings.db_read_your_writes_seconds
+        for key in [key for key, at in _recent_writes.items() if at < cutoff]:
+            _recent_writes.pop(key, None)
+
+
+def _wrote_recently(user_id: Optional[str]) -> bool:
+    if not user_id:
+        return False
+    wrote_at = _recent_writes.get(user_id)
+    return wrote_at is not None and time.monotonic() - wrote_at < settings.db_read_your_writes_seconds
+
+
+async def _replica_is_fresh(connection: asyncpg.Connection) -> bool:
+    now = time.monotonic()
+    if now - _replica_state["checked_at"] >= settings.db_replica_lag_check_interval_seconds:
+        _replica_state["checked_at"] = now
+        try:
+            _replica_state["lag_seconds"] = await connection.fetchval(REPLICA_LAG_SQL)
+        except Exception:
+            _replica_state["lag_seconds"] = None
+    lag = _replica_state["lag_seconds"]
+    return lag is not None and lag <= settings.db_replica_max_lag_seconds
 
 
 @asynccontextmanager
-async def get_connection() -> AsyncGenerator[asyncpg.Connection, None]:
-    pool = await get_pool()
-    async with pool.acquire() as connection:
+async def get_read_connection(user_id: Optional[str] = None) -> AsyncGenerator[asyncpg.Connection, None]:
+    """Acquire a connection for read-only queries, preferring the replica.
+
+    Falls back to the primary (dashboard pool) when no replica is configured, the
+    replica is unreachable or saturated, its replay lag exceeds
+    ``db_replica_max_lag_seconds``, or ``user_id`` wrote through this worker within
+    ``db_read_your_writes_seconds``. The write marker is per process, so with several
+    workers a read can still land on the replica within the lag bound.
+    """
+    replica = None
+    if settings.database_replica_url and not _wrote_recently(user_id):
+        try:
+            replica = await get_pool(POOL_REPLICA)
+            connection = await _acquire(POOL_REPLICA, replica)
+        except Exception:
+            replica = None
+        else:
+            try:
+                fresh = await _replica_is_fresh(connection)
+            except BaseException:
+                await replica.release(connection)
+                raise
+            if not fresh:
+                await replica.release(connection)
+                replica = None
+
+    if replica is None:
+        if settings.database_replica_url:
+            _replica_state["fallbacks"] += 1
+        async with get_connection(pool=POOL_DASHBOARD) as primary:
+            yield primary
+        return
+
+    try:
         yield connection
+    finally:
+        await replica.release(connection)
+
+
+def get_replica_status() -> Dict[str, Any]:
+    return {
+        "configured": bool(settings.database_replica_url),
+        "lag_seconds": _replica_state["lag_seconds"],
+        "fallbacks": _replica_state["fallbacks"],
+    }
+
+
+def get_pool_stats_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Acquire-wait histogram and saturation gauges for every named pool."""
+    snapshot: Dict[str, Dict[str, Any]] = {}
+    for name in POOL_NAMES:
+        stats = _stats_for(name)
+        pool: Optional[asyncpg.Pool] = _pools.get(_physical_pool_name(name))
+        _, max_size = _pool_size(name)
+        size = pool.get_size() if pool is not None else 0
+        idle = pool.get_idle_size() if pool is not None else 0
+        in_use = size - idle
+        snapshot[name] = {
+            "open": pool is not None,
+            "size": size,
+            "idle": idle,
+            "in_use": in_use,
+            "max_size": max_size,
+            "saturation": (in_use / max_size) if max_size else 0.0,
+            "acquired": stats["acquired"],
+            "timeouts": stats["timeouts"],
+            "waiting": stats["waiting"],
+            "wait_seconds_total": stats["wait_seconds_total"],
+            "wait_buckets": list(stats["wait_buckets"]),
+        }
+    return snapshot
 
 
 async def init_db():
-    """Initialize database with required tables."""
-    async with get_connection() as conn:
-        # Users table
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id TEXT PRIMARY KEY,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-            )
-        """)
-        
-        # Enroll tokens table
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS enroll_tokens (
-                id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                token_hash TEXT UNIQUE NOT NULL,
-                expires_at TIMESTAMPTZ NOT NULL,
-                used_at TIMESTAMPTZ,
-                used_device_id TEXT,
-                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-            )
-        """)
-        
-        # Devices table
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS devices (
-                id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                name TEXT NOT NULL,
-                platform TEXT NOT NULL,
-                arch TEXT NOT NULL,
-                fingerprint_hash TEXT,
-                agent_version TEXT,
-                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                last_seen_at TIMESTAMPTZ,
-                revoked_at TIMESTAMPTZ
-            )
-        """)
-        
-        # Device tokens table
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS device_tokens (
-                id TEXT PRIMARY KEY,
-                device_id TEXT NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
-                token_hash TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                expires_at TIMESTAMPTZ,
-                revoked_at TIMESTAMPTZ,
-                last_used_at TIMESTAMPTZ
-            )
-        """)
-        
-        # Commands table
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS commands (
-                id TEXT PRIMARY KEY,
-                device_id TEXT NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
-                user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                type TEXT NOT NULL,
-                params_json JSONB NOT NULL DEFAULT '{}'::jsonb,
-                status TEXT NOT NULL DEFAULT 'queued',
-                progress INT NOT NULL DEFAULT 0,
-                message TEXT NOT NULL DEFAULT '',
-                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                started_at TIMESTAMPTZ,
-                finished_at TIMESTAMPTZ,
-                expires_at TIMESTAMPTZ,
-                report_id TEXT,
-                dedupe_key TEXT
-            )
-        """)
-        
-        # Reports table
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS reports (
-                id TEXT PRIMARY KEY,
-                device_id TEXT NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
-                command_id TEXT,
-                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                health_score INT,
-                disk_free_percent REAL,
-                startup_apps_count INT,
-                one_liner TEXT,
-                raw_report_json JSONB
-            )
-        """)
-        
-        # Device settings table
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS device_settings (
-                device_id TEXT PRIMARY KEY REFERENCES devices(id) ON DELETE CASCADE,
-                upload_level INT NOT NULL DEFAULT 0,
-                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-            )
-        """)
-
-        # AI insights table (cached AI copilot summaries)
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS ai_insights (
-                id TEXT PRIMARY KEY,
-                device_id TEXT NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
-                user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                report_id TEXT REFERENCES reports(id) ON DELETE CASCADE,
-                source TEXT NOT NULL,
-                summary TEXT NOT NULL,
-                risk_level TEXT NOT NULL,
-                reasons_json JSONB NOT NULL DEFAULT '[]'::jsonb,
-                actions_json JSONB NOT NULL DEFAULT '[]'::jsonb,
-                prompt_version TEXT NOT NULL DEFAULT 'v1',
-                model_version TEXT NOT NULL DEFAULT 'default',
-                generated_at TIMESTAMPTZ NOT NULL,
-                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                UNIQUE(device_id, report_id)
-            )
-        """)
-
-        # Report share links
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS report_shares (
-                id TEXT PRIMARY KEY,
-                report_id TEXT NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
-                user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                share_token TEXT UNIQUE,
-                share_token_hash TEXT UNIQUE,
-                expires_at TIMESTAMPTZ NOT NULL,
-                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                revoked_at TIMESTAMPTZ
-            )
-        """)
-
-        # Backward-compatible schema upgrades
-        await conn.execute("""
-            ALTER TABLE ai_insights
-            ADD COLUMN IF NOT EXISTS prompt_version TEXT NOT NULL DEFAULT 'v1'
-        """)
-        await conn.execute("""
-            ALTER TABLE ai_insights
-            ADD COLUMN IF NOT EXISTS model_version TEXT NOT NULL DEFAULT 'default'
-        """)
-        await conn.execute("""
-            ALTER TABLE enroll_tokens
-            ADD COLUMN IF NOT EXISTS used_device_id TEXT
-        """)
-        await conn.execute("""
-            ALTER TABLE report_shares
-            ADD COLUMN IF NOT EXISTS share_token_hash TEXT
-        """)
-        await conn.execute("""
-            ALTER TABLE report_shares
-            ALTER COLUMN share_token DROP NOT NULL
-        """)
-
-        # Refresh token table (web session rotation)
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS auth_refresh_tokens (
-                id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                token_hash TEXT UNIQUE NOT NULL,
-                expires_at TIMESTAMPTZ NOT NULL,
-                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                revoked_at TIMESTAMPTZ
-            )
-        """)
-        
-        # Indexes for performance
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_commands_device_status_created
-            ON commands(device_id, status, created_at ASC)
-        """)
-        
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_reports_device_created
-            ON reports(device_id, created_at DESC)
-        """)
-        
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_devices_user_lastseen
-            ON devices(user_id, last_seen_at DESC)
-        """)
-
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_ai_insights_device_generated
-            ON ai_insights(device_id, generated_at DESC)
-        """)
-
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_report_shares_token_expires
-            ON report_shares(share_token, expires_at DESC)
-        """)
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_report_shares_token_hash_expires
-            ON report_shares(share_token_hash, expires_at DESC)
-        """)
-
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_auth_refresh_user_created
-            ON auth_refresh_tokens(user_id, created_at DESC)
-        """)
+    """Bring the schema up to date via the versioned migrations in app/migrations."""
+    async with get_connection(pool=POOL_BACKGROUND) as conn:
+        await migrate(conn)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[1] / "migrations"
+# Files named NNNN_description.sql are applied in version order.
+_FILENAME_RE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+# First-line header for migrations that cannot run inside a transaction
+# (CREATE INDEX CONCURRENTLY). Their statements are executed one at a time.
+NO_TRANSACTION_HEADER = "-- migrate: no-transaction"
+# pg_advisory_lock key shared by every worker, so only one of them migrates.
+MIGRATION_LOCK_ID = 7_246_911_034
+# CREATE INDEX CONCURRENTLY that fails or is interrupted leaves an INVALID index behind;
+# IF NOT EXISTS would then skip it forever, so it is dropped before the build is retried.
+_CONCURRENT_INDEX_RE = re.compile(
+    r"^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.\"]+)",
+    re.IGNORECASE,
+)
+_INDEX_VALID_SQL = """
+    SELECT i.indisvalid
+    FROM pg_index i
+    WHERE i.indexrelid = to_regclass($1)
+"""
+
+SCHEMA_MIGRATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+"""
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sql: str
+    transactional: bool
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+    def statements(self) -> List[str]:
+        # Statements end with ";" at the end of a line; used for no-transaction files,
+        # which should therefore stick to plain DDL without function bodies.
+        parts = re.split(r";[ \t]*(?:\n|$)", self.sql)
+        statements = []
+        for part in parts:
+            lines = [line for line in part.splitlines() if not line.strip().startswith("--")]
+            statement = "\n".join(lines).strip()
+            if statement:
+                statements.append(statement)
+        return statements
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations: Dict[int, Migration] = {}
+    for path in sorted(directory.glob("*.sql")):
+        match = _FILENAME_RE.match(path.name)
+        if not match:
+            raise ValueError(f"Invalid migration filename: {path.name}")
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version: {version}")
+        sql = path.read_text(encoding="utf-8")
+        first_line = sql.lstrip().splitlines()[0].strip().lower() if sql.strip() else ""
+        migrations[version] = Migration(
+            version=version,
+            name=match.group(2),
+            sql=sql,
+            transactional=first_line != NO_TRANSACTION_HEADER,
+        )
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def latest_version(migrations: Optional[List[Migration]] = None) -> int:
+    migrations = load_migrations() if migrations is None else migrations
+    return migrations[-1].version if migrations else 0
+
+
+async def current_version(conn) -> int:
+    """Highest applied migration version; 0 for a database that was never migrated."""
+    try:
+        version = await conn.fetchval("SELECT MAX(version) FROM schema_migrations")
+    except asyncpg.UndefinedTableError:
+        return 0
+    return version or 0
+
+
+async def _apply(conn, migration: Migration) -> None:
+    record_sql = "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)"
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await conn.execute(record_sql, migration.version, migration.name, migration.checksum)
+        return
+    for statement in migration.statements():
+        await _drop_invalid_index(conn, statement)
+        await conn.execute(statement)
+    await conn.execute(record_sql, migration.version, migration.name, migration.checksum)
+
+
+async def _drop_invalid_index(conn, statement: str) -> None:
+    match = _CONCURRENT_INDEX_RE.match(statement)
+    if not match:
+        return
+    name = match.group(1)
+    if await conn.fetchval(_INDEX_VALID_SQL, name) is False:
+        logger.warning("Dropping invalid index %s left by an interrupted build", name)
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+async def apply_migrations(conn, migrations: Optional[List[Migration]] = None) -> List[int]:
+    """Apply pending migrations in order under a cluster-wide advisory lock.
+
+    Returns the versions applied by this call. Workers that lose the race for the lock
+    wait, then find nothing left to do.
+    """
+    migrations = load_migrations() if migrations is None else migrations
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+    try:
+        await conn.execute(SCHEMA_MIGRATIONS_DDL)
+        rows = await conn.fetch("SELECT version, checksum FROM schema_migrations")
+        applied = {row["version"]: row["checksum"] for row in rows}
+        done: List[int] = []
+        for migration in migrations:
+            checksum = applied.get(migration.version)
+            if checksum is not None:
+                if checksum != migration.checksum:
+                    logger.warning(
+                        "Applied migration %04d_%s was edited after it ran",
+                        migration.version,
+                        migration.name,
+                    )
+                continue
+            logger.info("Applying migration %04d_%s", migration.version, migration.name)
+            await _apply(conn, migration)
+            done.append(migration.version)
+        return done
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+
+
+async def migrate(conn) -> List[int]:
+    """Startup entry point: one version query when the schema is already current."""
+    migrations = load_migrations()
+    if await current_version(conn) >= latest_version(migrations):
+        return []
+    return await apply_migrations(conn, migrations)
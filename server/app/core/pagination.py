@@ -0,0 +1,31 @@
+"""Opaque keyset cursors for lists ordered by ``(created_at DESC, id DESC)``.
+
+The cursor carries the last row's sort key, so the next page is an index range scan
+(``(created_at, id) < ($cursor)``) instead of an OFFSET that reads and discards every
+earlier row. ``id`` breaks ties between rows created in the same instant.
+"""
+
+import base64
+import binascii
+from datetime import datetime, timezone
+from typing import Tuple
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = f"{created_at.astimezone(timezone.utc).isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of :func:`encode_cursor`; raises ``ValueError`` for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError("Malformed cursor") from exc
+    created_at_text, separator, row_id = raw.partition("|")
+    if not separator or not row_id:
+        raise ValueError("Malformed cursor")
+    created_at = datetime.fromisoformat(created_at_text)
+    if created_at.tzinfo is None:
+        raise ValueError("Malformed cursor")
+    return created_at, row_id
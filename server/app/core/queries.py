@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import logging
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.request_context import current_trace_id
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the per-query latency histogram buckets; the last bucket is +Inf.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Sample parameters for EXPLAIN of hot queries; scripts/explain_hot_queries.py seeds
+# rows with exactly these identifiers.
+EXPLAIN_USER_ID = "usr_explain_0"
+EXPLAIN_DEVICE_ID = "dev_explain_0"
+EXPLAIN_COMMAND_ID = "cmd_explain_0"
+EXPLAIN_TOKEN_HASH = "0" * 64
+EXPLAIN_EMAIL = "explain-0@example.com"
+EXPLAIN_NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+_REGISTRY: Dict[str, "RegisteredQuery"] = {}
+_STATS: Dict[str, Dict[str, Any]] = {}
+_STATS_LOCK = Lock()
+
+
+def _new_stats() -> Dict[str, Any]:
+    return {
+        "calls": 0,
+        "errors": 0,
+        "rows": 0,
+        "total_seconds": 0.0,
+        "max_seconds": 0.0,
+        "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+    }
+
+
+def _rows_from_status(status: Any) -> int:
+    # asyncpg returns command tags such as "UPDATE 3" or "INSERT 0 1".
+    if isinstance(status, str):
+        tail = status.rsplit(" ", 1)[-1]
+        if tail.isdigit():
+            return int(tail)
+    return 0
+
+
+def _record(query: "RegisteredQuery", elapsed: float, rows: int, failed: bool) -> None:
+    with _STATS_LOCK:
+        stats = _STATS.setdefault(query.name, _new_stats())
+        stats["calls"] += 1
+        stats["rows"] += rows
+        stats["total_seconds"] += elapsed
+        stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+        stats["buckets"][bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        if failed:
+            stats["errors"] += 1
+
+    if elapsed * 1000 >= settings.db_slow_query_ms:
+        logger.warning(
+            "Slow query: name=%s duration_ms=%.1f rows=%d failed=%s trace_id=%s",
+            query.name,
+            elapsed * 1000,
+            rows,
+            failed,
+            current_trace_id(),
+        )
+
+
+class RegisteredQuery:
+    """A named SQL statement with call/row/latency accounting.
+
+    Queries are declared once at import time with ``register_query`` and executed through
+    the helpers below, which forward to the asyncpg connection unchanged.
+    """
+
+    def __init__(self, name: str, sql: str, *, hot: bool = False, explain_args: Sequence[Any] = ()):
+        self.name = name
+        self.sql = sql
+        # Hot queries are plan-checked by scripts/explain_hot_queries.py, which runs
+        # EXPLAIN with ``explain_args`` against its seeded dataset.
+        self.hot = hot
+        self.explain_args = tuple(explain_args)
+
+    def __repr__(self) -> str:
+        return f"RegisteredQuery({self.name!r})"
+
+    async def fetch(self, conn, *args: Any) -> List[Any]:
+        started = time.perf_counter()
+        rows: List[Any] = []
+        failed = True
+        try:
+            rows = await conn.fetch(self.sql, *args)
+            failed = False
+            return rows
+        finally:
+            _record(self, time.perf_counter() - started, len(rows or []), failed)
+
+    async def fetchrow(self, conn, *args: Any) -> Optional[Any]:
+        started = time.perf_counter()
+        row = None
+        failed = True
+        try:
+            row = await conn.fetchrow(self.sql, *args)
+            failed = False
+            return row
+        finally:
+            _record(self, time.perf_counter() - started, 1 if row is not None else 0, failed)
+
+    async def fetchval(self, conn, *args: Any) -> Any:
+        started = time.perf_counter()
+        value = None
+        failed = True
+        try:
+            value = await conn.fetchval(self.sql, *args)
+            failed = False
+            return value
+        finally:
+            _record(self, time.perf_counter() - started, 1 if value is not None else 0, failed)
+
+    async def execute(self, conn, *args: Any) -> Any:
+        started = time.perf_counter()
+        status = None
+        failed = True
+        try:
+            status = await conn.execute(self.sql, *args)
+            failed = False
+            return status
+        finally:
+            _record(self, time.perf_counter() - started, _rows_from_status(status), failed)
+
+    async def executemany(self, conn, args: Iterable[Sequence[Any]]) -> None:
+        batch = list(args)
+        started = time.perf_counter()
+        failed = True
+        try:
+            await conn.executemany(self.sql, batch)
+            failed = False
+        finally:
+            _record(self, time.perf_counter() - started, 0 if failed else len(batch), failed)
+
+
+def register_query(
+    name: str,
+    sql: str,
+    *,
+    hot: bool = False,
+    explain_args: Sequence[Any] = (),
+) -> RegisteredQuery:
+    existing = _REGISTRY.get(name)
+    if existing is not None:
+        if existing.sql != sql:
+            raise ValueError(f"Query name already registered with different SQL: {name}")
+        return existing
+    query = RegisteredQuery(name, sql, hot=hot, explain_args=explain_args)
+    _REGISTRY[name] = query
+    return query
+
+
+def registered_queries() -> List[RegisteredQuery]:
+    return list(_REGISTRY.values())
+
+
+def hot_queries() -> List[RegisteredQuery]:
+    return [query for query in _REGISTRY.values() if query.hot]
+
+
+def get_query_stats_snapshot() -> Dict[str, Dict[str, Any]]:
+    with _STATS_LOCK:
+        return {
+            name: {**stats, "buckets": list(stats["buckets"])}
+            for name, stats in _STATS.items()
+        }
+
+
+def reset_query_stats() -> None:
+    with _STATS_LOCK:
+        _STATS.clear()
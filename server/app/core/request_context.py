@@ -0,0 +1,30 @@
+from contextvars import ContextVar
+from typing import Optional
+
+# Trace id of the request being served; set by trace_middleware in app.main.
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="-")
+
+
+def current_trace_id() -> str:
+    return trace_id_var.get()
+
+
+class RequestDbStats:
+    """Database time and query count accumulated while serving one request."""
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Set by the metrics middleware; the asyncpg query logger adds every query's elapsed time.
+db_stats_var: ContextVar[Optional[RequestDbStats]] = ContextVar("db_stats", default=None)
+
+
+def record_db_query(elapsed: float) -> None:
+    stats = db_stats_var.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
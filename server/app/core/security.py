@@ -1,5 +1,7 @@
 import hashlib
 import secrets
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -67,10 +69,43 @@ def decode_jwt_token(token: str) -> Optional[dict]:
         return None
 
 
+# Lowercase Crockford base32: digits sort before letters, so string order is numeric order.
+_ID_ALPHABET = "0123456789abcdefghjkmnpqrstvwxyz"
+_ID_RANDOM_BITS = 80
+_id_lock = threading.Lock()
+_last_id_ms = 0
+_last_id_random = 0
+
+
+def _encode_id_part(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        chars.append(_ID_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
 def generate_id(prefix: str = "") -> str:
-    """Generate a unique ID."""
-    import uuid
-    uid = str(uuid.uuid4()).replace("-", "")[:16]
+    """Generate a unique, time-ordered ID (ULID layout: 48-bit ms timestamp + 80 random bits).
+
+    New rows land on the right edge of the primary-key B-tree instead of a random leaf,
+    and ``ORDER BY id`` follows creation order. Within one process IDs are strictly
+    increasing; inside the same millisecond the random part is advanced by a random step.
+    """
+    global _last_id_ms, _last_id_random
+    with _id_lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_id_ms:
+            random_part = secrets.randbits(_ID_RANDOM_BITS)
+        else:
+            # Same millisecond, or the clock stepped back: stay monotonic.
+            now_ms = _last_id_ms
+            random_part = _last_id_random + 1 + secrets.randbits(32)
+            if random_part >> _ID_RANDOM_BITS:
+                now_ms += 1
+                random_part = secrets.randbits(_ID_RANDOM_BITS)
+        _last_id_ms, _last_id_random = now_ms, random_part
+    uid = _encode_id_part(now_ms, 10) + _encode_id_part(random_part, 16)
     if prefix:
         return f"{prefix}_{uid}"
     return uid
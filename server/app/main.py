@@ -2,15 +2,37 @@ from contextlib import asynccontextmanager
 import logging
 import uuid
 
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.responses import Response
 
-from app.api.v1.routers import agent, ai, auth, commands, devices, reports, tokens
+from app.api.v1.deps import require_ops_token
+from app.api.v1.routers import agent, ai, auth, commands, devices, fleet, ops, reports, tokens
 from app.core.bootstrap import ensure_mvp_test_login_user
-from app.core.config import settings, validate_security_settings
-from app.core.database import close_pool, get_connection, init_db
+from app.core.config import (
+    is_serverless,
+    migrations_run_on_startup,
+    settings,
+    validate_security_settings,
+)
+from app.core.database import (
+    DatabaseUnavailableError,
+    close_pool,
+    get_connection,
+    init_db,
+    open_pools,
+)
+from app.core.request_context import trace_id_var
+from app.services.command_progress import command_progress
+from app.services.event_bus import close_event_listener
+from app.services.fleet_rollups import fleet_rollups
+from app.services.metrics import MetricsMiddleware, collect_all, render_prometheus, stop_metrics_flusher
+from app.services.presence import presence_tracker
+from app.services.profiling import ProfilingMiddleware, loop_watchdog
+from app.services.redis_client import redis_service
+from app.services.request_rate_limit import RateLimitMiddleware
 
 logger = logging.getLogger(__name__)
 
@@ -19,12 +41,29 @@ logger = logging.getLogger(__name__)
 async def lifespan(_: FastAPI):
     validate_security_settings()
     try:
-        await init_db()
+        if migrations_run_on_startup():
+            await init_db()
         await ensure_mvp_test_login_user()
+        if not is_serverless():
+            # Serverless instances open their single connection lazily on first use.
+            await open_pools()
     except Exception as exc:
         logger.exception("Database initialization failed during startup. Exiting (fail-fast).")
         raise RuntimeError("Database initialization failed") from exc
+    loop_watchdog.start()
+    if not is_serverless():
+        presence_tracker.start()
     yield
+    await loop_watchdog.stop()
+    await presence_tracker.stop()
+    await command_progress.stop()
+    await fleet_rollups.stop()
+    await stop_metrics_flusher()
+    await redis_service.close()
+    try:
+        await close_event_listener()
+    except Exception:
+        logger.exception("Error while closing event bus listener")
     try:
         await close_pool()
     except Exception:
@@ -39,6 +78,11 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Added first so it runs innermost, in the same task as the endpoint.
+app.add_middleware(ProfilingMiddleware)
+# Inside CORS (429s keep their CORS headers) and metrics, before any routing or auth.
+app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -48,6 +92,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 trusted_hosts = [host.strip() for host in settings.trusted_hosts if host.strip()]
 if settings.environment.lower() in {"production", "staging"} and trusted_hosts:
     app.add_middleware(TrustedHostMiddleware, allowed_hosts=trusted_hosts)
@@ -58,15 +104,36 @@ app.include_router(tokens.router, prefix="/v1/tokens", tags=["tokens"])
 app.include_router(devices.router, prefix="/v1/devices", tags=["devices"])
 app.include_router(commands.router, prefix="/v1", tags=["commands"])
 app.include_router(reports.router, prefix="/v1/reports", tags=["reports"])
+app.include_router(fleet.router, prefix="/v1/fleet", tags=["fleet"])
 app.include_router(agent.router, prefix="/v1/agent", tags=["agent"])
 app.include_router(ai.router, prefix="/v1/ai", tags=["ai"])
+app.include_router(ops.router, prefix="/v1/ops", tags=["ops"], include_in_schema=False)
+
+
+@app.exception_handler(DatabaseUnavailableError)
+async def database_unavailable_handler(request: Request, exc: DatabaseUnavailableError):
+    logger.warning(
+        "Database pool exhausted: pool=%s path=%s trace_id=%s",
+        exc.pool_name,
+        request.url.path,
+        getattr(request.state, "trace_id", "-"),
+    )
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service temporarily unavailable"},
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.middleware("http")
 async def trace_middleware(request: Request, call_next):
     trace_id = request.headers.get("X-Trace-Id") or uuid.uuid4().hex
     request.state.trace_id = trace_id
-    response: Response = await call_next(request)
+    token = trace_id_var.set(trace_id)
+    try:
+        response: Response = await call_next(request)
+    finally:
+        trace_id_var.reset(token)
     response.headers["X-Trace-Id"] = trace_id
     return response
 
@@ -80,6 +147,17 @@ async def root():
     }
 
 
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_ops_token)])
+async def metrics():
+    """Prometheus scrape endpoint; aggregates all workers when METRICS_MULTIPROC_DIR is set."""
+    if not settings.enable_metrics:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return Response(
+        content=render_prometheus(collect_all()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 @app.get("/health")
 async def health():
     env = settings.environment.lower()
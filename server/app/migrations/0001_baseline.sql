@@ -0,0 +1,163 @@
+-- Baseline schema (previously created by init_db on every startup).
+-- Statements are idempotent so databases created before migrations adopt it as-is.
+
+-- Users table
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Enroll tokens table
+CREATE TABLE IF NOT EXISTS enroll_tokens (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    token_hash TEXT UNIQUE NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    used_at TIMESTAMPTZ,
+    used_device_id TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Devices table
+CREATE TABLE IF NOT EXISTS devices (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    arch TEXT NOT NULL,
+    fingerprint_hash TEXT,
+    agent_version TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_seen_at TIMESTAMPTZ,
+    revoked_at TIMESTAMPTZ
+);
+
+-- Device tokens table
+CREATE TABLE IF NOT EXISTS device_tokens (
+    id TEXT PRIMARY KEY,
+    device_id TEXT NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+    token_hash TEXT UNIQUE NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMPTZ,
+    revoked_at TIMESTAMPTZ,
+    last_used_at TIMESTAMPTZ
+);
+
+-- Commands table
+CREATE TABLE IF NOT EXISTS commands (
+    id TEXT PRIMARY KEY,
+    device_id TEXT NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    type TEXT NOT NULL,
+    params_json JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status TEXT NOT NULL DEFAULT 'queued',
+    progress INT NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    expires_at TIMESTAMPTZ,
+    report_id TEXT,
+    dedupe_key TEXT
+);
+
+-- Reports table
+CREATE TABLE IF NOT EXISTS reports (
+    id TEXT PRIMARY KEY,
+    device_id TEXT NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+    command_id TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    health_score INT,
+    disk_free_percent REAL,
+    startup_apps_count INT,
+    one_liner TEXT,
+    raw_report_json JSONB
+);
+
+-- Device settings table
+CREATE TABLE IF NOT EXISTS device_settings (
+    device_id TEXT PRIMARY KEY REFERENCES devices(id) ON DELETE CASCADE,
+    upload_level INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- AI insights table (cached AI copilot summaries)
+CREATE TABLE IF NOT EXISTS ai_insights (
+    id TEXT PRIMARY KEY,
+    device_id TEXT NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    report_id TEXT REFERENCES reports(id) ON DELETE CASCADE,
+    source TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    risk_level TEXT NOT NULL,
+    reasons_json JSONB NOT NULL DEFAULT '[]'::jsonb,
+    actions_json JSONB NOT NULL DEFAULT '[]'::jsonb,
+    prompt_version TEXT NOT NULL DEFAULT 'v1',
+    model_version TEXT NOT NULL DEFAULT 'default',
+    generated_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    UNIQUE(device_id, report_id)
+);
+
+-- Report share links
+CREATE TABLE IF NOT EXISTS report_shares (
+    id TEXT PRIMARY KEY,
+    report_id TEXT NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    share_token TEXT UNIQUE,
+    share_token_hash TEXT UNIQUE,
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    revoked_at TIMESTAMPTZ
+);
+
+-- Backward-compatible schema upgrades
+ALTER TABLE ai_insights
+ADD COLUMN IF NOT EXISTS prompt_version TEXT NOT NULL DEFAULT 'v1';
+
+ALTER TABLE ai_insights
+ADD COLUMN IF NOT EXISTS model_version TEXT NOT NULL DEFAULT 'default';
+
+ALTER TABLE enroll_tokens
+ADD COLUMN IF NOT EXISTS used_device_id TEXT;
+
+ALTER TABLE report_shares
+ADD COLUMN IF NOT EXISTS share_token_hash TEXT;
+
+ALTER TABLE report_shares
+ALTER COLUMN share_token DROP NOT NULL;
+
+-- Refresh token table (web session rotation)
+CREATE TABLE IF NOT EXISTS auth_refresh_tokens (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    token_hash TEXT UNIQUE NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    revoked_at TIMESTAMPTZ
+);
+
+-- Indexes for performance
+CREATE INDEX IF NOT EXISTS idx_commands_device_status_created
+ON commands(device_id, status, created_at ASC);
+
+CREATE INDEX IF NOT EXISTS idx_reports_device_created
+ON reports(device_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_devices_user_lastseen
+ON devices(user_id, last_seen_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_ai_insights_device_generated
+ON ai_insights(device_id, generated_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_report_shares_token_expires
+ON report_shares(share_token, expires_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_report_shares_token_hash_expires
+ON report_shares(share_token_hash, expires_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_auth_refresh_user_created
+ON auth_refresh_tokens(user_id, created_at DESC);
@@ -0,0 +1,24 @@
+-- migrate: no-transaction
+-- Indexes for hot lookups found by scripts/explain_hot_queries.py.
+-- Built CONCURRENTLY so deploys do not block writes on large tables.
+
+-- Login/register look users up by lower(email); the UNIQUE index on raw email cannot serve it.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_email_lower
+ON users (lower(email));
+
+-- Device detail / command listing: newest commands for a device regardless of status.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_commands_device_created
+ON commands (device_id, created_at DESC);
+
+-- Action ranking aggregates success rate per command type over the last 30 days.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_commands_device_type_created
+ON commands (device_id, type, created_at DESC) INCLUDE (status);
+
+-- PING latency trend: only succeeded PINGs are read, newest first.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_commands_ping_finished
+ON commands (device_id, finished_at DESC) INCLUDE (started_at)
+WHERE type = 'PING' AND status = 'succeeded';
+
+-- AI version usage per user over the last 30 days, answered from the index alone.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ai_insights_user_generated
+ON ai_insights (user_id, generated_at DESC) INCLUDE (prompt_version, model_version);
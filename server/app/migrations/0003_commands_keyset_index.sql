@@ -0,0 +1,8 @@
+-- migrate: no-transaction
+-- Keyset pagination of a device's commands: (created_at, id) with id as the tie-breaker,
+-- so GET /v1/devices/{id}/commands?cursor=... is a single index range scan.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_commands_device_created_id
+ON commands (device_id, created_at DESC, id DESC);
+
+-- Superseded by the index above (same leading columns).
+DROP INDEX CONCURRENTLY IF EXISTS idx_commands_device_created;
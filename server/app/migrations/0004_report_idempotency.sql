@@ -0,0 +1,8 @@
+-- migrate: no-transaction
+-- Agent report uploads are deduplicated per device by Idempotency-Key (or a content hash
+-- for agents that do not send one), so an outbox retry never stores a second copy.
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_reports_device_idempotency_key
+ON reports (device_id, idempotency_key)
+WHERE idempotency_key IS NOT NULL;
@@ -0,0 +1,3 @@
+-- Raw report bodies move to the blob store; rows keep summary columns and a content ref.
+-- Existing inline bodies are moved in batches by scripts/migrate_report_blobs.py.
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS raw_report_ref TEXT;
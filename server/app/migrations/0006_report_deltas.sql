@@ -0,0 +1,4 @@
+-- Delta-encoded report bodies: a row with raw_report_base_id stores a JSON patch against
+-- that report's body instead of a full body; depth counts patches since the last snapshot.
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS raw_report_base_id TEXT;
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS raw_report_delta_depth SMALLINT NOT NULL DEFAULT 0;
@@ -0,0 +1,13 @@
+-- Narrow time series of every numeric report field, written on report upload.
+-- Trend signals and /devices/{id}/metrics read one (device, metric) index range
+-- instead of wide report rows.
+CREATE TABLE IF NOT EXISTS device_metrics (
+    device_id TEXT NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    ts TIMESTAMPTZ NOT NULL,
+    value DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (device_id, metric, ts)
+);
+
+-- History is filled by scripts/backfill_device_metrics.py in batches, not here: one
+-- INSERT over every report would hold the migration lock for the whole table scan.
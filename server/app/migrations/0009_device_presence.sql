@@ -0,0 +1,9 @@
+-- migrate: no-transaction
+-- Offline transitions are claimed by setting offline_announced_at = last_seen_at, so the
+-- in-memory deadline of one worker and the database sweep never announce twice.
+ALTER TABLE devices ADD COLUMN IF NOT EXISTS offline_announced_at TIMESTAMPTZ;
+
+-- Presence sweep: active devices whose last heartbeat falls in a recent time range.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_devices_last_seen_active
+ON devices (last_seen_at)
+WHERE revoked_at IS NULL;
@@ -119,6 +119,7 @@ class CommandResponse(BaseModel):
 class CommandListResponse(BaseModel):
     commands: List[CommandResponse]
     total: int
+    next_cursor: Optional[str] = None
 
 
 # ========== Report Models ==========
@@ -179,6 +180,16 @@ class AiVersionInfoResponse(BaseModel):
     usages: List[AiVersionUsageItem] = Field(default_factory=list)
 
 
+class AiPregenerateResponse(BaseModel):
+    provider: str
+    total_devices: int
+    generated: int
+    skipped: int
+    failed: int = 0
+    remaining: int = 0
+    llm_calls: int
+
+
 class AiQueryRequest(BaseModel):
     query: str = Field(min_length=3, max_length=200)
     limit: int = Field(default=5, ge=1, le=20)
@@ -214,6 +225,53 @@ class DeviceTrendResponse(BaseModel):
     summary: str
 
 
+class DeviceMetricPoint(BaseModel):
+    ts: datetime
+    min: float
+    max: float
+    avg: float
+    count: int
+
+
+class DeviceMetricSeries(BaseModel):
+    metric: str
+    points: List[DeviceMetricPoint] = Field(default_factory=list)
+
+
+class DeviceMetricsResponse(BaseModel):
+    device_id: str
+    start: datetime
+    end: datetime
+    bucket_seconds: float
+    series: List[DeviceMetricSeries] = Field(default_factory=list)
+
+
+class FleetDiskFreeBucket(BaseModel):
+    min_percent: int
+    max_percent: int
+    devices: int
+
+
+class FleetCommandStats(BaseModel):
+    type: str
+    succeeded: int
+    failed: int
+    success_rate: Optional[float] = None
+
+
+class FleetOverviewResponse(BaseModel):
+    days: int
+    since: datetime
+    devices_reporting: int
+    avg_health_score: Optional[float] = None
+    high_risk_devices: int
+    disk_free_distribution: List[FleetDiskFreeBucket] = Field(default_factory=list)
+    reports: int
+    report_avg_health_score: Optional[float] = None
+    report_avg_disk_free_percent: Optional[float] = None
+    commands: List[FleetCommandStats] = Field(default_factory=list)
+
+
 class ReportExportResponse(BaseModel):
     report_id: str
     format: str
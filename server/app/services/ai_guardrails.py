@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from threading import Lock
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 from app.services.request_rate_limit import allow_rate_limit_key
+from app.services.shared_counters import SharedCountersFull, get_shared_counters
 
 
 def _new_metrics() -> Dict[str, int]:
@@ -25,6 +26,29 @@ async def check_rate_limit(key: str, limit: int, window_seconds: int = 60) -> bo
     return await allow_rate_limit_key(scope_key=f"ai:{key}", limit=limit, window_seconds=window_seconds)
 
 
+def _increments(*, success: bool, rate_limited: bool, fallback_used: bool) -> List[str]:
+    fields = ["requests_total", "requests_success" if success else "requests_failed"]
+    if rate_limited:
+        fields.append("requests_rate_limited")
+    if fallback_used:
+        fields.append("fallback_total")
+    return fields
+
+
+def _shared_key(scope_key: Optional[str], field: str) -> str:
+    return f"ai:{scope_key}:{field}" if scope_key else f"ai:{field}"
+
+
+def _local_bucket(scope: Optional[str]) -> Dict[str, int]:
+    if scope is None:
+        return _METRICS
+    bucket = _METRICS_BY_SCOPE.get(scope)
+    if bucket is None:
+        bucket = _new_metrics()
+        _METRICS_BY_SCOPE[scope] = bucket
+    return bucket
+
+
 def record_ai_call(
     *,
     success: bool,
@@ -32,32 +56,45 @@ def record_ai_call(
     fallback_used: bool = False,
     scope_key: Optional[str] = None,
 ) -> None:
-    def _apply(bucket: Dict[str, int]) -> None:
-        bucket["requests_total"] += 1
-        if success:
-            bucket["requests_success"] += 1
-        else:
-            bucket["requests_failed"] += 1
-        if rate_limited:
-            bucket["requests_rate_limited"] += 1
-        if fallback_used:
-            bucket["fallback_total"] += 1
+    fields = _increments(success=success, rate_limited=rate_limited, fallback_used=fallback_used)
+    scopes = [None, scope_key] if scope_key else [None]
+
+    # Each increment that cannot reach the shared counters (segment full or
+    # unavailable) is kept in this worker instead, so nothing is counted twice.
+    counters = get_shared_counters()
+    overflow: List[Tuple[Optional[str], str]] = []
+    for scope in scopes:
+        for field in fields:
+            if counters is not None:
+                try:
+                    counters.add(_shared_key(scope, field))
+                    continue
+                except (OSError, SharedCountersFull):
+                    pass
+            overflow.append((scope, field))
+    if not overflow:
+        return
 
     with _METRICS_LOCK:
-        _apply(_METRICS)
-        if scope_key:
-            scoped = _METRICS_BY_SCOPE.get(scope_key)
-            if scoped is None:
-                scoped = _new_metrics()
-                _METRICS_BY_SCOPE[scope_key] = scoped
-            _apply(scoped)
+        for scope, field in overflow:
+            _local_bucket(scope)[field] += 1
 
 
 def get_ai_metrics_snapshot(scope_key: Optional[str] = None) -> Dict[str, int]:
+    """Counts for the node when shared counters are enabled, else for this worker.
+
+    Increments that overflowed the shared counters are added from this worker's
+    local counts.
+    """
     with _METRICS_LOCK:
-        if not scope_key:
-            return dict(_METRICS)
-        return dict(_METRICS_BY_SCOPE.get(scope_key, _new_metrics()))
+        local = dict(_METRICS) if not scope_key else dict(_METRICS_BY_SCOPE.get(scope_key, _new_metrics()))
+    counters = get_shared_counters()
+    if counters is not None:
+        try:
+            return {field: counters.get(_shared_key(scope_key, field)) + local[field] for field in local}
+        except OSError:
+            pass
+    return local
 
 
 def classify_ai_error(exc: Exception) -> str:
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from typing import Any, Tuple
+
+from app.core.security import generate_id
+from app.models import DeviceAiSummaryResponse
+
+AI_INSIGHT_UPSERT_SQL = """
+    INSERT INTO ai_insights (
+        id, device_id, user_id, report_id,
+        source, summary, risk_level, reasons_json, actions_json, prompt_version, model_version, generated_at
+    )
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8::jsonb, $9::jsonb, $10, $11, $12)
+    ON CONFLICT (device_id, report_id)
+    DO UPDATE SET
+        source = EXCLUDED.source,
+        summary = EXCLUDED.summary,
+        risk_level = EXCLUDED.risk_level,
+        reasons_json = EXCLUDED.reasons_json,
+        actions_json = EXCLUDED.actions_json,
+        prompt_version = EXCLUDED.prompt_version,
+        model_version = EXCLUDED.model_version,
+        generated_at = EXCLUDED.generated_at
+"""
+
+
+def build_ai_insight_row(
+    *,
+    device_id: str,
+    user_id: str,
+    report_id: str,
+    summary: DeviceAiSummaryResponse,
+    prompt_version: str,
+    model_version: str,
+) -> Tuple[Any, ...]:
+    """Positional arguments for AI_INSIGHT_UPSERT_SQL (execute or executemany)."""
+    return (
+        generate_id("ais"),
+        device_id,
+        user_id,
+        report_id,
+        summary.source,
+        summary.summary,
+        summary.risk_level,
+        list(summary.reasons),
+        [action.model_dump() for action in summary.recommended_actions],
+        prompt_version,
+        model_version,
+        summary.generated_at,
+    )
@@ -3,9 +3,7 @@ from __future__ import annotations
 import json
 import logging
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
-
-import httpx
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from app.core.config import settings
 from app.models import DeviceAiRecommendedAction, DeviceAiSummaryResponse
@@ -26,6 +24,17 @@ SYSTEM_PROMPT = (
     "Allowed command_type: RUN_FULL, RUN_STORAGE_ONLY, PING."
 )
 
+BATCH_SYSTEM_PROMPT = (
+    "You are an IT operations copilot. "
+    "The input contains a devices array; summarize every device independently. "
+    "Return strict JSON only with a single key results, an array with one object per input device. "
+    "Each object must have keys: device_id, summary, risk_level, reasons, recommended_actions. "
+    "device_id must be copied from the input. "
+    "risk_level must be one of: low, medium, high, unknown. "
+    "recommended_actions must contain command_type, label, reason. "
+    "Allowed command_type: RUN_FULL, RUN_STORAGE_ONLY, PING."
+)
+
 
 def _sanitize_report(latest_report: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     if not latest_report:
@@ -64,6 +73,60 @@ def _build_user_prompt(
     return text[: settings.ai_max_prompt_chars]
 
 
+def _build_batch_user_prompt(items: List[Dict[str, Any]]) -> str:
+    devices = []
+    for item in items:
+        rule_based: DeviceAiSummaryResponse = item["rule_based"]
+        devices.append(
+            {
+                "device_id": item["device_id"],
+                "device_online": item["is_online"],
+                "latest_report": _sanitize_report(item.get("latest_report")),
+                "rule_based_baseline": {
+                    "summary": rule_based.summary,
+                    "risk_level": rule_based.risk_level,
+                    "reasons": rule_based.reasons,
+                    "recommended_actions": [action.model_dump() for action in rule_based.recommended_actions],
+                },
+            }
+        )
+    payload = {
+        "devices": devices,
+        "constraints": {
+            "no_sensitive_data": True,
+            "max_reasons": 4,
+            "max_actions": 3,
+        },
+    }
+    # Never truncated: a cut-off JSON document is useless to the model. Oversized batches
+    # are split by _split_batch_for_prompt instead.
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def _split_batch_for_prompt(items: List[Dict[str, Any]]) -> Tuple[List[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Pack items into chunks whose batch prompt fits settings.ai_max_prompt_chars.
+
+    Returns (chunks, oversized); an item too large to fit even alone is not sent.
+    """
+    chunks: List[List[Dict[str, Any]]] = []
+    oversized: List[Dict[str, Any]] = []
+    current: List[Dict[str, Any]] = []
+    for item in items:
+        if len(_build_batch_user_prompt(current + [item])) <= settings.ai_max_prompt_chars:
+            current.append(item)
+            continue
+        if current:
+            chunks.append(current)
+        if len(_build_batch_user_prompt([item])) <= settings.ai_max_prompt_chars:
+            current = [item]
+        else:
+            current = []
+            oversized.append(item)
+    if current:
+        chunks.append(current)
+    return chunks, oversized
+
+
 def _normalize_actions(actions: List[Dict[str, Any]]) -> List[DeviceAiRecommendedAction]:
     allowed = {"RUN_FULL", "RUN_STORAGE_ONLY", "PING"}
     normalized: List[DeviceAiRecommendedAction] = []
@@ -81,6 +144,28 @@ def _normalize_actions(actions: List[Dict[str, Any]]) -> List[DeviceAiRecommende
     return normalized
 
 
+def _build_llm_summary(raw: Dict[str, Any], rule_based: DeviceAiSummaryResponse) -> DeviceAiSummaryResponse:
+    risk_level = str(raw.get("risk_level", "unknown")).lower()
+    if risk_level not in {"low", "medium", "high", "unknown"}:
+        risk_level = "unknown"
+
+    reasons = [str(item) for item in raw.get("reasons", [])][:4]
+    actions = _normalize_actions(list(raw.get("recommended_actions", [])))
+    if not actions:
+        actions = rule_based.recommended_actions[:2]
+
+    return DeviceAiSummaryResponse(
+        enabled=True,
+        source="llm",
+        summary=str(raw.get("summary", rule_based.summary))[:500],
+        risk_level=risk_level,
+        reasons=reasons or rule_based.reasons[:3],
+        recommended_actions=actions,
+        based_on_report_id=rule_based.based_on_report_id,
+        generated_at=datetime.now(timezone.utc),
+    )
+
+
 def apply_audience_view(
     summary: DeviceAiSummaryResponse,
     *,
@@ -218,14 +303,22 @@ def _extract_content(data: Dict[str, Any]) -> str:
     raise ValueError("invalid model response: content missing")
 
 
-async def _call_provider_chat(provider: str, messages: List[Dict[str, str]], trace_id: str) -> Dict[str, Any]:
+def _build_chat_request(
+    provider: str,
+    messages: List[Dict[str, str]],
+    trace_id: str,
+    *,
+    stream: bool = False,
+) -> Tuple[str, Dict[str, str], Dict[str, Any], float]:
     model, endpoint, api_key = _provider_runtime(provider)
     temperature = settings.glm_temperature if provider == "glm45" else 0.2
-    payload = {
+    payload: Dict[str, Any] = {
         "model": model,
         "messages": messages,
         "temperature": temperature,
     }
+    if stream:
+        payload["stream"] = True
     if provider == "openai":
         payload["response_format"] = {"type": "json_object"}
     elif provider == "glm45":
@@ -239,7 +332,13 @@ async def _call_provider_chat(provider: str, messages: List[Dict[str, str]], tra
         "X-Trace-Id": trace_id,
     }
     timeout_seconds = settings.glm_timeout_seconds if provider == "glm45" else settings.ai_timeout_seconds
-    timeout = httpx.Timeout(timeout_seconds)
+    return endpoint, headers, payload, float(timeout_seconds)
+
+
+async def _call_provider_chat(provider: str, messages: List[Dict[str, str]], trace_id: str) -> Dict[str, Any]:
+    import httpx  # deferred: only AI calls need the HTTP client stack
+
+    endpoint, headers, payload, timeout = _build_chat_request(provider, messages, trace_id)
     retries = max(0, settings.ai_max_retries)
 
     last_error: Optional[Exception] = None
@@ -259,22 +358,69 @@ async def _call_provider_chat(provider: str, messages: List[Dict[str, str]], tra
     raise last_error
 
 
-async def generate_device_ai_summary(
-    *,
-    is_online: bool,
-    latest_report: Optional[Dict[str, Any]],
-    rule_based: DeviceAiSummaryResponse,
-    rate_limit_key: str,
+def _extract_stream_delta(data: Dict[str, Any]) -> str:
+    choices = data.get("choices")
+    if not isinstance(choices, list) or not choices:
+        return ""
+    delta = choices[0].get("delta") or {}
+    content = delta.get("content")
+    return content if isinstance(content, str) else ""
+
+
+async def _stream_provider_chat(
+    provider: str,
+    messages: List[Dict[str, str]],
     trace_id: str,
-    audience: str = "operator",
-    provider: Optional[str] = None,
-    metrics_key: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Yield content fragments from the provider's streaming (SSE) chat completion.
+
+    Streams are not retried: once fragments have been forwarded to the client a retry
+    would duplicate output, so failures surface to the caller which falls back instead.
+    """
+    import httpx
+
+    endpoint, headers, payload, timeout = _build_chat_request(provider, messages, trace_id, stream=True)
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        async with client.stream("POST", endpoint, headers=headers, json=payload) as response:
+            if response.status_code >= 400:
+                body = await response.aread()
+                raise RuntimeError(f"{provider} http {response.status_code}: {body[:200]!r}")
+            async for line in response.aiter_lines():
+                line = line.strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    fragment = _extract_stream_delta(json.loads(data))
+                except json.JSONDecodeError:
+                    continue
+                if fragment:
+                    yield fragment
+
+
+def _rule_based_fallback(
+    rule_based: DeviceAiSummaryResponse,
+    *,
+    source: str,
+    summary: str,
 ) -> DeviceAiSummaryResponse:
-    if not settings.enable_ai_copilot:
-        return apply_audience_view(rule_based, audience=audience, is_online=is_online)
+    fallback = rule_based.model_copy()
+    fallback.source = source
+    fallback.summary = summary
+    fallback.generated_at = datetime.now(timezone.utc)
+    return fallback
 
-    provider_name = resolve_ai_provider(provider)
 
+async def _check_guardrails(
+    provider_name: str,
+    *,
+    rule_based: DeviceAiSummaryResponse,
+    rate_limit_key: str,
+    metrics_key: Optional[str],
+) -> Optional[DeviceAiSummaryResponse]:
+    """Return a fallback summary when the provider must not be called, otherwise None."""
     # Guardrail: in-process rate limit
     if not await check_rate_limit(rate_limit_key, settings.ai_rate_limit_per_minute):
         record_ai_call(
@@ -283,24 +429,33 @@ async def generate_device_ai_summary(
             fallback_used=True,
             scope_key=metrics_key,
         )
-        fallback = rule_based.model_copy()
-        fallback.source = "rate_limited"
-        fallback.summary = "AI 요청 한도를 초과했습니다. 기본 권장 액션을 사용하세요."
-        fallback.generated_at = datetime.now(timezone.utc)
-        return apply_audience_view(fallback, audience=audience, is_online=is_online)
+        return _rule_based_fallback(
+            rule_based,
+            source="rate_limited",
+            summary="AI 요청 한도를 초과했습니다. 기본 권장 액션을 사용하세요.",
+        )
 
     # Guardrail: key missing -> deterministic fallback
     _, _, api_key = _provider_runtime(provider_name)
     if not api_key:
         record_ai_call(success=False, fallback_used=True, scope_key=metrics_key)
-        fallback = rule_based.model_copy()
-        fallback.source = "rule_based"
-        fallback.summary = f"{provider_name.upper()} API 키가 없어 기본 규칙 기반 요약을 사용합니다."
-        fallback.generated_at = datetime.now(timezone.utc)
-        return apply_audience_view(fallback, audience=audience, is_online=is_online)
+        return _rule_based_fallback(
+            rule_based,
+            source="rule_based",
+            summary=f"{provider_name.upper()} API 키가 없어 기본 규칙 기반 요약을 사용합니다.",
+        )
+    return None
 
+
+def _build_summary_messages(
+    *,
+    is_online: bool,
+    latest_report: Optional[Dict[str, Any]],
+    rule_based: DeviceAiSummaryResponse,
+    audience: str,
+) -> List[Dict[str, str]]:
     style_hint = "운영자 관점으로 간결히" if audience == "operator" else "관리자 관점으로 영향/우선순위를 강조"
-    messages = [
+    return [
         {"role": "system", "content": SYSTEM_PROMPT},
         {
             "role": "user",
@@ -309,35 +464,226 @@ async def generate_device_ai_summary(
         },
     ]
 
-    try:
-        raw = await _call_provider_chat(provider_name, messages, trace_id)
-        risk_level = str(raw.get("risk_level", "unknown")).lower()
-        if risk_level not in {"low", "medium", "high", "unknown"}:
-            risk_level = "unknown"
 
-        reasons = [str(item) for item in raw.get("reasons", [])][:4]
-        actions = _normalize_actions(list(raw.get("recommended_actions", [])))
-        if not actions:
-            actions = rule_based.recommended_actions[:2]
+async def generate_device_ai_summary(
+    *,
+    is_online: bool,
+    latest_report: Optional[Dict[str, Any]],
+    rule_based: DeviceAiSummaryResponse,
+    rate_limit_key: str,
+    trace_id: str,
+    audience: str = "operator",
+    provider: Optional[str] = None,
+    metrics_key: Optional[str] = None,
+) -> DeviceAiSummaryResponse:
+    if not settings.enable_ai_copilot:
+        return apply_audience_view(rule_based, audience=audience, is_online=is_online)
+
+    provider_name = resolve_ai_provider(provider)
+    fallback = await _check_guardrails(
+        provider_name,
+        rule_based=rule_based,
+        rate_limit_key=rate_limit_key,
+        metrics_key=metrics_key,
+    )
+    if fallback is not None:
+        return apply_audience_view(fallback, audience=audience, is_online=is_online)
 
+    messages = _build_summary_messages(
+        is_online=is_online,
+        latest_report=latest_report,
+        rule_based=rule_based,
+        audience=audience,
+    )
+
+    try:
+        raw = await _call_provider_chat(provider_name, messages, trace_id)
+        response = _build_llm_summary(raw, rule_based)
         record_ai_call(success=True, scope_key=metrics_key)
-        response = DeviceAiSummaryResponse(
-            enabled=True,
-            source="llm",
-            summary=str(raw.get("summary", rule_based.summary))[:500],
-            risk_level=risk_level,
-            reasons=reasons or rule_based.reasons[:3],
-            recommended_actions=actions,
-            based_on_report_id=rule_based.based_on_report_id,
-            generated_at=datetime.now(timezone.utc),
-        )
         return apply_audience_view(response, audience=audience, is_online=is_online)
     except Exception as exc:
         error_type = classify_ai_error(exc)
         logger.warning("AI adapter fallback: trace_id=%s error_type=%s", trace_id, error_type)
         record_ai_call(success=False, fallback_used=True, scope_key=metrics_key)
-        fallback = rule_based.model_copy()
-        fallback.source = "fallback"
-        fallback.summary = "AI 생성이 실패하여 기본 규칙 기반 요약으로 대체되었습니다."
-        fallback.generated_at = datetime.now(timezone.utc)
+        fallback = _rule_based_fallback(
+            rule_based,
+            source="fallback",
+            summary="AI 생성이 실패하여 기본 규칙 기반 요약으로 대체되었습니다.",
+        )
         return apply_audience_view(fallback, audience=audience, is_online=is_online)
+
+
+async def stream_device_ai_summary(
+    *,
+    is_online: bool,
+    latest_report: Optional[Dict[str, Any]],
+    rule_based: DeviceAiSummaryResponse,
+    rate_limit_key: str,
+    trace_id: str,
+    audience: str = "operator",
+    provider: Optional[str] = None,
+    metrics_key: Optional[str] = None,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Streaming counterpart of generate_device_ai_summary.
+
+    Yields ``("delta", text)`` for each provider fragment and ends with exactly one
+    ``("result", DeviceAiSummaryResponse)`` validated the same way as the non-streaming path.
+    """
+    if not settings.enable_ai_copilot:
+        yield "result", apply_audience_view(rule_based, audience=audience, is_online=is_online)
+        return
+
+    provider_name = resolve_ai_provider(provider)
+    fallback = await _check_guardrails(
+        provider_name,
+        rule_based=rule_based,
+        rate_limit_key=rate_limit_key,
+        metrics_key=metrics_key,
+    )
+    if fallback is not None:
+        yield "result", apply_audience_view(fallback, audience=audience, is_online=is_online)
+        return
+
+    messages = _build_summary_messages(
+        is_online=is_online,
+        latest_report=latest_report,
+        rule_based=rule_based,
+        audience=audience,
+    )
+
+    fragments: List[str] = []
+    try:
+        async for fragment in _stream_provider_chat(provider_name, messages, trace_id):
+            fragments.append(fragment)
+            yield "delta", fragment
+        raw = _parse_model_json("".join(fragments))
+        response = _build_llm_summary(raw, rule_based)
+        record_ai_call(success=True, scope_key=metrics_key)
+    except Exception as exc:
+        error_type = classify_ai_error(exc)
+        logger.warning("AI stream fallback: trace_id=%s error_type=%s", trace_id, error_type)
+        record_ai_call(success=False, fallback_used=True, scope_key=metrics_key)
+        response = _rule_based_fallback(
+            rule_based,
+            source="fallback",
+            summary="AI 생성이 실패하여 기본 규칙 기반 요약으로 대체되었습니다.",
+        )
+    yield "result", apply_audience_view(response, audience=audience, is_online=is_online)
+
+
+def _split_batch_results(raw: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    results = raw.get("results")
+    if not isinstance(results, list):
+        raise ValueError("invalid batch response: results missing")
+    by_device: Dict[str, Dict[str, Any]] = {}
+    for entry in results:
+        if not isinstance(entry, dict):
+            continue
+        device_id = str(entry.get("device_id", "")).strip()
+        if device_id and device_id not in by_device:
+            by_device[device_id] = entry
+    return by_device
+
+
+async def generate_device_ai_summaries_batch(
+    *,
+    items: List[Dict[str, Any]],
+    rate_limit_key: str,
+    trace_id: str,
+    provider: Optional[str] = None,
+    metrics_key: Optional[str] = None,
+) -> Tuple[Dict[str, DeviceAiSummaryResponse], int]:
+    """Summarize several devices with as few provider calls as the prompt limit allows.
+
+    Each item carries ``device_id``, ``is_online``, ``latest_report`` and ``rule_based``.
+    Items are split into chunks whose prompt fits ``ai_max_prompt_chars``, one call per
+    chunk. Items the model omits or answers with malformed output fall back to their
+    rule-based summary individually; the rest of the chunk is kept. Results use the
+    operator view. Returns (summaries by device_id, number of provider calls made).
+    """
+    if not items:
+        return {}, 0
+
+    def _view(item: Dict[str, Any], summary: DeviceAiSummaryResponse) -> DeviceAiSummaryResponse:
+        return apply_audience_view(summary, audience="operator", is_online=item["is_online"])
+
+    if not settings.enable_ai_copilot:
+        return {item["device_id"]: _view(item, item["rule_based"]) for item in items}, 0
+
+    provider_name = resolve_ai_provider(provider)
+    results: Dict[str, DeviceAiSummaryResponse] = {}
+
+    def _fallback_all(chunk: List[Dict[str, Any]], *, source: str, summary: str, rate_limited: bool = False) -> None:
+        for item in chunk:
+            record_ai_call(success=False, rate_limited=rate_limited, fallback_used=True, scope_key=metrics_key)
+            results[item["device_id"]] = _view(
+                item, _rule_based_fallback(item["rule_based"], source=source, summary=summary),
+            )
+
+    _, _, api_key = _provider_runtime(provider_name)
+    if not api_key:
+        _fallback_all(
+            items,
+            source="rule_based",
+            summary=f"{provider_name.upper()} API 키가 없어 기본 규칙 기반 요약을 사용합니다.",
+        )
+        return results, 0
+
+    chunks, oversized = _split_batch_for_prompt(items)
+    _fallback_all(oversized, source="fallback", summary="AI 입력 한도를 초과하여 기본 규칙 기반 요약으로 대체되었습니다.")
+
+    calls = 0
+    for index, chunk in enumerate(chunks):
+        if not await check_rate_limit(rate_limit_key, settings.ai_rate_limit_per_minute):
+            for rest in chunks[index:]:
+                _fallback_all(
+                    rest,
+                    source="rate_limited",
+                    summary="AI 요청 한도를 초과했습니다. 기본 권장 액션을 사용하세요.",
+                    rate_limited=True,
+                )
+            break
+
+        messages = [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": "운영자 관점으로 간결히. 다음 JSON 입력의 각 디바이스를 요약해 JSON만 반환하세요: "
+                + _build_batch_user_prompt(chunk),
+            },
+        ]
+        by_device: Dict[str, Dict[str, Any]] = {}
+        calls += 1
+        try:
+            raw = await _call_provider_chat(provider_name, messages, trace_id)
+            by_device = _split_batch_results(raw)
+        except Exception as exc:
+            error_type = classify_ai_error(exc)
+            logger.warning(
+                "AI batch adapter fallback: trace_id=%s error_type=%s size=%d",
+                trace_id,
+                error_type,
+                len(chunk),
+            )
+
+        for item in chunk:
+            device_id = item["device_id"]
+            rule_based: DeviceAiSummaryResponse = item["rule_based"]
+            entry = by_device.get(device_id)
+            summary: Optional[DeviceAiSummaryResponse] = None
+            if entry is not None:
+                try:
+                    summary = _build_llm_summary(entry, rule_based)
+                except Exception:
+                    logger.warning("AI batch item invalid: trace_id=%s device_id=%s", trace_id, device_id)
+            if summary is None:
+                record_ai_call(success=False, fallback_used=True, scope_key=metrics_key)
+                summary = _rule_based_fallback(
+                    rule_based,
+                    source="fallback",
+                    summary="AI 생성이 실패하여 기본 규칙 기반 요약으로 대체되었습니다.",
+                )
+            else:
+                record_ai_call(success=True, scope_key=metrics_key)
+            results[device_id] = _view(item, summary)
+    return results, calls
@@ -0,0 +1,207 @@
+"""Content-addressed store for raw report bodies.
+
+Bodies are compressed (zstd when the ``zstandard`` package is installed, zlib otherwise)
+and stored under the sha256 of the uncompressed bytes, so identical uploads share one
+blob and a ref can be written before the row that points at it. ``reports`` keeps the
+summary columns plus ``raw_report_ref``; the body is loaded only by the report detail
+endpoint, through a small LRU of recently read bodies.
+
+Backends (``REPORT_BLOB_BACKEND``):
+
+- ``local``: files under ``REPORT_BLOB_DIR`` (default; serverless falls back to inline)
+- ``s3``: any S3-compatible bucket via boto3 (optional dependency)
+- ``inline``: keep bodies in ``reports.raw_report_json`` as before
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from app.core.config import is_serverless, settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zlib fallback
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+REF_PREFIX = "sha256:"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+def compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=settings.report_blob_zstd_level).compress(data)
+    return zlib.compress(data, 6)
+
+
+def decompress(data: bytes) -> bytes:
+    if data[:4] == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("Blob is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def blob_ref(data: bytes) -> str:
+    return REF_PREFIX + hashlib.sha256(data).hexdigest()
+
+
+def _digest(ref: str) -> str:
+    if not ref.startswith(REF_PREFIX) or len(ref) != len(REF_PREFIX) + 64:
+        raise ValueError(f"Invalid blob ref: {ref!r}")
+    return ref[len(REF_PREFIX):]
+
+
+class LocalBlobStore:
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+
+    def _path(self, ref: str) -> Path:
+        digest = _digest(ref)
+        return self.root / "sha256" / digest[:2] / digest
+
+    def _put(self, ref: str, data: bytes) -> None:
+        path = self._path(ref)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+
+    def _get(self, ref: str) -> bytes:
+        try:
+            return self._path(ref).read_bytes()
+        except FileNotFoundError:
+            raise BlobNotFound(ref) from None
+
+    async def put(self, ref: str, data: bytes) -> None:
+        await asyncio.to_thread(self._put, ref, data)
+
+    async def get(self, ref: str) -> bytes:
+        return await asyncio.to_thread(self._get, ref)
+
+
+class S3BlobStore:
+    def __init__(self) -> None:
+        try:
+            import boto3
+        except ImportError as exc:
+            raise RuntimeError("REPORT_BLOB_BACKEND=s3 requires the boto3 package") from exc
+        self.bucket = settings.report_blob_s3_bucket
+        self.prefix = settings.report_blob_s3_prefix.strip("/")
+        self._client = boto3.client("s3", endpoint_url=settings.report_blob_s3_endpoint_url or None)
+        self._missing = self._client.exceptions.NoSuchKey
+
+    def _key(self, ref: str) -> str:
+        digest = _digest(ref)
+        return f"{self.prefix}/sha256/{digest[:2]}/{digest}" if self.prefix else f"sha256/{digest[:2]}/{digest}"
+
+    def _get(self, ref: str) -> bytes:
+        try:
+            return self._client.get_object(Bucket=self.bucket, Key=self._key(ref))["Body"].read()
+        except self._missing:
+            raise BlobNotFound(ref) from None
+
+    async def put(self, ref: str, data: bytes) -> None:
+        await asyncio.to_thread(self._client.put_object, Bucket=self.bucket, Key=self._key(ref), Body=data)
+
+    async def get(self, ref: str) -> bytes:
+        return await asyncio.to_thread(self._get, ref)
+
+
+class BodyCache:
+    """LRU of decompressed bodies bounded by total bytes."""
+
+    def __init__(self) -> None:
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def get(self, ref: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(ref)
+            if body is not None:
+                self._entries.move_to_end(ref)
+            return body
+
+    def put(self, ref: str, body: bytes) -> None:
+        limit = settings.report_blob_cache_bytes
+        if len(body) > limit:
+            return
+        with self._lock:
+            if ref in self._entries:
+                return
+            self._entries[ref] = body
+            self._size += len(body)
+            while self._size > limit:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+_STORE = None
+_body_cache = BodyCache()
+
+
+def backend_name() -> str:
+    backend = settings.report_blob_backend.lower()
+    if backend == "local" and is_serverless():
+        return "inline"  # no durable local disk on serverless instances
+    return backend
+
+
+def get_blob_store():
+    """The configured store, or None when bodies stay inline in Postgres."""
+    global _STORE
+    backend = backend_name()
+    if backend == "inline":
+        return None
+    if _STORE is None:
+        if backend == "local":
+            _STORE = LocalBlobStore(settings.report_blob_dir)
+        elif backend == "s3":
+            _STORE = S3BlobStore()
+        else:
+            raise RuntimeError(f"Unknown REPORT_BLOB_BACKEND: {settings.report_blob_backend}")
+    return _STORE
+
+
+async def put_report_body(body: bytes) -> Optional[str]:
+    """Store a raw report body and return its ref; None when the backend is inline."""
+    store = get_blob_store()
+    if store is None:
+        return None
+    ref = blob_ref(body)
+    await store.put(ref, await asyncio.to_thread(compress, body))
+    return ref
+
+
+async def get_report_body(ref: str) -> bytes:
+    body = _body_cache.get(ref)
+    if body is not None:
+        return body
+    store = get_blob_store()
+    if store is None:
+        raise BlobNotFound(ref)
+    body = await asyncio.to_thread(decompress, await store.get(ref))
+    _body_cache.put(ref, body)
+    return body
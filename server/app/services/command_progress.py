@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from app.core.config import is_serverless, settings
+from app.core.database import POOL_BACKGROUND, get_connection
+from app.core.queries import register_query
+from app.services.event_bus import publish_event
+from app.services.fleet_rollups import fleet_rollups
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = frozenset({"succeeded", "failed"})
+# Statuses a command may still move out of; terminal statuses never change again.
+OPEN_STATUSES = ("queued", "running")
+COMMAND_UPDATED_EVENT = "command.updated"
+# Commands without a write for this long are forgotten (agent died mid-scan).
+_RECENT_TTL_SECONDS = 600.0
+
+TRANSITION_COMMAND = register_query(
+    "command_progress.transition",
+    """
+    UPDATE commands
+    SET status = $3, progress = $4, message = $5, finished_at = $6
+    WHERE id = $1 AND device_id = $2 AND status = ANY($7::text[])
+    RETURNING type
+    """,
+)
+COMMAND_STATUS = register_query(
+    "command_progress.status",
+    "SELECT status FROM commands WHERE id = $1 AND device_id = $2",
+)
+FLUSH_PROGRESS = register_query(
+    "command_progress.flush",
+    """
+    UPDATE commands c
+    SET progress = u.progress, message = u.message
+    FROM unnest($1::text[], $2::text[], $3::int[], $4::text[]) AS u(id, device_id, progress, message)
+    WHERE c.id = u.id AND c.device_id = u.device_id AND c.status = 'running'
+    RETURNING c.id
+    """,
+)
+
+
+class CommandNotFound(Exception):
+    pass
+
+
+class CommandTransitionRejected(Exception):
+    """The command is already in a terminal status different from the requested one."""
+
+    def __init__(self, current_status: str) -> None:
+        super().__init__(current_status)
+        self.current_status = current_status
+
+
+@dataclass
+class _Pending:
+    device_id: str
+    user_id: str
+    progress: int
+    message: str
+
+
+class CommandProgressCoalescer:
+    """State machine for agent status updates with coalesced ``running`` ticks.
+
+    Every transition is one conditional ``UPDATE ... RETURNING`` that only matches
+    commands still in ``OPEN_STATUSES``, so ``succeeded -> running`` and other
+    regressions are rejected by the database even across workers. Once a command has
+    been written, further ``running`` ticks inside ``command_progress_coalesce_seconds``
+    only replace an in-memory entry; a single task flushes the latest tick of every
+    pending command in one batched UPDATE per window and publishes their events.
+    Terminal statuses drop any pending tick and are written immediately. Serverless
+    instances cannot keep a flusher alive between requests, so there every tick is
+    written directly.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[str, _Pending] = {}
+        self._last_written: Dict[str, Tuple[str, float]] = {}
+        self._lock = Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.counts = {"written": 0, "coalesced": 0, "flushed": 0, "rejected": 0}
+
+    def _count(self, outcome: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counts[outcome] += amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+    def _note_written(self, command_id: str, device_id: str) -> None:
+        now = time.monotonic()
+        self._last_written[command_id] = (device_id, now)
+        if len(self._last_written) > 1024:
+            cutoff = now - _RECENT_TTL_SECONDS
+            for stale in [key for key, (_, at) in self._last_written.items() if at < cutoff]:
+                del self._last_written[stale]
+
+    def _try_coalesce(self, command_id: str, device: dict, progress: int, message: str) -> bool:
+        window = settings.command_progress_coalesce_seconds
+        if window <= 0 or is_serverless():
+            return False
+        recent = self._last_written.get(command_id)
+        if recent is None or recent[0] != device["device_id"]:
+            return False
+        if time.monotonic() - recent[1] >= window:
+            return False
+        self._pending[command_id] = _Pending(device["device_id"], device["user_id"], progress, message)
+        self._ensure_flusher()
+        return True
+
+    async def update(self, conn, *, command_id: str, device: dict, status: str, progress: int, message: str) -> None:
+        """Apply an agent status update; raises CommandNotFound / CommandTransitionRejected."""
+        if status == "running" and self._try_coalesce(command_id, device, progress, message):
+            self._count("coalesced")
+            return
+
+        self._pending.pop(command_id, None)
+        now = datetime.now(timezone.utc)
+        finished_at = now if status in TERMINAL_STATUSES else None
+        command_type = await TRANSITION_COMMAND.fetchval(
+            conn, command_id, device["device_id"], status, progress, message, finished_at, list(OPEN_STATUSES),
+        )
+        if command_type is None:
+            current = await COMMAND_STATUS.fetchval(conn, command_id, device["device_id"])
+            if current is None:
+                raise CommandNotFound(command_id)
+            self._last_written.pop(command_id, None)
+            if current == status:
+                return  # agent retried a terminal update that already landed
+            self._count("rejected")
+            raise CommandTransitionRejected(current)
+
+        self._count("written")
+        if status in TERMINAL_STATUSES:
+            self._last_written.pop(command_id, None)
+            await fleet_rollups.record_command(
+                conn, user_id=device["user_id"], command_type=command_type, status=status, finished_at=now,
+            )
+        else:
+            self._note_written(command_id, device["device_id"])
+        await publish_event(
+            conn,
+            user_id=device["user_id"],
+            event_type=COMMAND_UPDATED_EVENT,
+            data={
+                "command_id": command_id,
+                "device_id": device["device_id"],
+                "status": status,
+                "progress": progress,
+                "message": message,
+                "finished_at": finished_at,
+            },
+        )
+
+    def _ensure_flusher(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(), name="command-progress-flusher")
+
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(settings.command_progress_coalesce_seconds)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Command progress flush failed")
+
+    async def flush(self) -> None:
+        """Write the latest pending tick of every command in one statement."""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        ids = list(pending)
+        async with get_connection(pool=POOL_BACKGROUND) as conn:
+            rows = await FLUSH_PROGRESS.fetch(
+                conn,
+                ids,
+                [pending[command_id].device_id for command_id in ids],
+                [pending[command_id].progress for command_id in ids],
+                [pending[command_id].message for command_id in ids],
+            )
+            self._count("flushed", len(rows))
+            for row in rows:
+                command_id = row["id"]
+                entry = pending[command_id]
+                self._note_written(command_id, entry.device_id)
+                await publish_event(
+                    conn,
+                    user_id=entry.user_id,
+                    event_type=COMMAND_UPDATED_EVENT,
+                    data={
+                        "command_id": command_id,
+                        "device_id": entry.device_id,
+                        "status": "running",
+                        "progress": entry.progress,
+                        "message": entry.message,
+                        "finished_at": None,
+                    },
+                )
+
+    async def stop(self) -> None:
+        task = self._task
+        self._task = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final command progress flush failed")
+
+
+command_progress = CommandProgressCoalescer()
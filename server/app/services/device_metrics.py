@@ -0,0 +1,137 @@
+"""Per-device time series in the narrow ``device_metrics`` table.
+
+Every numeric field of an uploaded report becomes one (device_id, metric, ts, value)
+row; nested objects are flattened into dotted snake_case names
+(``storage.freeBytes`` -> ``storage.free_bytes``), lists are skipped. Charts read a
+range downsampled in SQL to fixed-width buckets (min/max/avg per bucket), so the
+response size depends on the requested point count, not on the range.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Sequence
+
+from app.core.queries import EXPLAIN_DEVICE_ID, EXPLAIN_NOW, register_query
+
+# Bounds what one (possibly misbehaving) agent can add per report.
+MAX_METRICS_PER_REPORT = 64
+MAX_METRIC_NAME_LENGTH = 100
+_MAX_DEPTH = 4
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+TREND_METRICS = ("disk_free_percent", "startup_apps_count")
+TREND_SAMPLES = 8
+
+INSERT_DEVICE_METRICS = register_query(
+    "device_metrics.insert",
+    """
+    INSERT INTO device_metrics (device_id, metric, ts, value)
+    SELECT $1, m.metric, $2, m.value
+    FROM unnest($3::text[], $4::float8[]) AS m(metric, value)
+    ON CONFLICT (device_id, metric, ts) DO UPDATE SET value = EXCLUDED.value
+    """,
+)
+RECENT_METRIC_SAMPLES = register_query(
+    "device_metrics.recent_samples",
+    """
+    SELECT m.metric, s.value
+    FROM unnest($2::text[]) AS m(metric)
+    CROSS JOIN LATERAL (
+        SELECT d.ts, d.value
+        FROM device_metrics d
+        WHERE d.device_id = $1
+          AND d.metric = m.metric
+          AND d.ts > NOW() - INTERVAL '7 days'
+        ORDER BY d.ts DESC
+        LIMIT $3
+    ) s
+    ORDER BY m.metric, s.ts DESC
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID, list(TREND_METRICS), TREND_SAMPLES),
+)
+METRIC_BUCKETS = register_query(
+    "device_metrics.buckets",
+    """
+    SELECT metric,
+           floor(extract(epoch FROM ts - $3::timestamptz) / $5::float8)::int AS bucket,
+           min(value) AS min, max(value) AS max, avg(value) AS avg, count(*) AS count
+    FROM device_metrics
+    WHERE device_id = $1
+      AND metric = ANY($2::text[])
+      AND ts >= $3
+      AND ts < $4
+    GROUP BY metric, bucket
+    ORDER BY metric, bucket
+    """,
+    hot=True,
+    explain_args=(
+        EXPLAIN_DEVICE_ID, ["health_score"], EXPLAIN_NOW - timedelta(days=365), EXPLAIN_NOW, 86400.0,
+    ),
+)
+
+
+def metric_name(path: Sequence[str]) -> str:
+    return ".".join(_CAMEL_BOUNDARY.sub("_", part).lower() for part in path)
+
+
+def extract_metrics(report: Dict[str, Any]) -> Dict[str, float]:
+    """Numeric fields of a report keyed by metric name, at most MAX_METRICS_PER_REPORT."""
+    metrics: Dict[str, float] = {}
+
+    def visit(value: Any, path: List[str]) -> None:
+        if len(metrics) >= MAX_METRICS_PER_REPORT:
+            return
+        if isinstance(value, dict):
+            if len(path) < _MAX_DEPTH:
+                for key, child in value.items():
+                    visit(child, path + [str(key)])
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and path:
+            name = metric_name(path)
+            if len(name) <= MAX_METRIC_NAME_LENGTH and math.isfinite(value):
+                metrics.setdefault(name, float(value))
+
+    visit(report, [])
+    return metrics
+
+
+async def record_report_metrics(conn, device_id: str, ts: datetime, report: Dict[str, Any]) -> int:
+    metrics = extract_metrics(report)
+    if metrics:
+        await INSERT_DEVICE_METRICS.execute(conn, device_id, ts, list(metrics), list(metrics.values()))
+    return len(metrics)
+
+
+async def fetch_recent_samples(conn, device_id: str, metrics: Sequence[str] = TREND_METRICS) -> Dict[str, List[float]]:
+    """Up to TREND_SAMPLES values per metric from the last 7 days, newest first."""
+    rows = await RECENT_METRIC_SAMPLES.fetch(conn, device_id, list(metrics), TREND_SAMPLES)
+    samples: Dict[str, List[float]] = {metric: [] for metric in metrics}
+    for row in rows:
+        samples[row["metric"]].append(float(row["value"]))
+    return samples
+
+
+def bucket_seconds(start: datetime, end: datetime, points: int) -> float:
+    return max(1.0, math.ceil((end - start).total_seconds() / points))
+
+
+async def fetch_metric_buckets(
+    conn, device_id: str, metrics: Sequence[str], start: datetime, end: datetime, width: float,
+) -> Dict[str, List[dict]]:
+    """Bucketed min/max/avg/count per metric; empty buckets are omitted."""
+    rows = await METRIC_BUCKETS.fetch(conn, device_id, list(metrics), start, end, width)
+    series: Dict[str, List[dict]] = {metric: [] for metric in metrics}
+    for row in rows:
+        series[row["metric"]].append(
+            {
+                "ts": start + timedelta(seconds=row["bucket"] * width),
+                "min": row["min"],
+                "max": row["max"],
+                "avg": row["avg"],
+                "count": row["count"],
+            }
+        )
+    return series
@@ -0,0 +1,49 @@
+"""Rule-based device risk score shared by the risk ranking and the fleet rollups."""
+
+from typing import List
+
+HIGH_RISK_SCORE = 60
+
+
+def compute_risk(row: dict, *, is_online: bool) -> tuple[int, str, List[str]]:
+    score = 0
+    reasons: List[str] = []
+    health_score = row.get("health_score")
+    disk_free_percent = row.get("disk_free_percent")
+    startup_apps_count = row.get("startup_apps_count")
+
+    if health_score is not None:
+        if health_score < 60:
+            score += 45
+            reasons.append(f"건강 점수 낮음({health_score})")
+        elif health_score < 80:
+            score += 20
+            reasons.append(f"건강 점수 주의({health_score})")
+    else:
+        score += 20
+        reasons.append("리포트 없음")
+
+    if disk_free_percent is not None:
+        if disk_free_percent < 15:
+            score += 35
+            reasons.append(f"디스크 위험({disk_free_percent:.1f}%)")
+        elif disk_free_percent < 25:
+            score += 15
+            reasons.append(f"디스크 부족({disk_free_percent:.1f}%)")
+
+    if startup_apps_count is not None and startup_apps_count >= 40:
+        score += 10
+        reasons.append(f"시작프로그램 과다({startup_apps_count})")
+
+    if not is_online:
+        score += 10
+        reasons.append("오프라인 상태")
+
+    score = min(score, 100)
+    if score >= HIGH_RISK_SCORE:
+        level = "high"
+    elif score >= 30:
+        level = "medium"
+    else:
+        level = "low"
+    return score, level, reasons[:3]
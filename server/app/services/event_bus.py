@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Iterable, Optional, Set
+
+from app.core import json_codec
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EVENT_CHANNEL = "pcinsight_events"
+
+_SUBSCRIPTIONS: Dict[str, Set["Subscription"]] = {}
+_LISTENER_CONN: Optional[Any] = None
+_LISTENER_LOCK = asyncio.Lock()
+_RECONNECT_TASK: Optional[asyncio.Task] = None
+_RECONNECT_INITIAL_DELAY_SECONDS = 0.5
+_RECONNECT_MAX_DELAY_SECONDS = 30.0
+
+
+class SubscriptionLimitExceeded(Exception):
+    pass
+
+
+class Subscription:
+    """A per-connection event queue scoped to one user.
+
+    Events are delivered to every subscription of the owning user whose ``event_types``
+    filter matches. The queue is bounded; when a slow consumer falls behind, the oldest
+    event is dropped so that the latest state always gets through.
+    """
+
+    def __init__(self, user_id: str, event_types: Optional[Iterable[str]] = None, maxsize: int = 100):
+        self.user_id = user_id
+        self.event_types = set(event_types) if event_types else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        if self.event_types is not None and event.get("type") not in self.event_types:
+            return
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def _dispatch(event: Dict[str, Any]) -> None:
+    user_id = event.get("user_id")
+    if not user_id:
+        return
+    for subscription in list(_SUBSCRIPTIONS.get(user_id, ())):
+        subscription.deliver(event)
+
+
+def _on_notification(_conn, _pid, _channel, payload: str) -> None:
+    try:
+        event = json_codec.loads(payload)
+    except json.JSONDecodeError:
+        logger.warning("Dropping malformed event bus payload")
+        return
+    _dispatch(event)
+
+
+async def _connect_listener() -> bool:
+    global _LISTENER_CONN
+    try:
+        import asyncpg
+
+        conn = await asyncpg.connect(settings.database_url)
+        await conn.add_listener(EVENT_CHANNEL, _on_notification)
+        conn.add_termination_listener(_on_listener_terminated)
+        _LISTENER_CONN = conn
+        return True
+    except Exception:
+        _LISTENER_CONN = None
+        return False
+
+
+async def _ensure_listener() -> None:
+    """Open the worker's dedicated LISTEN connection on first subscription.
+
+    The listener connection lives outside the pool so long-lived streams never hold a
+    pool slot. If it cannot be opened, events published by this worker are still
+    delivered locally; only cross-worker fan-out is lost.
+    """
+    if _listener_active():
+        return
+    async with _LISTENER_LOCK:
+        if _listener_active():
+            return
+        if not await _connect_listener():
+            logger.warning("Event bus listener unavailable; falling back to worker-local delivery")
+            _schedule_reconnect()
+
+
+def _on_listener_terminated(conn) -> None:
+    """Called by asyncpg when the LISTEN connection drops (server restart, failover).
+
+    Without this the worker would keep a dead listener until the next subscription and
+    silently miss events from other workers for every stream already open.
+    """
+    global _LISTENER_CONN
+    if _LISTENER_CONN is not conn:
+        return  # closed on purpose by close_event_listener
+    _LISTENER_CONN = None
+    logger.warning("Event bus listener connection lost; reconnecting")
+    _schedule_reconnect()
+
+
+def _schedule_reconnect() -> None:
+    global _RECONNECT_TASK
+    if _RECONNECT_TASK is not None and not _RECONNECT_TASK.done():
+        return
+    try:
+        _RECONNECT_TASK = asyncio.get_running_loop().create_task(_reconnect_listener())
+    except RuntimeError:
+        _RECONNECT_TASK = None  # no running loop (interpreter shutdown)
+
+
+async def _reconnect_listener() -> None:
+    delay = _RECONNECT_INITIAL_DELAY_SECONDS
+    while _SUBSCRIPTIONS:
+        await asyncio.sleep(delay)
+        async with _LISTENER_LOCK:
+            if _listener_active():
+                return
+            if await _connect_listener():
+                logger.info("Event bus listener reconnected")
+                return
+        delay = min(delay * 2, _RECONNECT_MAX_DELAY_SECONDS)
+    # Nobody is listening any more; the next subscribe() opens a fresh connection.
+
+
+async def close_event_listener() -> None:
+    global _LISTENER_CONN, _RECONNECT_TASK
+    task, _RECONNECT_TASK = _RECONNECT_TASK, None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    conn = _LISTENER_CONN
+    _LISTENER_CONN = None
+    if conn is not None and not conn.is_closed():
+        await conn.close()
+
+
+def _listener_active() -> bool:
+    return _LISTENER_CONN is not None and not _LISTENER_CONN.is_closed()
+
+
+async def subscribe(user_id: str, event_types: Optional[Iterable[str]] = None) -> Subscription:
+    """Register a stream for ``user_id`` on this worker.
+
+    ``event_stream_max_subscriptions_per_user`` is enforced per process: with N workers
+    a user can hold up to N times that many streams in total. The cap protects each
+    worker's memory and file descriptors, not a fleet-wide quota.
+    """
+    current = _SUBSCRIPTIONS.get(user_id, set())
+    if len(current) >= settings.event_stream_max_subscriptions_per_user:
+        raise SubscriptionLimitExceeded(user_id)
+    subscription = Subscription(user_id, event_types)
+    _SUBSCRIPTIONS.setdefault(user_id, set()).add(subscription)
+    await _ensure_listener()
+    return subscription
+
+
+def unsubscribe(subscription: Subscription) -> None:
+    subscriptions = _SUBSCRIPTIONS.get(subscription.user_id)
+    if not subscriptions:
+        return
+    subscriptions.discard(subscription)
+    if not subscriptions:
+        _SUBSCRIPTIONS.pop(subscription.user_id, None)
+
+
+async def publish_event(conn, *, user_id: str, event_type: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Publish an event to every worker via NOTIFY on the caller's connection.
+
+    NOTIFY is transactional, so events published inside a transaction reach other
+    workers only once it commits. Without a listener this worker delivers its own
+    events directly; inside a transaction that delivery is deferred and the event is
+    returned instead, for the caller to pass to ``dispatch_local`` after commit (a
+    rolled-back transaction must not announce anything). Returns None otherwise.
+    Publishing never fails the caller's request.
+    """
+    event = {"user_id": user_id, "type": event_type, "data": data}
+    payload = json_codec.dumps(event)
+    try:
+        await conn.execute("SELECT pg_notify($1, $2)", EVENT_CHANNEL, payload)
+    except Exception:
+        logger.warning("Event publish failed: type=%s", event_type)
+    if _listener_active():
+        return None
+    local = json_codec.loads(payload)
+    if conn.is_in_transaction():
+        return local
+    _dispatch(local)
+    return None
+
+
+def dispatch_local(events: Iterable[Optional[Dict[str, Any]]]) -> None:
+    """Deliver events returned by ``publish_event`` once their transaction committed."""
+    for event in events:
+        if event is not None:
+            _dispatch(event)
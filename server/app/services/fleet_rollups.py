@@ -0,0 +1,564 @@
+"""Per-tenant fleet aggregates maintained incrementally on report ingest and command completion.
+
+Three tables (migration 0008):
+
+* ``fleet_device_latest`` - summary of each device's newest report;
+* ``fleet_state`` - current fleet state per tenant as (count, total) per metric
+  (``devices``, ``health_score``, ``high_risk_devices``, ``disk_free_bin.<0-9>``), moved by
+  the difference between a device's previous and new report;
+* ``fleet_rollups`` - event counts per UTC hour (``reports``, ``health_score``,
+  ``disk_free_percent``, ``commands.<type>.<succeeded|failed>``), folded into daily rows
+  once older than ``fleet_rollup_hourly_retention_days``.
+
+Ingest only merges into an in-memory batch; one task applies it every
+``fleet_rollup_flush_seconds`` in a single transaction. The fleet overview reads the
+state rows plus one bucket range, so it costs the same for 10 devices or 100,000.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import is_serverless, settings
+from app.core.database import POOL_BACKGROUND, get_connection
+from app.core.queries import EXPLAIN_NOW, EXPLAIN_USER_ID, register_query
+from app.services.device_risk import compute_risk
+
+logger = logging.getLogger(__name__)
+
+DISK_FREE_BINS = 10
+# pg_try_advisory_xact_lock key: one worker compacts at a time.
+COMPACTION_LOCK_ID = 7_246_911_035
+
+ENSURE_DEVICE_LATEST = register_query(
+    "fleet_rollups.ensure_device_latest",
+    """
+    INSERT INTO fleet_device_latest (device_id, user_id)
+    SELECT d.id, d.user_id
+    FROM devices d
+    WHERE d.id = ANY($1::text[])
+    ORDER BY d.id
+    ON CONFLICT (device_id) DO NOTHING
+    """,
+)
+LOCK_DEVICE_LATEST = register_query(
+    "fleet_rollups.lock_device_latest",
+    """
+    SELECT device_id, user_id, reported_at, health_score, disk_free_bin, high_risk
+    FROM fleet_device_latest
+    WHERE device_id = ANY($1::text[])
+    ORDER BY device_id
+    FOR UPDATE
+    """,
+)
+UPDATE_DEVICE_LATEST = register_query(
+    "fleet_rollups.update_device_latest",
+    """
+    UPDATE fleet_device_latest l
+    SET reported_at = u.reported_at, health_score = u.health_score,
+        disk_free_bin = u.disk_free_bin, high_risk = u.high_risk
+    FROM unnest($1::text[], $2::timestamptz[], $3::int[], $4::smallint[], $5::bool[])
+         AS u(device_id, reported_at, health_score, disk_free_bin, high_risk)
+    WHERE l.device_id = u.device_id
+    """,
+)
+ADD_STATE = register_query(
+    "fleet_rollups.add_state",
+    """
+    INSERT INTO fleet_state AS s (user_id, metric, count, total)
+    SELECT u.user_id, u.metric, u.count, u.total
+    FROM unnest($1::text[], $2::text[], $3::bigint[], $4::float8[]) AS u(user_id, metric, count, total)
+    ON CONFLICT (user_id, metric) DO UPDATE
+    SET count = s.count + EXCLUDED.count, total = s.total + EXCLUDED.total
+    """,
+)
+ADD_BUCKETS = register_query(
+    "fleet_rollups.add_buckets",
+    """
+    INSERT INTO fleet_rollups AS r (user_id, granularity, bucket_start, metric, count, total)
+    SELECT u.user_id, 'hour', u.bucket_start, u.metric, u.count, u.total
+    FROM unnest($1::text[], $2::timestamptz[], $3::text[], $4::bigint[], $5::float8[])
+         AS u(user_id, bucket_start, metric, count, total)
+    ON CONFLICT (user_id, granularity, bucket_start, metric) DO UPDATE
+    SET count = r.count + EXCLUDED.count, total = r.total + EXCLUDED.total
+    """,
+)
+FORGET_DEVICE = register_query(
+    "fleet_rollups.forget_device",
+    """
+    WITH removed AS (
+        DELETE FROM fleet_device_latest
+        WHERE device_id = $1 AND reported_at IS NOT NULL
+        RETURNING user_id, health_score, disk_free_bin, high_risk
+    )
+    INSERT INTO fleet_state AS s (user_id, metric, count, total)
+    SELECT removed.user_id, m.metric, -m.count, -m.total
+    FROM removed
+    CROSS JOIN LATERAL (
+        VALUES ('devices', 1, 0::float8),
+               ('health_score', CASE WHEN health_score IS NULL THEN 0 ELSE 1 END,
+                coalesce(health_score, 0)::float8),
+               ('high_risk_devices', high_risk::int, 0::float8),
+               ('disk_free_bin.' || disk_free_bin, 1, 0::float8)
+    ) AS m(metric, count, total)
+    WHERE m.metric IS NOT NULL
+    ON CONFLICT (user_id, metric) DO UPDATE
+    SET count = s.count + EXCLUDED.count, total = s.total + EXCLUDED.total
+    """,
+)
+TRY_COMPACTION_LOCK = register_query(
+    "fleet_rollups.try_compaction_lock",
+    "SELECT pg_try_advisory_xact_lock($1)",
+)
+COMPACT_HOURLY = register_query(
+    "fleet_rollups.compact_hourly",
+    """
+    WITH moved AS (
+        DELETE FROM fleet_rollups
+        WHERE granularity = 'hour' AND bucket_start < $1
+        RETURNING user_id, bucket_start, metric, count, total
+    ), folded AS (
+        INSERT INTO fleet_rollups AS r (user_id, granularity, bucket_start, metric, count, total)
+        SELECT user_id, 'day', date_trunc('day', bucket_start AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+               metric, sum(count), sum(total)
+        FROM moved
+        GROUP BY 1, 3, 4
+        ON CONFLICT (user_id, granularity, bucket_start, metric) DO UPDATE
+        SET count = r.count + EXCLUDED.count, total = r.total + EXCLUDED.total
+        RETURNING 1
+    )
+    SELECT count(*) FROM moved
+    """,
+)
+CLEAR_TENANTS = register_query(
+    "fleet_rollups.clear_tenants",
+    """
+    WITH cleared_state AS (
+        DELETE FROM fleet_state WHERE user_id = ANY($1::text[])
+    ), cleared_buckets AS (
+        DELETE FROM fleet_rollups WHERE user_id = ANY($1::text[])
+    )
+    DELETE FROM fleet_device_latest WHERE user_id = ANY($1::text[])
+    """,
+)
+LATEST_REPORTS = register_query(
+    "fleet_rollups.latest_reports",
+    """
+    SELECT DISTINCT ON (r.device_id)
+           r.device_id, d.user_id, r.created_at, r.health_score, r.disk_free_percent, r.startup_apps_count
+    FROM devices d
+    JOIN reports r ON r.device_id = d.id
+    WHERE d.user_id = ANY($1::text[])
+    ORDER BY r.device_id, r.created_at DESC
+    """,
+)
+INSERT_DEVICE_LATEST = register_query(
+    "fleet_rollups.insert_device_latest",
+    """
+    INSERT INTO fleet_device_latest (device_id, user_id, reported_at, health_score, disk_free_bin, high_risk)
+    SELECT * FROM unnest($1::text[], $2::text[], $3::timestamptz[], $4::int[], $5::smallint[], $6::bool[])
+    """,
+)
+REBUILD_STATE = register_query(
+    "fleet_rollups.rebuild_state",
+    """
+    INSERT INTO fleet_state (user_id, metric, count, total)
+    SELECT user_id, 'devices', count(*), 0
+    FROM fleet_device_latest WHERE user_id = ANY($1::text[]) GROUP BY user_id
+    UNION ALL
+    SELECT user_id, 'health_score', count(health_score), coalesce(sum(health_score), 0)
+    FROM fleet_device_latest WHERE user_id = ANY($1::text[]) GROUP BY user_id
+    UNION ALL
+    SELECT user_id, 'high_risk_devices', count(*) FILTER (WHERE high_risk), 0
+    FROM fleet_device_latest WHERE user_id = ANY($1::text[]) GROUP BY user_id
+    UNION ALL
+    SELECT user_id, 'disk_free_bin.' || disk_free_bin, count(*), 0
+    FROM fleet_device_latest WHERE user_id = ANY($1::text[]) AND disk_free_bin IS NOT NULL
+    GROUP BY user_id, disk_free_bin
+    """,
+)
+# Events before $2 (a UTC day start) land in daily buckets, later ones in hourly buckets.
+REBUILD_BUCKETS = register_query(
+    "fleet_rollups.rebuild_buckets",
+    """
+    INSERT INTO fleet_rollups (user_id, granularity, bucket_start, metric, count, total)
+    SELECT e.user_id,
+           CASE WHEN e.ts < $2 THEN 'day' ELSE 'hour' END,
+           CASE WHEN e.ts < $2 THEN date_trunc('day', e.ts AT TIME ZONE 'UTC')
+                ELSE date_trunc('hour', e.ts AT TIME ZONE 'UTC') END AT TIME ZONE 'UTC',
+           e.metric, count(*), coalesce(sum(e.value), 0)
+    FROM (
+        SELECT d.user_id, r.created_at AS ts, m.metric, m.value
+        FROM devices d
+        JOIN reports r ON r.device_id = d.id
+        CROSS JOIN LATERAL (
+            VALUES ('reports', 0::float8),
+                   ('health_score', r.health_score::float8),
+                   ('disk_free_percent', r.disk_free_percent::float8)
+        ) AS m(metric, value)
+        WHERE d.user_id = ANY($1::text[]) AND m.value IS NOT NULL
+        UNION ALL
+        SELECT c.user_id, c.finished_at, 'commands.' || c.type || '.' || c.status, 0
+        FROM commands c
+        WHERE c.user_id = ANY($1::text[])
+          AND c.status IN ('succeeded', 'failed')
+          AND c.finished_at IS NOT NULL
+    ) e
+    GROUP BY 1, 2, 3, 4
+    """,
+)
+FLEET_STATE = register_query(
+    "fleet_rollups.state",
+    "SELECT metric, count, total FROM fleet_state WHERE user_id = $1",
+    hot=True,
+    explain_args=(EXPLAIN_USER_ID,),
+)
+FLEET_TOTALS = register_query(
+    "fleet_rollups.totals",
+    """
+    SELECT metric, sum(count)::bigint AS count, sum(total) AS total
+    FROM fleet_rollups
+    WHERE user_id = $1
+      AND granularity IN ('day', 'hour')
+      AND bucket_start >= $2
+    GROUP BY metric
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_USER_ID, EXPLAIN_NOW - timedelta(days=7)),
+)
+
+
+def disk_free_bin(disk_free_percent: Optional[float]) -> Optional[int]:
+    """10%-wide bin index 0-9; 100% free lands in the last bin."""
+    if disk_free_percent is None:
+        return None
+    return min(max(int(disk_free_percent // 10), 0), DISK_FREE_BINS - 1)
+
+
+def hour_start(at: datetime) -> datetime:
+    return at.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(at: datetime) -> datetime:
+    return at.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    return float(value)
+
+
+def _high_risk(health_score, disk_free_percent, startup_apps_count) -> bool:
+    row = {"health_score": health_score, "disk_free_percent": disk_free_percent, "startup_apps_count": startup_apps_count}
+    return compute_risk(row, is_online=True)[1] == "high"
+
+
+@dataclass
+class _ReportSample:
+    user_id: str
+    reported_at: datetime
+    health_score: Optional[int]
+    disk_free_bin: Optional[int]
+    high_risk: bool
+
+
+def _state_items(health_score, disk_bin, high_risk) -> List[Tuple[str, int, float]]:
+    items = [("high_risk_devices", int(bool(high_risk)), 0.0)]
+    if health_score is not None:
+        items.append(("health_score", 1, float(health_score)))
+    if disk_bin is not None:
+        items.append((f"disk_free_bin.{disk_bin}", 1, 0.0))
+    return items
+
+
+class _Batch:
+    def __init__(self) -> None:
+        # Only the newest report per device matters for the current state.
+        self.reports: Dict[str, _ReportSample] = {}
+        self.buckets: Dict[Tuple[str, datetime, str], List[float]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.reports or self.buckets)
+
+    def add_report(self, device_id: str, sample: _ReportSample) -> None:
+        current = self.reports.get(device_id)
+        if current is None or current.reported_at <= sample.reported_at:
+            self.reports[device_id] = sample
+
+    def add(self, user_id: str, at: datetime, metric: str, count: int, total: float = 0.0) -> None:
+        entry = self.buckets.setdefault((user_id, hour_start(at), metric), [0, 0.0])
+        entry[0] += count
+        entry[1] += total
+
+    def merge(self, other: "_Batch") -> None:
+        for device_id, sample in other.reports.items():
+            self.add_report(device_id, sample)
+        for (user_id, bucket, metric), (count, total) in other.buckets.items():
+            entry = self.buckets.setdefault((user_id, bucket, metric), [0, 0.0])
+            entry[0] += count
+            entry[1] += total
+
+
+class FleetRollupWriter:
+    """Batches rollup deltas and applies them in one transaction per flush window.
+
+    Report samples are applied against ``fleet_device_latest`` rows locked in device_id
+    order (placeholders are inserted first, so a device's first report is counted once
+    even when two workers flush it together); a sample older than the stored one only
+    counts toward the hourly buckets. State and bucket upserts are sorted by key so
+    concurrent flushes take row locks in the same order.
+    """
+
+    def __init__(self) -> None:
+        self._batch = _Batch()
+        self._task: Optional[asyncio.Task] = None
+        self._compacted_at: Optional[float] = None
+        self._lock = Lock()
+        self.counts = {"reports": 0, "commands": 0, "flushes": 0, "compactions": 0}
+
+    def _count(self, operation: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counts[operation] += amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+    async def record_report(
+        self,
+        conn,
+        *,
+        device_id: str,
+        user_id: str,
+        reported_at: datetime,
+        health_score=None,
+        disk_free_percent=None,
+        startup_apps_count=None,
+    ) -> None:
+        health = _number(health_score)
+        disk = _number(disk_free_percent)
+        batch = _Batch()
+        batch.add_report(device_id, _ReportSample(
+            user_id,
+            reported_at,
+            None if health is None else round(health),
+            disk_free_bin(disk),
+            _high_risk(health, disk, _number(startup_apps_count)),
+        ))
+        batch.add(user_id, reported_at, "reports", 1)
+        if health is not None:
+            batch.add(user_id, reported_at, "health_score", 1, health)
+        if disk is not None:
+            batch.add(user_id, reported_at, "disk_free_percent", 1, disk)
+        self._count("reports")
+        await self._record(conn, batch)
+
+    async def record_command(
+        self,
+        conn,
+        *,
+        user_id: str,
+        command_type: str,
+        status: str,
+        finished_at: datetime,
+        previous_status: Optional[str] = None,
+    ) -> None:
+        """Count a terminal command; a failed command later completed by its report moves to succeeded."""
+        batch = _Batch()
+        batch.add(user_id, finished_at, f"commands.{command_type}.{status}", 1)
+        if previous_status == "failed" and status == "succeeded":
+            batch.add(user_id, finished_at, f"commands.{command_type}.failed", -1)
+        self._count("commands")
+        await self._record(conn, batch)
+
+    async def forget_device(self, conn, device_id: str) -> None:
+        """Take a deleted device out of the current state; past buckets keep its events."""
+        self._batch.reports.pop(device_id, None)
+        await FORGET_DEVICE.execute(conn, device_id)
+
+    async def _record(self, conn, batch: _Batch) -> None:
+        if settings.fleet_rollup_flush_seconds > 0 and not is_serverless():
+            self._batch.merge(batch)
+            self._ensure_flusher()
+            return
+        await self.apply(conn, batch)
+        self._count("flushes")
+        await self._maybe_compact(conn)
+
+    async def apply(self, conn, batch: _Batch) -> None:
+        async with conn.transaction():
+            if batch.reports:
+                await self._apply_reports(conn, batch.reports)
+            if batch.buckets:
+                keys = sorted(batch.buckets)
+                await ADD_BUCKETS.execute(
+                    conn,
+                    [key[0] for key in keys],
+                    [key[1] for key in keys],
+                    [key[2] for key in keys],
+                    [int(batch.buckets[key][0]) for key in keys],
+                    [batch.buckets[key][1] for key in keys],
+                )
+
+    async def _apply_reports(self, conn, reports: Dict[str, _ReportSample]) -> None:
+        device_ids = sorted(reports)
+        await ENSURE_DEVICE_LATEST.execute(conn, device_ids)
+        rows = await LOCK_DEVICE_LATEST.fetch(conn, device_ids)
+
+        state: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0, 0.0])
+        updated: List[Tuple[str, _ReportSample]] = []
+        for row in rows:
+            sample = reports[row["device_id"]]
+            user_id = row["user_id"]
+            if row["reported_at"] is None:
+                state[(user_id, "devices")][0] += 1
+            elif row["reported_at"] > sample.reported_at:
+                continue  # an out-of-order upload; the stored report is newer
+            else:
+                for metric, count, total in _state_items(row["health_score"], row["disk_free_bin"], row["high_risk"]):
+                    state[(user_id, metric)][0] -= count
+                    state[(user_id, metric)][1] -= total
+            for metric, count, total in _state_items(sample.health_score, sample.disk_free_bin, sample.high_risk):
+                state[(user_id, metric)][0] += count
+                state[(user_id, metric)][1] += total
+            updated.append((row["device_id"], sample))
+
+        if updated:
+            await UPDATE_DEVICE_LATEST.execute(
+                conn,
+                [device_id for device_id, _ in updated],
+                [sample.reported_at for _, sample in updated],
+                [sample.health_score for _, sample in updated],
+                [sample.disk_free_bin for _, sample in updated],
+                [sample.high_risk for _, sample in updated],
+            )
+        keys = sorted(key for key, (count, total) in state.items() if count or total)
+        if keys:
+            await ADD_STATE.execute(
+                conn,
+                [key[0] for key in keys],
+                [key[1] for key in keys],
+                [int(state[key][0]) for key in keys],
+                [state[key][1] for key in keys],
+            )
+
+    async def compact(self, conn, now: Optional[datetime] = None) -> Optional[int]:
+        """Fold hourly buckets older than the retention into daily ones; None if another worker holds the lock."""
+        now = now or datetime.now(timezone.utc)
+        cutoff = day_start(now - timedelta(days=settings.fleet_rollup_hourly_retention_days))
+        async with conn.transaction():
+            if not await TRY_COMPACTION_LOCK.fetchval(conn, COMPACTION_LOCK_ID):
+                return None
+            folded = await COMPACT_HOURLY.fetchval(conn, cutoff)
+        self._count("compactions")
+        return folded
+
+    async def _maybe_compact(self, conn) -> None:
+        now = time.monotonic()
+        if self._compacted_at is not None and now - self._compacted_at < settings.fleet_rollup_compact_interval_seconds:
+            return
+        self._compacted_at = now
+        try:
+            await self.compact(conn)
+        except Exception:
+            logger.exception("Fleet rollup compaction failed")
+
+    def _ensure_flusher(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(), name="fleet-rollup-flusher")
+
+    async def _run(self) -> None:
+        while self._batch:
+            await asyncio.sleep(settings.fleet_rollup_flush_seconds)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Fleet rollup flush failed")
+
+    async def flush(self) -> None:
+        """Apply everything recorded since the last flush; compacts when the interval has passed.
+
+        A batch that fails to apply is merged back and retried with the next window.
+        """
+        batch, self._batch = self._batch, _Batch()
+        if not batch:
+            return
+        applied = False
+        try:
+            async with get_connection(pool=POOL_BACKGROUND) as conn:
+                await self.apply(conn, batch)
+                applied = True
+                self._count("flushes")
+                await self._maybe_compact(conn)
+        finally:
+            if not applied:
+                # The transaction rolled back: keep the deltas so the next window retries them.
+                self._batch.merge(batch)
+
+    async def stop(self) -> None:
+        task = self._task
+        self._task = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final fleet rollup flush failed")
+
+
+async def rebuild_fleet_rollups(conn, user_ids: List[str], now: Optional[datetime] = None) -> int:
+    """Recompute every rollup row of the given tenants from reports and commands.
+
+    For drift recovery and bulk loads that bypass ingest. Runs in one transaction; reports
+    flushed by the API while it runs may be counted twice in their hourly bucket.
+    Returns the number of devices with a report.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = day_start(now - timedelta(days=settings.fleet_rollup_hourly_retention_days))
+    async with conn.transaction():
+        await CLEAR_TENANTS.execute(conn, user_ids)
+        rows = await LATEST_REPORTS.fetch(conn, user_ids)
+        if rows:
+            await INSERT_DEVICE_LATEST.execute(
+                conn,
+                [row["device_id"] for row in rows],
+                [row["user_id"] for row in rows],
+                [row["created_at"] for row in rows],
+                [row["health_score"] for row in rows],
+                [disk_free_bin(row["disk_free_percent"]) for row in rows],
+                [
+                    _high_risk(row["health_score"], row["disk_free_percent"], row["startup_apps_count"])
+                    for row in rows
+                ],
+            )
+        await REBUILD_STATE.execute(conn, user_ids)
+        await REBUILD_BUCKETS.execute(conn, user_ids, cutoff)
+    return len(rows)
+
+
+async def fetch_fleet_state(conn, user_id: str) -> Dict[str, Tuple[int, float]]:
+    rows = await FLEET_STATE.fetch(conn, user_id)
+    return {row["metric"]: (int(row["count"]), float(row["total"])) for row in rows}
+
+
+async def fetch_fleet_totals(conn, user_id: str, since: datetime) -> Dict[str, Tuple[int, float]]:
+    """Event totals per metric from both hourly and daily buckets starting at ``since``."""
+    rows = await FLEET_TOTALS.fetch(conn, user_id, since)
+    return {row["metric"]: (int(row["count"]), float(row["total"])) for row in rows}
+
+
+fleet_rollups = FleetRollupWriter()
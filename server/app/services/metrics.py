@@ -0,0 +1,407 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.database import ACQUIRE_WAIT_BUCKETS, get_pool_stats_snapshot
+from app.core.queries import LATENCY_BUCKETS, get_query_stats_snapshot
+from app.core.request_context import RequestDbStats, db_stats_var
+from app.services.ai_guardrails import get_ai_metrics_snapshot
+from app.services.command_progress import command_progress
+from app.services.fleet_rollups import fleet_rollups
+from app.services.profiling import loop_watchdog
+from app.services.redis_client import redis_service
+from app.services.shared_counters import get_shared_counters
+from app.services.request_rate_limit import get_rate_limit_rejections_snapshot
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "pcinsight"
+# Upper bounds (seconds) of the request latency buckets; the last bucket is +Inf.
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Requests that matched no route share one label so scanners cannot blow up cardinality.
+UNMATCHED_ROUTE = "unmatched"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_requests: Dict[Labels, Dict[str, Any]] = {}
+_in_flight = 0
+_lock = Lock()
+_flush_task: Optional[asyncio.Task] = None
+
+
+def _new_histogram(bounds: Tuple[float, ...]) -> Dict[str, Any]:
+    return {"buckets": [0] * (len(bounds) + 1), "sum": 0.0, "count": 0}
+
+
+def _observe(histogram: Dict[str, Any], bounds: Tuple[float, ...], value: float) -> None:
+    histogram["buckets"][bisect_left(bounds, value)] += 1
+    histogram["sum"] += value
+    histogram["count"] += 1
+
+
+def _route_template(scope: Dict[str, Any]) -> str:
+    route = scope.get("route")
+    # "route_template" is set by RateLimitMiddleware for requests rejected before routing.
+    return getattr(route, "path", None) or scope.get("route_template") or UNMATCHED_ROUTE
+
+
+def record_request(method: str, route: str, status_code: int, elapsed: float, db: RequestDbStats) -> None:
+    key: Labels = (("method", method), ("route", route))
+    with _lock:
+        entry = _requests.get(key)
+        if entry is None:
+            entry = {
+                "statuses": {},
+                "duration": _new_histogram(REQUEST_BUCKETS),
+                "db": _new_histogram(LATENCY_BUCKETS),
+                "db_queries": 0,
+            }
+            _requests[key] = entry
+        code = str(status_code)
+        entry["statuses"][code] = entry["statuses"].get(code, 0) + 1
+        _observe(entry["duration"], REQUEST_BUCKETS, elapsed)
+        _observe(entry["db"], LATENCY_BUCKETS, db.seconds)
+        entry["db_queries"] += db.queries
+
+
+class MetricsMiddleware:
+    """Records latency, status, DB time and query count per route template.
+
+    A plain ASGI middleware rather than ``@app.middleware("http")`` so streaming
+    responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.enable_metrics:
+            await self.app(scope, receive, send)
+            return
+
+        global _in_flight
+        _ensure_flusher()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        db_stats = RequestDbStats()
+        token = db_stats_var.set(db_stats)
+        with _lock:
+            _in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            db_stats_var.reset(token)
+            with _lock:
+                _in_flight -= 1
+            record_request(scope["method"], _route_template(scope), status_code, elapsed, db_stats)
+
+
+# ---------------------------------------------------------------------------
+# Collection: every source is turned into metric families of the form
+#   {"type": ..., "help": ..., "bounds": [...], "samples": {labels: value | histogram}}
+# so snapshots from several workers can be merged by summing samples.
+# ---------------------------------------------------------------------------
+
+def _family(kind: str, help_text: str, bounds: Iterable[float] = ()) -> Dict[str, Any]:
+    return {"type": kind, "help": help_text, "bounds": list(bounds), "samples": {}}
+
+
+def collect_local() -> Dict[str, Dict[str, Any]]:
+    families = {
+        f"{PREFIX}_http_requests_total": _family("counter", "HTTP requests by route template and status."),
+        f"{PREFIX}_http_request_duration_seconds": _family(
+            "histogram", "HTTP request latency by route template.", REQUEST_BUCKETS
+        ),
+        f"{PREFIX}_http_request_db_seconds": _family(
+            "histogram", "Database time spent per HTTP request.", LATENCY_BUCKETS
+        ),
+        f"{PREFIX}_http_request_db_queries_total": _family("counter", "Database queries issued by HTTP requests."),
+        f"{PREFIX}_http_requests_in_flight": _family("gauge", "HTTP requests currently being served."),
+        f"{PREFIX}_db_pool_connections": _family("gauge", "Open pool connections by state."),
+        f"{PREFIX}_db_pool_max_size": _family("gauge", "Configured maximum pool size."),
+        f"{PREFIX}_db_pool_waiting": _family("gauge", "Coroutines waiting to acquire a connection."),
+        f"{PREFIX}_db_pool_acquire_wait_seconds": _family(
+            "histogram", "Time spent waiting for a pooled connection.", ACQUIRE_WAIT_BUCKETS
+        ),
+        f"{PREFIX}_db_pool_acquire_timeouts_total": _family("counter", "Acquire attempts that timed out (503)."),
+        f"{PREFIX}_db_query_duration_seconds": _family(
+            "histogram", "Latency of registered queries.", LATENCY_BUCKETS
+        ),
+        f"{PREFIX}_db_query_rows_total": _family("counter", "Rows returned or affected by registered queries."),
+        f"{PREFIX}_db_query_errors_total": _family("counter", "Failed executions of registered queries."),
+        f"{PREFIX}_rate_limit_rejections_total": _family("counter", "Requests rejected with 429 by policy scope."),
+        f"{PREFIX}_ai_requests_total": _family("counter", "AI copilot calls by outcome."),
+        f"{PREFIX}_event_loop_blocked_total": _family("counter", "Times the event loop exceeded the lag threshold."),
+        f"{PREFIX}_command_progress_updates_total": _family(
+            "counter", "Agent status updates by outcome (written, coalesced, flushed, rejected)."
+        ),
+        f"{PREFIX}_fleet_rollup_operations_total": _family(
+            "counter", "Fleet rollup work by operation (reports, commands, flushes, compactions)."
+        ),
+        f"{PREFIX}_redis_circuit_open": _family("gauge", "1 while the Redis circuit breaker is open."),
+        f"{PREFIX}_redis_errors_total": _family("counter", "Failed Redis commands."),
+        f"{PREFIX}_redis_short_circuited_total": _family("counter", "Redis calls skipped because the circuit was open."),
+        f"{PREFIX}_redis_circuit_opened_total": _family("counter", "Times the Redis circuit breaker opened."),
+    }
+
+    def put(name: str, labels: Labels, value: Any) -> None:
+        families[f"{PREFIX}_{name}"]["samples"][labels] = value
+
+    with _lock:
+        for key, entry in _requests.items():
+            for code, count in entry["statuses"].items():
+                put("http_requests_total", key + (("status", code),), count)
+            put("http_request_duration_seconds", key, _copy_histogram(entry["duration"]))
+            put("http_request_db_seconds", key, _copy_histogram(entry["db"]))
+            put("http_request_db_queries_total", key, entry["db_queries"])
+        put("http_requests_in_flight", (), _in_flight)
+
+    for pool, stats in get_pool_stats_snapshot().items():
+        labels: Labels = (("pool", pool),)
+        if stats["open"]:
+            put("db_pool_connections", labels + (("state", "in_use"),), stats["in_use"])
+            put("db_pool_connections", labels + (("state", "idle"),), stats["idle"])
+            put("db_pool_max_size", labels, stats["max_size"])
+            put("db_pool_waiting", labels, stats["waiting"])
+        put(
+            "db_pool_acquire_wait_seconds",
+            labels,
+            {"buckets": stats["wait_buckets"], "sum": stats["wait_seconds_total"], "count": sum(stats["wait_buckets"])},
+        )
+        put("db_pool_acquire_timeouts_total", labels, stats["timeouts"])
+
+    for name, stats in get_query_stats_snapshot().items():
+        labels = (("query", name),)
+        put("db_query_duration_seconds", labels, {"buckets": stats["buckets"], "sum": stats["total_seconds"], "count": stats["calls"]})
+        put("db_query_rows_total", labels, stats["rows"])
+        put("db_query_errors_total", labels, stats["errors"])
+
+    for scope, count in get_rate_limit_rejections_snapshot().items():
+        put("rate_limit_rejections_total", (("scope", scope),), count)
+
+    if get_shared_counters() is None:
+        # Node-wide AI counters are added once in collect_all instead of per worker.
+        families[f"{PREFIX}_ai_requests_total"]["samples"] = _ai_samples()
+    put("event_loop_blocked_total", (), loop_watchdog.blocked_total)
+
+    for outcome, count in command_progress.snapshot().items():
+        put("command_progress_updates_total", (("outcome", outcome),), count)
+    for operation, count in fleet_rollups.snapshot().items():
+        put("fleet_rollup_operations_total", (("operation", operation),), count)
+
+    redis = redis_service.snapshot()
+    if redis["configured"]:
+        put("redis_circuit_open", (), int(redis["circuit_open"]))
+        put("redis_errors_total", (), redis["errors_total"])
+        put("redis_short_circuited_total", (), redis["short_circuited_total"])
+        put("redis_circuit_opened_total", (), redis["opened_total"])
+    return families
+
+
+def _ai_samples() -> Dict[Labels, int]:
+    ai = get_ai_metrics_snapshot()
+    samples: Dict[Labels, int] = {
+        (("outcome", outcome),): ai[f"requests_{outcome}"] for outcome in ("success", "failed", "rate_limited")
+    }
+    samples[(("outcome", "fallback"),)] = ai["fallback_total"]
+    return samples
+
+
+def _copy_histogram(histogram: Dict[str, Any]) -> Dict[str, Any]:
+    return {"buckets": list(histogram["buckets"]), "sum": histogram["sum"], "count": histogram["count"]}
+
+
+def merge_families(snapshots: List[Dict[str, Dict[str, Any]]], *, gauges_from: int) -> Dict[str, Dict[str, Any]]:
+    """Sum samples across worker snapshots; only the first ``gauges_from`` contribute gauges."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for position, families in enumerate(snapshots):
+        for name, family in families.items():
+            target = merged.setdefault(name, {**family, "samples": {}})
+            if family["type"] == "gauge" and position >= gauges_from:
+                continue
+            for labels, value in family["samples"].items():
+                current = target["samples"].get(labels)
+                if current is None:
+                    target["samples"][labels] = _copy_histogram(value) if isinstance(value, dict) else value
+                elif isinstance(value, dict):
+                    current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+                    current["sum"] += value["sum"]
+                    current["count"] += value["count"]
+                else:
+                    target["samples"][labels] = current + value
+    return merged
+
+
+# ---------------------------------------------------------------------------
+# Multi-worker aggregation through settings.metrics_multiproc_dir
+# ---------------------------------------------------------------------------
+
+def _snapshot_path(directory: Path, pid: int) -> Path:
+    return directory / f"{pid}.json"
+
+
+def _encode(families: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        name: {**family, "samples": [[list(map(list, labels)), value] for labels, value in family["samples"].items()]}
+        for name, family in families.items()
+    }
+
+
+def _decode(payload: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    return {
+        name: {**family, "samples": {tuple(tuple(pair) for pair in labels): value for labels, value in family["samples"]}}
+        for name, family in payload.items()
+    }
+
+
+def write_snapshot() -> None:
+    if not settings.metrics_multiproc_dir:
+        return
+    directory = Path(settings.metrics_multiproc_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = _snapshot_path(directory, os.getpid())
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(
+        json.dumps({"written_at": time.time(), "families": _encode(collect_local())}),
+        encoding="utf-8",
+    )
+    os.replace(temporary, path)
+
+
+def _read_other_snapshots() -> Tuple[List[Dict[str, Dict[str, Any]]], List[Dict[str, Dict[str, Any]]]]:
+    fresh: List[Dict[str, Dict[str, Any]]] = []
+    stale: List[Dict[str, Dict[str, Any]]] = []
+    directory = Path(settings.metrics_multiproc_dir)
+    own = _snapshot_path(directory, os.getpid())
+    cutoff = time.time() - settings.metrics_stale_seconds
+    for path in directory.glob("*.json"):
+        if path == own:
+            continue
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        (fresh if payload.get("written_at", 0) >= cutoff else stale).append(_decode(payload["families"]))
+    return fresh, stale
+
+
+def collect_all() -> Dict[str, Dict[str, Any]]:
+    local = collect_local()
+    if not settings.metrics_multiproc_dir:
+        workers = [local]
+        merged = merge_families(workers, gauges_from=1)
+    else:
+        write_snapshot()
+        fresh, stale = _read_other_snapshots()
+        workers = [local] + fresh
+        # Exited workers keep contributing counters (so totals never go backwards)
+        # but not gauges, which would report connections that no longer exist.
+        merged = merge_families(workers + stale, gauges_from=len(workers))
+    if get_shared_counters() is not None:
+        merged[f"{PREFIX}_ai_requests_total"]["samples"] = _ai_samples()
+    merged[f"{PREFIX}_metrics_workers"] = {
+        **_family("gauge", "Workers whose snapshot is included in these gauges."),
+        "samples": {(): len(workers)},
+    }
+    return merged
+
+
+# ---------------------------------------------------------------------------
+# Prometheus text exposition format 0.0.4
+# ---------------------------------------------------------------------------
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{key}="{_escape(str(value))}"' for key, value in labels]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(families: Dict[str, Dict[str, Any]]) -> str:
+    lines: List[str] = []
+    for name in sorted(families):
+        family = families[name]
+        if not family["samples"]:
+            continue
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for labels in sorted(family["samples"]):
+            value = family["samples"][labels]
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            bounds = [str(bound) for bound in family["bounds"]] + ["+Inf"]
+            for bound, count in zip(bounds, value["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(value['sum']))}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Periodic snapshot flush so idle workers still show up in other workers' scrapes
+# ---------------------------------------------------------------------------
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.metrics_flush_interval_seconds)
+        try:
+            write_snapshot()
+        except OSError:
+            logger.exception("Failed to write metrics snapshot")
+
+
+def _ensure_flusher() -> None:
+    global _flush_task
+    if not settings.metrics_multiproc_dir or (_flush_task is not None and not _flush_task.done()):
+        return
+    _flush_task = asyncio.get_running_loop().create_task(_flush_loop(), name="metrics-flush")
+
+
+async def stop_metrics_flusher() -> None:
+    global _flush_task
+    task = _flush_task
+    _flush_task = None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    if settings.metrics_multiproc_dir:
+        try:
+            write_snapshot()
+        except OSError:
+            logger.exception("Failed to write final metrics snapshot")
+
+
+def reset_metrics() -> None:
+    global _in_flight
+    with _lock:
+        _requests.clear()
+        _in_flight = 0
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import is_serverless, settings
+from app.core.database import POOL_BACKGROUND, get_connection
+from app.services.event_bus import dispatch_local, publish_event
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_EVENT = "device.presence"
+# pg_try_advisory_xact_lock key for the database sweep, so one worker scans at a time.
+PRESENCE_SWEEP_LOCK_ID = 7_246_911_036
+# The sweep only looks this many intervals past the threshold, so enabling it does not
+# announce every device that went silent long ago.
+_SWEEP_LOOKBACK_INTERVALS = 10
+
+# Claiming sets offline_announced_at = last_seen_at, so each silence is announced exactly
+# once no matter how many workers (heap deadline or sweep) notice it.
+_CLAIM_OFFLINE_SQL = """
+    UPDATE devices d
+    SET offline_announced_at = d.last_seen_at
+    FROM unnest($1::text[], $2::timestamptz[]) AS e(id, seen_at)
+    WHERE d.id = e.id
+      AND d.last_seen_at = e.seen_at
+      AND d.revoked_at IS NULL
+      AND d.offline_announced_at IS DISTINCT FROM d.last_seen_at
+    RETURNING d.id, d.user_id, d.last_seen_at
+"""
+
+_SWEEP_OFFLINE_SQL = """
+    UPDATE devices
+    SET offline_announced_at = last_seen_at
+    WHERE revoked_at IS NULL
+      AND last_seen_at < $1
+      AND last_seen_at >= $2
+      AND offline_announced_at IS DISTINCT FROM last_seen_at
+    RETURNING id, user_id, last_seen_at
+"""
+
+
+def online_threshold() -> timedelta:
+    return timedelta(seconds=settings.device_online_threshold_seconds)
+
+
+def is_device_online(last_seen_at: Optional[datetime], now: Optional[datetime] = None) -> bool:
+    """Single source of truth for the heartbeat-based online flag."""
+    if last_seen_at is None:
+        return False
+    current = now or datetime.now(timezone.utc)
+    return (current - last_seen_at) < online_threshold()
+
+
+class PresenceTracker:
+    """Detects online -> offline transitions from heartbeats without scanning devices.
+
+    Every heartbeat pushes ``(deadline, device_id, seen_at)`` onto a min-heap; older
+    entries for the same device are invalidated lazily by comparing ``seen_at`` with the
+    latest heartbeat seen by this worker. A single task sleeps until the earliest
+    deadline. Expired candidates are claimed in one batched UPDATE that requires an
+    exact ``devices.last_seen_at`` match, so a worker holding a stale heartbeat does
+    nothing.
+
+    The heap only covers heartbeats this process received; after a restart or crash
+    those deadlines are gone. The same task therefore sweeps ``devices.last_seen_at``
+    every ``presence_sweep_interval_seconds`` under an advisory lock and claims the
+    silent devices nobody announced. The claim column makes the two paths race-free.
+    Serverless instances never start the task; their devices' status is still derived
+    from ``last_seen_at`` on read.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[datetime, str, datetime]] = []
+        self._latest: Dict[str, Tuple[str, datetime]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._next_sweep: Optional[datetime] = None
+
+    def tracked_count(self) -> int:
+        return len(self._latest)
+
+    def observe_heartbeat(self, device_id: str, user_id: str, seen_at: datetime) -> None:
+        self._latest[device_id] = (user_id, seen_at)
+        deadline = seen_at + online_threshold()
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (deadline, device_id, seen_at))
+        self._ensure_started()
+        if self._wakeup is not None and (earliest is None or deadline < earliest):
+            self._wakeup.set()
+
+    def forget(self, device_id: str) -> None:
+        self._latest.pop(device_id, None)
+
+    def start(self) -> None:
+        """Start the sweep at boot, before any heartbeat reaches this worker."""
+        self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        if is_serverless():
+            return  # no background tasks on an instance frozen between requests
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="presence-tracker")
+
+    async def stop(self) -> None:
+        task = self._task
+        self._task = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def _pop_expired(self, now: datetime) -> List[Tuple[str, str, datetime]]:
+        expired: List[Tuple[str, str, datetime]] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, device_id, seen_at = heapq.heappop(self._heap)
+            latest = self._latest.get(device_id)
+            if latest is None or latest[1] != seen_at:
+                continue  # superseded by a newer heartbeat
+            expired.append((device_id, latest[0], seen_at))
+        return expired
+
+    def _sweep_enabled(self) -> bool:
+        return settings.presence_sweep_interval_seconds > 0
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            now = datetime.now(timezone.utc)
+            if self._sweep_enabled() and (self._next_sweep is None or self._next_sweep <= now):
+                self._next_sweep = now + timedelta(seconds=settings.presence_sweep_interval_seconds)
+                try:
+                    await self.sweep()
+                except Exception:
+                    logger.exception("Presence database sweep failed")
+                continue
+            wake_at = [self._heap[0][0]] if self._heap else []
+            if self._sweep_enabled() and self._next_sweep is not None:
+                wake_at.append(self._next_sweep)
+            delay = (min(wake_at) - now).total_seconds() if wake_at else None
+            if delay is None or delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            expired = self._pop_expired(datetime.now(timezone.utc))
+            if not expired:
+                continue
+            try:
+                await self._announce_offline(expired)
+            except Exception:
+                logger.exception("Presence offline sweep failed")
+
+    async def _announce_offline(self, expired: List[Tuple[str, str, datetime]]) -> None:
+        async with get_connection(pool=POOL_BACKGROUND) as conn:
+            rows = await conn.fetch(
+                _CLAIM_OFFLINE_SQL,
+                [device_id for device_id, _, _ in expired],
+                [seen_at for _, _, seen_at in expired],
+            )
+            for device_id, _, _ in expired:
+                self.forget(device_id)
+            # Unclaimed devices have a newer heartbeat (another worker holds its deadline),
+            # were revoked, or were already announced by the sweep.
+            await _publish_offline(conn, rows)
+
+    async def sweep(self, now: Optional[datetime] = None) -> Optional[int]:
+        """Claim and announce devices that went silent without a live deadline anywhere.
+
+        Returns the number of devices announced, or None when another worker holds the
+        sweep lock.
+        """
+        current = now or datetime.now(timezone.utc)
+        cutoff = current - online_threshold()
+        lookback = timedelta(seconds=settings.presence_sweep_interval_seconds * _SWEEP_LOOKBACK_INTERVALS)
+        async with get_connection(pool=POOL_BACKGROUND) as conn:
+            async with conn.transaction():
+                if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)", PRESENCE_SWEEP_LOCK_ID):
+                    return None
+                rows = await conn.fetch(_SWEEP_OFFLINE_SQL, cutoff, cutoff - lookback)
+                # NOTIFY is transactional: the events go out when the claims commit.
+                deferred = await _publish_offline(conn, rows)
+        dispatch_local(deferred)
+        for row in rows:
+            self.forget(row["id"])
+        return len(rows)
+
+
+async def _publish_offline(conn, rows) -> List[Optional[Dict[str, Any]]]:
+    """Announce claimed rows; returns the events left for local delivery after commit."""
+    deferred: List[Optional[Dict[str, Any]]] = []
+    for row in rows:
+        deferred.append(await publish_event(
+            conn,
+            user_id=row["user_id"],
+            event_type=PRESENCE_EVENT,
+            data={"device_id": row["id"], "status": "offline", "last_seen_at": row["last_seen_at"]},
+        ))
+    return deferred
+
+
+presence_tracker = PresenceTracker()
+
+
+async def record_heartbeat(
+    conn,
+    *,
+    device_id: str,
+    user_id: str,
+    previous_seen_at: Optional[datetime],
+    seen_at: datetime,
+) -> None:
+    """Announce an offline -> online transition and arm the device's offline deadline."""
+    if not is_device_online(previous_seen_at, now=seen_at):
+        await publish_event(
+            conn,
+            user_id=user_id,
+            event_type=PRESENCE_EVENT,
+            data={"device_id": device_id, "status": "online", "last_seen_at": seen_at},
+        )
+    presence_tracker.observe_heartbeat(device_id, user_id, seen_at)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import secrets
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Requests carrying this header with the ops token as its value are always profiled.
+PROFILE_HEADER = "x-pcinsight-profile"
+_UNMATCHED_ROUTE = "unmatched"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{'/'.join(parts[-2:])}:{name}"
+
+
+def _folded_stack(frame, max_depth: int) -> str:
+    labels: List[str] = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class StackSampler:
+    """Statistical profiler for requests served on the event loop thread.
+
+    A daemon thread wakes every ``profiler_interval_ms`` while at least one profiled
+    request is active, reads the loop thread's current frame and charges the folded
+    stack to whichever profiled request's task is running. Stacks are aggregated per
+    route template and dumped in the folded format read by flamegraph.pl/speedscope.
+    Work a request hands to other tasks or the threadpool is not attributed.
+    """
+
+    def __init__(self) -> None:
+        self._active: Dict[asyncio.Task, Counter] = {}
+        self._by_route: Dict[str, Counter] = {}
+        self._samples = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+
+    def should_profile(self, headers: Dict[str, str]) -> bool:
+        supplied = headers.get(PROFILE_HEADER)
+        if supplied and settings.ops_api_token:
+            return secrets.compare_digest(supplied.encode(), settings.ops_api_token.encode())
+        rate = settings.profiler_sample_rate
+        return rate > 0 and random.random() < rate
+
+    def begin(self) -> Optional[asyncio.Task]:
+        task = asyncio.current_task()
+        if task is None:
+            return None
+        self._ensure_thread()
+        with self._lock:
+            self._active[task] = Counter()
+        self._wakeup.set()
+        return task
+
+    def end(self, task: asyncio.Task, route: str) -> None:
+        with self._lock:
+            stacks = self._active.pop(task, None)
+            if stacks:
+                self._by_route.setdefault(route, Counter()).update(stacks)
+            if not self._active:
+                self._wakeup.clear()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            time.sleep(settings.profiler_interval_ms / 1000)
+            self.sample_once()
+
+    def sample_once(self) -> None:
+        loop = self._loop
+        if loop is None or not self._active:
+            return
+        try:
+            task = asyncio.current_task(loop)
+        except RuntimeError:
+            return
+        frame = sys._current_frames().get(self._loop_thread_id)
+        with self._lock:
+            stacks = self._active.get(task) if task is not None else None
+            if stacks is None or frame is None:
+                return
+            stacks[_folded_stack(frame, settings.profiler_max_stack_depth)] += 1
+            self._samples += 1
+
+    def dump_folded(self, route: Optional[str] = None) -> str:
+        """One ``route;frame;...;frame count`` line per distinct stack."""
+        with self._lock:
+            lines = [
+                f"{name};{stack} {count}"
+                for name, stacks in sorted(self._by_route.items())
+                if route is None or name == route
+                for stack, count in stacks.most_common()
+            ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: sum(stacks.values()) for name, stacks in sorted(self._by_route.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._by_route.clear()
+            self._samples = 0
+
+
+class ProfilingMiddleware:
+    """Opts individual requests into the stack sampler.
+
+    Must sit inside every middleware that runs the app in a child task (such as
+    ``@app.middleware("http")``), so the task registered here is the one executing the
+    endpoint.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        if not stack_sampler.should_profile(headers):
+            await self.app(scope, receive, send)
+            return
+        task = stack_sampler.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if task is not None:
+                route = getattr(scope.get("route"), "path", None) or _UNMATCHED_ROUTE
+                stack_sampler.end(task, f"{scope['method']} {route}")
+
+
+class EventLoopWatchdog:
+    """Logs the loop thread's stack when the event loop stops turning.
+
+    A coroutine on the loop refreshes a heartbeat every check interval; a daemon thread
+    watches it and, once the heartbeat is older than ``event_loop_lag_threshold_ms``,
+    logs where the loop thread is stuck (synchronous bcrypt, PDF rendering, ...).
+    Each blocked episode is logged once, with its total duration when it ends.
+    """
+
+    def __init__(self) -> None:
+        self.blocked_total = 0
+        self.max_lag_seconds = 0.0
+        self._beat = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+
+    def start(self) -> None:
+        if settings.event_loop_lag_threshold_ms <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat(), name="event-loop-heartbeat")
+        self._thread = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        task = self._task
+        self._task = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _heartbeat(self) -> None:
+        interval = settings.event_loop_lag_check_interval_ms / 1000
+        while True:
+            before = time.monotonic()
+            self._beat = before
+            await asyncio.sleep(interval)
+            lag = time.monotonic() - before - interval
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+    def _watch(self) -> None:
+        interval = settings.event_loop_lag_check_interval_ms / 1000
+        threshold = settings.event_loop_lag_threshold_ms / 1000
+        blocked_since: Optional[float] = None
+        while not self._stop.wait(interval / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat - interval
+            if stalled > threshold and blocked_since != beat:
+                blocked_since = beat
+                self.blocked_total += 1
+                self._log_blocked(stalled)
+            elif blocked_since is not None and beat != blocked_since:
+                logger.warning(
+                    "Event loop unblocked after %.0f ms",
+                    (beat - blocked_since) * 1000,
+                )
+                blocked_since = None
+
+    def _log_blocked(self, stalled: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "<no frame>\n"
+        logger.warning(
+            "Event loop blocked for more than %.0f ms; loop thread stack:\n%s",
+            stalled * 1000,
+            stack.rstrip(),
+        )
+
+
+stack_sampler = StackSampler()
+loop_watchdog = EventLoopWatchdog()
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RedisUnavailable(Exception):
+    """Redis is not configured, the circuit is open, or the command failed."""
+
+
+class RedisService:
+    """Process-wide Redis client behind a circuit breaker.
+
+    One bounded connection pool with short socket timeouts is shared by every caller.
+    After ``redis_breaker_failure_threshold`` consecutive failures the circuit opens:
+    calls fail immediately with ``RedisUnavailable`` so callers fall back to their
+    local behaviour without paying a connect timeout per request. While open, a
+    background task PINGs Redis every ``redis_breaker_probe_interval_seconds`` and
+    closes the circuit on the first success.
+    """
+
+    def __init__(self) -> None:
+        self._client: Optional[Any] = None
+        self._import_error = False
+        self._lock = Lock()
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self.errors_total = 0
+        self.short_circuited_total = 0
+        self.opened_total = 0
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.redis_url) and not self._import_error
+
+    @property
+    def circuit_open(self) -> bool:
+        return self._opened_at is not None
+
+    def _get_client(self) -> Optional[Any]:
+        if self._client is not None:
+            return self._client
+        try:
+            from redis import asyncio as redis_asyncio  # type: ignore
+        except Exception:
+            self._import_error = True
+            logger.warning("REDIS_URL is set but the redis package is not installed; using local fallbacks")
+            return None
+        pool = redis_asyncio.BlockingConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout_seconds,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_connect_timeout_seconds,
+            decode_responses=True,
+        )
+        self._client = redis_asyncio.Redis(connection_pool=pool)
+        return self._client
+
+    async def run(self, operation: Callable[[Any], Awaitable[T]]) -> T:
+        """Run ``operation(client)``; raises ``RedisUnavailable`` instead of Redis errors."""
+        if not settings.redis_url or self._import_error:
+            raise RedisUnavailable("Redis is not configured")
+        if self.circuit_open:
+            with self._lock:
+                self.short_circuited_total += 1
+            raise RedisUnavailable("Redis circuit is open")
+        client = self._get_client()
+        if client is None:
+            raise RedisUnavailable("Redis client is not available")
+        try:
+            result = await operation(client)
+        except Exception as exc:
+            self._record_failure(exc)
+            raise RedisUnavailable(str(exc) or type(exc).__name__) from exc
+        self._consecutive_failures = 0
+        return result
+
+    def _record_failure(self, exc: Exception) -> None:
+        with self._lock:
+            self.errors_total += 1
+            self._consecutive_failures += 1
+            if self.circuit_open or self._consecutive_failures < settings.redis_breaker_failure_threshold:
+                return
+            self._opened_at = time.monotonic()
+            self.opened_total += 1
+        logger.warning(
+            "Redis circuit opened after %d consecutive failures: %s",
+            self._consecutive_failures,
+            exc,
+        )
+        self._ensure_probe()
+
+    def _ensure_probe(self) -> None:
+        if self._probe_task is not None and not self._probe_task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._probe_task = asyncio.create_task(self._probe(), name="redis-circuit-probe")
+
+    async def _probe(self) -> None:
+        while self.circuit_open:
+            await asyncio.sleep(settings.redis_breaker_probe_interval_seconds)
+            client = self._get_client()
+            if client is None:
+                continue
+            try:
+                await client.ping()
+            except Exception as exc:
+                logger.debug("Redis probe failed: %s", exc)
+                continue
+            opened_at = self._opened_at
+            with self._lock:
+                self._opened_at = None
+                self._consecutive_failures = 0
+            if opened_at is not None:
+                logger.info("Redis circuit closed after %.1fs", time.monotonic() - opened_at)
+
+    async def close(self) -> None:
+        task = self._probe_task
+        self._probe_task = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        client = self._client
+        self._client = None
+        if client is not None:
+            try:
+                await client.aclose()
+            except Exception:
+                logger.exception("Error while closing Redis client")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "configured": self.configured,
+                "circuit_open": self.circuit_open,
+                "consecutive_failures": self._consecutive_failures,
+                "errors_total": self.errors_total,
+                "short_circuited_total": self.short_circuited_total,
+                "opened_total": self.opened_total,
+            }
+
+
+redis_service = RedisService()
@@ -0,0 +1,244 @@
+"""Delta encoding of raw report bodies against the device's previous report.
+
+Consecutive reports from one PC share most of their content, so with
+``report_delta_snapshot_interval`` > 0 a new body is stored as a JSON patch against the
+previous report of the same device, and ``reports.raw_report_base_id`` points at that
+report. Patches use RFC 6902 add/remove/replace semantics and RFC 6901 paths in a
+compact list form, ``["+", path, value]``, ``["-", path]`` and ``["=", path, value]``,
+since a scan changes many small numbers and the op objects would outweigh them. A full snapshot is stored every
+N reports, and whenever the patch would not be clearly smaller than the body. Readers
+call ``load_report_body``, which walks back to the nearest snapshot (or cached body)
+and replays the patches; the result goes through an LRU keyed by report id, where
+uploads also leave their own body since it is the next upload's base.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, List, Optional, Tuple
+
+from app.core import json_codec
+from app.core.config import settings
+from app.core.queries import EXPLAIN_DEVICE_ID, register_query
+from app.services.blob_store import BodyCache, get_report_body
+
+logger = logging.getLogger(__name__)
+
+ADD, REMOVE, REPLACE = "+", "-", "="
+# Store a delta only when it is at most this fraction of the full body.
+_MAX_DELTA_RATIO = 0.75
+# Guards against reference cycles in corrupted rows; real chains stop at the interval.
+_MAX_CHAIN = 1000
+
+LATEST_REPORT_BODY = register_query(
+    "report_delta.latest_body",
+    """
+    SELECT id, raw_report_json::text AS raw_report_json_text, raw_report_ref,
+           raw_report_base_id, raw_report_delta_depth
+    FROM reports
+    WHERE device_id = $1
+    ORDER BY created_at DESC
+    LIMIT 1
+    """,
+    hot=True,
+    explain_args=(EXPLAIN_DEVICE_ID,),
+)
+REPORT_BODY_SOURCE = register_query(
+    "report_delta.body_source",
+    """
+    SELECT id, raw_report_json::text AS raw_report_json_text, raw_report_ref,
+           raw_report_base_id, raw_report_delta_depth
+    FROM reports
+    WHERE id = $1
+    """,
+)
+
+
+class ReportBodyUnavailable(Exception):
+    pass
+
+
+_reconstructed = BodyCache()
+
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def diff(old: Any, new: Any) -> List[list]:
+    """Patch turning ``old`` into ``new``."""
+    ops: List[list] = []
+    _diff(old, new, "", ops)
+    return ops
+
+
+def _diff(old: Any, new: Any, path: str, ops: List[list]) -> None:
+    if type(old) is not type(new):
+        ops.append([REPLACE, path, new])
+    elif isinstance(old, dict):
+        for key in old:
+            if key not in new:
+                ops.append([REMOVE, f"{path}/{_escape(key)}"])
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key in old:
+                _diff(old[key], value, child, ops)
+            else:
+                ops.append([ADD, child, value])
+    elif isinstance(old, list):
+        _diff_list(old, new, path, ops)
+    elif old != new:
+        ops.append([REPLACE, path, new])
+
+
+def _same(old: Any, new: Any) -> bool:
+    """Equality that tells ``1``, ``1.0`` and ``True`` apart, as their JSON does."""
+    if type(old) is not type(new):
+        return False
+    if isinstance(old, dict):
+        return old.keys() == new.keys() and all(_same(value, new[key]) for key, value in old.items())
+    if isinstance(old, list):
+        return len(old) == len(new) and all(_same(a, b) for a, b in zip(old, new))
+    return old == new
+
+
+def _diff_list(old: list, new: list, path: str, ops: List[list]) -> None:
+    # Trim the common head and tail so an inserted or removed item costs one op
+    # instead of shifting every element after it.
+    limit = min(len(old), len(new))
+    head = 0
+    while head < limit and _same(old[head], new[head]):
+        head += 1
+    tail = 0
+    while tail < limit - head and _same(old[-1 - tail], new[-1 - tail]):
+        tail += 1
+    old_end = len(old) - tail
+    new_end = len(new) - tail
+    common = min(old_end, new_end)
+    for index in range(head, common):
+        _diff(old[index], new[index], f"{path}/{index}", ops)
+    for index in range(old_end - 1, common - 1, -1):
+        ops.append([REMOVE, f"{path}/{index}"])
+    for index in range(common, new_end):
+        ops.append([ADD, f"{path}/{index}", new[index]])
+
+
+def apply_patch(document: Any, ops: List[list]) -> Any:
+    """Apply a patch produced by ``diff``; ``document`` is modified in place."""
+    for op in ops:
+        kind, path = op[0], op[1]
+        if path == "":
+            if kind == REMOVE:
+                raise ValueError("Cannot remove the document root")
+            document = op[2]
+            continue
+        tokens = [_unescape(token) for token in path[1:].split("/")]
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if kind == ADD:
+                parent.insert(index, op[2])
+            elif kind == REMOVE:
+                del parent[index]
+            elif kind == REPLACE:
+                parent[index] = op[2]
+            else:
+                raise ValueError(f"Unsupported patch op: {kind}")
+        elif kind in (ADD, REPLACE):
+            parent[last] = op[2]
+        elif kind == REMOVE:
+            del parent[last]
+        else:
+            raise ValueError(f"Unsupported patch op: {kind}")
+    return document
+
+
+async def _stored_body(row) -> Optional[bytes]:
+    if row["raw_report_ref"]:
+        return await get_report_body(row["raw_report_ref"])
+    if row["raw_report_json_text"]:
+        return row["raw_report_json_text"].encode("utf-8")
+    return None
+
+
+async def load_report_body(conn, row) -> Optional[bytes]:
+    """Full raw body of a report row, replaying deltas; None when the row has no body.
+
+    ``row`` needs ``id``, ``raw_report_json_text``, ``raw_report_ref`` and
+    ``raw_report_base_id``; base rows are read through ``conn``.
+    """
+    cached = _reconstructed.get(row["id"])
+    if cached is not None:
+        return cached
+    requested_id = row["id"]
+    patches: List[bytes] = []
+    while True:
+        body = _reconstructed.get(row["id"]) if patches else None
+        if body is not None:
+            break
+        stored = await _stored_body(row)
+        if stored is None:
+            if not patches:
+                return None
+            raise ReportBodyUnavailable(f"Report {row['id']} has no body")
+        if not row["raw_report_base_id"]:
+            body = stored
+            break
+        patches.append(stored)
+        if len(patches) > _MAX_CHAIN:
+            raise ReportBodyUnavailable(f"Delta chain of report {requested_id} is too long")
+        base_id = row["raw_report_base_id"]
+        row = await REPORT_BODY_SOURCE.fetchrow(conn, base_id)
+        if row is None:
+            raise ReportBodyUnavailable(f"Base report {base_id} of {requested_id} is missing")
+
+    if not patches:
+        return body
+    document = json_codec.loads(body)
+    for patch in reversed(patches):
+        document = apply_patch(document, json_codec.loads(patch))
+    body = json_codec.dumps_bytes(document)
+    _reconstructed.put(requested_id, body)
+    return body
+
+
+def remember_report_body(report_id: str, body: bytes) -> None:
+    """Cache a freshly uploaded body; it is the base of the device's next report."""
+    if settings.report_delta_snapshot_interval > 0:
+        _reconstructed.put(report_id, body)
+
+
+async def encode_report_body(conn, device_id: str, report: Any, body: bytes) -> Tuple[bytes, Optional[str], int]:
+    """Bytes to store for a new report of ``device_id``, its base report id and delta depth.
+
+    Returns ``(body, None, 0)`` (a full snapshot) when delta encoding is off, the device
+    has no previous report, the snapshot interval is reached, the previous body cannot
+    be read, or the patch is not small enough to be worth it.
+    """
+    interval = settings.report_delta_snapshot_interval
+    if interval <= 0:
+        return body, None, 0
+    previous = await LATEST_REPORT_BODY.fetchrow(conn, device_id)
+    if previous is None:
+        return body, None, 0
+    depth = previous["raw_report_delta_depth"] + 1
+    if depth >= interval:
+        return body, None, 0
+    try:
+        previous_body = await load_report_body(conn, previous)
+    except Exception:
+        logger.exception("Previous report body unavailable, storing a snapshot: report=%s", previous["id"])
+        return body, None, 0
+    if previous_body is None:
+        return body, None, 0
+    delta = json_codec.dumps_bytes(diff(json_codec.loads(previous_body), report))
+    if len(delta) > len(body) * _MAX_DELTA_RATIO:
+        return body, None, 0
+    return delta, previous["id"], depth
@@ -1,18 +1,28 @@
 from __future__ import annotations
 
+import hashlib
 import time
 from collections import deque
+from dataclasses import dataclass
 from threading import Lock
-from typing import Deque, Dict, Optional
+from typing import Deque, Dict, List, Optional, Pattern, Tuple
 
-from fastapi import HTTPException, Request, status
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import compile_path
 
 from app.core.config import settings
+from app.services.redis_client import RedisUnavailable, redis_service
+from app.services.shared_counters import SharedCountersFull, get_shared_counters
 
 _REQUEST_BUCKETS: Dict[str, Deque[float]] = {}
 _REQUEST_LOCK = Lock()
-_REDIS_CLIENT: Optional[object] = None
-_REDIS_IMPORT_ERROR = False
+_REJECTIONS: Dict[str, int] = {}
+# Idle in-memory buckets are evicted at most this often; every new fingerprint or IP
+# creates a key, so without eviction the dict grows for the life of the worker.
+_EVICT_INTERVAL_SECONDS = 60.0
+_next_eviction = 0.0
+_longest_window = 0
 
 
 def _client_id(request: Request) -> str:
@@ -24,24 +34,44 @@ def _client_id(request: Request) -> str:
     return "unknown"
 
 
-async def _get_redis_client():
-    global _REDIS_CLIENT, _REDIS_IMPORT_ERROR
-    if _REDIS_CLIENT is not None:
-        return _REDIS_CLIENT
-    if _REDIS_IMPORT_ERROR or not settings.redis_url:
+def _token_fingerprint(request: Request) -> Optional[str]:
+    # Bearer token or auth cookie, hashed but not verified: enough to give every
+    # device/session its own bucket without a database lookup. Because anyone can mint
+    # fingerprints, token buckets sit behind a per-IP ceiling (see RateLimitMiddleware).
+    authorization = request.headers.get("authorization", "")
+    token = authorization[7:].strip() if authorization[:7].lower() == "bearer " else ""
+    token = token or request.cookies.get(settings.auth_cookie_name, "")
+    if not token:
         return None
-    try:
-        from redis import asyncio as redis_asyncio  # type: ignore
-    except Exception:
-        _REDIS_IMPORT_ERROR = True
-        return None
-    _REDIS_CLIENT = redis_asyncio.from_url(settings.redis_url, decode_responses=True)
-    return _REDIS_CLIENT
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:24]
+
+
+def record_rate_limit_rejection(scope: str) -> None:
+    with _REQUEST_LOCK:
+        _REJECTIONS[scope] = _REJECTIONS.get(scope, 0) + 1
+
+
+def get_rate_limit_rejections_snapshot() -> Dict[str, int]:
+    with _REQUEST_LOCK:
+        return dict(_REJECTIONS)
+
+
+def _evict_idle_buckets(now: float) -> None:
+    # Caller holds _REQUEST_LOCK. A bucket whose newest hit is older than the longest
+    # window in use can no longer limit anything.
+    for key, bucket in list(_REQUEST_BUCKETS.items()):
+        if not bucket or (now - bucket[-1]) > _longest_window:
+            del _REQUEST_BUCKETS[key]
 
 
 def _allow_in_memory(key: str, limit: int, window_seconds: int) -> bool:
+    global _next_eviction, _longest_window
     now = time.monotonic()
     with _REQUEST_LOCK:
+        _longest_window = max(_longest_window, window_seconds)
+        if now >= _next_eviction:
+            _evict_idle_buckets(now)
+            _next_eviction = now + _EVICT_INTERVAL_SECONDS
         bucket = _REQUEST_BUCKETS.get(key)
         if bucket is None:
             bucket = deque()
@@ -58,33 +88,158 @@ def _allow_in_memory(key: str, limit: int, window_seconds: int) -> bool:
 
 
 async def allow_rate_limit_key(*, scope_key: str, limit: int, window_seconds: int = 60) -> bool:
-    redis_client = await _get_redis_client()
-    if redis_client is not None:
+    bucket = int(time.time()) // window_seconds
+    redis_key = f"{settings.redis_rate_limit_prefix}:{scope_key}:{bucket}"
+
+    async def incr(client) -> int:
+        count = await client.incr(redis_key)
+        if count == 1:
+            await client.expire(redis_key, window_seconds + 1)
+        return count
+
+    try:
+        return await redis_service.run(incr) <= limit
+    except RedisUnavailable:
+        pass
+    # Without Redis, workers on one host still share a window through the mmap table.
+    counters = get_shared_counters()
+    if counters is not None:
         try:
-            bucket = int(time.time()) // window_seconds
-            redis_key = f"{settings.redis_rate_limit_prefix}:{scope_key}:{bucket}"
-            count = await redis_client.incr(redis_key)
-            if count == 1:
-                await redis_client.expire(redis_key, window_seconds + 1)
-            return count <= limit
-        except Exception:
-            # Fallback to process-local limiter if redis is unavailable at runtime.
+            return counters.add(f"rl:{scope_key}:{bucket}", ttl_seconds=window_seconds + 1) <= limit
+        except (OSError, SharedCountersFull):
             pass
+    # Per-worker limits as the last resort.
     return _allow_in_memory(scope_key, limit, window_seconds)
 
 
-async def enforce_request_rate_limit(
-    *,
-    request: Request,
-    scope: str,
-    limit: int | None = None,
-    window_seconds: int | None = None,
-) -> None:
-    max_requests = limit or settings.rate_limit_requests
-    window = window_seconds or settings.rate_limit_window_seconds
-    key = f"{scope}:{_client_id(request)}"
-    if not await allow_rate_limit_key(scope_key=key, limit=max_requests, window_seconds=window):
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Too many requests. Please try again later.",
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """Limit for one route; limits are read from Settings on every request.
+
+    ``key`` is "client" (IP) for unauthenticated routes and "token" (fingerprint of the
+    presented credential, falling back to the IP) for authenticated ones. Token-keyed
+    requests must also pass a per-IP ceiling of ``rate_limit_ip_ceiling_multiplier``
+    times the limit.
+    """
+
+    name: str
+    key: str = "token"
+    limit_setting: str = "rate_limit_requests"
+    window_setting: str = "rate_limit_window_seconds"
+
+    def limit(self) -> int:
+        return int(getattr(settings, self.limit_setting))
+
+    def window_seconds(self) -> int:
+        return int(getattr(settings, self.window_setting))
+
+
+_LOGIN_LIMITS = {
+    "limit_setting": "auth_login_rate_limit_requests",
+    "window_setting": "auth_login_rate_limit_window_seconds",
+}
+
+# (method, route template) -> policy. Static segments before parameters where two
+# templates could match the same path; the first match wins.
+RATE_LIMIT_POLICIES: Dict[Tuple[str, str], RateLimitPolicy] = {
+    ("POST", "/v1/auth/login"): RateLimitPolicy("auth:login", key="client", **_LOGIN_LIMITS),
+    ("POST", "/v1/auth/refresh"): RateLimitPolicy("auth:refresh", key="client", **_LOGIN_LIMITS),
+    ("POST", "/v1/auth/register"): RateLimitPolicy(
+        "auth:register",
+        key="client",
+        limit_setting="auth_register_rate_limit_requests",
+        window_setting="auth_register_rate_limit_window_seconds",
+    ),
+    ("POST", "/v1/tokens/enroll"): RateLimitPolicy("token:enroll"),
+    ("POST", "/v1/tokens/enroll/status"): RateLimitPolicy("token:enroll:status"),
+    ("POST", "/v1/devices/{device_id}/commands"): RateLimitPolicy("commands:create"),
+    ("GET", "/v1/devices/{device_id}/commands"): RateLimitPolicy("commands:list"),
+    ("GET", "/v1/commands/{command_id}"): RateLimitPolicy("commands:get"),
+    ("GET", "/v1/reports/share/{share_token}"): RateLimitPolicy(
+        "report:share:public",
+        key="client",
+        limit_setting="share_public_rate_limit_requests",
+        window_setting="share_public_rate_limit_window_seconds",
+    ),
+    ("POST", "/v1/reports/share/{share_ref}/revoke"): RateLimitPolicy("report:share:revoke"),
+    ("GET", "/v1/reports/{report_id}"): RateLimitPolicy("report:detail"),
+    ("GET", "/v1/reports/{report_id}/export"): RateLimitPolicy("report:export"),
+    ("POST", "/v1/reports/{report_id}/share"): RateLimitPolicy("report:share:create"),
+    ("GET", "/v1/reports/{report_id}/shares"): RateLimitPolicy("report:share:list"),
+    ("POST", "/v1/agent/enroll"): RateLimitPolicy("agent:enroll", key="client"),
+    ("GET", "/v1/agent/commands/next"): RateLimitPolicy("agent:next"),
+    ("POST", "/v1/agent/commands/{command_id}/status"): RateLimitPolicy("agent:status"),
+    ("POST", "/v1/agent/reports"): RateLimitPolicy("agent:report"),
+    ("POST", "/v1/agent/heartbeat"): RateLimitPolicy("agent:heartbeat"),
+}
+
+_COMPILED: Dict[str, List[Tuple[Pattern[str], str, RateLimitPolicy]]] = {}
+for (_method, _template), _policy in RATE_LIMIT_POLICIES.items():
+    _COMPILED.setdefault(_method, []).append((compile_path(_template)[0], _template, _policy))
+
+
+def match_policy(method: str, path: str) -> Optional[Tuple[str, RateLimitPolicy]]:
+    for pattern, template, policy in _COMPILED.get(method, ()):
+        if pattern.match(path):
+            return template, policy
+    return None
+
+
+def _retry_after(window_seconds: int) -> str:
+    return str(window_seconds - int(time.time()) % window_seconds)
+
+
+class RateLimitMiddleware:
+    """Applies RATE_LIMIT_POLICIES before routing and authentication.
+
+    A rejected request is answered here with 429, so it never resolves
+    ``verify_device_token``/``get_current_user`` or touches Postgres.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        matched = match_policy(scope["method"], scope["path"])
+        if matched is None:
+            await self.app(scope, receive, send)
+            return
+
+        template, policy = matched
+        request = Request(scope)
+        client = _client_id(request)
+        fingerprint = _token_fingerprint(request) if policy.key == "token" else None
+        window = policy.window_seconds()
+        if await self._allow(policy, client, fingerprint, window):
+            await self.app(scope, receive, send)
+            return
+
+        record_rate_limit_rejection(policy.name)
+        # Lets request metrics label the 429 with its route although routing never ran.
+        scope["route_template"] = template
+        response = JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests. Please try again later."},
+            headers={"Retry-After": _retry_after(window)},
+        )
+        await response(scope, receive, send)
+
+    @staticmethod
+    async def _allow(policy: RateLimitPolicy, client: str, fingerprint: Optional[str], window: int) -> bool:
+        if fingerprint is None:
+            return await allow_rate_limit_key(
+                scope_key=f"{policy.name}:ip:{client}", limit=policy.limit(), window_seconds=window
+            )
+        # Fingerprints are unverified, so a client rotating made-up tokens would get a
+        # fresh bucket per request; the IP ceiling bounds that before the token bucket.
+        multiplier = settings.rate_limit_ip_ceiling_multiplier
+        if multiplier > 0 and not await allow_rate_limit_key(
+            scope_key=f"{policy.name}:ceiling:ip:{client}", limit=policy.limit() * multiplier, window_seconds=window
+        ):
+            return False
+        return await allow_rate_limit_key(
+            scope_key=f"{policy.name}:t:{fingerprint}", limit=policy.limit(), window_seconds=window
         )
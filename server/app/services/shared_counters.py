@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None  # type: ignore[assignment]
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PCICNT01"
+# magic, slot count, stripe count; padded so slots start on a cache line.
+_HEADER = struct.Struct("<8sII")
+HEADER_SIZE = 64
+# key hash (0 = never used), expires_at epoch seconds (0 = never), value.
+_SLOT = struct.Struct("<QqqQ")
+SLOT_SIZE = _SLOT.size
+_STRIPES = 64
+
+
+class SharedCountersFull(Exception):
+    """Every slot in the key's stripe holds a live counter."""
+
+
+class SharedCounters:
+    """Fixed-size hash table of int64 counters in an mmap'd file shared by all workers.
+
+    Keys are stored as 64-bit blake2b hashes with linear probing inside one of
+    ``_STRIPES`` stripes; each stripe is guarded by a byte-range ``lockf`` lock (other
+    processes) plus a ``threading.Lock`` (this process), so an increment is atomic
+    across every worker on the node. Counters can carry a TTL: expired slots are
+    reused in place and never cleared, which keeps probe chains intact without
+    tombstones. Point the path at tmpfs (``/dev/shm``) so pages never hit disk.
+    """
+
+    def __init__(self, path: str, slots: int) -> None:
+        self.path = path
+        self._requested_slots = max(_STRIPES, slots - slots % _STRIPES)
+        self.slots = self._requested_slots
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self._pid: Optional[int] = None
+        self._locks: List[Lock] = [Lock() for _ in range(_STRIPES)]
+        self._open_lock = Lock()
+
+    def _ensure_open(self) -> mmap.mmap:
+        # Re-open after fork: lockf locks and the mapping belong to the parent.
+        if self._map is not None and self._pid == os.getpid():
+            return self._map
+        with self._open_lock:
+            if self._map is not None and self._pid == os.getpid():
+                return self._map
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+                try:
+                    header = os.pread(fd, _HEADER.size, 0)
+                    if len(header) == _HEADER.size and header[:8] == MAGIC:
+                        _, self.slots, _ = _HEADER.unpack(header)
+                    else:
+                        self.slots = self._requested_slots
+                        os.ftruncate(fd, HEADER_SIZE + self.slots * SLOT_SIZE)
+                        os.pwrite(fd, _HEADER.pack(MAGIC, self.slots, _STRIPES), 0)
+                finally:
+                    fcntl.lockf(fd, fcntl.LOCK_UN)
+                self._map = mmap.mmap(fd, HEADER_SIZE + self.slots * SLOT_SIZE)
+            except Exception:
+                os.close(fd)
+                raise
+            self._fd = fd
+            self._pid = os.getpid()
+            return self._map
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        digest = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest or 1
+
+    @contextmanager
+    def _stripe(self, stripe: int) -> Iterator[None]:
+        with self._locks[stripe]:
+            # One lock byte per stripe inside the header; lockf ranges are advisory.
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def _probe(self, key_hash: int) -> Iterator[int]:
+        per_stripe = self.slots // _STRIPES
+        base = (key_hash % _STRIPES) * per_stripe
+        start = (key_hash // _STRIPES) % per_stripe
+        for step in range(per_stripe):
+            yield HEADER_SIZE + (base + (start + step) % per_stripe) * SLOT_SIZE
+
+    def add(self, key: str, amount: int = 1, *, ttl_seconds: int = 0) -> int:
+        """Add ``amount`` to ``key`` and return the new value.
+
+        With ``ttl_seconds`` the counter starts over once expired (fixed windows).
+        """
+        buffer = self._ensure_open()
+        key_hash = self._hash(key)
+        now = int(time.time())
+        with self._stripe(key_hash % _STRIPES):
+            free: Optional[int] = None
+            for offset in self._probe(key_hash):
+                slot_hash, expires_at, value, _ = _SLOT.unpack_from(buffer, offset)
+                live = expires_at == 0 or expires_at > now
+                if slot_hash == key_hash and live:
+                    value += amount
+                    _SLOT.pack_into(buffer, offset, slot_hash, expires_at, value, 0)
+                    return value
+                if free is None and (slot_hash == 0 or not live):
+                    free = offset
+                if slot_hash == 0:
+                    break
+            if free is None:
+                raise SharedCountersFull(key)
+            expires_at = now + ttl_seconds if ttl_seconds else 0
+            _SLOT.pack_into(buffer, free, key_hash, expires_at, amount, 0)
+            return amount
+
+    def get(self, key: str) -> int:
+        buffer = self._ensure_open()
+        key_hash = self._hash(key)
+        now = int(time.time())
+        with self._stripe(key_hash % _STRIPES):
+            for offset in self._probe(key_hash):
+                slot_hash, expires_at, value, _ = _SLOT.unpack_from(buffer, offset)
+                if slot_hash == key_hash and (expires_at == 0 or expires_at > now):
+                    return value
+                if slot_hash == 0:
+                    break
+        return 0
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fd is not None and self._pid == os.getpid():
+            os.close(self._fd)
+        self._fd = None
+        self._pid = None
+
+
+_COUNTERS: Optional[SharedCounters] = None
+
+
+def get_shared_counters() -> Optional[SharedCounters]:
+    """The node-wide counter table, or None when ``shared_counters_path`` is unset."""
+    global _COUNTERS
+    path = settings.shared_counters_path
+    if not path or fcntl is None:
+        return None
+    if _COUNTERS is None or _COUNTERS.path != path:
+        _COUNTERS = SharedCounters(path, settings.shared_counters_slots)
+    return _COUNTERS
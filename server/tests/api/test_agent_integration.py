@@ -28,7 +28,7 @@ def mock_db():
     
     # Mock the async context manager get_connection
     @asynccontextmanager
-    async def mock_get_connection():
+    async def mock_get_connection(**_kwargs):
         yield mock_conn
 
     # Patch where it is imported/used. 
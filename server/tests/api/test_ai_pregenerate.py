@@ -0,0 +1,153 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.api.v1.deps import get_current_user
+from app.core.config import settings
+from app.main import app
+
+
+class MockConnection:
+    def __init__(self):
+        self.fetch = AsyncMock()
+        self.executemany = AsyncMock()
+
+
+def _device_row(device_id: str, report_id: str, health_score: int) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "device_id": device_id,
+        "last_seen_at": now,
+        "id": report_id,
+        "health_score": health_score,
+        "disk_free_percent": 40.0,
+        "startup_apps_count": 10,
+        "one_liner": "테스트",
+        "created_at": now,
+    }
+
+
+@pytest.mark.anyio
+async def test_pregenerate_batches_devices_and_writes_once(client, monkeypatch):
+    mock_conn = MockConnection()
+    mock_conn.fetch.side_effect = [
+        [
+            _device_row("dev_1", "rpt_1", 90),
+            _device_row("dev_2", "rpt_2", 50),
+            _device_row("dev_3", "rpt_3", 70),
+        ],
+        [{"report_id": "rpt_3"}],
+    ]
+
+    @asynccontextmanager
+    async def mock_get_connection(**_kwargs):
+        yield mock_conn
+
+    monkeypatch.setattr(settings, "enable_ai_copilot", True)
+    monkeypatch.setattr(settings, "ai_batch_size", 8)
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
+
+    provider_response = {
+        "results": [
+            {"device_id": "dev_1", "summary": "양호", "risk_level": "low", "reasons": [], "recommended_actions": []},
+            {"device_id": "dev_2", "summary": "위험", "risk_level": "high", "reasons": [], "recommended_actions": []},
+        ]
+    }
+    mocked_call = AsyncMock(return_value=provider_response)
+    with patch("app.api.v1.routers.ai.get_connection", side_effect=mock_get_connection):
+        with patch("app.services.ai_runtime.check_rate_limit", new=AsyncMock(return_value=True)):
+            with patch("app.services.ai_runtime._call_provider_chat", new=mocked_call):
+                response = await client.post("/v1/ai/insights/pregenerate?provider=openai")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body == {
+        "provider": "openai",
+        "total_devices": 3,
+        "generated": 2,
+        "skipped": 1,
+        "failed": 0,
+        "remaining": 0,
+        "llm_calls": 1,
+    }
+    assert mocked_call.await_count == 1
+    assert mock_conn.executemany.await_count == 1
+    written = mock_conn.executemany.await_args.args[1]
+    assert [row[1] for row in written] == ["dev_1", "dev_2"]
+    app.dependency_overrides = {}
+
+
+@pytest.mark.anyio
+async def test_pregenerate_does_not_cache_fallbacks_and_caps_batches(client, monkeypatch):
+    mock_conn = MockConnection()
+    mock_conn.fetch.side_effect = [
+        [_device_row(f"dev_{index}", f"rpt_{index}", 70) for index in range(5)],
+        [],
+    ]
+
+    @asynccontextmanager
+    async def mock_get_connection(**_kwargs):
+        yield mock_conn
+
+    monkeypatch.setattr(settings, "enable_ai_copilot", True)
+    monkeypatch.setattr(settings, "ai_batch_size", 2)
+    monkeypatch.setattr(settings, "ai_pregenerate_max_batches", 2)
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
+
+    # The first batch answers only dev_0; dev_1 falls back and must not be cached.
+    provider_response = {
+        "results": [
+            {"device_id": "dev_0", "summary": "양호", "risk_level": "low", "reasons": [], "recommended_actions": []},
+            {"device_id": "dev_2", "summary": "양호", "risk_level": "low", "reasons": [], "recommended_actions": []},
+        ]
+    }
+    mocked_call = AsyncMock(return_value=provider_response)
+    with patch("app.api.v1.routers.ai.get_connection", side_effect=mock_get_connection):
+        with patch("app.services.ai_runtime.check_rate_limit", new=AsyncMock(return_value=True)):
+            with patch("app.services.ai_runtime._call_provider_chat", new=mocked_call):
+                response = await client.post("/v1/ai/insights/pregenerate?provider=openai")
+    app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "provider": "openai",
+        "total_devices": 5,
+        "generated": 2,
+        "skipped": 0,
+        "failed": 2,
+        "remaining": 1,
+        "llm_calls": 2,
+    }
+    written = mock_conn.executemany.await_args.args[1]
+    assert [row[1] for row in written] == ["dev_0", "dev_2"]
+
+
+@pytest.mark.anyio
+async def test_pregenerate_rate_limited_makes_no_call_and_writes_nothing(client, monkeypatch):
+    mock_conn = MockConnection()
+    mock_conn.fetch.side_effect = [[_device_row("dev_1", "rpt_1", 70)], []]
+
+    @asynccontextmanager
+    async def mock_get_connection(**_kwargs):
+        yield mock_conn
+
+    monkeypatch.setattr(settings, "enable_ai_copilot", True)
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
+
+    mocked_call = AsyncMock()
+    with patch("app.api.v1.routers.ai.get_connection", side_effect=mock_get_connection):
+        with patch("app.services.ai_runtime.check_rate_limit", new=AsyncMock(return_value=False)):
+            with patch("app.services.ai_runtime._call_provider_chat", new=mocked_call):
+                response = await client.post("/v1/ai/insights/pregenerate?provider=openai")
+    app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["generated"], body["failed"], body["llm_calls"]) == (0, 1, 0)
+    assert mocked_call.await_count == 0
+    assert mock_conn.executemany.await_count == 0
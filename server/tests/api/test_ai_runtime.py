@@ -5,7 +5,12 @@ import pytest
 
 from app.core.config import settings
 from app.models import DeviceAiSummaryResponse
-from app.services.ai_runtime import generate_device_ai_summary
+from app.services.ai_runtime import (
+    _build_batch_user_prompt,
+    generate_device_ai_summaries_batch,
+    generate_device_ai_summary,
+    stream_device_ai_summary,
+)
 
 
 def _rule_based() -> DeviceAiSummaryResponse:
@@ -104,3 +109,154 @@ async def test_generate_ai_summary_applies_manager_view(monkeypatch):
     assert result.source == "rule_based"
     assert result.summary.startswith("관리자 요약:")
     assert any(reason.startswith("업무 영향 관점") for reason in result.reasons)
+
+
+@pytest.mark.anyio
+async def test_generate_ai_summaries_batch_splits_and_falls_back_per_item(monkeypatch):
+    monkeypatch.setattr(settings, "enable_ai_copilot", True)
+    monkeypatch.setattr(settings, "ai_provider", "openai")
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    items = [
+        {"device_id": "dev_a", "is_online": True, "latest_report": {"health_score": 50}, "rule_based": _rule_based()},
+        {"device_id": "dev_b", "is_online": False, "latest_report": None, "rule_based": _rule_based()},
+    ]
+    provider_response = {
+        "results": [
+            {
+                "device_id": "dev_a",
+                "summary": "디스크 정리 필요",
+                "risk_level": "high",
+                "reasons": ["디스크 부족"],
+                "recommended_actions": [
+                    {"command_type": "RUN_STORAGE_ONLY", "label": "스토리지 점검", "reason": "디스크"},
+                ],
+            },
+            {"device_id": "dev_unknown", "summary": "ignored"},
+        ]
+    }
+    mocked_call = AsyncMock(return_value=provider_response)
+    with patch("app.services.ai_runtime.check_rate_limit", new=AsyncMock(return_value=True)):
+        with patch("app.services.ai_runtime._call_provider_chat", new=mocked_call):
+            results, calls = await generate_device_ai_summaries_batch(
+                items=items,
+                rate_limit_key="user:1:batch",
+                trace_id="t6",
+                provider="openai",
+            )
+
+    assert mocked_call.await_count == 1
+    assert calls == 1
+    assert set(results) == {"dev_a", "dev_b"}
+    assert results["dev_a"].source == "llm"
+    assert results["dev_a"].risk_level == "high"
+    assert results["dev_b"].source == "fallback"
+
+
+@pytest.mark.anyio
+async def test_generate_ai_summaries_batch_falls_back_when_call_fails(monkeypatch):
+    monkeypatch.setattr(settings, "enable_ai_copilot", True)
+    monkeypatch.setattr(settings, "ai_provider", "openai")
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    items = [
+        {"device_id": "dev_a", "is_online": True, "latest_report": None, "rule_based": _rule_based()},
+    ]
+    with patch("app.services.ai_runtime.check_rate_limit", new=AsyncMock(return_value=True)):
+        with patch("app.services.ai_runtime._call_provider_chat", side_effect=RuntimeError("openai 500")):
+            results, calls = await generate_device_ai_summaries_batch(
+                items=items,
+                rate_limit_key="user:1:batch",
+                trace_id="t7",
+                provider="openai",
+            )
+    assert results["dev_a"].source == "fallback"
+    assert calls == 1
+
+
+@pytest.mark.anyio
+async def test_generate_ai_summaries_batch_splits_chunks_to_prompt_limit(monkeypatch):
+    monkeypatch.setattr(settings, "enable_ai_copilot", True)
+    monkeypatch.setattr(settings, "ai_provider", "openai")
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    items = [
+        {"device_id": f"dev_{index}", "is_online": True, "latest_report": {"one_liner": "x" * 200},
+         "rule_based": _rule_based()}
+        for index in range(4)
+    ]
+    items.append(
+        {"device_id": "dev_huge", "is_online": True, "latest_report": {"one_liner": "x" * 5000},
+         "rule_based": _rule_based()}
+    )
+    # Room for exactly two regular devices per prompt; dev_huge never fits.
+    monkeypatch.setattr(settings, "ai_max_prompt_chars", len(_build_batch_user_prompt(items[:2])))
+
+    prompts = []
+
+    async def fake_call(provider, messages, trace_id):
+        prompts.append(messages[1]["content"])
+        return {"results": []}
+
+    with patch("app.services.ai_runtime.check_rate_limit", new=AsyncMock(return_value=True)):
+        with patch("app.services.ai_runtime._call_provider_chat", side_effect=fake_call):
+            results, calls = await generate_device_ai_summaries_batch(
+                items=items,
+                rate_limit_key="user:1:batch",
+                trace_id="t8",
+                provider="openai",
+            )
+
+    assert calls == 2
+    assert all("dev_huge" not in prompt for prompt in prompts)
+    assert set(results) == {"dev_0", "dev_1", "dev_2", "dev_3", "dev_huge"}
+
+
+@pytest.mark.anyio
+async def test_generate_ai_summaries_batch_rate_limited_makes_no_call(monkeypatch):
+    monkeypatch.setattr(settings, "enable_ai_copilot", True)
+    monkeypatch.setattr(settings, "ai_provider", "openai")
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    items = [{"device_id": "dev_a", "is_online": True, "latest_report": None, "rule_based": _rule_based()}]
+    mocked_call = AsyncMock()
+    with patch("app.services.ai_runtime.check_rate_limit", new=AsyncMock(return_value=False)):
+        with patch("app.services.ai_runtime._call_provider_chat", new=mocked_call):
+            results, calls = await generate_device_ai_summaries_batch(
+                items=items,
+                rate_limit_key="user:1:batch",
+                trace_id="t9",
+                provider="openai",
+            )
+
+    assert calls == 0
+    assert mocked_call.await_count == 0
+    assert results["dev_a"].source == "rate_limited"
+
+
+@pytest.mark.anyio
+async def test_stream_ai_summary_yields_deltas_then_validated_result(monkeypatch):
+    monkeypatch.setattr(settings, "enable_ai_copilot", True)
+    monkeypatch.setattr(settings, "ai_provider", "openai")
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+
+    async def fake_stream(provider, messages, trace_id):
+        yield '{"summary": "스트림 요약", "risk_level": "HIGH", '
+        yield '"reasons": ["디스크"], "recommended_actions": [{"command_type": "FORMAT_DISK"}]}'
+
+    with patch("app.services.ai_runtime.check_rate_limit", new=AsyncMock(return_value=True)):
+        with patch("app.services.ai_runtime._stream_provider_chat", new=fake_stream):
+            events = [
+                event
+                async for event in stream_device_ai_summary(
+                    is_online=True,
+                    latest_report={"health_score": 40},
+                    rule_based=_rule_based(),
+                    rate_limit_key="user:1",
+                    trace_id="t8",
+                    provider="openai",
+                )
+            ]
+
+    kinds = [kind for kind, _ in events]
+    assert kinds == ["delta", "delta", "result"]
+    result = events[-1][1]
+    assert result.source == "llm"
+    assert result.risk_level == "high"
+    assert result.recommended_actions == []
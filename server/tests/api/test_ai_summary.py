@@ -256,3 +256,40 @@ async def test_ai_summary_manager_view_does_not_overwrite_cache(client, monkeypa
     assert mocked_generate.await_args.kwargs["audience"] == "manager"
     assert mock_conn.execute.await_count == 0
     app.dependency_overrides = {}
+
+
+@pytest.mark.anyio
+async def test_ai_summary_stream_emits_rule_based_then_result(client, monkeypatch):
+    mock_conn = MockConnection()
+    mock_conn.fetchrow.side_effect = [
+        {"id": "dev_1", "last_seen_at": datetime.now(timezone.utc)},
+        {
+            "id": "rpt_stream",
+            "health_score": 90,
+            "disk_free_percent": 50.0,
+            "startup_apps_count": 5,
+            "one_liner": "정상 상태",
+            "created_at": datetime.now(timezone.utc),
+        },
+    ]
+
+    @asynccontextmanager
+    async def mock_get_connection():
+        yield mock_conn
+
+    monkeypatch.setattr(settings, "enable_ai_copilot", False)
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
+
+    with patch("app.api.v1.routers.devices.get_connection", side_effect=mock_get_connection):
+        response = await client.get("/v1/devices/dev_1/ai-summary/stream?provider=openai")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        line.split(":", 1)[1].strip()
+        for line in response.text.splitlines()
+        if line.startswith("event:")
+    ]
+    assert events == ["rule_based", "result", "done"]
+    assert mock_conn.execute.await_count == 0
+    app.dependency_overrides = {}
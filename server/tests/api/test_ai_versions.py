@@ -22,7 +22,7 @@ async def test_ai_versions_endpoint_returns_active_and_usage(client, monkeypatch
     ]
 
     @asynccontextmanager
-    async def mock_get_connection():
+    async def mock_get_read_connection(*_args):
         yield mock_conn
 
     monkeypatch.setattr(settings, "ai_prompt_version", "v2")
@@ -31,7 +31,7 @@ async def test_ai_versions_endpoint_returns_active_and_usage(client, monkeypatch
     monkeypatch.setattr(settings, "ai_model_version", "gpt-4o-mini-2026-01")
     app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
 
-    with patch("app.api.v1.routers.ai.get_connection", side_effect=mock_get_connection):
+    with patch("app.api.v1.routers.ai.get_read_connection", side_effect=mock_get_read_connection):
         response = await client.get("/v1/ai/versions")
 
     assert response.status_code == 200
@@ -54,7 +54,7 @@ async def test_ai_versions_filters_legacy_default_model_rows(client, monkeypatch
     ]
 
     @asynccontextmanager
-    async def mock_get_connection():
+    async def mock_get_read_connection(*_args):
         yield mock_conn
 
     monkeypatch.setattr(settings, "ai_prompt_version", "v1")
@@ -63,7 +63,7 @@ async def test_ai_versions_filters_legacy_default_model_rows(client, monkeypatch
     monkeypatch.setattr(settings, "ai_model_version", "default")
     app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
 
-    with patch("app.api.v1.routers.ai.get_connection", side_effect=mock_get_connection):
+    with patch("app.api.v1.routers.ai.get_read_connection", side_effect=mock_get_read_connection):
         response = await client.get("/v1/ai/versions")
 
     assert response.status_code == 200
@@ -0,0 +1,126 @@
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.api.v1.deps import get_current_user, verify_device_token
+from app.core.config import settings
+from app.main import app
+from app.services import blob_store
+
+REPORT = {
+    "healthScore": 72,
+    "storage": {"folders": [{"name": f"folder-{i}", "bytes": i * 4096} for i in range(200)]},
+}
+
+
+@pytest.fixture
+def local_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "report_blob_backend", "local")
+    monkeypatch.setattr(settings, "report_blob_dir", str(tmp_path))
+    monkeypatch.setattr(blob_store, "_STORE", None)
+    blob_store._body_cache.clear()
+    yield tmp_path
+    blob_store._body_cache.clear()
+
+
+def _detail_row(ref):
+    return {
+        "id": "rpt_1",
+        "device_id": "dev_1",
+        "command_id": None,
+        "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc),
+        "health_score": 72,
+        "disk_free_percent": 40.0,
+        "startup_apps_count": 3,
+        "one_liner": "양호",
+        "raw_report_json_text": None,
+        "raw_report_ref": ref,
+        "raw_report_base_id": None,
+    }
+
+
+async def _get_detail(client, conn):
+    @asynccontextmanager
+    async def mock_get_read_connection(*_args):
+        yield conn
+
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
+    try:
+        with patch("app.api.v1.routers.reports.get_read_connection", side_effect=mock_get_read_connection):
+            return await client.get("/v1/reports/rpt_1")
+    finally:
+        app.dependency_overrides = {}
+
+
+@pytest.mark.anyio
+async def test_bodies_are_compressed_and_content_addressed(local_store):
+    body = json.dumps(REPORT).encode("utf-8")
+
+    ref = await blob_store.put_report_body(body)
+
+    assert ref == await blob_store.put_report_body(body)
+    assert ref == blob_store.blob_ref(body)
+    stored = list(local_store.rglob(ref.split(":", 1)[1]))
+    assert len(stored) == 1
+    assert stored[0].stat().st_size < len(body) // 4
+    blob_store._body_cache.clear()
+    assert await blob_store.get_report_body(ref) == body
+
+
+@pytest.mark.anyio
+async def test_upload_stores_ref_instead_of_inline_json(client, local_store):
+    conn = MagicMock()
+    conn.fetchval = AsyncMock(side_effect=lambda _sql, *args: args[0])
+    conn.execute = AsyncMock()
+
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        yield conn
+
+    app.dependency_overrides[verify_device_token] = lambda: {"device_id": "dev_1", "user_id": "usr_1"}
+    try:
+        with patch("app.api.v1.routers.agent.get_connection", side_effect=mock_get_connection), \
+                patch("app.api.v1.routers.agent.publish_event", AsyncMock()):
+            response = await client.post("/v1/agent/reports", json={"command_id": None, "report": REPORT})
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    args = conn.fetchval.await_args_list[0].args
+    inline_json, ref = args[9], args[10]
+    assert inline_json is None
+    assert ref.startswith("sha256:")
+    assert json.loads(await blob_store.get_report_body(ref)) == REPORT
+
+
+@pytest.mark.anyio
+async def test_detail_loads_body_from_blob_store_once(client, local_store):
+    body = json.dumps(REPORT).encode("utf-8")
+    ref = await blob_store.put_report_body(body)
+    conn = MagicMock()
+    conn.fetchrow = AsyncMock(return_value=_detail_row(ref))
+
+    with patch.object(blob_store.LocalBlobStore, "_get", autospec=True,
+                      side_effect=blob_store.LocalBlobStore._get) as read_blob:
+        first = await _get_detail(client, conn)
+        second = await _get_detail(client, conn)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json()["raw_report_json"] == REPORT
+    assert second.content == first.content
+    assert read_blob.call_count == 1
+
+
+@pytest.mark.anyio
+async def test_missing_blob_returns_summary_with_null_body(client, local_store):
+    conn = MagicMock()
+    conn.fetchrow = AsyncMock(return_value=_detail_row(blob_store.blob_ref(b"gone")))
+
+    response = await _get_detail(client, conn)
+
+    assert response.status_code == 200
+    assert response.json()["raw_report_json"] is None
+    assert response.json()["health_score"] == 72
@@ -0,0 +1,174 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.api.v1.deps import get_current_user
+from app.core.config import settings
+from app.main import app
+from app.services import event_bus
+
+
+class MockConnection:
+    def __init__(self):
+        self.fetchrow = AsyncMock()
+        self.execute = AsyncMock()
+        self.in_transaction = False
+
+    def is_in_transaction(self):
+        return self.in_transaction
+
+
+def _command_row(status: str) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "id": "cmd_1",
+        "type": "RUN_DEEP",
+        "status": status,
+        "progress": 10,
+        "message": "Scanning",
+        "created_at": now,
+        "started_at": now,
+        "finished_at": None,
+        "report_id": None,
+    }
+
+
+def _event_names(body: str) -> list:
+    return [line.split(":", 1)[1].strip() for line in body.splitlines() if line.startswith("event:")]
+
+
+@pytest.fixture(autouse=True)
+def no_listener():
+    with patch("app.services.event_bus._ensure_listener", new=AsyncMock()):
+        yield
+
+
+@pytest.mark.anyio
+async def test_command_events_closes_immediately_for_terminal_command(client):
+    mock_conn = MockConnection()
+    mock_conn.fetchrow.return_value = _command_row("succeeded")
+
+    @asynccontextmanager
+    async def mock_get_connection():
+        yield mock_conn
+
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
+    with patch("app.api.v1.routers.commands.get_connection", side_effect=mock_get_connection):
+        response = await client.get("/v1/commands/cmd_1/events")
+
+    assert response.status_code == 200
+    assert _event_names(response.text) == ["snapshot", "done"]
+    assert "usr_1" not in event_bus._SUBSCRIPTIONS
+    app.dependency_overrides = {}
+
+
+@pytest.mark.anyio
+async def test_command_events_pushes_published_updates(client):
+    mock_conn = MockConnection()
+    mock_conn.fetchrow.return_value = _command_row("running")
+
+    @asynccontextmanager
+    async def mock_get_connection():
+        yield mock_conn
+
+    async def publish_later():
+        while "usr_1" not in event_bus._SUBSCRIPTIONS:
+            await asyncio.sleep(0.01)
+        for status, progress in (("running", 50), ("succeeded", 100)):
+            await event_bus.publish_event(
+                mock_conn,
+                user_id="usr_1",
+                event_type="command.updated",
+                data={"command_id": "cmd_1", "status": status, "progress": progress},
+            )
+
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
+    with patch("app.api.v1.routers.commands.get_connection", side_effect=mock_get_connection):
+        publisher = asyncio.create_task(publish_later())
+        response = await client.get("/v1/commands/cmd_1/events")
+        await publisher
+
+    assert response.status_code == 200
+    assert _event_names(response.text) == ["snapshot", "command", "command", "done"]
+    mock_conn.execute.assert_awaited()
+    assert mock_conn.execute.await_args.args[1] == event_bus.EVENT_CHANNEL
+    app.dependency_overrides = {}
+
+
+@pytest.mark.anyio
+async def test_publish_inside_transaction_defers_local_delivery():
+    mock_conn = MockConnection()
+    mock_conn.in_transaction = True
+    subscription = await event_bus.subscribe("usr_tx")
+    try:
+        deferred = await event_bus.publish_event(
+            mock_conn, user_id="usr_tx", event_type="command.updated", data={"command_id": "cmd_1"},
+        )
+        assert deferred == {"user_id": "usr_tx", "type": "command.updated", "data": {"command_id": "cmd_1"}}
+        assert subscription.queue.empty()
+
+        event_bus.dispatch_local([deferred, None])
+        assert subscription.queue.get_nowait() == deferred
+    finally:
+        event_bus.unsubscribe(subscription)
+
+
+@pytest.mark.anyio
+async def test_event_bus_enforces_per_user_subscription_limit(monkeypatch):
+    monkeypatch.setattr(settings, "event_stream_max_subscriptions_per_user", 2)
+    first = await event_bus.subscribe("usr_limit")
+    second = await event_bus.subscribe("usr_limit")
+    with pytest.raises(event_bus.SubscriptionLimitExceeded):
+        await event_bus.subscribe("usr_limit")
+    event_bus.unsubscribe(first)
+    third = await event_bus.subscribe("usr_limit")
+    event_bus.unsubscribe(second)
+    event_bus.unsubscribe(third)
+    assert "usr_limit" not in event_bus._SUBSCRIPTIONS
+
+
+class FakeListenerConnection:
+    def __init__(self):
+        self.closed = False
+        self.add_listener = AsyncMock()
+        self.termination_listeners = []
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+    def terminate(self):
+        self.closed = True
+        for callback in self.termination_listeners:
+            callback(self)
+
+
+@pytest.mark.anyio
+async def test_listener_reconnects_after_connection_loss(monkeypatch):
+    first, second = FakeListenerConnection(), FakeListenerConnection()
+    connect = AsyncMock(side_effect=[first, RuntimeError("db restarting"), second])
+    monkeypatch.setattr("asyncpg.connect", connect)
+    monkeypatch.setattr(event_bus, "_RECONNECT_INITIAL_DELAY_SECONDS", 0)
+    subscription = event_bus.Subscription("usr_1")
+    event_bus._SUBSCRIPTIONS["usr_1"] = {subscription}
+    try:
+        assert await event_bus._connect_listener()
+        first.terminate()
+        assert not event_bus._listener_active()
+        await asyncio.wait_for(event_bus._RECONNECT_TASK, timeout=1)
+
+        assert event_bus._LISTENER_CONN is second
+        assert connect.await_count == 3  # one failed attempt backed off and retried
+        second.add_listener.assert_awaited_once_with(event_bus.EVENT_CHANNEL, event_bus._on_notification)
+    finally:
+        event_bus.unsubscribe(subscription)
+        await event_bus.close_event_listener()
+    assert second.closed
@@ -0,0 +1,99 @@
+import base64
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.api.v1.deps import get_current_user
+from app.api.v1.routers.commands import LIST_DEVICE_COMMANDS, LIST_DEVICE_COMMANDS_AFTER
+from app.core.pagination import decode_cursor
+from app.core.security import generate_id
+from app.main import app
+
+BASE = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class MockConnection:
+    def __init__(self, rows):
+        self.fetchrow = AsyncMock(return_value={"id": "dev_1"})
+        self.fetch = AsyncMock(return_value=rows)
+        self.fetchval = AsyncMock(return_value=len(rows))
+
+
+def _command_rows(count: int) -> list:
+    return [
+        {
+            "id": f"cmd_{index:02d}",
+            "type": "RUN_FULL",
+            "status": "succeeded",
+            "progress": 100,
+            "message": "",
+            "created_at": BASE - timedelta(minutes=index),
+            "started_at": None,
+            "finished_at": None,
+            "report_id": None,
+        }
+        for index in range(count)
+    ]
+
+
+@pytest.fixture
+def as_user():
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
+    yield
+    app.dependency_overrides = {}
+
+
+async def _list(client, conn, query: str):
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        yield conn
+
+    with patch("app.api.v1.routers.commands.get_connection", side_effect=mock_get_connection):
+        return await client.get(f"/v1/devices/dev_1/commands{query}")
+
+
+@pytest.mark.anyio
+async def test_list_commands_returns_keyset_cursor(client, as_user):
+    conn = MockConnection(_command_rows(3))
+    response = await _list(client, conn, "?limit=2")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [command["id"] for command in body["commands"]] == ["cmd_00", "cmd_01"]
+    assert decode_cursor(body["next_cursor"]) == (BASE - timedelta(minutes=1), "cmd_01")
+    assert conn.fetch.await_args.args == (LIST_DEVICE_COMMANDS.sql, "dev_1", 3, 0)
+
+    conn = MockConnection(_command_rows(1))
+    response = await _list(client, conn, f"?limit=2&cursor={body['next_cursor']}")
+
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] is None
+    assert conn.fetch.await_args.args == (
+        LIST_DEVICE_COMMANDS_AFTER.sql, "dev_1", BASE - timedelta(minutes=1), "cmd_01", 3,
+    )
+
+
+@pytest.mark.anyio
+async def test_list_commands_rejects_malformed_cursor(client, as_user):
+    conn = MockConnection([])
+    no_id = base64.urlsafe_b64encode(BASE.isoformat().encode()).decode()
+    bad_date = base64.urlsafe_b64encode(b"yesterday|cmd_1").decode()
+    for cursor in ("not-a-cursor", no_id, bad_date):
+        response = await _list(client, conn, f"?cursor={cursor}")
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid cursor"
+    conn.fetch.assert_not_awaited()
+
+
+def test_generated_ids_are_time_ordered(monkeypatch):
+    ids = [generate_id("cmd") for _ in range(2000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert all(len(value) == len("cmd_") + 26 for value in ids)
+
+    later = 2_000_000_000_000 * 1_000_000  # 2033, in ns
+    monkeypatch.setattr("app.core.security.time.time_ns", lambda: later)
+    assert generate_id("cmd") > ids[-1]
+    assert generate_id("cmd")[4:14] == generate_id("cmd")[4:14]
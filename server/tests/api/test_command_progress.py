@@ -0,0 +1,136 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.api.v1.deps import verify_device_token
+from app.core.config import settings
+from app.main import app
+from app.services.command_progress import (
+    FLUSH_PROGRESS,
+    TRANSITION_COMMAND,
+    CommandProgressCoalescer,
+    CommandTransitionRejected,
+)
+
+DEVICE = {"device_id": "dev_1", "user_id": "usr_1"}
+
+
+class MockConnection:
+    def __init__(self, current_status=None):
+        self.fetchval = AsyncMock(side_effect=self._fetchval)
+        self.fetch = AsyncMock(side_effect=lambda _sql, ids, *_args: [{"id": command_id} for command_id in ids])
+        self.execute = AsyncMock()
+        self.current_status = current_status
+
+    async def _fetchval(self, sql, *args):
+        if sql == TRANSITION_COMMAND.sql:
+            return args[0] if self.current_status in ("queued", "running") else None
+        return self.current_status
+
+
+@pytest.fixture
+def window(monkeypatch):
+    monkeypatch.setattr(settings, "command_progress_coalesce_seconds", 5.0)
+
+
+def _sql_calls(conn, sql):
+    return [call for call in conn.fetchval.await_args_list + conn.fetch.await_args_list if call.args[0] == sql]
+
+
+@pytest.mark.anyio
+async def test_running_ticks_are_coalesced_into_one_batched_write(window):
+    coalescer = CommandProgressCoalescer()
+    conn = MockConnection("running")
+    published = AsyncMock()
+
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        yield conn
+
+    with patch("app.services.command_progress.publish_event", published), \
+            patch("app.services.command_progress.get_connection", side_effect=mock_get_connection):
+        for progress in range(1, 21):
+            await coalescer.update(
+                conn, command_id="cmd_1", device=DEVICE, status="running", progress=progress, message=f"{progress}%",
+            )
+        assert len(_sql_calls(conn, TRANSITION_COMMAND.sql)) == 1
+        await coalescer.flush()
+
+        flushes = _sql_calls(conn, FLUSH_PROGRESS.sql)
+        assert [call.args[1:] for call in flushes] == [(["cmd_1"], ["dev_1"], [20], ["20%"])]
+        assert coalescer.snapshot() == {"written": 1, "coalesced": 19, "flushed": 1, "rejected": 0}
+        assert [call.kwargs["data"]["progress"] for call in published.await_args_list] == [1, 20]
+
+        await coalescer.update(
+            conn, command_id="cmd_1", device=DEVICE, status="running", progress=21, message="21%",
+        )
+        await coalescer.update(
+            conn, command_id="cmd_1", device=DEVICE, status="succeeded", progress=100, message="done",
+        )
+        await coalescer.stop()
+
+    transitions = _sql_calls(conn, TRANSITION_COMMAND.sql)
+    assert [call.args[3] for call in transitions] == ["running", "succeeded"]
+    assert transitions[-1].args[6] is not None  # finished_at
+    assert len(_sql_calls(conn, FLUSH_PROGRESS.sql)) == 1  # the pending 21% tick was dropped
+    assert published.await_args_list[-1].kwargs["data"]["status"] == "succeeded"
+
+
+@pytest.mark.anyio
+async def test_serverless_writes_every_tick_without_a_flusher(window, monkeypatch):
+    monkeypatch.setattr(settings, "serverless_mode", True)
+    coalescer = CommandProgressCoalescer()
+    conn = MockConnection("running")
+    with patch("app.services.command_progress.publish_event", AsyncMock()) as published:
+        for progress in range(1, 6):
+            await coalescer.update(
+                conn, command_id="cmd_1", device=DEVICE, status="running", progress=progress, message=f"{progress}%",
+            )
+
+    assert [call.args[4] for call in _sql_calls(conn, TRANSITION_COMMAND.sql)] == [1, 2, 3, 4, 5]
+    assert published.await_count == 5
+    assert coalescer._task is None
+    assert coalescer.snapshot()["coalesced"] == 0
+
+
+@pytest.mark.anyio
+async def test_terminal_status_cannot_regress(window):
+    coalescer = CommandProgressCoalescer()
+    conn = MockConnection("succeeded")
+    with patch("app.services.command_progress.publish_event", AsyncMock()) as published:
+        with pytest.raises(CommandTransitionRejected) as rejected:
+            await coalescer.update(
+                conn, command_id="cmd_1", device=DEVICE, status="running", progress=50, message="",
+            )
+        # A retried terminal update that already landed is accepted without a new event.
+        await coalescer.update(
+            conn, command_id="cmd_1", device=DEVICE, status="succeeded", progress=100, message="",
+        )
+
+    assert rejected.value.current_status == "succeeded"
+    published.assert_not_awaited()
+    assert coalescer.snapshot()["rejected"] == 1
+
+
+@pytest.mark.anyio
+async def test_status_endpoint_maps_rejections_to_http(client, window):
+    conn = MockConnection("failed")
+
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        yield conn
+
+    app.dependency_overrides[verify_device_token] = lambda: DEVICE
+    try:
+        with patch("app.api.v1.routers.agent.get_connection", side_effect=mock_get_connection):
+            payload = {"status": "running", "progress": 10, "message": "Scanning"}
+            conflict = await client.post("/v1/agent/commands/cmd_1/status", json=payload)
+            conn.current_status = None
+            missing = await client.post("/v1/agent/commands/cmd_2/status", json=payload)
+    finally:
+        app.dependency_overrides = {}
+
+    assert conflict.status_code == 409
+    assert conflict.json()["detail"] == "Command is already failed"
+    assert missing.status_code == 404
@@ -0,0 +1,156 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.api.v1.deps import get_current_user
+from app.core import database
+from app.core.config import settings
+from app.main import app
+
+
+def _saturated_pool():
+    pool = MagicMock()
+    pool.acquire = AsyncMock(side_effect=asyncio.TimeoutError())
+    pool.release = AsyncMock()
+    pool.get_size.return_value = 2
+    pool.get_idle_size.return_value = 0
+    return pool
+
+
+@pytest.fixture
+def fake_pools(monkeypatch):
+    pools = {}
+    monkeypatch.setattr(database, "_pools", pools)
+    monkeypatch.setattr(database, "_acquire_stats", {})
+    return pools
+
+
+@pytest.mark.anyio
+async def test_acquire_uses_named_pool_and_records_wait(fake_pools):
+    connection = object()
+    pool = _saturated_pool()
+    pool.acquire = AsyncMock(return_value=connection)
+    fake_pools[database.POOL_AGENT] = pool
+
+    async with database.get_connection(pool=database.POOL_AGENT) as conn:
+        assert conn is connection
+
+    pool.release.assert_awaited_once_with(connection)
+    snapshot = database.get_pool_stats_snapshot()
+    assert snapshot["agent"]["acquired"] == 1
+    assert sum(snapshot["agent"]["wait_buckets"]) == 1
+    assert snapshot["agent"]["in_use"] == 2
+    assert snapshot["dashboard"]["open"] is False
+
+
+@pytest.mark.anyio
+async def test_saturated_pool_fails_fast_with_503(client, fake_pools):
+    fake_pools[database.POOL_DASHBOARD] = _saturated_pool()
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
+    try:
+        response = await client.get("/v1/devices")
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert database.get_pool_stats_snapshot()["dashboard"]["timeouts"] == 1
+
+
+@pytest.mark.anyio
+async def test_unknown_pool_name_is_rejected(fake_pools):
+    with pytest.raises(ValueError):
+        await database.get_pool("reports")
+
+
+def _pool_yielding(connection):
+    pool = _saturated_pool()
+    pool.acquire = AsyncMock(return_value=connection)
+    return pool
+
+
+@pytest.fixture
+def replica_setup(fake_pools, monkeypatch):
+    monkeypatch.setattr(settings, "database_replica_url", "postgresql://replica/db")
+    monkeypatch.setattr(database, "_recent_writes", {})
+    monkeypatch.setattr(database, "_replica_state", {"lag_seconds": None, "checked_at": 0.0, "fallbacks": 0})
+    primary_conn = MagicMock(name="primary")
+    replica_conn = MagicMock(name="replica")
+    replica_conn.fetchval = AsyncMock(return_value=0.5)
+    fake_pools[database.POOL_DASHBOARD] = _pool_yielding(primary_conn)
+    fake_pools[database.POOL_REPLICA] = _pool_yielding(replica_conn)
+    return primary_conn, replica_conn
+
+
+@pytest.mark.anyio
+async def test_read_connection_uses_primary_without_replica(fake_pools, monkeypatch):
+    monkeypatch.setattr(settings, "database_replica_url", "")
+    primary_conn = MagicMock(name="primary")
+    fake_pools[database.POOL_DASHBOARD] = _pool_yielding(primary_conn)
+
+    async with database.get_read_connection("usr_1") as conn:
+        assert conn is primary_conn
+
+
+@pytest.mark.anyio
+async def test_read_connection_prefers_fresh_replica(replica_setup):
+    _, replica_conn = replica_setup
+
+    async with database.get_read_connection("usr_1") as conn:
+        assert conn is replica_conn
+    assert database.get_replica_status()["lag_seconds"] == 0.5
+
+
+@pytest.mark.anyio
+async def test_read_connection_falls_back_after_write_or_on_lag(replica_setup, monkeypatch):
+    primary_conn, replica_conn = replica_setup
+
+    database.mark_user_write("usr_1")
+    async with database.get_read_connection("usr_1") as conn:
+        assert conn is primary_conn
+    async with database.get_read_connection("usr_2") as conn:
+        assert conn is replica_conn
+
+    monkeypatch.setattr(settings, "db_replica_lag_check_interval_seconds", 0)
+    replica_conn.fetchval.return_value = 30.0
+    async with database.get_read_connection("usr_2") as conn:
+        assert conn is primary_conn
+    assert database.get_replica_status()["fallbacks"] == 2
+
+
+@pytest.mark.anyio
+async def test_serverless_mode_shares_one_lazy_pool(fake_pools, monkeypatch):
+    monkeypatch.setattr(settings, "serverless_mode", True)
+    created = []
+
+    async def fake_create_pool(dsn, **kwargs):
+        created.append(kwargs)
+        return _pool_yielding(MagicMock())
+
+    monkeypatch.setattr(database.asyncpg, "create_pool", fake_create_pool)
+
+    agent_pool = await database.get_pool(database.POOL_AGENT)
+    assert await database.get_pool(database.POOL_BACKGROUND) is agent_pool
+    assert len(created) == 1
+    assert created[0]["min_size"] == 0
+    assert created[0]["max_size"] == settings.db_serverless_pool_max_size
+
+
+@pytest.mark.anyio
+async def test_serverless_startup_skips_ddl_and_pool_warmup(monkeypatch):
+    import app.main as main_module
+
+    monkeypatch.setattr(settings, "serverless_mode", True)
+    monkeypatch.setattr(settings, "run_migrations_on_startup", None)
+    init_db = AsyncMock()
+    open_pools = AsyncMock()
+    monkeypatch.setattr(main_module, "init_db", init_db)
+    monkeypatch.setattr(main_module, "open_pools", open_pools)
+    monkeypatch.setattr(main_module, "close_pool", AsyncMock())
+
+    async with main_module.lifespan(app):
+        pass
+
+    init_db.assert_not_awaited()
+    open_pools.assert_not_awaited()
@@ -0,0 +1,169 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.api.v1.deps import get_current_user, verify_device_token
+from app.api.v1.routers.devices import DEVICE_FOR_USER, PING_LATENCY_SAMPLES
+from app.core.config import settings
+from app.main import app
+from app.services.device_metrics import (
+    INSERT_DEVICE_METRICS,
+    MAX_METRICS_PER_REPORT,
+    METRIC_BUCKETS,
+    RECENT_METRIC_SAMPLES,
+    extract_metrics,
+)
+
+USER = {"id": "usr_1", "email": "test@example.com"}
+REPORT = {
+    "healthScore": 72,
+    "diskFreePercent": 31.5,
+    "oneLiner": "양호",
+    "storage": {"folders": [{"name": "Downloads", "bytes": 10}], "totalBytes": 512_000_000_000, "freePercent": 31.5},
+    "slowdown": {"startupAppsCount": 12, "heavyProcessCount": 2, "reasons": []},
+    "privacy": {"tempFilesBytes": 1024, "enabled": True},
+}
+
+
+class MockConnection:
+    def __init__(self, device=True, buckets=(), samples=(), pings=()):
+        self.device = device
+        self.buckets = list(buckets)
+        self.samples = list(samples)
+        self.pings = list(pings)
+        self.fetchrow = AsyncMock(side_effect=self._fetchrow)
+        self.fetch = AsyncMock(side_effect=self._fetch)
+
+    async def _fetchrow(self, sql, *args):
+        if sql in (DEVICE_FOR_USER.sql, "SELECT id FROM devices WHERE id = $1 AND user_id = $2"):
+            return {"id": args[0]} if self.device else None
+        raise AssertionError(sql)
+
+    async def _fetch(self, sql, *args):
+        if sql == METRIC_BUCKETS.sql:
+            return self.buckets
+        if sql == RECENT_METRIC_SAMPLES.sql:
+            return self.samples
+        if sql == PING_LATENCY_SAMPLES.sql:
+            return self.pings
+        raise AssertionError(sql)
+
+
+async def _get(client, conn, url, params=None):
+    @asynccontextmanager
+    async def mock_get_read_connection(*_args):
+        yield conn
+
+    app.dependency_overrides[get_current_user] = lambda: USER
+    try:
+        with patch("app.api.v1.routers.devices.get_read_connection", side_effect=mock_get_read_connection):
+            return await client.get(url, params=params)
+    finally:
+        app.dependency_overrides = {}
+
+
+def test_extract_metrics_flattens_numeric_fields():
+    metrics = extract_metrics(REPORT)
+
+    assert metrics == {
+        "health_score": 72.0,
+        "disk_free_percent": 31.5,
+        "storage.total_bytes": 512_000_000_000.0,
+        "storage.free_percent": 31.5,
+        "slowdown.startup_apps_count": 12.0,
+        "slowdown.heavy_process_count": 2.0,
+        "privacy.temp_files_bytes": 1024.0,
+    }
+    noisy = {f"field{i}": i for i in range(500)}
+    noisy["nan"] = float("nan")
+    assert len(extract_metrics(noisy)) == MAX_METRICS_PER_REPORT
+
+
+@pytest.mark.anyio
+async def test_upload_records_report_metrics(client, monkeypatch):
+    monkeypatch.setattr(settings, "report_blob_backend", "inline")
+    conn = MagicMock()
+    conn.fetchval = AsyncMock(side_effect=lambda _sql, *args: args[0])
+    conn.execute = AsyncMock()
+
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        yield conn
+
+    app.dependency_overrides[verify_device_token] = lambda: {"device_id": "dev_1", "user_id": "usr_1"}
+    try:
+        with patch("app.api.v1.routers.agent.get_connection", side_effect=mock_get_connection), \
+                patch("app.api.v1.routers.agent.publish_event", AsyncMock()):
+            response = await client.post("/v1/agent/reports", json={"command_id": None, "report": REPORT})
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    (insert,) = [call for call in conn.execute.await_args_list if call.args[0] == INSERT_DEVICE_METRICS.sql]
+    _, device_id, _ts, names, values = insert.args
+    assert device_id == "dev_1"
+    assert dict(zip(names, values)) == extract_metrics(REPORT)
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_downsamples_long_ranges(client):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    conn = MockConnection(buckets=[
+        {"metric": "health_score", "bucket": 0, "min": 60.0, "max": 80.0, "avg": 70.0, "count": 4},
+        {"metric": "health_score", "bucket": 199, "min": 75.0, "max": 75.0, "avg": 75.0, "count": 1},
+    ])
+
+    response = await _get(client, conn, "/v1/devices/dev_1/metrics", {
+        "metric": ["health_score", "disk_free_percent"],
+        "from": start.isoformat(),
+        "to": (start + timedelta(days=365)).isoformat(),
+        "points": 200,
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["bucket_seconds"] == 365 * 86400 / 200
+    health, disk = body["series"]
+    assert (health["metric"], disk["metric"], disk["points"]) == ("health_score", "disk_free_percent", [])
+    assert [point["count"] for point in health["points"]] == [4, 1]
+    last = datetime.fromisoformat(health["points"][1]["ts"].replace("Z", "+00:00"))
+    assert last == start + timedelta(seconds=199 * body["bucket_seconds"])
+    sql_args = conn.fetch.await_args.args
+    assert sql_args[1:3] == ("dev_1", ["health_score", "disk_free_percent"])
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_validates_range_and_ownership(client):
+    now = datetime.now(timezone.utc)
+    backwards = await _get(client, MockConnection(), "/v1/devices/dev_1/metrics", {
+        "from": now.isoformat(), "to": (now - timedelta(days=1)).isoformat(),
+    })
+    missing = await _get(client, MockConnection(device=False), "/v1/devices/dev_2/metrics")
+    default = await _get(client, MockConnection(), "/v1/devices/dev_1/metrics")
+
+    assert backwards.status_code == 400
+    assert missing.status_code == 404
+    assert default.status_code == 200
+    assert [series["metric"] for series in default.json()["series"]] == [
+        "health_score", "disk_free_percent", "startup_apps_count",
+    ]
+
+
+@pytest.mark.anyio
+async def test_trends_read_recent_metric_samples(client):
+    conn = MockConnection(samples=[
+        {"metric": "disk_free_percent", "value": 12.0},
+        {"metric": "disk_free_percent", "value": 28.0},
+        {"metric": "disk_free_percent", "value": 24.0},
+        {"metric": "startup_apps_count", "value": 10.0},
+    ])
+
+    response = await _get(client, conn, "/v1/devices/dev_1/ai-trends")
+
+    assert response.status_code == 200
+    signals = {signal["metric"]: signal for signal in response.json()["signals"]}
+    assert signals["disk_free_percent"]["status"] == "degraded"
+    assert signals["disk_free_percent"]["baseline"] == 26.0
+    assert signals["startup_apps_count"]["current"] == 10.0
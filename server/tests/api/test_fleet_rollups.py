@@ -0,0 +1,243 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.api.v1.deps import get_current_user
+from app.core.config import settings
+from app.main import app
+from app.services.fleet_rollups import (
+    ADD_BUCKETS,
+    ADD_STATE,
+    COMPACT_HOURLY,
+    ENSURE_DEVICE_LATEST,
+    FLEET_STATE,
+    FLEET_TOTALS,
+    LOCK_DEVICE_LATEST,
+    TRY_COMPACTION_LOCK,
+    UPDATE_DEVICE_LATEST,
+    FleetRollupWriter,
+)
+
+USER = {"id": "usr_1", "email": "test@example.com"}
+NOW = datetime(2026, 3, 4, 10, 30, tzinfo=timezone.utc)
+
+
+class MockConnection:
+    def __init__(self, latest=(), state=(), totals=(), lock_acquired=True):
+        self.latest = list(latest)
+        self.state = list(state)
+        self.totals = list(totals)
+        self.lock_acquired = lock_acquired
+        self.execute = AsyncMock()
+        self.fetch = AsyncMock(side_effect=self._fetch)
+        self.fetchval = AsyncMock(side_effect=self._fetchval)
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def _fetch(self, sql, *args):
+        if sql == LOCK_DEVICE_LATEST.sql:
+            return [row for row in self.latest if row["device_id"] in args[0]]
+        if sql == FLEET_STATE.sql:
+            return self.state
+        if sql == FLEET_TOTALS.sql:
+            return self.totals
+        raise AssertionError(sql)
+
+    async def _fetchval(self, sql, *args):
+        if sql == TRY_COMPACTION_LOCK.sql:
+            return self.lock_acquired
+        if sql == COMPACT_HOURLY.sql:
+            return 48
+        raise AssertionError(sql)
+
+    def executed(self, sql):
+        return [call.args[1:] for call in self.execute.await_args_list if call.args[0] == sql]
+
+
+def _latest(device_id, reported_at=None, health_score=None, disk_free_bin=None, high_risk=False):
+    return {
+        "device_id": device_id, "user_id": "usr_1", "reported_at": reported_at,
+        "health_score": health_score, "disk_free_bin": disk_free_bin, "high_risk": high_risk,
+    }
+
+
+@pytest.fixture
+def window(monkeypatch):
+    monkeypatch.setattr(settings, "fleet_rollup_flush_seconds", 5.0)
+    monkeypatch.setattr(settings, "fleet_rollup_compact_interval_seconds", 3600.0)
+
+
+async def _flush(writer, conn):
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        yield conn
+
+    with patch("app.services.fleet_rollups.get_connection", side_effect=mock_get_connection):
+        await writer.stop()
+
+
+@pytest.mark.anyio
+async def test_flush_moves_state_by_the_difference_to_the_previous_report(window):
+    writer = FleetRollupWriter()
+    conn = MockConnection(latest=[
+        _latest("dev_1", NOW - timedelta(days=1), health_score=70, disk_free_bin=3),
+        _latest("dev_2"),  # placeholder: first report of this device
+    ])
+
+    await writer.record_report(conn, device_id="dev_1", user_id="usr_1", reported_at=NOW,
+                               health_score=50, disk_free_percent=12.0, startup_apps_count=5)
+    await writer.record_report(conn, device_id="dev_1", user_id="usr_1", reported_at=NOW - timedelta(minutes=5),
+                               health_score=65, disk_free_percent=30.0)
+    await writer.record_report(conn, device_id="dev_2", user_id="usr_1", reported_at=NOW,
+                               health_score=90, disk_free_percent=100.0)
+    assert conn.execute.await_count == 0  # nothing is written before the window ends
+    await _flush(writer, conn)
+
+    assert conn.executed(ENSURE_DEVICE_LATEST.sql) == [(["dev_1", "dev_2"],)]
+    ((ids, reported_at, health, bins, high_risk),) = conn.executed(UPDATE_DEVICE_LATEST.sql)
+    assert (ids, reported_at, health, bins, high_risk) == (
+        ["dev_1", "dev_2"], [NOW, NOW], [50, 90], [1, 9], [True, False],
+    )
+    ((users, metrics, counts, totals),) = conn.executed(ADD_STATE.sql)
+    assert set(users) == {"usr_1"}
+    assert dict(zip(metrics, zip(counts, totals))) == {
+        "devices": (1, 0.0),
+        "health_score": (1, 70.0),  # -70 +50 +90
+        "high_risk_devices": (1, 0.0),
+        "disk_free_bin.1": (1, 0.0),
+        "disk_free_bin.3": (-1, 0.0),
+        "disk_free_bin.9": (1, 0.0),
+    }
+    ((_, buckets, bucket_metrics, bucket_counts, bucket_totals),) = conn.executed(ADD_BUCKETS.sql)
+    assert set(buckets) == {datetime(2026, 3, 4, 10, tzinfo=timezone.utc)}
+    assert dict(zip(bucket_metrics, zip(bucket_counts, bucket_totals))) == {
+        "reports": (3, 0.0),
+        "health_score": (3, 205.0),
+        "disk_free_percent": (3, 142.0),
+    }
+    assert writer.snapshot()["flushes"] == 1
+
+
+@pytest.mark.anyio
+async def test_failed_flush_keeps_the_batch_for_the_next_window(window):
+    writer = FleetRollupWriter()
+    conn = MockConnection(latest=[_latest("dev_1")])
+
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        yield conn
+
+    await writer.record_report(conn, device_id="dev_1", user_id="usr_1", reported_at=NOW, health_score=80)
+    await writer.record_report(conn, device_id="dev_1", user_id="usr_1", reported_at=NOW, health_score=60)
+    with patch("app.services.fleet_rollups.get_connection", side_effect=mock_get_connection):
+        with patch.object(writer, "apply", AsyncMock(side_effect=ConnectionError("db restarting"))):
+            with pytest.raises(ConnectionError):
+                await writer.flush()
+        assert writer.snapshot()["flushes"] == 0
+        # A report recorded after the failure joins the retained batch.
+        await writer.record_report(conn, device_id="dev_1", user_id="usr_1", reported_at=NOW, health_score=70)
+        await writer.stop()
+
+    ((_, _, metrics, counts, totals),) = conn.executed(ADD_BUCKETS.sql)
+    assert dict(zip(metrics, zip(counts, totals)))["health_score"] == (3, 210.0)
+    assert writer.snapshot()["flushes"] == 1
+
+
+@pytest.mark.anyio
+async def test_out_of_order_report_only_counts_toward_buckets(window):
+    writer = FleetRollupWriter()
+    conn = MockConnection(latest=[_latest("dev_1", NOW, health_score=80, disk_free_bin=5)])
+
+    await writer.record_report(conn, device_id="dev_1", user_id="usr_1", reported_at=NOW - timedelta(hours=2),
+                               health_score=40, disk_free_percent=8.0)
+    await _flush(writer, conn)
+
+    assert conn.executed(UPDATE_DEVICE_LATEST.sql) == []
+    assert conn.executed(ADD_STATE.sql) == []
+    ((_, buckets, metrics, counts, _),) = conn.executed(ADD_BUCKETS.sql)
+    assert buckets[0] == datetime(2026, 3, 4, 8, tzinfo=timezone.utc)
+    assert dict(zip(metrics, counts))["reports"] == 1
+
+
+@pytest.mark.anyio
+async def test_command_outcomes_are_written_through_without_a_window(monkeypatch):
+    monkeypatch.setattr(settings, "fleet_rollup_flush_seconds", 0)
+    monkeypatch.setattr(settings, "fleet_rollup_compact_interval_seconds", 3600.0)
+    writer = FleetRollupWriter()
+    conn = MockConnection()
+
+    await writer.record_command(conn, user_id="usr_1", command_type="RUN_FULL", status="failed", finished_at=NOW)
+    await writer.record_command(conn, user_id="usr_1", command_type="RUN_FULL", status="succeeded",
+                                finished_at=NOW, previous_status="failed")
+
+    first, second = conn.executed(ADD_BUCKETS.sql)
+    assert (first[2], first[3]) == (["commands.RUN_FULL.failed"], [1])
+    assert dict(zip(second[2], second[3])) == {"commands.RUN_FULL.failed": -1, "commands.RUN_FULL.succeeded": 1}
+    # The first write-through also ran the (due) compaction.
+    assert writer.snapshot() == {"reports": 0, "commands": 2, "flushes": 2, "compactions": 1}
+
+
+@pytest.mark.anyio
+async def test_compaction_folds_hours_before_the_retention_day(monkeypatch):
+    monkeypatch.setattr(settings, "fleet_rollup_hourly_retention_days", 2)
+    writer = FleetRollupWriter()
+
+    folded = await writer.compact(MockConnection(), now=NOW)
+    skipped = await writer.compact(MockConnection(lock_acquired=False), now=NOW)
+
+    assert folded == 48
+    assert skipped is None
+    conn = MockConnection()
+    await writer.compact(conn, now=NOW)
+    compact_call = [call for call in conn.fetchval.await_args_list if call.args[0] == COMPACT_HOURLY.sql][0]
+    assert compact_call.args[1] == datetime(2026, 3, 2, tzinfo=timezone.utc)
+
+
+@pytest.mark.anyio
+async def test_overview_reads_only_rollup_tables(client):
+    conn = MockConnection(
+        state=[
+            {"metric": "devices", "count": 4, "total": 0.0},
+            {"metric": "health_score", "count": 4, "total": 290.0},
+            {"metric": "high_risk_devices", "count": 1, "total": 0.0},
+            {"metric": "disk_free_bin.1", "count": 1, "total": 0.0},
+            {"metric": "disk_free_bin.4", "count": 3, "total": 0.0},
+        ],
+        totals=[
+            {"metric": "reports", "count": 20, "total": 0.0},
+            {"metric": "health_score", "count": 20, "total": 1500.0},
+            {"metric": "commands.RUN_FULL.succeeded", "count": 9, "total": 0.0},
+            {"metric": "commands.RUN_FULL.failed", "count": 1, "total": 0.0},
+            {"metric": "commands.RUN_DEEP.failed", "count": 2, "total": 0.0},
+        ],
+    )
+
+    @asynccontextmanager
+    async def mock_get_read_connection(*_args):
+        yield conn
+
+    app.dependency_overrides[get_current_user] = lambda: USER
+    try:
+        with patch("app.api.v1.routers.fleet.get_read_connection", side_effect=mock_get_read_connection):
+            response = await client.get("/v1/fleet/overview", params={"days": 7})
+            invalid = await client.get("/v1/fleet/overview", params={"days": 0})
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    assert invalid.status_code == 422
+    body = response.json()
+    assert (body["devices_reporting"], body["avg_health_score"], body["high_risk_devices"]) == (4, 72.5, 1)
+    assert [bucket["devices"] for bucket in body["disk_free_distribution"]] == [0, 1, 0, 0, 3, 0, 0, 0, 0, 0]
+    assert (body["reports"], body["report_avg_health_score"], body["report_avg_disk_free_percent"]) == (20, 75.0, None)
+    assert body["commands"] == [
+        {"type": "RUN_DEEP", "succeeded": 0, "failed": 2, "success_rate": 0.0},
+        {"type": "RUN_FULL", "succeeded": 9, "failed": 1, "success_rate": 0.9},
+    ]
+    assert {call.args[0] for call in conn.fetch.await_args_list} == {FLEET_STATE.sql, FLEET_TOTALS.sql}
+    since = datetime.fromisoformat(body["since"].replace("Z", "+00:00"))
+    assert since == conn.fetch.await_args_list[1].args[2]
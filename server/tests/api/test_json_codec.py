@@ -0,0 +1,72 @@
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.api.v1.deps import get_current_user
+from app.core import database, json_codec
+from app.main import app
+
+
+@pytest.mark.anyio
+async def test_pool_connections_get_json_codecs():
+    connection = MagicMock()
+    connection.set_type_codec = AsyncMock()
+
+    await database._init_connection(connection)
+
+    registered = {call.args[0]: call.kwargs for call in connection.set_type_codec.await_args_list}
+    assert set(registered) == {"json", "jsonb"}
+    assert registered["jsonb"]["decoder"] is json_codec.loads
+    assert registered["jsonb"]["encoder"] is json_codec.dumps
+
+
+def test_json_codec_round_trips_non_ascii_and_datetimes():
+    value = {"oneLiner": "전반적으로 양호합니다.", "at": datetime(2026, 1, 1, tzinfo=timezone.utc)}
+    encoded = json_codec.dumps(value)
+    assert "전반적으로" in encoded
+    assert json_codec.loads(encoded)["at"].startswith("2026-01-01")
+    assert json_codec.dumps_bytes(value) == encoded.encode("utf-8")
+
+
+@pytest.mark.anyio
+async def test_report_detail_passes_stored_json_through(client):
+    raw_text = '{"storage": {"folders": [{"name": "Downloads", "bytes": 1}]}, "healthScore": 80}'
+    conn = MagicMock()
+    conn.fetchrow = AsyncMock(
+        return_value={
+            "id": "rpt_1",
+            "device_id": "dev_1",
+            "command_id": None,
+            "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc),
+            "health_score": 80,
+            "disk_free_percent": 42.5,
+            "startup_apps_count": 7,
+            "one_liner": "양호",
+            "raw_report_json_text": raw_text,
+            "raw_report_ref": None,
+            "raw_report_base_id": None,
+        }
+    )
+
+    @asynccontextmanager
+    async def mock_get_read_connection(*_args):
+        yield conn
+
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
+    try:
+        with patch("app.api.v1.routers.reports.get_read_connection", side_effect=mock_get_read_connection):
+            response = await client.get("/v1/reports/rpt_1")
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert raw_text.encode() in response.content
+    body = response.json()
+    assert body["raw_report_json"] == json.loads(raw_text)
+    assert body["id"] == "rpt_1"
+    assert body["one_liner"] == "양호"
+    assert body["disk_free_percent"] == 42.5
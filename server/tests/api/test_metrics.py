@@ -0,0 +1,114 @@
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core.config import settings
+from app.core.request_context import RequestDbStats, record_db_query
+from app.services import metrics
+from app.services.request_rate_limit import record_rate_limit_rejection
+
+
+class MockConnection:
+    def __init__(self):
+        async def fetchval(*_args):
+            record_db_query(0.02)
+            return 1
+
+        self.fetchval = AsyncMock(side_effect=fetchval)
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics(monkeypatch):
+    monkeypatch.setattr(settings, "ops_api_token", "")
+    monkeypatch.setattr(settings, "metrics_multiproc_dir", "")
+    metrics.reset_metrics()
+    yield
+    metrics.reset_metrics()
+
+
+def _sample(text: str, prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"missing sample: {prefix}")
+
+
+@pytest.mark.anyio
+async def test_metrics_record_route_template_status_and_db_time(client):
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        yield MockConnection()
+
+    with patch("app.main.get_connection", side_effect=mock_get_connection):
+        await client.get("/health")
+        await client.get("/health")
+    await client.get("/no/such/route")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert _sample(body, 'pcinsight_http_requests_total{method="GET",route="/health",status="200"}') == 2
+    assert _sample(body, 'pcinsight_http_request_db_queries_total{method="GET",route="/health"}') == 2
+    assert _sample(body, 'pcinsight_http_request_db_seconds_sum{method="GET",route="/health"}') == pytest.approx(0.04)
+    assert _sample(body, 'pcinsight_http_request_duration_seconds_count{method="GET",route="/health"}') == 2
+    assert 'route="unmatched",status="404"' in body
+    assert "/no/such/route" not in body
+    # The scrape itself is still in flight while the body is rendered.
+    assert _sample(body, "pcinsight_http_requests_in_flight ") == 1
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_requires_ops_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "ops_api_token", "ops-secret")
+    assert (await client.get("/metrics")).status_code == 401
+    ok = await client.get("/metrics", headers={"Authorization": "Bearer ops-secret"})
+    assert ok.status_code == 200
+
+    monkeypatch.setattr(settings, "ops_api_token", "")
+    monkeypatch.setattr(settings, "environment", "production")
+    assert (await client.get("/metrics")).status_code == 404
+
+
+@pytest.mark.anyio
+async def test_rate_limit_rejections_are_counted_per_policy(client):
+    before = metrics.collect_local()["pcinsight_rate_limit_rejections_total"]["samples"].get(
+        (("scope", "commands:create"),), 0
+    )
+    record_rate_limit_rejection("commands:create")
+    record_rate_limit_rejection("commands:create")
+
+    body = (await client.get("/metrics")).text
+    assert _sample(body, 'pcinsight_rate_limit_rejections_total{scope="commands:create"}') == before + 2
+
+
+def test_multiprocess_snapshots_are_summed_and_stale_gauges_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_multiproc_dir", str(tmp_path))
+    other = {
+        "pcinsight_http_requests_total": {
+            "type": "counter",
+            "help": "HTTP requests by route template and status.",
+            "bounds": [],
+            "samples": [[[["method", "GET"], ["route", "/health"], ["status", "200"]], 5]],
+        },
+        "pcinsight_http_requests_in_flight": {
+            "type": "gauge",
+            "help": "HTTP requests currently being served.",
+            "bounds": [],
+            "samples": [[[], 3]],
+        },
+    }
+    (tmp_path / "1001.json").write_text(json.dumps({"written_at": time.time(), "families": other}))
+    (tmp_path / "1002.json").write_text(json.dumps({"written_at": time.time() - 3600, "families": other}))
+    metrics.record_request("GET", "/health", 200, 0.01, RequestDbStats())
+
+    body = metrics.render_prometheus(metrics.collect_all())
+
+    assert _sample(body, 'pcinsight_http_requests_total{method="GET",route="/health",status="200"}') == 11
+    assert _sample(body, "pcinsight_http_requests_in_flight ") == 3
+    assert _sample(body, "pcinsight_metrics_workers ") == 2
+    assert (tmp_path / f"{os.getpid()}.json").exists()
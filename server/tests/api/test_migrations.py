@@ -0,0 +1,115 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock
+
+import asyncpg
+import pytest
+
+from app.core import migrations
+
+
+class MockConnection:
+    def __init__(self, applied=None):
+        self.fetchval = AsyncMock()
+        self.fetch = AsyncMock(return_value=applied or [])
+        self.execute = AsyncMock()
+        self.transactions = 0
+
+    def transaction(self):
+        @asynccontextmanager
+        async def _transaction():
+            self.transactions += 1
+            yield
+
+        return _transaction()
+
+
+def _write(tmp_path, name, sql):
+    (tmp_path / name).write_text(sql, encoding="utf-8")
+
+
+def test_load_migrations_orders_files_and_detects_no_transaction(tmp_path):
+    _write(tmp_path, "0002_indexes.sql", "-- migrate: no-transaction\nCREATE INDEX CONCURRENTLY a ON t(x);\n")
+    _write(tmp_path, "0001_baseline.sql", "CREATE TABLE t (x INT);\n")
+
+    loaded = migrations.load_migrations(tmp_path)
+
+    assert [m.version for m in loaded] == [1, 2]
+    assert loaded[0].transactional is True
+    assert loaded[1].transactional is False
+    assert loaded[1].statements() == ["CREATE INDEX CONCURRENTLY a ON t(x)"]
+
+
+def test_load_migrations_rejects_bad_names(tmp_path):
+    _write(tmp_path, "1_baseline.sql", "SELECT 1;")
+    with pytest.raises(ValueError):
+        migrations.load_migrations(tmp_path)
+
+
+def test_bundled_migrations_load():
+    loaded = migrations.load_migrations()
+    assert loaded[0].version == 1
+    assert "CREATE TABLE IF NOT EXISTS users" in loaded[0].sql
+
+
+@pytest.mark.anyio
+async def test_apply_migrations_skips_applied_and_runs_concurrent_outside_transaction(tmp_path):
+    _write(tmp_path, "0001_baseline.sql", "CREATE TABLE t (x INT);\n")
+    _write(
+        tmp_path,
+        "0002_indexes.sql",
+        "-- migrate: no-transaction\nCREATE INDEX CONCURRENTLY a ON t(x);\nCREATE INDEX CONCURRENTLY b ON t(x);\n",
+    )
+    loaded = migrations.load_migrations(tmp_path)
+    conn = MockConnection(applied=[{"version": 1, "checksum": loaded[0].checksum}])
+
+    applied = await migrations.apply_migrations(conn, loaded)
+
+    assert applied == [2]
+    assert conn.transactions == 0
+    executed = [call.args[0] for call in conn.execute.await_args_list]
+    assert executed[0] == "SELECT pg_advisory_lock($1)"
+    assert "CREATE INDEX CONCURRENTLY a ON t(x)" in executed
+    assert "CREATE INDEX CONCURRENTLY b ON t(x)" in executed
+    assert executed[-1] == "SELECT pg_advisory_unlock($1)"
+
+
+@pytest.mark.anyio
+async def test_migrate_fast_path_is_a_single_query():
+    conn = MockConnection()
+    conn.fetchval.return_value = migrations.latest_version()
+
+    assert await migrations.migrate(conn) == []
+    conn.fetchval.assert_awaited_once()
+    conn.execute.assert_not_awaited()
+
+
+@pytest.mark.anyio
+async def test_current_version_is_zero_before_first_migration():
+    conn = MockConnection()
+    conn.fetchval.side_effect = asyncpg.UndefinedTableError("missing")
+    assert await migrations.current_version(conn) == 0
+
+
+@pytest.mark.anyio
+async def test_concurrent_index_build_drops_invalid_leftover_first(tmp_path):
+    _write(
+        tmp_path,
+        "0001_indexes.sql",
+        "-- migrate: no-transaction\n"
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON t(x);\n"
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON t(y);\n"
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_old;\n",
+    )
+    loaded = migrations.load_migrations(tmp_path)
+    conn = MockConnection()
+    # idx_a was left INVALID by an interrupted build; idx_b does not exist yet.
+    validity = {"idx_a": False, "idx_b": None}
+    conn.fetchval.side_effect = lambda sql, name: validity[name]
+
+    await migrations.apply_migrations(conn, loaded)
+
+    executed = [call.args[0] for call in conn.execute.await_args_list]
+    drop = executed.index("DROP INDEX CONCURRENTLY IF EXISTS idx_a")
+    assert executed[drop + 1] == "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON t(x)"
+    assert "DROP INDEX CONCURRENTLY IF EXISTS idx_b" not in executed
+    assert [call.args[1] for call in conn.fetchval.await_args_list] == ["idx_a", "idx_b"]
@@ -0,0 +1,134 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core.config import settings
+from app.services import presence
+
+
+class MockConnection:
+    def __init__(self, lock_acquired=True):
+        self.fetch = AsyncMock(return_value=[])
+        self.fetchval = AsyncMock(return_value=lock_acquired)
+        self.execute = AsyncMock()
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def no_sweep(monkeypatch):
+    monkeypatch.setattr(settings, "presence_sweep_interval_seconds", 0)
+
+
+def test_is_device_online_uses_configured_threshold(monkeypatch):
+    now = datetime.now(timezone.utc)
+    monkeypatch.setattr(settings, "device_online_threshold_seconds", 300)
+    assert presence.is_device_online(now - timedelta(minutes=4), now)
+    monkeypatch.setattr(settings, "device_online_threshold_seconds", 60)
+    assert not presence.is_device_online(now - timedelta(minutes=4), now)
+    assert not presence.is_device_online(None, now)
+
+
+@pytest.mark.anyio
+async def test_heartbeat_does_not_start_sweep_task_in_serverless_mode(monkeypatch):
+    monkeypatch.setattr(settings, "serverless_mode", True)
+    tracker = presence.PresenceTracker()
+    tracker.observe_heartbeat("dev_1", "usr_1", datetime.now(timezone.utc))
+    tracker.start()
+
+    assert tracker._task is None
+    assert tracker.tracked_count() == 1
+
+
+@pytest.mark.anyio
+async def test_record_heartbeat_publishes_online_only_on_transition(monkeypatch):
+    monkeypatch.setattr(settings, "device_online_threshold_seconds", 120)
+    mock_conn = MockConnection()
+    now = datetime.now(timezone.utc)
+    tracker = presence.PresenceTracker()
+    with patch.object(presence, "presence_tracker", tracker):
+        with patch("app.services.presence.publish_event", new=AsyncMock(return_value=None)) as mocked_publish:
+            await presence.record_heartbeat(
+                mock_conn, device_id="dev_1", user_id="usr_1", previous_seen_at=None, seen_at=now
+            )
+            await presence.record_heartbeat(
+                mock_conn, device_id="dev_1", user_id="usr_1", previous_seen_at=now, seen_at=now
+            )
+        await tracker.stop()
+
+    assert mocked_publish.await_count == 1
+    assert mocked_publish.await_args.kwargs["data"]["status"] == "online"
+    assert tracker.tracked_count() == 1
+
+
+@pytest.mark.anyio
+async def test_tracker_announces_offline_once_deadline_passes(monkeypatch):
+    monkeypatch.setattr(settings, "device_online_threshold_seconds", 60)
+    seen_stale = datetime.now(timezone.utc) - timedelta(seconds=61)
+    seen_elsewhere = datetime.now(timezone.utc) - timedelta(seconds=61)
+    mock_conn = MockConnection()
+    # dev_other is not claimed: another worker recorded a newer heartbeat for it.
+    mock_conn.fetch.return_value = [{"id": "dev_owned", "user_id": "usr_1", "last_seen_at": seen_stale}]
+
+    @asynccontextmanager
+    async def mock_get_connection(**_kwargs):
+        yield mock_conn
+
+    tracker = presence.PresenceTracker()
+    with patch("app.services.presence.get_connection", side_effect=mock_get_connection):
+        with patch("app.services.presence.publish_event", new=AsyncMock(return_value=None)) as mocked_publish:
+            tracker.observe_heartbeat("dev_owned", "usr_1", seen_stale)
+            tracker.observe_heartbeat("dev_other", "usr_1", seen_elsewhere)
+            for _ in range(50):
+                if tracker.tracked_count() == 0:
+                    break
+                await asyncio.sleep(0.01)
+            await tracker.stop()
+
+    assert tracker.tracked_count() == 0
+    assert mocked_publish.await_count == 1
+    data = mocked_publish.await_args.kwargs["data"]
+    assert data == {"device_id": "dev_owned", "status": "offline", "last_seen_at": seen_stale}
+    sql, device_ids, seen = mock_conn.fetch.await_args.args
+    assert sql == presence._CLAIM_OFFLINE_SQL
+    assert sorted(zip(device_ids, seen)) == [("dev_other", seen_elsewhere), ("dev_owned", seen_stale)]
+
+
+@pytest.mark.anyio
+async def test_sweep_announces_devices_without_a_live_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "device_online_threshold_seconds", 60)
+    monkeypatch.setattr(settings, "presence_sweep_interval_seconds", 30)
+    now = datetime(2026, 3, 4, 10, 0, tzinfo=timezone.utc)
+    seen = now - timedelta(seconds=90)
+    mock_conn = MockConnection()
+    # Heartbeat received by a worker that has since restarted.
+    mock_conn.fetch.return_value = [{"id": "dev_orphan", "user_id": "usr_1", "last_seen_at": seen}]
+    busy_conn = MockConnection(lock_acquired=False)
+
+    connections = [mock_conn, busy_conn]
+
+    @asynccontextmanager
+    async def mock_get_connection(**_kwargs):
+        yield connections.pop(0)
+
+    tracker = presence.PresenceTracker()
+    with patch("app.services.presence.get_connection", side_effect=mock_get_connection):
+        with patch("app.services.presence.publish_event", new=AsyncMock(return_value=None)) as mocked_publish:
+            announced = await tracker.sweep(now=now)
+            contended = await tracker.sweep(now=now)
+
+    assert announced == 1
+    assert contended is None
+    assert busy_conn.fetch.await_count == 0
+    sql, cutoff, lookback = mock_conn.fetch.await_args.args
+    assert sql == presence._SWEEP_OFFLINE_SQL
+    assert cutoff == now - timedelta(seconds=60)
+    assert lookback == cutoff - timedelta(seconds=300)
+    assert mocked_publish.await_args.kwargs["data"] == {
+        "device_id": "dev_orphan", "status": "offline", "last_seen_at": seen,
+    }
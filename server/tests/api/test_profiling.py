@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core.config import settings
+from app.services.profiling import EventLoopWatchdog, stack_sampler
+
+
+def _blocking_fetchval(*_args):
+    time.sleep(0.05)
+    return 1
+
+
+class MockConnection:
+    def __init__(self):
+        self.fetchval = AsyncMock(side_effect=_blocking_fetchval)
+
+
+@pytest.fixture(autouse=True)
+def ops_token(monkeypatch):
+    monkeypatch.setattr(settings, "ops_api_token", "ops-secret")
+    monkeypatch.setattr(settings, "profiler_sample_rate", 0.0)
+    monkeypatch.setattr(settings, "profiler_interval_ms", 2.0)
+    stack_sampler.reset()
+    yield
+    stack_sampler.reset()
+
+
+@asynccontextmanager
+async def mock_get_connection(*_args, **_kwargs):
+    yield MockConnection()
+
+
+@pytest.mark.anyio
+async def test_profile_header_samples_request_stacks_per_route(client):
+    ops_headers = {"Authorization": "Bearer ops-secret"}
+    with patch("app.main.get_connection", side_effect=mock_get_connection):
+        await client.get("/health")
+        assert (await client.get("/v1/ops/profile", headers=ops_headers)).text == ""
+
+        await client.get("/health", headers={"X-Pcinsight-Profile": "ops-secret"})
+
+    response = await client.get("/v1/ops/profile", headers=ops_headers)
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines
+    assert all(line.startswith("GET /health;") for line in lines)
+    assert any("_blocking_fetchval" in line for line in lines)
+    assert int(lines[0].rsplit(" ", 1)[1]) >= 1
+
+    summary = (await client.get("/v1/ops/profile/summary", headers=ops_headers)).json()
+    assert summary["samples_by_route"]["GET /health"] >= 1
+
+    assert (await client.delete("/v1/ops/profile", headers=ops_headers)).status_code == 200
+    assert (await client.get("/v1/ops/profile", headers=ops_headers)).text == ""
+
+
+@pytest.mark.anyio
+async def test_profile_endpoints_require_ops_token(client):
+    assert (await client.get("/v1/ops/profile")).status_code == 401
+    with patch("app.main.get_connection", side_effect=mock_get_connection):
+        await client.get("/health", headers={"X-Pcinsight-Profile": "wrong"})
+    assert stack_sampler.summary() == {}
+
+
+@pytest.mark.anyio
+async def test_loop_watchdog_logs_stack_of_blocking_call(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "event_loop_lag_threshold_ms", 50)
+    monkeypatch.setattr(settings, "event_loop_lag_check_interval_ms", 10)
+    watchdog = EventLoopWatchdog()
+    watchdog.start()
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.services.profiling"):
+            await asyncio.sleep(0.05)
+            time.sleep(0.3)  # stands in for synchronous bcrypt on the loop
+            await asyncio.sleep(0.1)
+    finally:
+        await watchdog.stop()
+
+    assert watchdog.blocked_total == 1
+    assert watchdog.max_lag_seconds >= 0.2
+    assert "Event loop blocked" in caplog.text
+    assert "test_loop_watchdog_logs_stack_of_blocking_call" in caplog.text
+    assert "Event loop unblocked" in caplog.text
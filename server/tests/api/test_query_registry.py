@@ -0,0 +1,87 @@
+import logging
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core import queries
+from app.core.config import settings
+from app.core.request_context import trace_id_var
+
+
+class MockConnection:
+    def __init__(self):
+        self.fetch = AsyncMock(return_value=[{"id": "a"}, {"id": "b"}])
+        self.fetchrow = AsyncMock(return_value=None)
+        self.execute = AsyncMock(return_value="UPDATE 3")
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    queries.reset_query_stats()
+    yield
+    queries.reset_query_stats()
+
+
+def test_register_query_is_idempotent_and_rejects_conflicts():
+    first = queries.register_query("test.same", "SELECT 1")
+    assert queries.register_query("test.same", "SELECT 1") is first
+    with pytest.raises(ValueError):
+        queries.register_query("test.same", "SELECT 2")
+
+
+@pytest.mark.anyio
+async def test_registered_query_records_calls_rows_and_errors():
+    query = queries.register_query("test.stats", "SELECT id FROM devices WHERE user_id = $1")
+    conn = MockConnection()
+
+    rows = await query.fetch(conn, "usr_1")
+    assert len(rows) == 2
+    conn.fetch.assert_awaited_once_with(query.sql, "usr_1")
+
+    await queries.register_query("test.update", "UPDATE devices SET name = $1").execute(conn, "x")
+
+    conn.fetch.side_effect = RuntimeError("boom")
+    with pytest.raises(RuntimeError):
+        await query.fetch(conn, "usr_1")
+
+    snapshot = queries.get_query_stats_snapshot()
+    assert snapshot["test.stats"]["calls"] == 2
+    assert snapshot["test.stats"]["rows"] == 2
+    assert snapshot["test.stats"]["errors"] == 1
+    assert sum(snapshot["test.stats"]["buckets"]) == 2
+    assert snapshot["test.update"]["rows"] == 3
+
+
+@pytest.mark.anyio
+async def test_slow_query_log_includes_trace_id(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "db_slow_query_ms", 0)
+    query = queries.register_query("test.slow", "SELECT 1")
+    token = trace_id_var.set("trace-abc")
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.core.queries"):
+            await query.fetchrow(MockConnection())
+    finally:
+        trace_id_var.reset(token)
+
+    assert "name=test.slow" in caplog.text
+    assert "trace_id=trace-abc" in caplog.text
+
+
+def test_hot_paths_are_registered():
+    import app.api.v1.routers.agent  # noqa: F401
+    import app.api.v1.deps  # noqa: F401
+
+    names = {query.name for query in queries.registered_queries()}
+    assert {"agent.device_token_lookup", "agent.claim_next_command", "agent.insert_report"} <= names
+
+
+def test_hot_queries_have_explain_args_for_every_parameter():
+    import re
+
+    import app.main  # noqa: F401
+
+    hot = queries.hot_queries()
+    assert {"auth.user_by_email", "devices.ping_latency_samples", "ai.version_usage"} <= {q.name for q in hot}
+    for query in hot:
+        placeholders = {int(n) for n in re.findall(r"\$(\d+)", query.sql)}
+        assert len(query.explain_args) == max(placeholders, default=0), query.name
@@ -0,0 +1,110 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core.config import settings
+from app.services import request_rate_limit
+
+
+class MockConnection:
+    def __init__(self):
+        self.fetchrow = AsyncMock(return_value=None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_buckets(monkeypatch):
+    monkeypatch.setattr(settings, "redis_url", "")
+    monkeypatch.setattr(request_rate_limit, "_REQUEST_BUCKETS", {})
+
+
+@pytest.mark.anyio
+async def test_throttled_agent_is_rejected_before_token_lookup(client, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_requests", 2)
+    acquired = []
+
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        acquired.append(1)
+        yield MockConnection()
+
+    with patch("app.api.v1.deps.get_connection", side_effect=mock_get_connection):
+        headers = {"Authorization": "Bearer device-token-a"}
+        statuses = [(await client.post("/v1/agent/heartbeat", headers=headers)).status_code for _ in range(3)]
+        other = await client.post("/v1/agent/heartbeat", headers={"Authorization": "Bearer device-token-b"})
+
+    assert statuses == [401, 401, 429]
+    assert len(acquired) == 3  # two for token-a, one for token-b; the 429 never reached Postgres
+    assert other.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_rejection_response_and_route_label(client, monkeypatch):
+    monkeypatch.setattr(settings, "share_public_rate_limit_requests", 1)
+    monkeypatch.setattr(settings, "ops_api_token", "")
+
+    @asynccontextmanager
+    async def mock_get_read_connection(*_args, **_kwargs):
+        yield MockConnection()
+
+    with patch("app.api.v1.routers.reports.get_read_connection", side_effect=mock_get_read_connection), \
+            patch("app.api.v1.routers.reports.get_connection", side_effect=mock_get_read_connection):
+        await client.get("/v1/reports/share/tok_1")
+        rejected = await client.get("/v1/reports/share/tok_2")
+
+    assert rejected.status_code == 429
+    assert rejected.json() == {"detail": "Too many requests. Please try again later."}
+    assert 1 <= int(rejected.headers["Retry-After"]) <= settings.share_public_rate_limit_window_seconds
+    metrics_body = (await client.get("/metrics")).text
+    assert 'route="/v1/reports/share/{share_token}",status="429"' in metrics_body
+
+
+def test_policy_table_matches_route_templates():
+    assert request_rate_limit.match_policy("GET", "/v1/reports/share/abc")[1].name == "report:share:public"
+    assert request_rate_limit.match_policy("GET", "/v1/reports/rpt_1")[1].name == "report:detail"
+    assert request_rate_limit.match_policy("POST", "/v1/devices/dev_1/commands")[1].name == "commands:create"
+    assert request_rate_limit.match_policy("GET", "/v1/devices/dev_1/commands")[1].name == "commands:list"
+    assert request_rate_limit.match_policy("GET", "/v1/devices") is None
+    assert request_rate_limit.match_policy("DELETE", "/v1/reports/rpt_1") is None
+
+
+def test_policy_templates_exist_in_app():
+    from app.main import app
+
+    templates = {(method.upper(), path) for path, item in app.openapi()["paths"].items() for method in item}
+    assert set(request_rate_limit.RATE_LIMIT_POLICIES) <= templates
+
+
+@pytest.mark.anyio
+async def test_rotating_tokens_hit_the_ip_ceiling(client, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_requests", 2)
+    monkeypatch.setattr(settings, "rate_limit_ip_ceiling_multiplier", 2)
+
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        yield MockConnection()
+
+    with patch("app.api.v1.deps.get_connection", side_effect=mock_get_connection):
+        statuses = [
+            (await client.post("/v1/agent/heartbeat", headers={"Authorization": f"Bearer forged-{index}"})).status_code
+            for index in range(5)
+        ]
+
+    # Every token is fresh, but the IP may only send 2 x 2 requests per window.
+    assert statuses == [401, 401, 401, 401, 429]
+
+
+def test_in_memory_buckets_evict_idle_keys(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(request_rate_limit.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(request_rate_limit, "_next_eviction", 0.0)
+    monkeypatch.setattr(request_rate_limit, "_longest_window", 0)
+
+    for index in range(50):
+        assert request_rate_limit._allow_in_memory(f"agent:heartbeat:t:{index}", 5, 60)
+    assert len(request_rate_limit._REQUEST_BUCKETS) == 50
+
+    clock[0] += 61  # past both the window and the eviction interval
+    assert request_rate_limit._allow_in_memory("agent:heartbeat:t:new", 5, 60)
+
+    assert list(request_rate_limit._REQUEST_BUCKETS) == ["agent:heartbeat:t:new"]
@@ -0,0 +1,88 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.config import settings
+from app.services import request_rate_limit
+from app.services.metrics import collect_local, render_prometheus
+from app.services.redis_client import RedisService, RedisUnavailable
+
+
+class FlakyRedis:
+    def __init__(self):
+        self.incr = AsyncMock(side_effect=ConnectionError("Connection refused"))
+        self.expire = AsyncMock()
+        self.ping = AsyncMock(side_effect=ConnectionError("Connection refused"))
+        self.aclose = AsyncMock()
+
+
+@pytest.fixture
+def redis_down(monkeypatch):
+    monkeypatch.setattr(settings, "redis_url", "redis://redis.invalid:6379/0")
+    monkeypatch.setattr(settings, "redis_breaker_failure_threshold", 3)
+    monkeypatch.setattr(settings, "redis_breaker_probe_interval_seconds", 0.01)
+    monkeypatch.setattr(request_rate_limit, "_REQUEST_BUCKETS", {})
+    service = RedisService()
+    fake = FlakyRedis()
+    service._client = fake
+    monkeypatch.setattr(request_rate_limit, "redis_service", service)
+    monkeypatch.setattr("app.services.metrics.redis_service", service)
+    return service, fake
+
+
+@pytest.mark.anyio
+async def test_circuit_opens_and_limits_fall_back_to_memory(redis_down):
+    service, fake = redis_down
+
+    results = [
+        await request_rate_limit.allow_rate_limit_key(scope_key="t:abc", limit=4, window_seconds=60)
+        for _ in range(6)
+    ]
+
+    assert results == [True, True, True, True, False, False]
+    assert fake.incr.await_count == 3  # later calls never touched the socket
+    assert service.circuit_open
+    assert service.snapshot()["short_circuited_total"] == 3
+    with pytest.raises(RedisUnavailable):
+        await service.run(lambda client: client.incr("k"))
+
+    body = render_prometheus(collect_local())
+    assert "pcinsight_redis_circuit_open 1" in body
+    assert "pcinsight_redis_errors_total 3" in body
+    await service.close()
+
+
+@pytest.mark.anyio
+async def test_probe_closes_circuit_once_redis_answers(redis_down):
+    service, fake = redis_down
+    for _ in range(3):
+        with pytest.raises(RedisUnavailable):
+            await service.run(lambda client: client.incr("k"))
+    assert service.circuit_open
+
+    await asyncio.sleep(0.05)
+    assert service.circuit_open
+    fake.ping.side_effect = None
+    fake.incr.side_effect = None
+    fake.incr.return_value = 1
+    for _ in range(50):
+        if not service.circuit_open:
+            break
+        await asyncio.sleep(0.01)
+
+    assert not service.circuit_open
+    assert await service.run(lambda client: client.incr("k")) == 1
+    assert service.snapshot()["opened_total"] == 1
+    await service.close()
+    fake.aclose.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_unconfigured_redis_is_unavailable_without_errors(monkeypatch):
+    monkeypatch.setattr(settings, "redis_url", "")
+    service = RedisService()
+    with pytest.raises(RedisUnavailable):
+        await service.run(lambda client: client.ping())
+    assert service.snapshot()["errors_total"] == 0
+    assert not service.circuit_open
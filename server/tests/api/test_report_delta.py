@@ -0,0 +1,151 @@
+import copy
+import json
+import random
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.api.v1.deps import get_current_user, verify_device_token
+from app.api.v1.routers.agent import INSERT_REPORT
+from app.api.v1.routers.reports import REPORT_DETAIL
+from app.core.config import settings
+from app.main import app
+from app.services import report_delta
+from app.services.report_delta import LATEST_REPORT_BODY, REPORT_BODY_SOURCE, apply_patch, diff
+
+DEVICE = {"device_id": "dev_1", "user_id": "usr_1"}
+
+
+def _report(n):
+    folders = [{"name": name, "bytes": 1_000_000 * (i + 1), "fileCount": 10 * (i + 1)}
+               for i, name in enumerate(["Downloads", "Documents", "Desktop", "Pictures", "a/b~c"]
+                                        + [f"Documents/sub{i}" for i in range(40)])]
+    folders[0]["bytes"] += n * 4096
+    if n % 2:
+        folders.insert(2, {"name": f"Projects{n}", "bytes": n, "fileCount": 1})
+    return {
+        "healthScore": 80 - n,
+        "oneLiner": "양호",
+        "storage": {"folders": folders, "freePercent": 40.5 - n},
+        "recommendations": ["다운로드 폴더를 정리하세요."] * (n % 3),
+        "createdAt": f"2026-01-0{n + 1}T00:00:00+00:00",
+    }
+
+
+class MockConnection:
+    """Keeps uploaded report rows in insertion order, newest last."""
+
+    def __init__(self):
+        self.rows = []
+        self.fetchval = AsyncMock(side_effect=self._fetchval)
+        self.fetchrow = AsyncMock(side_effect=self._fetchrow)
+        self.execute = AsyncMock(return_value="UPDATE 0")
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def _fetchval(self, sql, *args):
+        assert sql == INSERT_REPORT.sql
+        self.rows.append({
+            "id": args[0], "device_id": args[1], "command_id": args[2], "created_at": args[3],
+            "health_score": args[4], "disk_free_percent": args[5], "startup_apps_count": args[6],
+            "one_liner": args[7], "raw_report_json_text": args[8], "raw_report_ref": args[9],
+            "raw_report_base_id": args[10], "raw_report_delta_depth": args[11],
+        })
+        return args[0]
+
+    async def _fetchrow(self, sql, *args):
+        if sql == LATEST_REPORT_BODY.sql:
+            matching = [row for row in self.rows if row["device_id"] == args[0]]
+            return matching[-1] if matching else None
+        if sql in (REPORT_BODY_SOURCE.sql, REPORT_DETAIL.sql):
+            return next((row for row in self.rows if row["id"] == args[0]), None)
+        raise AssertionError(sql)
+
+
+@pytest.fixture
+def deltas(monkeypatch):
+    monkeypatch.setattr(settings, "report_blob_backend", "inline")
+    monkeypatch.setattr(settings, "report_delta_snapshot_interval", 3)
+    report_delta._reconstructed.clear()
+    yield
+    report_delta._reconstructed.clear()
+
+
+def test_patch_round_trips_list_and_nested_changes():
+    rng = random.Random(7)
+    for n in range(6):
+        old, new = _report(n), _report(n + 1)
+        patch_ops = diff(old, new)
+        assert apply_patch(copy.deepcopy(old), json.loads(json.dumps(patch_ops))) == new
+
+    apps = [f"app{i}" for i in range(50)]
+    inserted = apps[:20] + ["new"] + apps[20:]
+    assert diff(apps, inserted) == [["+", "/20", "new"]]
+    assert diff(inserted, apps) == [["-", "/20"]]
+    for _ in range(200):
+        old = [rng.randint(0, 5) for _ in range(rng.randint(0, 8))]
+        new = [rng.randint(0, 5) for _ in range(rng.randint(0, 8))]
+        assert apply_patch(list(old), diff(old, new)) == new
+    assert apply_patch({"a": 1}, diff({"a": 1}, [1, 2])) == [1, 2]
+
+
+def test_patch_keeps_bool_int_and_float_apart():
+    cases = [
+        ([1, 2], [True, 2]),
+        ([0, 1], [0, 1.0]),
+        ({"a": [0, 1.0]}, {"a": [False, 1]}),
+        ([[1], {"x": 1}], [[True], {"x": 1.0}]),
+    ]
+    for old, new in cases:
+        patch_ops = json.loads(json.dumps(diff(old, new)))
+        assert patch_ops
+        assert json.dumps(apply_patch(copy.deepcopy(old), patch_ops)) == json.dumps(new)
+
+
+@pytest.mark.anyio
+async def test_uploads_store_deltas_and_detail_rebuilds_them(client, deltas):
+    conn = MockConnection()
+
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        yield conn
+
+    app.dependency_overrides[verify_device_token] = lambda: DEVICE
+    app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
+    try:
+        with patch("app.api.v1.routers.agent.get_connection", side_effect=mock_get_connection), \
+                patch("app.api.v1.routers.agent.publish_event", AsyncMock()), \
+                patch("app.api.v1.routers.reports.get_read_connection", side_effect=mock_get_connection):
+            for n in range(4):
+                response = await client.post("/v1/agent/reports", json={"command_id": None, "report": _report(n)})
+                assert response.status_code == 200
+            report_delta._reconstructed.clear()
+            details = [(await client.get(f"/v1/reports/{row['id']}")).json() for row in conn.rows]
+    finally:
+        app.dependency_overrides = {}
+
+    rows = conn.rows
+    assert [row["raw_report_delta_depth"] for row in rows] == [0, 1, 2, 0]
+    assert [row["raw_report_base_id"] for row in rows] == [None, rows[0]["id"], rows[1]["id"], None]
+    assert len(rows[2]["raw_report_json_text"]) < len(json.dumps(_report(2), ensure_ascii=False)) / 2
+    assert [detail["raw_report_json"] for detail in details] == [_report(n) for n in range(4)]
+
+
+@pytest.mark.anyio
+async def test_broken_chain_raises_and_next_upload_is_a_snapshot(client, deltas):
+    conn = MockConnection()
+    conn.rows.append({
+        "id": "rpt_orphan", "device_id": "dev_1", "command_id": None, "created_at": None,
+        "health_score": 80, "disk_free_percent": None, "startup_apps_count": None, "one_liner": None,
+        "raw_report_json_text": "[]", "raw_report_ref": None,
+        "raw_report_base_id": "rpt_deleted", "raw_report_delta_depth": 1,
+    })
+
+    with pytest.raises(report_delta.ReportBodyUnavailable):
+        await report_delta.load_report_body(conn, conn.rows[0])
+    body, base_id, depth = await report_delta.encode_report_body(conn, "dev_1", _report(1), b"{}")
+
+    assert (body, base_id, depth) == (b"{}", None, 0)
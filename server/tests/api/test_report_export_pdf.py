@@ -28,12 +28,12 @@ async def test_report_export_pdf_returns_base64_pdf(client):
     }
 
     @asynccontextmanager
-    async def mock_get_connection():
+    async def mock_get_read_connection(*_args):
         yield mock_conn
 
     app.dependency_overrides[get_current_user] = lambda: {"id": "usr_1", "email": "test@example.com"}
 
-    with patch("app.api.v1.routers.reports.get_connection", side_effect=mock_get_connection):
+    with patch("app.api.v1.routers.reports.get_read_connection", side_effect=mock_get_read_connection):
         response = await client.get("/v1/reports/rpt_1/export?format=pdf")
 
     assert response.status_code == 200
@@ -0,0 +1,112 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.api.v1.deps import verify_device_token
+from app.api.v1.routers.agent import COMPLETE_COMMAND_WITH_REPORT, INSERT_REPORT, REPORT_BY_IDEMPOTENCY_KEY
+from app.core.config import settings
+from app.main import app
+
+DEVICE = {"device_id": "dev_1", "user_id": "usr_1"}
+
+
+class MockConnection:
+    """Stores reports keyed like the (device_id, idempotency_key) unique index."""
+
+    def __init__(self):
+        self.stored = {}
+        self.commands = {}
+        self.fetchval = AsyncMock(side_effect=self._fetchval)
+        self.execute = AsyncMock(return_value="UPDATE 1")
+        self.fetchrow = AsyncMock(side_effect=self._fetchrow)
+        self.transactions = 0
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.transactions += 1
+        yield
+
+    async def _fetchrow(self, sql, *args):
+        assert sql == COMPLETE_COMMAND_WITH_REPORT.sql
+        _, report_id, command_id, _ = args
+        previous = self.commands.get(command_id, {"status": "running", "report_id": None})
+        self.commands[command_id] = {"status": "succeeded", "report_id": report_id}
+        return {"type": "RUN_FULL", "previous_status": previous["status"], "previous_report_id": previous["report_id"]}
+
+    async def _fetchval(self, sql, *args):
+        if sql == INSERT_REPORT.sql:
+            key = (args[1], args[-1])
+            if key in self.stored:
+                return None
+            self.stored[key] = args[0]
+            return args[0]
+        if sql == REPORT_BY_IDEMPOTENCY_KEY.sql:
+            return self.stored.get((args[0], args[1]))
+        raise AssertionError(sql)
+
+
+@pytest.fixture
+def upload(client, monkeypatch):
+    monkeypatch.setattr(settings, "report_blob_backend", "inline")
+    conn = MockConnection()
+
+    @asynccontextmanager
+    async def mock_get_connection(*_args, **_kwargs):
+        yield conn
+
+    async def post(body, headers=None):
+        return await client.post("/v1/agent/reports", json=body, headers=headers or {})
+
+    app.dependency_overrides[verify_device_token] = lambda: DEVICE
+    with patch("app.api.v1.routers.agent.get_connection", side_effect=mock_get_connection), \
+            patch("app.api.v1.routers.agent.publish_event", AsyncMock(return_value=None)) as publish:
+        conn.publish = publish
+        yield post, conn
+    app.dependency_overrides = {}
+
+
+@pytest.mark.anyio
+async def test_retry_with_idempotency_key_returns_original_report(upload):
+    post, conn = upload
+    body = {"command_id": "cmd_1", "report": {"healthScore": 80, "oneLiner": "양호"}}
+
+    first = await post(body, {"Idempotency-Key": "9b1c6a2e-upload-1"})
+    retry = await post(body, {"Idempotency-Key": "9b1c6a2e-upload-1"})
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json()["report_id"] == first.json()["report_id"]
+    assert retry.json()["message"] == "Report already uploaded"
+    assert len(conn.stored) == 1
+    completions = [call for call in conn.fetchrow.await_args_list if call.args[0] == COMPLETE_COMMAND_WITH_REPORT.sql]
+    # The replay re-runs the completion for the original report, which changes nothing.
+    assert [call.args[2] for call in completions] == [first.json()["report_id"]] * 2
+    assert conn.publish.await_count == 1  # no second event
+    assert conn.transactions == 2
+
+
+@pytest.mark.anyio
+async def test_replay_completes_a_command_the_original_upload_did_not_name(upload):
+    post, conn = upload
+
+    first = await post({"report": {"healthScore": 80}}, {"Idempotency-Key": "upload-without-command"})
+    retry = await post({"command_id": "cmd_9", "report": {"healthScore": 80}}, {"Idempotency-Key": "upload-without-command"})
+
+    assert retry.json()["report_id"] == first.json()["report_id"]
+    assert conn.commands["cmd_9"] == {"status": "succeeded", "report_id": first.json()["report_id"]}
+    assert conn.publish.await_count == 1
+
+
+@pytest.mark.anyio
+async def test_uploads_without_key_are_deduplicated_by_content(upload):
+    post, conn = upload
+    body = {"command_id": "cmd_2", "report": {"healthScore": 61}}
+
+    first = await post(body)
+    retry = await post(body)
+    other = await post({"command_id": "cmd_3", "report": {"healthScore": 61}})
+
+    assert retry.json()["report_id"] == first.json()["report_id"]
+    assert other.json()["report_id"] != first.json()["report_id"]
+    assert all(key.startswith("sha256:") for _, key in conn.stored)
+    assert len(conn.stored) == 2
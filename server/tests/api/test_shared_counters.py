@@ -0,0 +1,128 @@
+import asyncio
+import multiprocessing
+
+import pytest
+
+from app.core.config import settings
+from app.services import ai_guardrails, request_rate_limit, shared_counters
+from app.services.shared_counters import SharedCounters, SharedCountersFull
+
+fork = multiprocessing.get_context("fork")
+
+
+@pytest.fixture
+def counters_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "counters")
+    monkeypatch.setattr(settings, "redis_url", "")
+    monkeypatch.setattr(settings, "shared_counters_path", path)
+    monkeypatch.setattr(settings, "shared_counters_slots", 1024)
+    monkeypatch.setattr(shared_counters, "_COUNTERS", None)
+    monkeypatch.setattr(request_rate_limit, "_REQUEST_BUCKETS", {})
+    monkeypatch.setattr(ai_guardrails, "_METRICS", ai_guardrails._new_metrics())
+    monkeypatch.setattr(ai_guardrails, "_METRICS_BY_SCOPE", {})
+    yield path
+    if shared_counters._COUNTERS is not None:
+        shared_counters._COUNTERS.close()
+
+
+def _hammer(path: str, times: int) -> None:
+    counters = SharedCounters(path, 1024)
+    for _ in range(times):
+        counters.add("hits")
+
+
+def _run_in_worker(target, *args) -> None:
+    process = fork.Process(target=target, args=args)
+    process.start()
+    process.join(timeout=30)
+    assert process.exitcode == 0
+
+
+def test_increments_are_atomic_across_processes(counters_path):
+    workers = [fork.Process(target=_hammer, args=(counters_path, 500)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    assert SharedCounters(counters_path, 1024).get("hits") == 2000
+
+
+def test_expired_counters_restart_and_full_stripes_raise(counters_path, monkeypatch):
+    counters = SharedCounters(counters_path, 64)  # file already sized: adopts 1024 slots
+    now = [1_000_000]
+    monkeypatch.setattr(shared_counters.time, "time", lambda: now[0])
+    assert counters.add("window", ttl_seconds=60) == 1
+    assert counters.add("window", ttl_seconds=60) == 2
+    now[0] += 61
+    assert counters.get("window") == 0
+    assert counters.add("window", ttl_seconds=60) == 1
+
+    tiny = SharedCounters(counters_path + "-tiny", 64)  # one slot per stripe
+    with pytest.raises(SharedCountersFull):
+        for index in range(65):
+            tiny.add(f"key-{index}")
+
+
+def _spend_rate_limit() -> None:
+    allowed = asyncio.run(request_rate_limit.allow_rate_limit_key(scope_key="t:abc", limit=3, window_seconds=60))
+    assert allowed
+
+
+def test_rate_limit_window_is_shared_by_workers(counters_path):
+    for _ in range(2):
+        _run_in_worker(_spend_rate_limit)
+
+    async def local_attempts():
+        return [
+            await request_rate_limit.allow_rate_limit_key(scope_key="t:abc", limit=3, window_seconds=60)
+            for _ in range(2)
+        ]
+
+    assert asyncio.run(local_attempts()) == [True, False]
+    assert request_rate_limit._REQUEST_BUCKETS == {}
+
+
+def _record_ai_calls() -> None:
+    ai_guardrails.record_ai_call(success=True, scope_key="user:shm")
+    ai_guardrails.record_ai_call(success=False, rate_limited=True, fallback_used=True, scope_key="user:shm")
+
+
+def test_ai_metrics_snapshot_covers_all_workers(counters_path):
+    _run_in_worker(_record_ai_calls)
+    _record_ai_calls()
+
+    scoped = ai_guardrails.get_ai_metrics_snapshot(scope_key="user:shm")
+    assert scoped == {
+        "requests_total": 4,
+        "requests_success": 2,
+        "requests_failed": 2,
+        "requests_rate_limited": 2,
+        "fallback_total": 2,
+    }
+    assert ai_guardrails.get_ai_metrics_snapshot()["requests_total"] == 4
+
+
+def test_ai_metrics_keep_increments_that_overflow_the_shared_table(counters_path, monkeypatch):
+    add = SharedCounters.add
+
+    def add_until_full(self, key, amount=1, *, ttl_seconds=0):
+        if key.startswith("ai:user:full:"):
+            raise SharedCountersFull(key)
+        return add(self, key, amount, ttl_seconds=ttl_seconds)
+
+    monkeypatch.setattr(SharedCounters, "add", add_until_full)
+    ai_guardrails.record_ai_call(success=True, scope_key="user:full")
+    ai_guardrails.record_ai_call(success=False, fallback_used=True, scope_key="user:full")
+
+    # Node-wide keys landed in shared memory once each; only the scoped ones overflowed.
+    assert ai_guardrails._METRICS == ai_guardrails._new_metrics()
+    assert ai_guardrails.get_ai_metrics_snapshot()["requests_total"] == 2
+    assert ai_guardrails.get_ai_metrics_snapshot(scope_key="user:full") == {
+        "requests_total": 2,
+        "requests_success": 1,
+        "requests_failed": 1,
+        "requests_rate_limited": 0,
+        "fallback_total": 1,
+    }
@@ -1,6 +1,6 @@
 import '@testing-library/jest-dom';
 import { QueryClient, QueryClientProvider } from '@tanstack/react-query';
-import { fireEvent, render, screen, waitFor } from '@testing-library/react';
+import { act, fireEvent, render, screen, waitFor } from '@testing-library/react';
 import DeviceDetailPage from '../app/devices/[id]/page';
 
 const mockUseRequireAuth = jest.fn();
@@ -12,6 +12,7 @@ const mockGetDeviceAiSummary = jest.fn();
 const mockGetDeviceAiTrends = jest.fn();
 const mockCreateCommand = jest.fn();
 const mockRevokeDevice = jest.fn();
+const mockSubscribeCommandEvents = jest.fn();
 
 jest.mock('../hooks/use-require-auth', () => ({
     useRequireAuth: () => mockUseRequireAuth(),
@@ -32,6 +33,7 @@ jest.mock('../lib/api', () => ({
         getDeviceAiTrends: (...args: unknown[]) => mockGetDeviceAiTrends(...args),
         createCommand: (...args: unknown[]) => mockCreateCommand(...args),
         revokeDevice: (...args: unknown[]) => mockRevokeDevice(...args),
+        subscribeCommandEvents: (...args: unknown[]) => mockSubscribeCommandEvents(...args),
     },
 }));
 
@@ -139,6 +141,7 @@ describe('DeviceDetailPage', () => {
         mockGetDeviceAiTrends.mockResolvedValue(null);
         mockCreateCommand.mockResolvedValue({ id: 'cmd_created' });
         mockRevokeDevice.mockResolvedValue({ message: 'ok' });
+        mockSubscribeCommandEvents.mockReturnValue(() => undefined);
 
         consoleErrorSpy = jest.spyOn(console, 'error').mockImplementation(() => undefined);
     });
@@ -253,6 +256,64 @@ describe('DeviceDetailPage', () => {
         expect(screen.getByRole('link', { name: '리포트 보기' })).toBeInTheDocument();
     });
 
+    it('tracks running commands over the event stream instead of polling', async () => {
+        const running = {
+            id: 'cmd_r',
+            type: 'RUN_FULL',
+            status: 'running',
+            progress: 30,
+            message: '',
+            created_at: '2026-02-14T12:36:18Z',
+            started_at: '2026-02-14T12:36:20Z',
+            finished_at: null,
+            report_id: null,
+        };
+        mockGetDevice.mockResolvedValue(makeDevice({ recent_commands: [running] }));
+        const handlers: any[] = [];
+        mockSubscribeCommandEvents.mockImplementation((_id: string, h: unknown) => {
+            handlers.push(h);
+            return () => undefined;
+        });
+        renderPage();
+
+        expect(await screen.findByText('30%')).toBeInTheDocument();
+        expect(mockSubscribeCommandEvents).toHaveBeenCalledWith('cmd_r', expect.any(Object));
+
+        act(() => {
+            handlers[0].onUpdate({ command_id: 'cmd_r', device_id: 'dev_test_1', status: 'running', progress: 75 });
+        });
+        expect(await screen.findByText('75%')).toBeInTheDocument();
+        expect(mockGetDevice).toHaveBeenCalledTimes(1);
+    });
+
+    it('falls back to polling when the command stream fails', async () => {
+        mockGetDevice.mockResolvedValue(
+            makeDevice({
+                recent_commands: [
+                    {
+                        id: 'cmd_r',
+                        type: 'PING',
+                        status: 'running',
+                        progress: 10,
+                        message: '',
+                        created_at: '2026-02-14T12:36:18Z',
+                        started_at: null,
+                        finished_at: null,
+                        report_id: null,
+                    },
+                ],
+            })
+        );
+        mockSubscribeCommandEvents.mockImplementation((_id: string, h: any) => {
+            h.onError();
+            return () => undefined;
+        });
+        renderPage();
+
+        expect(await screen.findByText('10%')).toBeInTheDocument();
+        await waitFor(() => expect(mockGetDevice.mock.calls.length).toBeGreaterThan(1), { timeout: 7000 });
+    }, 10000);
+
     it('renders empty command history state', async () => {
         mockGetDevice.mockResolvedValueOnce(makeDevice({ recent_commands: [] }));
         renderPage();
@@ -6,6 +6,7 @@ import Link from 'next/link';
 import { usePathname } from 'next/navigation';
 import { useRequireAuth } from '@/hooks/use-require-auth';
 import { useAbVariant } from '@/hooks/use-ab-variant';
+import { useCommandStream } from '@/hooks/use-command-stream';
 import { useEffect, useState } from 'react';
 import {
     AI_PROVIDER_CHANGED_EVENT,
@@ -43,8 +44,11 @@ export default function DeviceDetailPage() {
         queryKey: ['device', deviceId],
         queryFn: () => api.getDevice(deviceId),
         enabled: isAuthenticated && Boolean(deviceId),
-        refetchInterval: 5000, // Poll for updates
+        // Command progress arrives over SSE (useCommandStream); this slow refresh only
+        // keeps presence and last seen current.
+        refetchInterval: 60000,
     });
+    useCommandStream(deviceId, device?.recent_commands, isAuthenticated && Boolean(deviceId));
 
     const {
         data: aiSummary,
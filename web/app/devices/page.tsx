@@ -2,7 +2,7 @@
 
 import { useEffect, useState } from 'react';
 import { useMutation, useQuery, useQueryClient } from '@tanstack/react-query';
-import { AiProvider, api, Device, DeviceRiskItem } from '@/lib/api';
+import { AiProvider, api, Device, DeviceRiskItem, FleetOverview } from '@/lib/api';
 import Link from 'next/link';
 import { useRequireAuth } from '@/hooks/use-require-auth';
 import {
@@ -34,6 +34,12 @@ export default function DevicesPage() {
         enabled: isAuthenticated,
         refetchInterval: 10000,
     });
+    const { data: fleetOverview } = useQuery({
+        queryKey: ['fleet-overview'],
+        queryFn: () => api.getFleetOverview(7),
+        enabled: isAuthenticated,
+        refetchInterval: 30000,
+    });
     const { data: aiMetrics } = useQuery({
         queryKey: ['ai-metrics'],
         queryFn: () => api.getAiMetrics(),
@@ -203,6 +209,10 @@ export default function DevicesPage() {
                     </div>
                 </div>
 
+                {fleetOverview && fleetOverview.devices_reporting > 0 && (
+                    <FleetOverviewPanel overview={fleetOverview} />
+                )}
+
                 {data?.devices.length === 0 ? (
                     <div className="card p-12 text-center">
                         <div className="text-5xl mb-4">🖥️</div>
@@ -533,6 +543,75 @@ function AiQueryPanel({
     );
 }
 
+function FleetOverviewPanel({ overview }: { overview: FleetOverview }) {
+    const commandTotals = overview.commands.reduce(
+        (acc, item) => ({ succeeded: acc.succeeded + item.succeeded, failed: acc.failed + item.failed }),
+        { succeeded: 0, failed: 0 }
+    );
+    const finished = commandTotals.succeeded + commandTotals.failed;
+    const lowDiskDevices = overview.disk_free_distribution
+        .filter((bucket) => bucket.max_percent <= 20)
+        .reduce((sum, bucket) => sum + bucket.devices, 0);
+    const tiles = [
+        {
+            label: '리포트 디바이스',
+            value: overview.devices_reporting,
+            description: '리포트를 한 번 이상 올린 디바이스 수',
+        },
+        {
+            label: '평균 건강 점수',
+            value: overview.avg_health_score ?? '-',
+            description: '디바이스별 최신 리포트 기준 평균',
+        },
+        {
+            label: '고위험',
+            value: overview.high_risk_devices,
+            description: '최신 리포트 기준 위험 점수 60 이상',
+        },
+        {
+            label: '디스크 20% 미만',
+            value: lowDiskDevices,
+            description: '여유 공간이 20% 미만인 디바이스 수',
+        },
+        {
+            label: `명령 성공률(${overview.days}일)`,
+            value: finished > 0 ? `${Math.round((commandTotals.succeeded / finished) * 100)}%` : '-',
+            description: `완료 ${finished}건 · 리포트 ${overview.reports}건`,
+        },
+    ];
+
+    return (
+        <div className="card mb-6">
+            <div className="card-header">
+                <h2 className="font-semibold">플릿 요약</h2>
+            </div>
+            <div className="card-body">
+                <div className="grid grid-cols-1 sm:grid-cols-2 xl:grid-cols-5 gap-3 text-sm">
+                    {tiles.map((item) => (
+                        <div key={item.label} className="rounded-lg border border-slate-700 p-3">
+                            <div className="text-base font-semibold">
+                                {item.label}: {item.value}
+                            </div>
+                            <p className="mt-1 text-xs text-slate-400 leading-relaxed">
+                                {item.description}
+                            </p>
+                        </div>
+                    ))}
+                </div>
+                {overview.commands.length > 0 && (
+                    <p className="mt-3 text-xs text-slate-500">
+                        {overview.commands
+                            .map((item) =>
+                                `${item.type} ${item.success_rate === null ? '-' : `${Math.round(item.success_rate * 100)}%`}`
+                            )
+                            .join(' · ')}
+                    </p>
+                )}
+            </div>
+        </div>
+    );
+}
+
 function RiskTopPanel({ items }: { items: DeviceRiskItem[] }) {
     return (
         <div className="card mb-6">
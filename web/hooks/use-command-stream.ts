@@ -0,0 +1,65 @@
+'use client';
+
+import { useEffect, useState } from 'react';
+import { useQueryClient } from '@tanstack/react-query';
+import { api, Command, CommandUpdate, DeviceDetail } from '@/lib/api';
+
+const ACTIVE_STATUSES = new Set(['queued', 'running']);
+const FALLBACK_POLL_MS = 5000;
+
+function applyUpdate(command: Command, update: CommandUpdate): Command {
+    const next: Record<string, unknown> = { ...command };
+    for (const [key, value] of Object.entries(update)) {
+        if (key in command && value !== undefined) next[key] = value;
+    }
+    return next as unknown as Command;
+}
+
+/**
+ * Follows the device's queued/running commands over SSE and writes their progress into
+ * the ['device', deviceId] query cache. If a stream fails, the device is polled every
+ * 5s instead until the set of active commands changes, which tries streaming again.
+ * Returns whether the polling fallback is active.
+ */
+export function useCommandStream(deviceId: string, commands: Command[] | undefined, enabled: boolean): boolean {
+    const queryClient = useQueryClient();
+    const [streamFailed, setStreamFailed] = useState(false);
+    const activeKey = (commands ?? [])
+        .filter((command) => ACTIVE_STATUSES.has(command.status))
+        .map((command) => command.id)
+        .sort()
+        .join(',');
+
+    useEffect(() => {
+        setStreamFailed(false);
+        if (!enabled || !activeKey) return;
+
+        const queryKey = ['device', deviceId];
+        const closers = activeKey.split(',').map((commandId) =>
+            api.subscribeCommandEvents(commandId, {
+                onUpdate: (update) => {
+                    queryClient.setQueryData<DeviceDetail>(queryKey, (device) => device && {
+                        ...device,
+                        recent_commands: device.recent_commands.map((command) =>
+                            command.id === commandId ? applyUpdate(command, update) : command
+                        ),
+                    });
+                },
+                // The finished command may have produced a new latest_report.
+                onDone: () => queryClient.invalidateQueries({ queryKey }),
+                onError: () => setStreamFailed(true),
+            })
+        );
+        return () => closers.forEach((close) => close());
+    }, [deviceId, activeKey, enabled, queryClient]);
+
+    useEffect(() => {
+        if (!streamFailed || !enabled || !activeKey) return;
+        const timer = setInterval(() => {
+            queryClient.invalidateQueries({ queryKey: ['device', deviceId] });
+        }, FALLBACK_POLL_MS);
+        return () => clearInterval(timer);
+    }, [deviceId, activeKey, enabled, streamFailed, queryClient]);
+
+    return streamFailed;
+}
@@ -301,6 +301,10 @@ class ApiClient {
         return this.request<{ devices: Device[]; total: number }>('GET', '/v1/devices');
     }
 
+    async getFleetOverview(days = 7) {
+        return this.request<FleetOverview>('GET', `/v1/fleet/overview?days=${days}`);
+    }
+
     async getRiskTopDevices(limit = 5) {
         return this.request<{ items: DeviceRiskItem[]; total: number }>(
             'GET',
@@ -355,6 +359,38 @@ class ApiClient {
         return this.request<Command>('GET', `/v1/commands/${commandId}`);
     }
 
+    // Server-Sent Events for one command: `snapshot`, then `command` updates, then `done`.
+    // EventSource cannot send headers, so the stream authenticates with the session cookie.
+    // The stream is closed on the first error; callers fall back to polling.
+    subscribeCommandEvents(commandId: string, handlers: CommandStreamHandlers): () => void {
+        if (typeof window === 'undefined' || typeof EventSource === 'undefined') {
+            handlers.onError();
+            return () => undefined;
+        }
+        const source = new EventSource(
+            `${this.getApiBase()}/v1/commands/${encodeURIComponent(commandId)}/events`,
+            { withCredentials: true }
+        );
+        const onUpdate = (event: MessageEvent) => {
+            try {
+                handlers.onUpdate(JSON.parse(event.data) as CommandUpdate);
+            } catch {
+                // Ignore a malformed frame; the next update or the final refetch corrects it.
+            }
+        };
+        source.addEventListener('snapshot', onUpdate as EventListener);
+        source.addEventListener('command', onUpdate as EventListener);
+        source.addEventListener('done', () => {
+            source.close();
+            handlers.onDone();
+        });
+        source.onerror = () => {
+            source.close();
+            handlers.onError();
+        };
+        return () => source.close();
+    }
+
     // Reports
     async getReport(reportId: string) {
         return this.request<ReportDetail>('GET', `/v1/reports/${reportId}`);
@@ -424,6 +460,19 @@ export interface DeviceRiskItem {
     latest_report_at: string | null;
 }
 
+export interface FleetOverview {
+    days: number;
+    since: string;
+    devices_reporting: number;
+    avg_health_score: number | null;
+    high_risk_devices: number;
+    disk_free_distribution: { min_percent: number; max_percent: number; devices: number }[];
+    reports: number;
+    report_avg_health_score: number | null;
+    report_avg_disk_free_percent: number | null;
+    commands: { type: string; succeeded: number; failed: number; success_rate: number | null }[];
+}
+
 export interface DeviceAiRecommendedAction {
     command_type: string;
     label: string;
@@ -469,6 +518,15 @@ export interface Command {
     report_id: string | null;
 }
 
+// `snapshot` carries a full Command (id); `command` events carry the changed fields (command_id).
+export type CommandUpdate = Partial<Command> & { command_id?: string; device_id?: string };
+
+export interface CommandStreamHandlers {
+    onUpdate: (update: CommandUpdate) => void;
+    onDone: () => void;
+    onError: () => void;
+}
+
 export interface ReportSummary {
     id: string;
     health_score: number | null;